@@ -0,0 +1,91 @@
+"""Shared helpers for benchmark scripts: timing, and machine-readable results.
+
+Results are written as JSON, and can be compared against a stored baseline with
+`benchmarks/compare.py`::
+
+    {
+      "suite": "hot_paths",
+      "metadata": {"viser": "...", "python": "...", ...},
+      "results": [
+        {"name": "buffer_push", "params": {"num_messages": 1000},
+         "median_sec": ..., "min_sec": ..., "max_sec": ..., "repeats": 5},
+        ...
+      ]
+    }
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+import viser
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeats: int,
+    setup: Optional[Callable[[], Any]] = None,
+    warmup: int = 1,
+) -> Dict[str, float]:
+    """Time a function. If `setup` is passed in, it runs before each repeat and
+    isn't timed. The first `warmup` runs aren't recorded."""
+    times: List[float] = []
+    for i in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+    return {
+        "median_sec": statistics.median(times),
+        "min_sec": min(times),
+        "max_sec": max(times),
+        "repeats": repeats,
+    }
+
+
+class Results:
+    """Collects results for a benchmark suite."""
+
+    def __init__(self, suite: str) -> None:
+        self.suite = suite
+        self.results: List[Dict[str, Any]] = []
+
+    def add(self, name: str, params: Dict[str, Any], timing: Dict[str, float]) -> None:
+        self.results.append({"name": name, "params": params, **timing})
+        param_str = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(
+            f"{name}({param_str}): {timing['median_sec'] * 1e3:.3f} ms",
+            file=sys.stderr,
+        )
+
+    def write(self, output: Optional[Path]) -> None:
+        """Print results as JSON, and write them to a file if `output` is set."""
+        out = json.dumps(
+            {
+                "suite": self.suite,
+                "metadata": {
+                    "viser": viser.__version__,
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "platform": platform.platform(),
+                    "machine": platform.machine(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                },
+                "results": self.results,
+            },
+            indent=2,
+        )
+        print(out)
+        if output is not None:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(out + "\n")
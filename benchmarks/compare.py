@@ -0,0 +1,86 @@
+"""Compare benchmark results against a stored baseline.
+
+Results are matched by benchmark name and parameters. Exits with status 1 if
+any benchmark got slower by more than the threshold, so this can be used in CI.
+
+Usage::
+
+    # Store a baseline, for example from the main branch.
+    python benchmarks/hot_paths.py --output baseline/hot_paths.json
+
+    # Later: measure again, and compare.
+    python benchmarks/hot_paths.py --output results/hot_paths.json
+    python benchmarks/compare.py baseline/hot_paths.json results/hot_paths.json
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import tyro
+
+_ResultKey = Tuple[str, str]
+
+
+def _load(path: Path) -> Dict[_ResultKey, Dict[str, Any]]:
+    data = json.loads(path.read_text())
+    return {
+        (result["name"], json.dumps(result["params"], sort_keys=True)): result
+        for result in data["results"]
+    }
+
+
+def _label(key: _ResultKey) -> str:
+    name, params = key
+    return f"{name} {', '.join(f'{k}={v}' for k, v in json.loads(params).items())}"
+
+
+def main(
+    baseline: Path,
+    current: Path,
+    /,
+    *,
+    threshold: float = 0.1,
+    min_delta_sec: float = 1e-4,
+) -> None:
+    """Compare two benchmark result files.
+
+    Args:
+        baseline: Results to compare against.
+        current: New results.
+        threshold: Relative slowdown in median time that counts as a regression.
+        min_delta_sec: Slowdowns smaller than this are treated as noise.
+    """
+    baseline_results = _load(baseline)
+    current_results = _load(current)
+
+    regressions = 0
+    print(f"{'benchmark':<64} {'baseline':>12} {'current':>12} {'change':>9}")
+    for key, result in current_results.items():
+        label = _label(key)
+        current_sec = result["median_sec"]
+        if key not in baseline_results:
+            print(f"{label:<64} {'-':>12} {current_sec * 1e3:>10.3f}ms {'new':>9}")
+            continue
+
+        baseline_sec = baseline_results[key]["median_sec"]
+        change = current_sec / baseline_sec - 1.0 if baseline_sec > 0 else 0.0
+        regressed = change > threshold and current_sec - baseline_sec > min_delta_sec
+        regressions += regressed
+        print(
+            f"{label:<64} {baseline_sec * 1e3:>10.3f}ms {current_sec * 1e3:>10.3f}ms"
+            f" {change:>+8.1%}{' <-- regression' if regressed else ''}"
+        )
+    for key in baseline_results.keys() - current_results.keys():
+        print(f"{_label(key):<64} missing from current results")
+
+    if regressions > 0:
+        print(f"\n{regressions} regression(s) over {threshold:.0%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
@@ -0,0 +1,110 @@
+"""Event loop latency while a client receives a large point cloud.
+
+Starts a server, adds a point cloud, and connects a single headless websocket
+client. While the client is receiving the point cloud, we measure how long
+callbacks scheduled on the server's event loop wait before running. Long waits
+mean that other clients' sends and receives are stalled.
+
+Usage::
+
+    python benchmarks/event_loop_latency.py --num-points 90_000_000
+    python benchmarks/event_loop_latency.py --num-points 90_000_000 --no-offload
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+import threading
+import time
+from unittest.mock import patch
+
+import numpy as np
+import tyro
+import websockets
+import zstandard
+
+import viser
+import viser._client_autobuild
+
+
+def _decode_header(frame: bytes | str) -> bytes:
+    """Get the decompressed msgpack header from a `client_api_version=2` window."""
+    assert isinstance(frame, bytes)
+    header_size, header_stored_size, buffer_count = struct.unpack_from("<QQQ", frame)
+    header_start = 24 + 24 * buffer_count
+    header = frame[header_start : header_start + header_stored_size]
+    if header_stored_size == header_size:
+        return header
+    return zstandard.ZstdDecompressor().decompress(header, max_output_size=header_size)
+
+
+def main(num_points: int = 10_000_000, offload: bool = True) -> None:
+    with patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None):
+        server = viser.ViserServer(verbose=False)
+    if not offload:
+        server._websock_server._broadcast_buffer.offload_min_bytes = 2**62
+
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(num_points, 3)).astype(np.float32)
+    # Smooth colors: compressible, so they go through zstd.
+    colors = np.linspace(0, 255, num_points * 3).astype(np.uint8).reshape(-1, 3)
+    print(f"Payload: {(points.nbytes + colors.nbytes) / 1e9:.2f} GB")
+
+    # Sample event loop latency from a separate thread.
+    event_loop = server.get_event_loop()
+    latencies: list[float] = []
+    sampling = threading.Event()
+    sampling.set()
+
+    def sample() -> None:
+        while sampling.is_set():
+            scheduled = time.perf_counter()
+            done = threading.Event()
+
+            def record() -> None:
+                latencies.append(time.perf_counter() - scheduled)
+                done.set()
+
+            event_loop.call_soon_threadsafe(record)
+            done.wait()
+            time.sleep(0.005)
+
+    async def receive() -> float:
+        async with websockets.connect(
+            f"ws://localhost:{server.get_port()}",
+            subprotocols=[websockets.Subprotocol(f"viser-v{viser.__version__}")],
+            max_size=None,
+        ) as ws:
+            start = time.perf_counter()
+            while b"PointCloudMessage" not in _decode_header(await ws.recv()):
+                pass
+            return time.perf_counter() - start
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    server.scene.add_point_cloud("/points", points, colors, point_size=0.01)
+    receive_sec = asyncio.run(receive())
+    sampling.clear()
+    sampler.join()
+    server.stop()
+
+    latencies_ms = np.array(latencies) * 1000.0
+    print(
+        json.dumps(
+            {
+                "num_points": num_points,
+                "offload": offload,
+                "receive_sec": receive_sec,
+                "loop_latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+                "loop_latency_ms_p99": float(np.percentile(latencies_ms, 99)),
+                "loop_latency_ms_max": float(latencies_ms.max()),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
@@ -0,0 +1,243 @@
+"""Broadcast fan-out: time from queueing a batch of updates until every client
+has been sent all of them.
+
+Two transports are measured:
+
+- ``fake``: message producers send to in-process connections that only count
+  bytes. This isolates windowing, encoding, and compression from the network.
+- ``websocket``: headless clients connect to a real server over localhost.
+  Clients run in this process, so their receive loop is included in the timing.
+
+Usage::
+
+    python benchmarks/fanout.py --output results/fanout.json
+    python benchmarks/fanout.py --num-clients 1 200 --transports fake
+"""
+
+from __future__ import annotations
+
+import asyncio
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Literal, Optional, Tuple
+from unittest.mock import patch
+
+import numpy as np
+import tyro
+import websockets
+import zstandard
+from _harness import Results
+
+import viser
+import viser._client_autobuild
+from viser import _messages
+from viser.infra._async_message_buffer import AsyncMessageBuffer
+from viser.infra._infra import _ClientHandleState, _message_producer
+
+
+def _updates(num_points: int, num_updates: int) -> List[_messages.Message]:
+    rng = np.random.default_rng(0)
+    out: List[_messages.Message] = [
+        _messages.PointCloudMessage(
+            "/points",
+            _messages.PointCloudProps(
+                points=rng.normal(size=(num_points, 3)).astype(np.float32),
+                colors=rng.integers(0, 256, size=(num_points, 3), dtype=np.uint8),
+                point_size=0.01,
+                point_shape="square",
+                precision="float32",
+            ),
+        )
+    ]
+    out.extend(
+        _messages.SetPositionMessage(f"/frames/{i}", (float(i), 0.0, 0.0))
+        for i in range(num_updates)
+    )
+    return out
+
+
+class _FakeTransport:
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+
+class _FakeConnection:
+    """Stands in for a websocket connection. Sent frames are counted and
+    dropped."""
+
+    def __init__(self) -> None:
+        self.transport = _FakeTransport()
+        self.bytes_sent = 0
+
+    async def send(self, data: object) -> None:
+        if isinstance(data, (bytes, str)):
+            self.bytes_sent += len(data)
+        else:
+            self.bytes_sent += sum(memoryview(c).nbytes for c in data)  # type: ignore
+
+
+async def _fanout_fake(
+    num_clients: int, messages: List[_messages.Message], repeats: int
+) -> List[float]:
+    event_loop = asyncio.get_running_loop()
+    buffer = AsyncMessageBuffer(event_loop, persistent_messages=True)
+    executor = ThreadPoolExecutor(max_workers=4)
+    states = [
+        _ClientHandleState(
+            AsyncMessageBuffer(event_loop, persistent_messages=False), event_loop
+        )
+        for _ in range(num_clients)
+    ]
+    tasks = [
+        event_loop.create_task(
+            _message_producer(
+                _FakeConnection(),  # type: ignore
+                buffer,
+                client_id,
+                2,
+                state,
+                executor,
+            )
+        )
+        for client_id, state in enumerate(states)
+    ]
+
+    times: List[float] = []
+    for _ in range(repeats + 1):
+        target = {
+            state_id: dict(state.send_stats.sent_count_from_type)
+            for state_id, state in enumerate(states)
+        }
+        for counts in target.values():
+            for message in messages:
+                name = type(message).__name__
+                counts[name] = counts.get(name, 0) + 1
+
+        start = time.perf_counter()
+        for message in messages:
+            buffer.push(message)
+        buffer.flush()
+        while not all(
+            all(
+                state.send_stats.sent_count_from_type.get(name, 0) >= count
+                for name, count in target[state_id].items()
+            )
+            for state_id, state in enumerate(states)
+        ):
+            await asyncio.sleep(0)
+        times.append(time.perf_counter() - start)
+
+    buffer.set_done()
+    for state in states:
+        state.message_buffer.set_done()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    executor.shutdown()
+
+    # The first run is a warmup.
+    return times[1:]
+
+
+def _header_from_frame(frame: bytes | str) -> bytes:
+    """Get the decompressed msgpack header from a `client_api_version=2` window."""
+    assert isinstance(frame, bytes)
+    header_size, header_stored_size, buffer_count = struct.unpack_from("<QQQ", frame)
+    header_start = 24 + 24 * buffer_count
+    header = frame[header_start : header_start + header_stored_size]
+    if header_stored_size == header_size:
+        return header
+    return zstandard.ZstdDecompressor().decompress(header, max_output_size=header_size)
+
+
+async def _fanout_websocket(
+    num_clients: int, messages: List[_messages.Message], repeats: int
+) -> List[float]:
+    with patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None):
+        server = viser.ViserServer(verbose=False)
+    connections = [
+        await websockets.connect(
+            f"ws://localhost:{server.get_port()}",
+            subprotocols=[websockets.Subprotocol(f"viser-v{viser.__version__}")],
+            max_size=None,
+        )
+        for _ in range(num_clients)
+    ]
+
+    async def receive_until(ws: Any, marker: bytes) -> None:
+        while marker not in _header_from_frame(await ws.recv()):
+            pass
+
+    # Drain the initial state.
+    await asyncio.gather(
+        *[receive_until(ws, b"SetGuiPanelLabelMessage") for ws in connections]
+    )
+
+    times: List[float] = []
+    for i in range(repeats + 1):
+        # The marker is pushed last, and scene node creation is in the lowest
+        # priority lane, so receiving it means every update was received.
+        marker = f"/marker/{i}"
+        start = time.perf_counter()
+        for message in messages:
+            server._websock_server.queue_message(message)
+        server.scene.add_label(marker, marker)
+        server.flush()
+        await asyncio.gather(
+            *[receive_until(ws, marker.encode()) for ws in connections]
+        )
+        times.append(time.perf_counter() - start)
+
+    for ws in connections:
+        await ws.close()
+    server.stop()
+    return times[1:]
+
+
+def main(
+    *,
+    num_clients: Tuple[int, ...] = (1, 10, 50, 200),
+    num_points: Tuple[int, ...] = (1_000, 100_000),
+    num_updates: int = 100,
+    transports: Tuple[Literal["fake", "websocket"], ...] = ("fake", "websocket"),
+    repeats: int = 5,
+    output: Optional[Path] = None,
+) -> None:
+    """Run benchmarks.
+
+    Args:
+        num_clients: Numbers of connected clients.
+        num_points: Sizes of the point cloud included in each batch.
+        num_updates: Number of small position updates in each batch.
+        transports: Transports to measure.
+        repeats: Number of timed batches for each configuration.
+        output: Path to write JSON results to.
+    """
+    results = Results("fanout")
+    for transport in transports:
+        for points in num_points:
+            messages = _updates(points, num_updates)
+            for clients in num_clients:
+                fanout = _fanout_fake if transport == "fake" else _fanout_websocket
+                times = asyncio.run(fanout(clients, messages, repeats))
+                results.add(
+                    f"fanout_{transport}",
+                    {
+                        "num_clients": clients,
+                        "num_points": points,
+                        "num_updates": num_updates,
+                    },
+                    {
+                        "median_sec": float(np.median(times)),
+                        "min_sec": min(times),
+                        "max_sec": max(times),
+                        "repeats": repeats,
+                    },
+                )
+    results.write(output)
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
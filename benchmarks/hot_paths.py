@@ -0,0 +1,227 @@
+"""Microbenchmarks for server-side hot paths.
+
+Covers message buffer pushes, buffer compaction, scene node creation,
+`Message.as_serializable_dict()`, point cloud ingestion, Gaussian splat setters,
+uint16 position quantization, and batched `SO3.from_matrix()`. Everything runs
+headless, in-process.
+
+Usage::
+
+    python benchmarks/hot_paths.py --output results/hot_paths.json
+    python benchmarks/hot_paths.py --num-points 1000 10000000 --only add_point_cloud
+    python benchmarks/compare.py baseline/hot_paths.json results/hot_paths.json
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from pathlib import Path
+from typing import Optional, Tuple
+from unittest.mock import patch
+
+import numpy as np
+import tyro
+from _harness import Results, measure
+
+import viser
+import viser._client_autobuild
+import viser.transforms as tf
+from viser import _messages
+from viser._quantize import quantize_positions
+from viser.infra._async_message_buffer import AsyncMessageBuffer
+
+
+def _bench_buffer_push(results: Results, num_messages: int, repeats: int) -> None:
+    # Node names repeat, so some pushes replace redundant messages.
+    messages = [
+        _messages.SetPositionMessage(f"/node/{i % 1000}", (1.0, 2.0, 3.0))
+        for i in range(num_messages)
+    ]
+    event_loop = asyncio.new_event_loop()
+    buffer = AsyncMessageBuffer(event_loop, persistent_messages=True)
+
+    def setup() -> None:
+        nonlocal buffer
+        buffer = AsyncMessageBuffer(event_loop, persistent_messages=True)
+
+    def run() -> None:
+        for message in messages:
+            buffer.push(message)
+
+    results.add(
+        "buffer_push",
+        {"num_messages": num_messages},
+        measure(run, repeats, setup=setup),
+    )
+    event_loop.close()
+
+
+def _bench_scene_nodes(
+    results: Results, server: viser.ViserServer, num_nodes: int, repeats: int
+) -> None:
+    def run() -> None:
+        for i in range(num_nodes):
+            server.scene.add_frame(f"/frames/{i}", show_axes=False)
+
+    results.add(
+        "add_frames",
+        {"num_nodes": num_nodes},
+        measure(run, repeats, setup=server.scene.reset),
+    )
+
+    # Removal messages are dropped by compaction. Setup adds and removes the
+    # nodes, then we time the compaction.
+    def setup_removed() -> None:
+        server.scene.reset()
+        server._run_garbage_collector()
+        for i in range(num_nodes):
+            server.scene.add_frame(f"/frames/{i}", show_axes=False).remove()
+
+    results.add(
+        "garbage_collector",
+        {"num_nodes": num_nodes},
+        measure(server._run_garbage_collector, repeats, setup=setup_removed),
+    )
+    server.scene.reset()
+    server._run_garbage_collector()
+
+
+def _bench_point_clouds(
+    results: Results, server: viser.ViserServer, num_points: int, repeats: int
+) -> None:
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(num_points, 3)).astype(np.float32)
+    colors = rng.integers(0, 256, size=(num_points, 3), dtype=np.uint8)
+    counter = itertools.count()
+    fresh_points = points
+
+    # New arrays each time, so content-addressed payloads aren't reused.
+    def setup() -> None:
+        nonlocal fresh_points
+        fresh_points = points.copy()
+        fresh_points[0, 0] = next(counter)
+
+    results.add(
+        "add_point_cloud",
+        {"num_points": num_points},
+        measure(
+            lambda: server.scene.add_point_cloud(
+                "/points", fresh_points, colors, point_size=0.01
+            ),
+            repeats,
+            setup=setup,
+        ),
+    )
+
+    message = _messages.PointCloudMessage(
+        "/points",
+        _messages.PointCloudProps(
+            points=points,
+            colors=colors,
+            point_size=0.01,
+            point_shape="square",
+            precision="float32",
+        ),
+    )
+    results.add(
+        "as_serializable_dict",
+        {"num_points": num_points},
+        measure(message.as_serializable_dict, repeats),
+    )
+
+    # Gaussian splats, with each attribute updated through the handle.
+    covariances = np.tile(np.eye(3, dtype=np.float32) * 0.01, (num_points, 1, 1))
+    opacities = np.full((num_points, 1), 0.5, dtype=np.float32)
+    splats = server.scene.add_gaussian_splats(
+        "/splats", points, covariances, colors / 255.0, opacities
+    )
+
+    def set_attributes() -> None:
+        splats.centers = points
+        splats.covariances = covariances
+        splats.rgbs = colors
+        splats.opacities = opacities
+
+    results.add(
+        "gaussian_splat_setters",
+        {"num_points": num_points},
+        measure(set_attributes, repeats),
+    )
+    server.scene.reset()
+    server._run_garbage_collector()
+
+
+def _bench_so3_from_matrix(results: Results, batch_size: int, repeats: int) -> None:
+    rng = np.random.default_rng(0)
+    matrices = tf.SO3.exp(rng.normal(size=(batch_size, 3))).as_matrix()
+    results.add(
+        "so3_from_matrix",
+        {"batch_size": batch_size},
+        measure(lambda: tf.SO3.from_matrix(matrices), repeats),
+    )
+
+
+def _bench_quantize_positions(results: Results, num_points: int, repeats: int) -> None:
+    # Georeferenced points, which need float64 inputs.
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0.0, 100.0, size=(num_points, 3)) + (4.5e5, 5.4e6, 0.0)
+    results.add(
+        "quantize_positions",
+        {"num_points": num_points},
+        measure(lambda: quantize_positions(points), repeats),
+    )
+
+
+def main(
+    *,
+    num_points: Tuple[int, ...] = (1_000, 100_000, 1_000_000),
+    num_nodes: Tuple[int, ...] = (100, 1_000, 10_000),
+    num_messages: Tuple[int, ...] = (1_000, 100_000),
+    repeats: int = 5,
+    only: Tuple[str, ...] = (),
+    output: Optional[Path] = None,
+) -> None:
+    """Run benchmarks.
+
+    Args:
+        num_points: Point counts for point cloud, splat, quantization, and SO3
+            benchmarks.
+        num_nodes: Scene node counts.
+        num_messages: Message counts for buffer pushes.
+        repeats: Number of timed runs for each benchmark.
+        only: If set, only run benchmarks with these names.
+        output: Path to write JSON results to.
+    """
+
+    def enabled(*names: str) -> bool:
+        return len(only) == 0 or any(name in only for name in names)
+
+    results = Results("hot_paths")
+    if enabled("buffer_push"):
+        for n in num_messages:
+            _bench_buffer_push(results, n, repeats)
+    if enabled("so3_from_matrix"):
+        for n in num_points:
+            _bench_so3_from_matrix(results, n, repeats)
+    if enabled("quantize_positions"):
+        for n in num_points:
+            _bench_quantize_positions(results, n, repeats)
+
+    with patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None):
+        server = viser.ViserServer(verbose=False)
+    try:
+        if enabled("add_frames", "garbage_collector"):
+            for n in num_nodes:
+                _bench_scene_nodes(results, server, n, repeats)
+        if enabled("add_point_cloud", "as_serializable_dict", "gaussian_splat_setters"):
+            for n in num_points:
+                _bench_point_clouds(results, server, n, repeats)
+    finally:
+        server.stop()
+
+    results.write(output)
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
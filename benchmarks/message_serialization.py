@@ -0,0 +1,126 @@
+"""Per-message serialization cost: compiled converters vs. reflection.
+
+Messages are serialized with the per-class converter tables used by
+`Message.as_serializable_dict()` and `Message.deserialize()`, and with the
+reference implementations that inspect type annotations for every value. The
+encoded bytes are checked to be identical.
+
+Usage::
+
+    python benchmarks/message_serialization.py --iterations 20_000
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Callable, Dict
+
+import msgspec.msgpack
+import numpy as np
+import tyro
+
+from viser import _messages
+from viser.infra._messages import (
+    Message,
+    _prepare_for_deserialization,
+    _prepare_for_serialization,
+    get_type_hints_cached,
+)
+
+
+def _reference_serializable_dict(message: Message) -> Dict[str, Any]:
+    hints = get_type_hints_cached(type(message))
+    out = {k: _prepare_for_serialization(v, hints[k]) for k, v in vars(message).items()}
+    out["type"] = type(message).__name__
+    return out
+
+
+def _reference_deserialize(raw: bytes) -> Message:
+    def lists_to_tuple(obj: Any) -> Any:
+        if isinstance(obj, list):
+            return tuple(lists_to_tuple(x) for x in obj)
+        elif isinstance(obj, dict):
+            return {k: lists_to_tuple(v) for k, v in obj.items()}
+        return obj
+
+    mapping = lists_to_tuple(msgspec.msgpack.decode(raw))
+    message_type = Message._subclass_from_type_string()[mapping.pop("type")]
+    hints = get_type_hints_cached(message_type)
+    return message_type(
+        **{k: _prepare_for_deserialization(v, hints[k]) for k, v in mapping.items()}
+    )
+
+
+def _time_per_call_us(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int = 20_000) -> None:
+    outgoing: Dict[str, Message] = {
+        "SetPositionMessage": _messages.SetPositionMessage(
+            "/frame", (np.float64(1.0), np.float64(2.0), np.float64(3.0))
+        ),
+        "SceneNodeUpdateMessage": _messages.SceneNodeUpdateMessage(
+            "/frame", {"axes_length": np.float32(0.5)}
+        ),
+        "FrameMessage": _messages.FrameMessage(
+            "/frame",
+            _messages.FrameProps(True, 0.5, 0.025, 0.05, (255, 0, 0)),
+        ),
+        "GuiUpdateMessage": _messages.GuiUpdateMessage("uuid", {"value": 0.5}),
+    }
+    incoming: Dict[str, Message] = {
+        "ViewerCameraMessage": _messages.ViewerCameraMessage(
+            wxyz=(1.0, 0.0, 0.0, 0.0),
+            position=(1.0, 2.0, 3.0),
+            fov=1.0,
+            near=0.01,
+            far=100.0,
+            image_height=480,
+            image_width=640,
+            look_at=(0.0, 0.0, 0.0),
+            up_direction=(0.0, 0.0, 1.0),
+        ),
+        "TransformControlsUpdateMessage": _messages.TransformControlsUpdateMessage(
+            "/controls", (1.0, 0.0, 0.0, 0.0), (1.0, 2.0, 3.0)
+        ),
+    }
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, message in outgoing.items():
+        compiled = msgspec.msgpack.encode(message.as_serializable_dict())
+        reference = msgspec.msgpack.encode(_reference_serializable_dict(message))
+        assert compiled == reference, name
+        results[f"encode/{name}"] = {
+            "reference_us": _time_per_call_us(
+                lambda: msgspec.msgpack.encode(_reference_serializable_dict(message)),
+                iterations,
+            ),
+            "compiled_us": _time_per_call_us(
+                lambda: msgspec.msgpack.encode(message.as_serializable_dict()),
+                iterations,
+            ),
+        }
+    for name, message in incoming.items():
+        raw = msgspec.msgpack.encode(message.as_serializable_dict())
+        assert vars(Message.deserialize(raw)) == vars(_reference_deserialize(raw))
+        results[f"decode/{name}"] = {
+            "reference_us": _time_per_call_us(
+                lambda: _reference_deserialize(raw), iterations
+            ),
+            "compiled_us": _time_per_call_us(
+                lambda: Message.deserialize(raw), iterations
+            ),
+        }
+
+    for result in results.values():
+        result["speedup"] = result["reference_us"] / result["compiled_us"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    tyro.cli(main)
@@ -23,6 +23,7 @@ from ._gui_handles import GuiUplotHandle as GuiUplotHandle
 from ._gui_handles import GuiVector2Handle as GuiVector2Handle
 from ._gui_handles import GuiVector3Handle as GuiVector3Handle
 from ._gui_handles import UploadedFile as UploadedFile
+from ._headless_client import HeadlessClient as HeadlessClient
 from ._icons_enum import Icon as Icon
 from ._icons_enum import IconName as IconName
 from ._notification_handle import NotificationHandle as NotificationHandle
@@ -49,6 +50,8 @@ from ._scene_handles import MeshHandle as MeshHandle
 from ._scene_handles import MeshSkinnedBoneHandle as MeshSkinnedBoneHandle
 from ._scene_handles import MeshSkinnedHandle as MeshSkinnedHandle
 from ._scene_handles import PointCloudHandle as PointCloudHandle
+from ._scene_handles import PointCloudLodHandle as PointCloudLodHandle
+from ._scene_handles import PointCloudStreamHandle as PointCloudStreamHandle
 from ._scene_handles import PointLightHandle as PointLightHandle
 from ._scene_handles import RectAreaLightHandle as RectAreaLightHandle
 from ._scene_handles import SceneNodeHandle as SceneNodeHandle
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import abc
+import dataclasses
 from functools import cached_property
-from typing import Any, Dict, Generic, Protocol, TypeVar, get_type_hints
+from typing import Any, Dict, Generic, Optional, Protocol, TypeVar, get_type_hints
 
 import numpy as np
 import numpy.typing as npt
 
+from ._quantize import dequantize_positions, quantize_positions
+
 # Type variable for props
 
 
@@ -33,13 +36,26 @@ class AssignablePropsBase(Generic[TImpl]):
 
     _impl: TImpl
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Defaults of props dataclasses are class attributes, which would be
+        # found before `__getattr__()` is called.
+        for base in cls.__mro__:
+            if "__dataclass_fields__" not in base.__dict__:
+                continue
+            for field in dataclasses.fields(base):
+                if field.name in base.__dict__ and isinstance(
+                    getattr(cls, field.name), type(base.__dict__[field.name])
+                ):
+                    setattr(cls, field.name, _PropsFieldWithDefault(field.name))
+
     def __init__(self, impl: TImpl):
         # Make sure arrays are copied to avoid shared references.
         # This will also make sure that our `np.array_equal` checks below work
         # correctly.
         for k, v in vars(impl.props).items():
             if isinstance(v, np.ndarray):
-                setattr(impl.props, k, v.copy())
+                setattr(impl.props, k, np.array(v))
 
         # Store the implementation object.
         self._impl = impl
@@ -89,6 +105,100 @@ class AssignablePropsBase(Generic[TImpl]):
     def _queue_update(self, name: str, value: Any) -> None:
         """Queue an update message with the property change."""
 
+    def _queue_updates(self, updates: Dict[str, Any]) -> None:
+        """Queue changes to several properties, which clients should apply
+        together. By default, each property is queued separately."""
+        for name, value in updates.items():
+            self._queue_update(name, value)
+
+    def _encode_prop(self, name: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Get the props to assign when `name` is set to `value`, for
+        properties whose encoding depends on other properties. Returns None if
+        the value should be cast and assigned as usual.
+
+        By default, quantized positions are re-quantized with a new bounding
+        box."""
+        bounds_name = name + "_bounds"
+        if getattr(self._impl.props, bounds_name, None) is None:
+            return None
+        quantized, bounds = quantize_positions(value)
+        return {bounds_name: bounds, name: quantized}
+
+    def _queue_array_patch(
+        self, name: str, rows: Optional[npt.NDArray[np.int64]]
+    ) -> None:
+        """Queue an update for rows of an array property that were assigned in
+        place. `rows` contains sorted, unique indices along the first axis, or
+        None if any row might have changed.
+
+        By default, the whole array is sent."""
+        del rows
+        self._queue_update(name, np.array(getattr(self._impl.props, name)))
+
+
+class _PropsFieldWithDefault:
+    """Class attribute for reading props fields that have defaults."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Any, objtype: Any = None) -> Any:
+        if obj is None:
+            return self
+        return props_getattr(obj, self.name)
+
+
+class PropArrayView(np.ndarray):
+    """Writable view of an array property, returned when array properties are
+    read from a handle. Assigning to rows of the view, for example with
+    `handle.colors[idx] = (255, 0, 0)`, updates the property and sends only the
+    changed rows to clients.
+
+    Arrays derived from a view (slices, arithmetic results, ...) are not
+    tracked: `handle.points[0][2] = 1.0` changes the server-side value without
+    sending it."""
+
+    # Set only on views returned by handles. Derived arrays keep these defaults.
+    _handle: Optional[AssignablePropsBase] = None
+    _prop_name: str = ""
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        handle = self._handle
+        if handle is None or getattr(handle._impl.props, self._prop_name) is not (
+            self.base
+        ):
+            # Not tracked, or the property has since been replaced.
+            super().__setitem__(key, value)
+            return
+
+        name = self._prop_name
+        value = handle._cast_value_recursive(
+            handle._prop_hints[name], np.asarray(value), name
+        )
+        super().__setitem__(key, value)
+        handle._queue_array_patch(name, _rows_from_key(key, self.shape[0]))
+
+
+def _rows_from_key(key: Any, num_rows: int) -> Optional[npt.NDArray[np.int64]]:
+    """Get the rows along the first axis that an indexing key can write to.
+    Returns None if they can't be determined cheaply."""
+    first = key[0] if isinstance(key, tuple) and len(key) > 0 else key
+    if isinstance(first, (int, np.integer)):
+        row = int(first) + num_rows if first < 0 else int(first)
+        return np.array([row], dtype=np.int64)
+    if isinstance(first, slice):
+        return np.arange(*first.indices(num_rows), dtype=np.int64)[
+            :: 1 if (first.step is None or first.step > 0) else -1
+        ]
+    if isinstance(first, (list, np.ndarray)):
+        index = np.asarray(first)
+        if index.dtype == np.bool_ and index.shape == (num_rows,):
+            return np.flatnonzero(index).astype(np.int64)
+        if np.issubdtype(index.dtype, np.integer):
+            index = index.reshape(-1).astype(np.int64)
+            return np.unique(np.where(index < 0, index + num_rows, index))
+    return None
+
 
 def props_setattr(self, name: str, value: Any) -> None:
     if name == "_impl":
@@ -102,7 +212,24 @@ def props_setattr(self, name: str, value: Any) -> None:
 
     # Try to handle as a props field.
     if name in self._prop_hints:
+        # In-place operators, like `handle.points += 1.0`, modify the property
+        # before it's assigned back.
+        if isinstance(value, PropArrayView) and value.base is getattr(
+            self._impl.props, name
+        ):
+            self._queue_array_patch(name, None)
+            return
+
+        # Props that are encoded together are sent in a single update.
+        updates = self._encode_prop(name, value)
+        if updates is not None:
+            for update_name, update_value in updates.items():
+                setattr(self._impl.props, update_name, update_value)
+            self._queue_updates(updates)
+            return
+
         # Handle type casting (arrays, tuples of arrays, etc.).
+        incoming = value
         value = self._cast_value_recursive(self._prop_hints[name], value, name)
         current_value = getattr(self._impl.props, name)
 
@@ -123,11 +250,18 @@ def props_setattr(self, name: str, value: Any) -> None:
                 if np.array_equal(current_value, value):
                     return
 
+            # Casts usually copy, but not always. The queued message shouldn't
+            # change if the caller modifies their array later.
+            if isinstance(incoming, np.ndarray) and np.may_share_memory(
+                value, incoming
+            ):
+                value = value.copy()
+
             # In-place update for same shape arrays.
             if hasattr(current_value, "shape") and value.shape == current_value.shape:
                 current_value[:] = value
             else:
-                setattr(self._impl.props, name, value.copy())
+                setattr(self._impl.props, name, np.array(value))
         else:
             # Non-array properties
             setattr(self._impl.props, name, value)
@@ -139,7 +273,20 @@ def props_setattr(self, name: str, value: Any) -> None:
 
 def props_getattr(self, name: str) -> Any:
     if name in self._prop_hints:
-        return getattr(self._impl.props, name)
+        value = getattr(self._impl.props, name)
+        bounds = getattr(self._impl.props, name + "_bounds", None)
+        if bounds is not None:
+            # Quantized positions are read as a dequantized copy. It's
+            # read-only, since assigning to it wouldn't update the property.
+            out = dequantize_positions(value, bounds)
+            out.flags.writeable = False
+            return out
+        if isinstance(value, np.ndarray) and value.ndim > 0:
+            view = value.view(PropArrayView)
+            view._handle = self
+            view._prop_name = name
+            return view
+        return value
     else:
         raise AttributeError(
             f"'{self.__class__.__name__}' object has no attribute '{name}'"
@@ -157,6 +157,13 @@ def _build_viser_client(out_dir: Path, cached: bool = True) -> None:
         check=False,
     )
 
+    # Write .gz/.br files next to the build outputs, so the server doesn't
+    # need to compress them at runtime.
+    if out_dir.exists():
+        from .infra._static_files import precompress_directory
+
+        precompress_directory(out_dir)
+
 
 def build_client_entrypoint() -> None:
     """Build the Viser client entrypoint, which is used to launch the viewer."""
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import functools
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+
+from . import _messages, infra
+
+_SCENE_ATTRIBUTE_FROM_MESSAGE_TYPE = {
+    "SetPositionMessage": "position",
+    "SetOrientationMessage": "wxyz",
+    "SetSceneNodeVisibilityMessage": "visible",
+    "SetSceneNodeClickableMessage": "clickable",
+}
+
+
+class HeadlessClient(infra.WebsockClient):
+    """Python client for a :class:`viser.ViserServer`, which mirrors scene and
+    GUI state without rendering anything.
+
+    This is useful for load testing and automation. Clients are asyncio-based,
+    so many can share one event loop::
+
+        async with viser.HeadlessClient("ws://localhost:8080") as client:
+            await client.send_camera()
+            await client.wait_until(lambda: client.find_gui("Reset") is not None)
+            await client.click_button(client.find_gui("Reset")["uuid"])
+
+    Mirrored state is stored as decoded message dictionaries, in the same shape
+    that the browser client sees.
+
+    Args:
+        url: Websocket URL of the server, like ``ws://localhost:8080``.
+        compact: Request the compact positional message format from the server.
+        dictionary_compression: Ask the server to compress small message
+            headers with the bundled zstd dictionary.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        compact: bool = True,
+        dictionary_compression: bool = True,
+    ) -> None:
+        super().__init__(
+            url,
+            message_class=_messages.Message,
+            compact=compact,
+            dictionary_compression=dictionary_compression,
+        )
+        self.scene: Dict[str, Dict[str, Any]] = {}
+        """Scene node creation messages, keyed by node name. Prop updates are
+        applied in place."""
+        self.scene_attributes: Dict[str, Dict[str, Any]] = {}
+        """Per-node `position`, `wxyz`, `visible`, and `clickable` attributes
+        set by the server, keyed by node name."""
+        self.gui: Dict[str, Dict[str, Any]] = {}
+        """GUI component creation messages, keyed by UUID. Value and prop
+        updates are applied in place."""
+        self.point_cloud_lod_nodes: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        """Octree node messages of level-of-detail point clouds, keyed by node
+        name and then by node ID."""
+        self.received_count_from_type: Dict[str, int] = {}
+
+    def find_gui(self, label: str) -> Optional[Dict[str, Any]]:
+        """Find a GUI component by its label. Returns `None` if there's no
+        match."""
+        for message in self.gui.values():
+            props = message.get("props", None)
+            if isinstance(props, dict) and props.get("label", None) == label:
+                return message
+        return None
+
+    async def send_camera(
+        self,
+        *,
+        wxyz: Tuple[float, float, float, float] = (1.0, 0.0, 0.0, 0.0),
+        position: Tuple[float, float, float] = (0.0, 0.0, -3.0),
+        fov: float = 1.3,
+        near: float = 0.01,
+        far: float = 1000.0,
+        image_height: int = 720,
+        image_width: int = 1280,
+        look_at: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+        up_direction: Tuple[float, float, float] = (0.0, 0.0, 1.0),
+    ) -> None:
+        """Send a camera update, as the browser client does when the viewport
+        moves. Servers wait for the first one before `client.camera` is
+        available."""
+        await self.send(
+            _messages.ViewerCameraMessage(
+                wxyz=wxyz,
+                position=position,
+                fov=fov,
+                near=near,
+                far=far,
+                image_height=image_height,
+                image_width=image_width,
+                look_at=look_at,
+                up_direction=up_direction,
+            )
+        )
+
+    async def update_gui(self, uuid: str, **updates: Any) -> None:
+        """Send a GUI update, like `update_gui(uuid, value=3.0)`. The local
+        mirror is updated immediately."""
+        if uuid in self.gui:
+            _apply_updates(self.gui[uuid], updates)
+        await self.send(_messages.GuiUpdateMessage(uuid, updates))
+
+    async def click_button(self, uuid: str) -> None:
+        """Click a GUI button."""
+        await self.send(_messages.GuiUpdateMessage(uuid, {"value": True}))
+
+    async def click_scene_node(
+        self,
+        name: str,
+        *,
+        ray_origin: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+        ray_direction: Tuple[float, float, float] = (0.0, 0.0, 1.0),
+        screen_pos: Tuple[float, float] = (0.5, 0.5),
+        instance_index: Optional[int] = None,
+    ) -> None:
+        """Click a scene node. The server only runs callbacks for clickable
+        nodes."""
+        await self.send(
+            _messages.SceneNodeClickMessage(
+                name=name,
+                instance_index=instance_index,
+                ray_origin=ray_origin,
+                ray_direction=ray_direction,
+                screen_pos=screen_pos,
+            )
+        )
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        message_type = message["type"]
+        self.received_count_from_type[message_type] = (
+            self.received_count_from_type.get(message_type, 0) + 1
+        )
+        if message_type in _SCENE_ATTRIBUTE_FROM_MESSAGE_TYPE:
+            attribute = _SCENE_ATTRIBUTE_FROM_MESSAGE_TYPE[message_type]
+            self.scene_attributes.setdefault(message["name"], {})[attribute] = message[
+                attribute
+            ]
+        elif message_type == "SceneNodeUpdateMessage":
+            if message["name"] in self.scene:
+                _apply_updates(self.scene[message["name"]], message["updates"])
+        elif message_type == "SceneNodeArrayPatchMessage":
+            if message["name"] in self.scene:
+                _apply_array_patch(self.scene[message["name"]], message)
+        elif message_type == "PointCloudLodNodeMessage":
+            nodes = self.point_cloud_lod_nodes.setdefault(message["name"], {})
+            nodes[message["node_id"]] = message
+        elif message_type == "PointCloudLodEvictMessage":
+            nodes = self.point_cloud_lod_nodes.get(message["name"], {})
+            for node_id in message["node_ids"]:
+                nodes.pop(node_id, None)
+        elif message_type == "RemoveSceneNodeMessage":
+            # As in the browser client, descendants are removed too.
+            prefix = message["name"] + "/"
+            for name in list(self.scene.keys()):
+                if name == message["name"] or name.startswith(prefix):
+                    self.scene.pop(name)
+                    self.scene_attributes.pop(name, None)
+                    self.point_cloud_lod_nodes.pop(name, None)
+        elif message_type == "GuiUpdateMessage":
+            if message["uuid"] in self.gui:
+                _apply_updates(self.gui[message["uuid"]], message["updates"])
+        elif message_type == "GuiRemoveMessage":
+            self.gui.pop(message["uuid"], None)
+        elif message_type == "ResetGuiMessage":
+            self.gui.clear()
+        elif message_type in _scene_node_types():
+            self.scene[message["name"]] = message
+        elif message_type in _gui_component_types():
+            self.gui[message["uuid"]] = message
+
+
+def _apply_updates(message: Dict[str, Any], updates: Dict[str, Any]) -> None:
+    """Apply a `{field name: value}` mapping to a decoded creation message.
+    Names can refer to `props` fields or to top-level message fields, as in
+    `_messages._fold_updates()`."""
+    props = message.get("props", None)
+    for name, value in updates.items():
+        if isinstance(props, dict) and name in props:
+            props[name] = value
+        else:
+            message[name] = value
+
+
+def _apply_array_patch(message: Dict[str, Any], patch: Dict[str, Any]) -> None:
+    """Overwrite rows of a decoded array prop, as in the browser client."""
+    props = message["props"]
+    data = bytearray(props[patch["prop_name"]])
+    row_bytes = patch["row_bytes"]
+    values = memoryview(patch["values"]).cast("B")
+    if patch["indices"] is None:
+        offset = patch["start"] * row_bytes
+        data[offset : offset + len(values)] = values
+    else:
+        indices = np.frombuffer(patch["indices"], dtype="<u4")
+        for i, row in enumerate(indices.tolist()):
+            offset = row * row_bytes
+            data[offset : offset + row_bytes] = values[
+                i * row_bytes : (i + 1) * row_bytes
+            ]
+    props[patch["prop_name"]] = bytes(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _scene_node_types() -> FrozenSet[str]:
+    return frozenset(
+        cls.__name__
+        for cls in _messages.Message.get_subclasses()
+        if issubclass(cls, _messages._CreateSceneNodeMessage)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _gui_component_types() -> FrozenSet[str]:
+    return frozenset(
+        cls.__name__
+        for cls in _messages.Message.get_subclasses()
+        if issubclass(cls, _messages._CreateGuiComponentMessage)
+    )
@@ -0,0 +1,564 @@
+"""Load testing for :class:`viser.ViserServer`, via the `viser-loadtest` entry
+point.
+
+A scenario is a Python file that sets up a server::
+
+    def setup(server: viser.ViserServer) -> None: ...
+
+    # Optional: called in a loop, at UPDATE_HZ.
+    def update(server: viser.ViserServer, step: int) -> None: ...
+
+    UPDATE_HZ = 60.0
+
+Scenarios run in a child process, so server memory and CPU usage can be
+measured separately from the clients. Headless clients are then ramped up in
+levels. At each level, we record time-to-first-frame for joining clients,
+window latency, and server memory and CPU usage. Results are written as JSON
+and as an HTML report with scaling curves.
+
+Usage::
+
+    viser-loadtest animation --clients 1 10 50 100
+    viser-loadtest ./my_scenario.py --clients 10 100 200 --hold-sec 10
+
+All clients share one event loop. For very large scenes or client counts,
+client-side decoding can become the bottleneck; this shows up as growing
+latency with flat server CPU usage.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import functools
+import html
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import platform
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import websockets
+
+import viser
+
+from ._headless_client import HeadlessClient
+from .infra._metrics import WINDOW_LATENCY_SECONDS_BOUNDS, Histogram
+
+_BUILTIN_SCENARIOS_DIR = Path(__file__).parent / "_loadtest_scenarios"
+
+UsageSampler = Callable[[], Tuple[Optional[float], Optional[float]]]
+"""Returns server resident memory in bytes and total CPU time in seconds. Either
+can be None if unavailable."""
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadtestLevel:
+    """Measurements for one level of the client ramp."""
+
+    num_clients: int
+    failed_joins: int
+    """Clients that joined at this level, but didn't receive the initial scene
+    before the join timeout."""
+    time_to_first_frame_sec: Tuple[float, ...]
+    """For each client that joined at this level: time from starting to connect
+    until every scene node created by the scenario's `setup()` was received."""
+    latency_p50_sec: Optional[float]
+    latency_p95_sec: Optional[float]
+    latency_p99_sec: Optional[float]
+    """Window latency quantiles during the hold period, across all clients.
+    These are estimated as histogram bucket upper bounds."""
+    received_bytes_per_sec: float
+    """Total receive throughput across all clients during the hold period."""
+    server_rss_bytes: Optional[float]
+    """Peak server resident memory during the hold period."""
+    server_cpu_percent: Optional[float]
+    """Server CPU usage during the hold period. 100 is one full core."""
+
+
+def _builtin_scenarios() -> List[str]:
+    return sorted(
+        path.stem
+        for path in _BUILTIN_SCENARIOS_DIR.glob("*.py")
+        if not path.name.startswith("_")
+    )
+
+
+def _resolve_scenario(scenario: str) -> Path:
+    """Get a scenario file from either a path or a built-in scenario name."""
+    if scenario in _builtin_scenarios():
+        return _BUILTIN_SCENARIOS_DIR / f"{scenario}.py"
+    path = Path(scenario)
+    if not path.is_file():
+        raise FileNotFoundError(
+            f"{scenario!r} is not a scenario file or a built-in scenario. Built-in"
+            f" scenarios are: {', '.join(_builtin_scenarios())}."
+        )
+    return path.resolve()
+
+
+def _load_scenario(path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(
+        f"viser_loadtest_scenario_{path.stem}", path
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not callable(getattr(module, "setup", None)):
+        raise ValueError(f"Scenario {path} should define a `setup(server)` function.")
+    return module
+
+
+def _serve_scenario(path: Path, port: int, conn: Connection, stop_event: Any) -> None:
+    """Run a scenario server until `stop_event` is set. This is the target of
+    the server process.
+
+    After setup, the server's port and the names of all scene nodes are sent
+    through `conn`."""
+    scenario = _load_scenario(path)
+    server = viser.ViserServer(port=port, verbose=False)
+    scenario.setup(server)
+    conn.send((server.get_port(), sorted(server.scene._handle_from_node_name.keys())))
+
+    update = getattr(scenario, "update", None)
+    if update is None:
+        stop_event.wait()
+    else:
+        period = 1.0 / getattr(scenario, "UPDATE_HZ", 60.0)
+        step = 0
+        next_time = time.perf_counter()
+        while not stop_event.is_set():
+            update(server, step)
+            step += 1
+            # Skip steps instead of bursting if updates fall behind.
+            next_time = max(next_time + period, time.perf_counter())
+            stop_event.wait(next_time - time.perf_counter())
+    server.stop()
+
+
+def _process_usage(pid: int) -> Tuple[Optional[float], Optional[float]]:
+    """Get resident memory in bytes and total CPU time in seconds for a
+    process. This uses `psutil` if it's installed, and otherwise falls back to
+    `/proc`."""
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        process = psutil.Process(pid)
+        cpu_times = process.cpu_times()
+        return float(process.memory_info().rss), cpu_times.user + cpu_times.system
+
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        statm = Path(f"/proc/{pid}/statm").read_text()
+    except OSError:
+        return None, None
+    # Fields after the command name, which is in parentheses, start at `state`.
+    fields = stat.rsplit(")", 1)[1].split()
+    cpu_sec = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return float(int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")), cpu_sec
+
+
+async def _join(
+    client: HeadlessClient, expected_nodes: FrozenSet[str], timeout: float
+) -> Optional[float]:
+    """Connect a client, and wait for the initial scene. Returns the time this
+    took, or None on failure."""
+
+    async def join() -> float:
+        start = time.perf_counter()
+        await client.connect()
+        await client.send_camera()
+        await client.wait_until(lambda: client.scene.keys() >= expected_nodes)
+        return time.perf_counter() - start
+
+    try:
+        return await asyncio.wait_for(join(), timeout)
+    except (asyncio.TimeoutError, OSError, websockets.exceptions.WebSocketException):
+        return None
+
+
+async def _run_levels(
+    url: str,
+    *,
+    levels: Sequence[int],
+    expected_nodes: Sequence[str],
+    sample_usage: UsageSampler,
+    ramp_per_sec: float,
+    hold_sec: float,
+    join_timeout_sec: float,
+) -> List[LoadtestLevel]:
+    """Ramp up clients through each level, holding at each one to measure."""
+    expected = frozenset(expected_nodes)
+    clients: List[HeadlessClient] = []
+    out: List[LoadtestLevel] = []
+    try:
+        for num_clients in levels:
+            joins = []
+            while len(clients) < num_clients:
+                client = HeadlessClient(url)
+                clients.append(client)
+                joins.append(
+                    asyncio.create_task(_join(client, expected, join_timeout_sec))
+                )
+                await asyncio.sleep(1.0 / ramp_per_sec)
+            join_times = await asyncio.gather(*joins)
+
+            # Only measure steady state, after every client has joined.
+            for client in clients:
+                client.stats.window_latency_sec = Histogram(
+                    WINDOW_LATENCY_SECONDS_BOUNDS
+                )
+            bytes_start = sum(client.stats.bytes_received for client in clients)
+            peak_rss, cpu_start = sample_usage()
+            time_start = time.perf_counter()
+            time_end = time_start + hold_sec
+            while True:
+                await asyncio.sleep(max(0.0, min(0.25, time_end - time.perf_counter())))
+                rss, cpu_end = sample_usage()
+                if rss is not None:
+                    peak_rss = max(peak_rss or 0.0, rss)
+                if time.perf_counter() >= time_end:
+                    break
+            elapsed = time.perf_counter() - time_start
+
+            latency = functools.reduce(
+                Histogram.merged,
+                [client.stats.window_latency_sec for client in clients],
+                Histogram(WINDOW_LATENCY_SECONDS_BOUNDS),
+            )
+            bytes_end = sum(client.stats.bytes_received for client in clients)
+            out.append(
+                LoadtestLevel(
+                    num_clients=len(clients),
+                    failed_joins=sum(t is None for t in join_times),
+                    time_to_first_frame_sec=tuple(
+                        t for t in join_times if t is not None
+                    ),
+                    latency_p50_sec=latency.quantile(0.5),
+                    latency_p95_sec=latency.quantile(0.95),
+                    latency_p99_sec=latency.quantile(0.99),
+                    received_bytes_per_sec=(bytes_end - bytes_start) / elapsed,
+                    server_rss_bytes=peak_rss,
+                    server_cpu_percent=None
+                    if cpu_start is None or cpu_end is None
+                    else (cpu_end - cpu_start) / elapsed * 100.0,
+                )
+            )
+    finally:
+        await asyncio.gather(*[client.close() for client in clients])
+    return out
+
+
+def run_loadtest(
+    scenario: str,
+    *,
+    clients: Sequence[int] = (1, 10, 50, 100),
+    ramp_per_sec: float = 20.0,
+    hold_sec: float = 5.0,
+    join_timeout_sec: float = 60.0,
+    port: int = 8080,
+    output_dir: Optional[Path] = None,
+) -> List[LoadtestLevel]:
+    """Run a load test, and print a summary. If `output_dir` is set, JSON
+    results and an HTML report are written there.
+
+    Args:
+        scenario: Path to a scenario file, or the name of a built-in scenario.
+        clients: Client counts to ramp up through.
+        ramp_per_sec: Rate at which new clients connect.
+        hold_sec: How long to measure at each level.
+        join_timeout_sec: Clients that don't receive the initial scene within
+            this time are counted as failed joins.
+        port: Port to start the server on. The next free port is used if
+            this one is taken.
+        output_dir: Directory to write results to.
+    """
+    path = _resolve_scenario(scenario)
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    stop_event = context.Event()
+    process = context.Process(
+        target=_serve_scenario,
+        args=(path, port, child_conn, stop_event),
+        daemon=True,
+    )
+    process.start()
+    try:
+        while not parent_conn.poll(0.1):
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Scenario server exited during setup, with code {process.exitcode}."
+                )
+        server_port, expected_nodes = parent_conn.recv()
+        pid = process.pid
+        assert pid is not None
+        levels = asyncio.run(
+            _run_levels(
+                f"ws://localhost:{server_port}",
+                levels=sorted(set(clients)),
+                expected_nodes=expected_nodes,
+                sample_usage=lambda: _process_usage(pid),
+                ramp_per_sec=ramp_per_sec,
+                hold_sec=hold_sec,
+                join_timeout_sec=join_timeout_sec,
+            )
+        )
+    finally:
+        stop_event.set()
+        process.join(timeout=5.0)
+        if process.is_alive():
+            process.terminate()
+
+    _print_levels(levels)
+    if output_dir is not None:
+        _write_report(output_dir, path.stem, levels)
+    return levels
+
+
+def _quantile(values: Sequence[float], q: float) -> Optional[float]:
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _format(value: Optional[float], scale: float = 1.0, digits: int = 1) -> str:
+    if value is None:
+        return "-"
+    if math.isinf(value):
+        return "inf"
+    return f"{value * scale:.{digits}f}"
+
+
+def _print_levels(levels: Sequence[LoadtestLevel]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title="viser-loadtest")
+    for column in (
+        "clients",
+        "failed",
+        "first frame p50 (ms)",
+        "first frame p95 (ms)",
+        "latency p50 (ms)",
+        "latency p99 (ms)",
+        "rx (MB/s)",
+        "server RSS (MB)",
+        "server CPU (%)",
+    ):
+        table.add_column(column, justify="right")
+    for level in levels:
+        table.add_row(
+            str(level.num_clients),
+            str(level.failed_joins),
+            _format(_quantile(level.time_to_first_frame_sec, 0.5), 1e3),
+            _format(_quantile(level.time_to_first_frame_sec, 0.95), 1e3),
+            _format(level.latency_p50_sec, 1e3),
+            _format(level.latency_p99_sec, 1e3),
+            _format(level.received_bytes_per_sec, 1e-6),
+            _format(level.server_rss_bytes, 1e-6),
+            _format(level.server_cpu_percent),
+        )
+    Console().print(table)
+
+
+_CHART_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c")
+
+
+def _svg_chart(
+    title: str, xs: Sequence[float], series: Dict[str, List[Optional[float]]]
+) -> str:
+    """Render a line chart as SVG. Missing and infinite values are skipped."""
+    width, height, margin = 480, 280, 56
+    values = [
+        y for ys in series.values() for y in ys if y is not None and math.isfinite(y)
+    ]
+    y_max = max(values, default=0.0) * 1.1 or 1.0
+    x_min, x_max = min(xs), max(xs)
+
+    def px(x: float) -> float:
+        return margin + (x - x_min) / ((x_max - x_min) or 1.0) * (width - 2 * margin)
+
+    def py(y: float) -> float:
+        return height - margin - y / y_max * (height - 2 * margin)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}"'
+        ' font-family="sans-serif" font-size="11">',
+        f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="13"'
+        f' font-weight="bold">{html.escape(title)}</text>',
+        f'<line x1="{margin}" y1="{height - margin}" x2="{width - margin}"'
+        f' y2="{height - margin}" stroke="black"/>',
+        f'<line x1="{margin}" y1="{margin}" x2="{margin}" y2="{height - margin}"'
+        ' stroke="black"/>',
+        f'<text x="{width / 2}" y="{height - 12}" text-anchor="middle">clients</text>',
+    ]
+    for x in xs:
+        parts.append(
+            f'<text x="{px(x):.1f}" y="{height - margin + 16}"'
+            f' text-anchor="middle">{x:g}</text>'
+        )
+    for fraction in (0.0, 0.5, 1.0):
+        parts.append(
+            f'<text x="{margin - 6}" y="{py(fraction * y_max) + 4:.1f}"'
+            f' text-anchor="end">{fraction * y_max:.3g}</text>'
+        )
+    for i, (label, ys) in enumerate(series.items()):
+        color = _CHART_COLORS[i % len(_CHART_COLORS)]
+        points = " ".join(
+            f"{px(x):.1f},{py(y):.1f}"
+            for x, y in zip(xs, ys)
+            if y is not None and math.isfinite(y)
+        )
+        parts.append(
+            f'<polyline fill="none" stroke="{color}" stroke-width="2"'
+            f' points="{points}"/>'
+        )
+        parts.append(
+            f'<text x="{width - margin}" y="{40 + 14 * i}" text-anchor="end"'
+            f' fill="{color}">{html.escape(label)}</text>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _scaled(values: Sequence[Optional[float]], scale: float) -> List[Optional[float]]:
+    return [None if v is None else v * scale for v in values]
+
+
+def _write_report(
+    output_dir: Path, scenario_name: str, levels: Sequence[LoadtestLevel]
+) -> None:
+    """Write `results.json` and `report.html` to a directory."""
+    metadata = {
+        "scenario": scenario_name,
+        "viser": viser.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "results.json").write_text(
+        json.dumps(
+            {
+                "metadata": metadata,
+                "levels": [dataclasses.asdict(level) for level in levels],
+            },
+            indent=2,
+        )
+        + "\n"
+    )
+
+    xs = [level.num_clients for level in levels]
+    first_frame = [level.time_to_first_frame_sec for level in levels]
+    charts = [
+        _svg_chart(
+            "Time to first frame (ms)",
+            xs,
+            {
+                "p50": _scaled([_quantile(t, 0.5) for t in first_frame], 1e3),
+                "p95": _scaled([_quantile(t, 0.95) for t in first_frame], 1e3),
+                "max": _scaled([max(t, default=None) for t in first_frame], 1e3),
+            },
+        ),
+        _svg_chart(
+            "Window latency (ms)",
+            xs,
+            {
+                "p50": _scaled([level.latency_p50_sec for level in levels], 1e3),
+                "p95": _scaled([level.latency_p95_sec for level in levels], 1e3),
+                "p99": _scaled([level.latency_p99_sec for level in levels], 1e3),
+            },
+        ),
+        _svg_chart(
+            "Server RSS (MB)",
+            xs,
+            {"peak": _scaled([level.server_rss_bytes for level in levels], 1e-6)},
+        ),
+        _svg_chart(
+            "Server CPU (%)",
+            xs,
+            {"mean": [level.server_cpu_percent for level in levels]},
+        ),
+        _svg_chart(
+            "Received, all clients (MB/s)",
+            xs,
+            {
+                "total": _scaled(
+                    [level.received_bytes_per_sec for level in levels], 1e-6
+                )
+            },
+        ),
+    ]
+    rows = "\n".join(
+        f"<tr><th>{html.escape(key)}</th><td>{html.escape(str(value))}</td></tr>"
+        for key, value in metadata.items()
+    )
+    (output_dir / "report.html").write_text(
+        "<!doctype html>\n<html><head><meta charset='utf-8'>"
+        f"<title>viser-loadtest: {html.escape(scenario_name)}</title></head>\n"
+        "<body style='font-family: sans-serif'>\n"
+        f"<h1>viser-loadtest: {html.escape(scenario_name)}</h1>\n"
+        f"<table>{rows}</table>\n"
+        f"<div style='display: flex; flex-wrap: wrap'>{''.join(charts)}</div>\n"
+        "</body></html>\n"
+    )
+
+
+def loadtest_entrypoint() -> None:
+    """Entry point for `viser-loadtest`."""
+    parser = argparse.ArgumentParser(
+        description="Measure how a Viser server scales with connected clients.",
+        epilog=f"Built-in scenarios: {', '.join(_builtin_scenarios())}.",
+    )
+    parser.add_argument(
+        "scenario", help="Path to a scenario file, or a built-in scenario name."
+    )
+    parser.add_argument(
+        "--clients",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50, 100],
+        help="Client counts to ramp up through.",
+    )
+    parser.add_argument(
+        "--ramp-per-sec",
+        type=float,
+        default=20.0,
+        help="Rate at which new clients connect.",
+    )
+    parser.add_argument(
+        "--hold-sec",
+        type=float,
+        default=5.0,
+        help="How long to measure at each level.",
+    )
+    parser.add_argument(
+        "--join-timeout-sec",
+        type=float,
+        default=60.0,
+        help="Time limit for receiving the initial scene.",
+    )
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--output-dir", type=Path, default=Path("loadtest_results"))
+    args = parser.parse_args()
+    run_loadtest(
+        args.scenario,
+        clients=args.clients,
+        ramp_per_sec=args.ramp_per_sec,
+        hold_sec=args.hold_sec,
+        join_timeout_sec=args.join_timeout_sec,
+        port=args.port,
+        output_dir=args.output_dir,
+    )
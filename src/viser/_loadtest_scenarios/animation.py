@@ -0,0 +1,23 @@
+"""Frames moving in a circle, updated at 60 Hz. Measures steady-state update
+latency and broadcast cost."""
+
+import numpy as np
+
+import viser
+
+NUM_FRAMES = 100
+UPDATE_HZ = 60.0
+
+_frames = []
+
+
+def setup(server: viser.ViserServer) -> None:
+    for i in range(NUM_FRAMES):
+        _frames.append(server.scene.add_frame(f"/frames/{i}", axes_length=0.1))
+
+
+def update(server: viser.ViserServer, step: int) -> None:
+    angles = step / UPDATE_HZ + np.linspace(0.0, 2.0 * np.pi, NUM_FRAMES)
+    with server.atomic():
+        for frame, angle in zip(_frames, angles):
+            frame.position = (np.cos(angle), np.sin(angle), 0.0)
@@ -0,0 +1,22 @@
+"""Static scene with a large Gaussian splat model. Measures join cost: every
+client downloads the full model when it connects.
+
+Scale `NUM_SPLATS` up to match production models; each splat is roughly 40
+bytes on the wire."""
+
+import numpy as np
+
+import viser
+
+NUM_SPLATS = 1_000_000
+
+
+def setup(server: viser.ViserServer) -> None:
+    rng = np.random.default_rng(0)
+    server.scene.add_gaussian_splats(
+        "/splats",
+        centers=rng.normal(size=(NUM_SPLATS, 3)).astype(np.float32),
+        covariances=np.tile(np.eye(3, dtype=np.float32) * 1e-4, (NUM_SPLATS, 1, 1)),
+        rgbs=rng.uniform(size=(NUM_SPLATS, 3)).astype(np.float32),
+        opacities=np.full((NUM_SPLATS, 1), 0.5, dtype=np.float32),
+    )
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import copy
 import dataclasses
 import uuid
 from typing import Any, ClassVar, Dict, Optional, Tuple, Type, TypeVar, Union
@@ -78,6 +79,55 @@ class Message(infra.Message):
 
         return "_".join(parts)
 
+    @override
+    def priority(self) -> infra.MessagePriority:
+        """Scene node creation/removal and large payloads are bulk data. Pose,
+        visibility, and small prop updates for scene nodes are transforms.
+        Everything else (GUI, camera, notifications, ...) is interactive."""
+        if isinstance(self, (_CreateSceneNodeMessage, RemoveSceneNodeMessage)):
+            return "bulk"
+        if self.estimate_payload_bytes() >= _BULK_PAYLOAD_BYTES:
+            return "bulk"
+        if isinstance(self, _TRANSFORM_MESSAGE_TYPES):
+            return "transform"
+        return "interactive"
+
+    @override
+    def ordering_key(self) -> str | None:
+        """Messages that target the same scene node, GUI element, or notification
+        are never reordered. Camera messages are ordered with each other."""
+        if isinstance(self, _CAMERA_MESSAGE_TYPES):
+            return "camera"
+        if isinstance(self, (NotificationMessage, RemoveNotificationMessage)):
+            return f"notification-{self.uuid}"
+        node_name = getattr(self, "name", None)
+        if node_name is not None:
+            return f"scene-{node_name}"
+        node_uuid = getattr(self, "uuid", None)
+        if node_uuid is not None:
+            return f"gui-{node_uuid}"
+        return None
+
+    @override
+    def coalesce_key(self) -> str | None:
+        """Pose, scene node prop, and GUI prop updates can be dropped in favor of
+        newer values for slow clients."""
+        if isinstance(self, _COALESCABLE_MESSAGE_TYPES):
+            return self.redundancy_key()
+        return None
+
+    @override
+    def owner_key(self) -> str | None:
+        """Updates for a scene node or GUI element are no longer needed after
+        it's removed."""
+        if isinstance(self, _OWNED_MESSAGE_TYPES):
+            return self.ordering_key()
+        return None
+
+    @override
+    def removes_owner(self) -> bool:
+        return isinstance(self, _REMOVAL_MESSAGE_TYPES)
+
     @classmethod
     def __init_subclass__(cls, tag: TagLiteral | None = None):
         """Tag will be used to create a union type in TypeScript."""
@@ -95,6 +145,19 @@ class _CreateSceneNodeMessage(Message, tag="SceneNodeMessage"):
         """All scene nodes will have the same redundancy key."""
         return f"create-or-remove-scene-{self.name}"
 
+    @override
+    def fold(self, update: infra.Message) -> Message | None:
+        """Prop updates and array patches can be folded into creation messages."""
+        if isinstance(update, SceneNodeUpdateMessage) and update.name == self.name:
+            return _fold_updates(self, update.updates)
+        if isinstance(update, SceneNodeArrayPatchMessage) and update.name == self.name:
+            array = getattr(getattr(self, "props", None), update.prop_name, None)
+            patched = update.apply(array)
+            if patched is None:
+                return None
+            return _fold_updates(self, {update.prop_name: patched})
+        return None
+
 
 @dataclasses.dataclass
 class RemoveSceneNodeMessage(Message):
@@ -118,6 +181,13 @@ class _CreateGuiComponentMessage(Message, tag="GuiComponentMessage"):
     def redundancy_key(self) -> str:
         return f"create-or-remove-gui-{self.uuid}"
 
+    @override
+    def fold(self, update: infra.Message) -> Message | None:
+        """Value and prop updates can be folded into creation messages."""
+        if isinstance(update, GuiUpdateMessage) and update.uuid == self.uuid:
+            return _fold_updates(self, update.updates)
+        return None
+
 
 @dataclasses.dataclass
 class GuiRemoveMessage(Message):
@@ -452,7 +522,9 @@ class PointCloudMessage(_CreateSceneNodeMessage):
 
 @dataclasses.dataclass
 class PointCloudProps:
-    points: Union[npt.NDArray[np.float16], npt.NDArray[np.float32]]
+    points: Union[
+        npt.NDArray[np.float16], npt.NDArray[np.float32], npt.NDArray[np.uint16]
+    ]
     """Location of points. Should have shape (N, 3)."""
     colors: npt.NDArray[np.uint8]
     """Colors of points. Should have shape (N, 3) or (3,)."""
@@ -460,19 +532,104 @@ class PointCloudProps:
     """Size of each point."""
     point_shape: Literal["square", "diamond", "circle", "rounded", "sparkle"]
     """Shape to draw each point."""
-    precision: Literal["float16", "float32"]
+    precision: Literal["float16", "float32", "uint16"]
     """Precision of the point cloud. Assignments to `points` are automatically casted
-    based on the current precision value. Updates to `points` should therefore happen
-    *after* updates to `precision`."""
+    based on the current precision value, and points are re-encoded when it's set. For
+    `uint16`, points are quantized within `points_bounds`, and are read as a read-only
+    dequantized copy."""
     scale: Union[float, Tuple[float, float, float]] = 1.0
     """Scale of the point cloud. A single float for uniform scaling or a
     tuple of (x, y, z) for per-axis scaling."""
+    points_bounds: Optional[
+        Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+    ] = None
+    """Lower and upper corners of the bounding box that quantized points are
+    relative to. Only used for `uint16` precision."""
+    scalars: Union[
+        npt.NDArray[np.float16], npt.NDArray[np.float32], npt.NDArray[np.uint8], None
+    ] = None
+    """Per-point scalar attributes, like intensity or height. Should have shape
+    (N, K), for the K attributes in `scalar_names`."""
+    scalar_names: Tuple[str, ...] = ()
+    """Names of the scalar attributes."""
+    color_by: Optional[str] = None
+    """Name of the scalar attribute that points are colored by. If None, points
+    are colored by `colors`."""
+    colormap: Literal["viridis", "plasma", "magma", "inferno", "gray"] = "viridis"
+    """Colormap for scalar attributes."""
+    scalar_range: Optional[Tuple[float, float]] = None
+    """Attribute values that map to the ends of the colormap. If None, the range
+    of the attribute's values is used."""
+    scalar_visible_range: Optional[Tuple[float, float]] = None
+    """Points with attribute values outside of this range are hidden. If None,
+    all points are shown."""
 
     def __post_init__(self):
         # Check shapes.
         assert len(self.points.shape) == 2
         assert self.colors.shape in ((3,), (self.points.shape[0], 3))
         assert self.points.shape[-1] == 3
+        if self.scalars is not None:
+            assert self.scalars.shape == (
+                self.points.shape[0],
+                len(self.scalar_names),
+            )
+            assert self.scalars.dtype in (np.float16, np.float32, np.uint8)
+
+        # Check dtypes.
+        assert (
+            self.points.dtype
+            == {
+                "float16": np.float16,
+                "float32": np.float32,
+                "uint16": np.uint16,
+            }[self.precision]
+        )
+        assert (self.points_bounds is not None) == (self.precision == "uint16")
+        assert self.colors.dtype == np.uint8
+
+
+@dataclasses.dataclass
+class PointCloudStreamMessage(_CreateSceneNodeMessage):
+    """Point cloud with a fixed capacity, which new points are appended to.
+
+    Points are stored in a ring buffer: once it's full, new points overwrite the
+    oldest ones."""
+
+    props: PointCloudStreamProps
+
+
+@dataclasses.dataclass
+class PointCloudStreamProps:
+    points: Union[npt.NDArray[np.float16], npt.NDArray[np.float32]]
+    """Ring buffer of point locations. Has shape (capacity, 3)."""
+    colors: npt.NDArray[np.uint8]
+    """Ring buffer of point colors. Has shape (capacity, 3)."""
+    num_points: int
+    """Number of valid points in the ring buffer."""
+    head: int
+    """Index that the next point is written to. Once the ring buffer is full,
+    this is also the index of the oldest point."""
+    point_size: float
+    """Size of each point."""
+    point_shape: Literal["square", "diamond", "circle", "rounded", "sparkle"]
+    """Shape to draw each point."""
+    precision: Literal["float16", "float32"]
+    """Precision of the point locations."""
+    age_fade: float = 0.0
+    """How much older points fade out, from 0.0 (not at all) to 1.0 (the oldest
+    point is fully transparent). Ages are computed on the client from positions
+    in the ring buffer."""
+    scale: Union[float, Tuple[float, float, float]] = 1.0
+    """Scale of the point cloud. A single float for uniform scaling or a
+    tuple of (x, y, z) for per-axis scaling."""
+
+    def __post_init__(self):
+        # Check shapes.
+        assert len(self.points.shape) == 2
+        assert self.points.shape[-1] == 3
+        assert self.colors.shape == self.points.shape
+        assert 0 <= self.num_points <= self.points.shape[0]
 
         # Check dtypes.
         if self.precision == "float16":
@@ -482,6 +639,64 @@ class PointCloudProps:
         assert self.colors.dtype == np.uint8
 
 
+@dataclasses.dataclass
+class PointCloudLodMessage(_CreateSceneNodeMessage):
+    """Point cloud that's streamed to each client in octree nodes, based on the
+    client's camera. Nodes are sent with `PointCloudLodNodeMessage`."""
+
+    props: PointCloudLodProps
+
+
+@dataclasses.dataclass
+class PointCloudLodProps:
+    octree_id: str
+    """Identifies the octree that nodes belong to. Nodes from an octree that was
+    replaced are ignored."""
+    point_size: float
+    """Size of each point."""
+    point_shape: Literal["square", "diamond", "circle", "rounded", "sparkle"]
+    """Shape to draw each point."""
+    precision: Literal["float16", "float32"]
+    """Precision of point locations, which are relative to node centers."""
+    scale: Union[float, Tuple[float, float, float]] = 1.0
+    """Scale of the point cloud. A single float for uniform scaling or a
+    tuple of (x, y, z) for per-axis scaling."""
+
+
+@dataclasses.dataclass
+class PointCloudLodNodeMessage(Message):
+    """Sent server->client to add an octree node to a level-of-detail point
+    cloud. Points in different nodes are disjoint."""
+
+    name: str
+    octree_id: str
+    node_id: int
+    offset: Tuple[float, float, float]
+    """Offset that's added to point locations, in the point cloud's frame."""
+    points: Union[npt.NDArray[np.float16], npt.NDArray[np.float32]]
+    """Point locations relative to `offset`. Shape (N, 3)."""
+    colors: npt.NDArray[np.uint8]
+    """Colors of points. Shape (N, 3) or (3,)."""
+
+    @override
+    def redundancy_key(self) -> str:
+        return str(uuid.uuid4())
+
+
+@dataclasses.dataclass
+class PointCloudLodEvictMessage(Message):
+    """Sent server->client to remove octree nodes from a level-of-detail point
+    cloud."""
+
+    name: str
+    octree_id: str
+    node_ids: Tuple[int, ...]
+
+    @override
+    def redundancy_key(self) -> str:
+        return str(uuid.uuid4())
+
+
 @dataclasses.dataclass
 class DirectionalLightMessage(_CreateSceneNodeMessage):
     """Directional light message."""
@@ -677,9 +892,15 @@ class CylinderMessage(_CreateSceneNodeMessage):
 
 @dataclasses.dataclass
 class MeshProps:
-    vertices: npt.NDArray[np.float32]
-    """A numpy array of vertex positions. Should have shape (V, 3).
+    vertices: Union[npt.NDArray[np.float32], npt.NDArray[np.uint16]]
+    """A numpy array of vertex positions. Should have shape (V, 3). Vertices are
+    uint16 if they're quantized.
     """
+    vertices_bounds: Optional[
+        Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+    ]
+    """Lower and upper corners of the bounding box that quantized vertices are
+    relative to. None if vertices aren't quantized."""
     faces: npt.NDArray[np.uint32]
     """A numpy array of faces, where each face is represented by indices of
     vertices. Should have shape (F, 3). """
@@ -710,6 +931,7 @@ class MeshProps:
         # Check shapes.
         assert self.vertices.shape[-1] == 3
         assert self.faces.shape[-1] == 3
+        assert (self.vertices_bounds is not None) == (self.vertices.dtype == np.uint16)
 
 
 @dataclasses.dataclass
@@ -836,6 +1058,7 @@ class SkinnedMeshProps(MeshProps):
         assert self.bone_wxyzs.shape[0] == self.bone_positions.shape[0]
         assert self.vertices.shape[-1] == 3
         assert self.faces.shape[-1] == 3
+        assert (self.vertices_bounds is not None) == (self.vertices.dtype == np.uint16)
         assert self.skin_weights is not None
         assert (
             self.skin_indices.shape
@@ -856,8 +1079,14 @@ class _BatchedMeshExtraProps:
     batched_wxyzs: npt.NDArray[np.float32]
     """Float array of shape (N, 4) representing quaternion rotations.
     """
-    batched_positions: npt.NDArray[np.float32]
-    """Float array of shape (N, 3) representing positions."""
+    batched_positions: Union[npt.NDArray[np.float32], npt.NDArray[np.uint16]]
+    """Float array of shape (N, 3) representing positions. Positions are uint16
+    if they're quantized."""
+    batched_positions_bounds: Optional[
+        Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+    ]
+    """Lower and upper corners of the bounding box that quantized positions are
+    relative to. None if positions aren't quantized."""
     batched_scales: Optional[npt.NDArray[np.float32]]
     """Float array of shape (N,) or (N,3) representing uniform or per-axis
     (XYZ) scales."""
@@ -869,6 +1098,9 @@ class _BatchedMeshExtraProps:
         assert self.batched_wxyzs.shape[-1] == 4
         assert self.batched_positions.shape[-1] == 3
         assert self.batched_wxyzs.shape[0] == self.batched_positions.shape[0]
+        assert (self.batched_positions_bounds is not None) == (
+            self.batched_positions.dtype == np.uint16
+        )
         if self.batched_scales is not None:
             assert self.batched_scales.shape in (
                 (self.batched_wxyzs.shape[0],),
@@ -1621,6 +1853,12 @@ class GuiUpdateMessage(Message):
             + ",".join(list(self.updates.keys()))
         )
 
+    @override
+    def fold(self, update: infra.Message) -> Message | None:
+        if isinstance(update, GuiUpdateMessage) and update.uuid == self.uuid:
+            return GuiUpdateMessage(self.uuid, {**self.updates, **update.updates})
+        return None
+
 
 @dataclasses.dataclass
 class SceneNodeUpdateMessage(Message):
@@ -1640,6 +1878,132 @@ class SceneNodeUpdateMessage(Message):
             + ",".join(list(self.updates.keys()))
         )
 
+    @override
+    def fold(self, update: infra.Message) -> Message | None:
+        if isinstance(update, SceneNodeUpdateMessage) and update.name == self.name:
+            return SceneNodeUpdateMessage(self.name, {**self.updates, **update.updates})
+        if (
+            isinstance(update, SceneNodeArrayPatchMessage)
+            and update.name == self.name
+            and update.prop_name in self.updates
+        ):
+            patched = update.apply(self.updates[update.prop_name])
+            if patched is None:
+                return None
+            return SceneNodeUpdateMessage(
+                self.name, {**self.updates, update.prop_name: patched}
+            )
+        return None
+
+
+@dataclasses.dataclass
+class SceneNodeArrayPatchMessage(Message):
+    """Sent server->client to overwrite rows of an array property of a scene
+    node, without resending the whole array.
+
+    Rows index the first axis of the array. Each row is `row_bytes` bytes."""
+
+    name: str
+    prop_name: str
+    row_bytes: int
+    start: int
+    """First row to overwrite, if `indices` is None."""
+    indices: Optional[npt.NDArray[np.uint32]]
+    """Sorted, unique rows to overwrite. If None, rows are contiguous and start at
+    `start`."""
+    values: npt.NDArray[np.uint8]
+    """Packed bytes of the overwritten rows."""
+
+    @override
+    def redundancy_key(self) -> str:
+        """Patches are never redundant with each other. They're dropped by full
+        updates of the same property instead; see :meth:`superseded_by()`."""
+        return str(uuid.uuid4())
+
+    @override
+    def superseded_by(self) -> Tuple[str, ...]:
+        return (
+            SceneNodeUpdateMessage(self.name, {self.prop_name: None}).redundancy_key(),
+            f"create-or-remove-scene-{self.name}",
+        )
+
+    @override
+    def folds_when_consumed(self) -> bool:
+        return True
+
+    @override
+    def fold(self, update: infra.Message) -> Message | None:
+        """Later patches for the same property are merged into this one. Rows
+        that are written twice take the later value."""
+        if not (
+            isinstance(update, SceneNodeArrayPatchMessage)
+            and update.name == self.name
+            and update.prop_name == self.prop_name
+            and update.row_bytes == self.row_bytes
+        ):
+            return None
+        rows = np.concatenate([update.rows(), self.rows()])
+        values = np.concatenate(
+            [
+                update.values.reshape(-1, self.row_bytes),
+                self.values.reshape(-1, self.row_bytes),
+            ]
+        )
+        # `np.unique()` returns the first occurrence of each row.
+        rows, first = np.unique(rows, return_index=True)
+        return SceneNodeArrayPatchMessage.from_rows(
+            self.name, self.prop_name, self.row_bytes, rows, values[first]
+        )
+
+    def rows(self) -> npt.NDArray[np.int64]:
+        """Indices of the rows that are overwritten."""
+        if self.indices is not None:
+            return self.indices.astype(np.int64)
+        return np.arange(
+            self.start, self.start + len(self.values) // max(self.row_bytes, 1)
+        )
+
+    def apply(self, array: Any) -> np.ndarray | None:
+        """Apply the patch to a copy of an array. Returns None if the patch
+        doesn't fit the array."""
+        if (
+            not isinstance(array, np.ndarray)
+            or array.ndim == 0
+            or array.shape[0] == 0
+            or array.nbytes // array.shape[0] != self.row_bytes
+        ):
+            return None
+        rows = self.rows()
+        if len(rows) > 0 and rows[-1] >= array.shape[0]:
+            return None
+        out = np.ascontiguousarray(array).copy()
+        out_rows = out.reshape(out.shape[0], -1).view(np.uint8)
+        values = self.values.reshape(-1, self.row_bytes)
+        if self.indices is None:
+            out_rows[self.start : self.start + len(values)] = values
+        else:
+            out_rows[rows] = values
+        return out
+
+    @staticmethod
+    def from_rows(
+        name: str,
+        prop_name: str,
+        row_bytes: int,
+        rows: npt.NDArray[np.integer],
+        values: npt.NDArray[np.uint8],
+    ) -> SceneNodeArrayPatchMessage:
+        """Make a patch from sorted, unique row indices and their packed values.
+        Contiguous rows are sent without indices."""
+        values = values.reshape(-1)
+        if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+            return SceneNodeArrayPatchMessage(
+                name, prop_name, row_bytes, int(rows[0]), None, values
+            )
+        return SceneNodeArrayPatchMessage(
+            name, prop_name, row_bytes, 0, rows.astype(np.uint32), values
+        )
+
 
 @dataclasses.dataclass
 class ThemeConfigurationMessage(Message):
@@ -1874,3 +2238,80 @@ class SetGuiPanelLabelMessage(Message):
     """Message from server->client to set the label of the GUI panel."""
 
     label: Optional[str]
+
+
+_BULK_PAYLOAD_BYTES = 64 * 1024
+"""Messages with estimated payloads larger than this are sent in the bulk lane."""
+
+_TRANSFORM_MESSAGE_TYPES = (
+    SetPositionMessage,
+    SetOrientationMessage,
+    SetBonePositionMessage,
+    SetBoneOrientationMessage,
+    SetSceneNodeVisibilityMessage,
+    SetSceneNodeClickableMessage,
+    SceneNodeUpdateMessage,
+    SceneNodeArrayPatchMessage,
+)
+
+_CAMERA_MESSAGE_TYPES = (
+    SetCameraPositionMessage,
+    SetCameraUpDirectionMessage,
+    SetCameraLookAtMessage,
+    SetCameraNearMessage,
+    SetCameraFarMessage,
+    SetCameraFovMessage,
+)
+
+_COALESCABLE_MESSAGE_TYPES = (
+    SetPositionMessage,
+    SetOrientationMessage,
+    SceneNodeUpdateMessage,
+    GuiUpdateMessage,
+)
+
+_REMOVAL_MESSAGE_TYPES = (
+    RemoveSceneNodeMessage,
+    GuiRemoveMessage,
+    GuiCloseModalMessage,
+)
+
+_OWNED_MESSAGE_TYPES = _REMOVAL_MESSAGE_TYPES + (
+    SetPositionMessage,
+    SetOrientationMessage,
+    SetBonePositionMessage,
+    SetBoneOrientationMessage,
+    SetSceneNodeClickableMessage,
+    SetSceneNodeVisibilityMessage,
+    SceneNodeUpdateMessage,
+    SceneNodeArrayPatchMessage,
+    GuiUpdateMessage,
+)
+
+
+def _fold_updates(message: Message, updates: Dict[str, Any]) -> Message | None:
+    """Apply a `{field name: value}` update mapping to a copy of a creation
+    message. Names can refer to fields of `message.props` or of the message
+    itself."""
+    props = getattr(message, "props", None)
+    prop_names = (
+        {field.name for field in dataclasses.fields(props)}
+        if dataclasses.is_dataclass(props)
+        else set()
+    )
+    message_names = {field.name for field in dataclasses.fields(message)}  # type: ignore
+    if not all(
+        name in prop_names or (name in message_names and name != "props")
+        for name in updates
+    ):
+        return None
+
+    # Copy instead of using `dataclasses.replace()`: intermediate states might
+    # not pass `__post_init__()` checks, for example when point positions and
+    # colors are updated separately.
+    out = copy.copy(message)
+    if any(name in prop_names for name in updates):
+        out.props = copy.copy(props)  # type: ignore
+    for name, value in updates.items():
+        setattr(out.props if name in prop_names else out, name, value)  # type: ignore
+    return out
@@ -0,0 +1,521 @@
+"""Octrees for streaming large point clouds at multiple levels of detail.
+
+Each point is assigned to exactly one octree node. Nodes near the root hold
+subsampled points that are spread over their cell, and deeper nodes add detail,
+so a client can render any subtree that contains the root. Which nodes each
+client receives depends on its camera and a point budget; see
+:class:`PointCloudLodStreamer`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import _messages
+from . import transforms as tf
+
+if TYPE_CHECKING:
+    from ._scene_handles import PointCloudLodHandle
+    from ._viser import CameraHandle, ClientHandle
+
+_MAX_DEPTH = 21
+"""Morton codes use 3 bits per level, and are stored in 64-bit integers."""
+
+_PARALLEL_MIN_POINTS = 1 << 20
+"""Inputs with at least this many points are processed in parallel chunks."""
+
+
+@dataclasses.dataclass(frozen=True)
+class PointCloudOctree:
+    """Points grouped into octree nodes. Nodes are sorted by level and then by
+    Morton code, so the root is node 0 and the children of each node are
+    contiguous."""
+
+    points: npt.NDArray[np.float32]
+    """Point locations, ordered by node. Shape (N, 3)."""
+    colors: npt.NDArray[np.uint8]
+    """Point colors, ordered by node. Shape (N, 3), or (3,) for a single color."""
+    node_start: npt.NDArray[np.int64]
+    """Index of the first point in each node."""
+    node_count: npt.NDArray[np.int64]
+    """Number of points in each node."""
+    node_level: npt.NDArray[np.int64]
+    """Depth of each node. The root is at level 0."""
+    node_center: npt.NDArray[np.float64]
+    """Center of each node's cell. Shape (M, 3)."""
+    node_half_size: npt.NDArray[np.float64]
+    """Half of the edge length of each node's cell."""
+    child_start: npt.NDArray[np.int64]
+    """Index of each node's first child."""
+    child_count: npt.NDArray[np.int64]
+    """Number of children of each node."""
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_start)
+
+
+def build_octree(
+    points: np.ndarray,
+    colors: np.ndarray,
+    *,
+    points_per_node: int = 16384,
+    max_depth: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> PointCloudOctree:
+    """Build an octree from a point cloud.
+
+    Every node holds at most `points_per_node` points, except at `max_depth`.
+    When a cell has more points than that, an evenly spaced subset in Morton
+    order is kept, which spreads the points over the cell.
+
+    Args:
+        points: Point locations. Shape (N, 3).
+        colors: Point colors as uint8. Shape (N, 3), or (3,) for a single color.
+        points_per_node: Maximum number of points in each node.
+        max_depth: Maximum depth of the octree. By default, this is chosen so
+            nodes for surfaces, like scans, are close to `points_per_node`.
+        num_threads: Number of threads for large inputs. Defaults to the number
+            of CPUs.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    num_points = points.shape[0]
+    assert points.shape == (num_points, 3), "Shape of points should be (N, 3)."
+    assert num_points > 0, "Point clouds need at least one point."
+    assert colors.shape in ((3,), (num_points, 3))
+    if max_depth is None:
+        # Points on surfaces split 4 ways per level.
+        max_depth = (
+            int(np.ceil(np.log(max(num_points / points_per_node, 1.0)) / np.log(4.0)))
+            + 2
+        )
+    depth = int(np.clip(max_depth, 1, _MAX_DEPTH))
+
+    lower = points.min(axis=0).astype(np.float64)
+    size = max(float((points.max(axis=0) - lower).max()), 1e-6)
+
+    with ThreadPoolExecutor(num_threads) as executor:
+        # Morton codes at the deepest level.
+        chunks = _chunks(num_points)
+        codes = np.concatenate(
+            list(
+                executor.map(
+                    lambda chunk: _morton_codes(points[chunk], lower, size, depth),
+                    chunks,
+                )
+            )
+        )
+
+        # Sort by Morton code. Points are first bucketed by their cell at a
+        # shallow level, then buckets are sorted in parallel.
+        bucket_level = min(2, depth)
+        bucket_shift = 3 * (depth - bucket_level)
+        buckets = (codes >> np.uint64(bucket_shift)).astype(np.uint16)
+        order = np.argsort(buckets, kind="stable")
+        bucket_bounds = np.searchsorted(
+            buckets[order], np.arange(8**bucket_level + 1), side="left"
+        )
+        del buckets
+
+        def sort_bucket(bucket: int) -> None:
+            start, stop = bucket_bounds[bucket], bucket_bounds[bucket + 1]
+            part = order[start:stop]
+            order[start:stop] = part[np.argsort(codes[part], kind="stable")]
+
+        list(executor.map(sort_bucket, range(8**bucket_level)))
+        sorted_codes = codes[order]
+        del codes
+
+        # Assign points to levels. Cells below the bucket level never span
+        # buckets, so deeper levels are assigned per bucket in parallel.
+        shallow = _select_levels(
+            sorted_codes,
+            np.arange(num_points),
+            range(bucket_level),
+            depth,
+            points_per_node,
+        )
+        remaining = np.ones(num_points, dtype=bool)
+        for _, _, selected in shallow:
+            remaining[selected] = False
+
+        def select_bucket(
+            bucket: int,
+        ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+            start, stop = bucket_bounds[bucket], bucket_bounds[bucket + 1]
+            positions = start + np.flatnonzero(remaining[start:stop])
+            return _select_levels(
+                sorted_codes,
+                positions,
+                range(bucket_level, depth + 1),
+                depth,
+                points_per_node,
+            )
+
+        deep = list(executor.map(select_bucket, range(8**bucket_level)))
+
+    # Concatenate nodes level by level. Buckets are in Morton order.
+    levels = shallow + [
+        tuple(np.concatenate([bucket[i][part] for bucket in deep]) for part in range(3))
+        for i in range(depth + 1 - bucket_level)
+    ]
+    node_cells = [cells for cells, _, _ in levels]
+    node_count = np.concatenate([counts for _, counts, _ in levels])
+    node_level = np.concatenate(
+        [np.full(len(cells), level) for level, cells in enumerate(node_cells)]
+    )
+    node_start = np.concatenate([[0], np.cumsum(node_count)[:-1]]).astype(np.int64)
+    point_order = order[np.concatenate([selected for _, _, selected in levels])]
+
+    # Children of a node are the contiguous cells in the next level whose
+    # parent cell matches.
+    level_offsets = np.cumsum([0] + [len(cells) for cells in node_cells])
+    child_start = np.zeros(len(node_count), dtype=np.int64)
+    child_count = np.zeros(len(node_count), dtype=np.int64)
+    for level in range(len(node_cells) - 1):
+        parents = node_cells[level]
+        child_parents = node_cells[level + 1] >> np.uint64(3)
+        first = np.searchsorted(child_parents, parents, side="left")
+        last = np.searchsorted(child_parents, parents, side="right")
+        node_slice = slice(level_offsets[level], level_offsets[level + 1])
+        child_start[node_slice] = level_offsets[level + 1] + first
+        child_count[node_slice] = last - first
+
+    # Cell geometry.
+    grid = np.concatenate([_morton_decode(cells) for cells in node_cells])
+    edge = size / (2.0**node_level)
+    node_center = lower + (grid + 0.5) * edge[:, None]
+
+    return PointCloudOctree(
+        points=points[point_order],
+        colors=colors if colors.shape == (3,) else colors[point_order],
+        node_start=node_start,
+        node_count=node_count.astype(np.int64),
+        node_level=node_level.astype(np.int64),
+        node_center=node_center,
+        node_half_size=edge / 2.0,
+        child_start=child_start,
+        child_count=child_count,
+    )
+
+
+def _chunks(num_points: int) -> List[slice]:
+    return [
+        slice(start, min(start + _PARALLEL_MIN_POINTS, num_points))
+        for start in range(0, num_points, _PARALLEL_MIN_POINTS)
+    ]
+
+
+def _morton_codes(
+    points: np.ndarray, lower: np.ndarray, size: float, depth: int
+) -> npt.NDArray[np.uint64]:
+    """Interleave the bits of grid coordinates at the given depth."""
+    resolution = 2**depth
+    grid = np.clip(
+        ((points - lower) * (resolution / size)).astype(np.int64), 0, resolution - 1
+    ).astype(np.uint64)
+    return (
+        _spread_bits(grid[:, 0])
+        | (_spread_bits(grid[:, 1]) << np.uint64(1))
+        | (_spread_bits(grid[:, 2]) << np.uint64(2))
+    )
+
+
+def _spread_bits(x: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint64]:
+    """Insert two zero bits between each of the lower 21 bits of `x`."""
+    x = x & np.uint64(0x1FFFFF)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+
+def _morton_decode(codes: npt.NDArray[np.uint64]) -> npt.NDArray[np.float64]:
+    """Get grid coordinates from Morton codes. Shape (M, 3)."""
+    out = np.zeros((len(codes), 3), dtype=np.uint64)
+    for bit in range(_MAX_DEPTH):
+        for axis in range(3):
+            out[:, axis] |= (
+                (codes >> np.uint64(3 * bit + axis)) & np.uint64(1)
+            ) << np.uint64(bit)
+    return out.astype(np.float64)
+
+
+def _select_levels(
+    sorted_codes: npt.NDArray[np.uint64],
+    positions: npt.NDArray[np.int64],
+    levels: range,
+    depth: int,
+    points_per_node: int,
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Assign points to nodes, level by level. `positions` are ascending indices
+    into `sorted_codes` of points that haven't been assigned yet.
+
+    Returns (cell codes, point counts, selected positions) for each level. Selected
+    positions are grouped by cell, in the same order as the cells."""
+    out = []
+    for level in levels:
+        if len(positions) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            out.append((empty.astype(np.uint64), empty, empty))
+            continue
+        cells = sorted_codes[positions] >> np.uint64(3 * (depth - level))
+        starts = np.flatnonzero(np.concatenate([[True], cells[1:] != cells[:-1]]))
+        counts = np.diff(np.append(starts, len(cells)))
+
+        if level == depth:
+            selected = np.ones(len(cells), dtype=bool)
+        else:
+            # Keep an evenly spaced subset of each cell's points.
+            count = np.repeat(counts, counts)
+            rank = np.arange(len(cells)) - np.repeat(starts, counts)
+            selected = (count <= points_per_node) | (
+                (rank + 1) * points_per_node // count > rank * points_per_node // count
+            )
+        out.append(
+            (
+                cells[starts],
+                np.minimum(counts, points_per_node) if level < depth else counts,
+                positions[selected],
+            )
+        )
+        positions = positions[~selected]
+    return out
+
+
+@dataclasses.dataclass
+class _ClientStream:
+    """Streaming state for one client."""
+
+    client: ClientHandle
+    detach_camera: Callable[[], None]
+    sent: Set[int] = dataclasses.field(default_factory=set)
+    """Nodes that were sent to the client, and not evicted since."""
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock)
+    """Held while nodes are selected and queued, so messages for a client are
+    queued in the same order as the selections that they're based on."""
+
+
+class PointCloudLodStreamer:
+    """Sends octree nodes to clients, based on their cameras.
+
+    Nodes are selected from the root, largest projected size first. Children of
+    a node are only considered once the node's points are sparser than the
+    screen's pixels. Nodes that leave the view, or that no longer fit in the point
+    budget, are evicted."""
+
+    def __init__(
+        self,
+        handle: PointCloudLodHandle,
+        octree: PointCloudOctree,
+        *,
+        point_budget: int,
+    ) -> None:
+        self._handle = handle
+        self._octree = octree
+        self._point_budget = point_budget
+        self._lock = threading.Lock()
+        self._stream_from_client: Dict[int, _ClientStream] = {}
+        self._detach: List[Callable[[], None]] = []
+
+        # Project nodes by their bounding spheres.
+        self._radius = octree.node_half_size * np.sqrt(3.0)
+
+    @property
+    def point_budget(self) -> int:
+        return self._point_budget
+
+    @point_budget.setter
+    def point_budget(self, point_budget: int) -> None:
+        self._point_budget = point_budget
+        with self._lock:
+            streams = tuple(self._stream_from_client.values())
+        for stream in streams:
+            self.update(stream.client)
+
+    def attach(self, owner: object) -> None:
+        """Stream to all clients of a server, or to a single client."""
+        from ._viser import ClientHandle, ViserServer
+
+        if isinstance(owner, ClientHandle):
+            self._on_connect(owner)
+            return
+        assert isinstance(owner, ViserServer)
+
+        def on_disconnect(client: ClientHandle) -> None:
+            with self._lock:
+                stream = self._stream_from_client.pop(client.client_id, None)
+            if stream is not None:
+                stream.detach_camera()
+
+        owner.on_client_connect(self._on_connect)
+        owner.on_client_disconnect(on_disconnect)
+        self._detach.append(
+            lambda: _discard(owner._client_connect_cb, self._on_connect)
+        )
+        self._detach.append(
+            lambda: _discard(owner._client_disconnect_cb, on_disconnect)
+        )
+
+    def detach(self) -> None:
+        """Stop streaming. Nodes on clients are removed with the scene node."""
+        for detach in self._detach:
+            detach()
+        self._detach.clear()
+        with self._lock:
+            streams = tuple(self._stream_from_client.values())
+            self._stream_from_client.clear()
+        for stream in streams:
+            stream.detach_camera()
+
+    def _on_connect(self, client: ClientHandle) -> None:
+        if self._handle._impl.removed:
+            return
+
+        def on_camera(camera: CameraHandle) -> None:
+            self.update(camera.client)
+
+        with self._lock:
+            self._stream_from_client[client.client_id] = _ClientStream(
+                client, lambda: _discard(client.camera._state.camera_cb, on_camera)
+            )
+        client.camera.on_update(on_camera)
+        if client.camera._state.update_timestamp != 0.0:
+            self.update(client)
+
+    def update(self, client: ClientHandle) -> None:
+        """Send and evict nodes for a client's current camera."""
+        if self._handle._impl.removed:
+            return
+        with self._lock:
+            stream = self._stream_from_client.get(client.client_id, None)
+        if stream is None:
+            return
+        with stream.lock:
+            self._update_locked(stream)
+
+    def _update_locked(self, stream: _ClientStream) -> None:
+        client = stream.client
+        selected = self.select_nodes(client.camera)
+        sent = stream.sent
+        evicted = sent.difference(selected)
+        added = [node for node in selected if node not in sent]
+        sent.difference_update(evicted)
+        sent.update(added)
+
+        queue_message = client._websock_connection.queue_message
+        name = self._handle._impl.name
+        props = self._handle._impl.props
+        dtype = {"float16": np.float16, "float32": np.float32}[props.precision]
+        if len(evicted) > 0:
+            queue_message(
+                _messages.PointCloudLodEvictMessage(
+                    name, props.octree_id, tuple(sorted(evicted))
+                )
+            )
+        octree = self._octree
+        for node in added:
+            start = octree.node_start[node]
+            stop = start + octree.node_count[node]
+            center = octree.node_center[node]
+            queue_message(
+                _messages.PointCloudLodNodeMessage(
+                    name,
+                    props.octree_id,
+                    int(node),
+                    offset=(float(center[0]), float(center[1]), float(center[2])),
+                    points=(octree.points[start:stop] - center).astype(dtype),
+                    colors=octree.colors
+                    if octree.colors.shape == (3,)
+                    else octree.colors[start:stop],
+                )
+            )
+
+    def select_nodes(self, camera: CameraHandle) -> List[int]:
+        """Select nodes for a camera, coarse nodes first."""
+        octree = self._octree
+        state = camera._state
+
+        # Node bounding spheres in the camera frame. Camera poses follow the
+        # OpenCV convention: +Z is forward.
+        T_world_cloud, scale = self._world_transform()
+        scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (3,))
+        T_camera_cloud = (
+            tf.SE3.from_rotation_and_translation(tf.SO3(state.wxyz), state.position)
+            .inverse()
+            .as_matrix()
+            @ T_world_cloud
+        )
+        centers = (octree.node_center * scale) @ T_camera_cloud[
+            :3, :3
+        ].T + T_camera_cloud[:3, 3]
+        radius = self._radius * float(np.max(np.abs(scale)))
+
+        # Frustum culling, against planes through the camera center.
+        tan_y = np.tan(state.fov / 2.0)
+        tan_x = tan_y * state.image_width / max(state.image_height, 1)
+        x, y, z = centers[:, 0], centers[:, 1], centers[:, 2]
+        visible = (z + radius > state.near) & (z - radius < state.far)
+        for tan, coord in ((tan_x, x), (tan_y, y)):
+            cos = 1.0 / np.sqrt(1.0 + tan**2)
+            visible &= np.abs(coord) * cos - z * tan * cos <= radius
+
+        # Projected diameters, in pixels. Children are needed once a node's points
+        # are spaced further apart than pixels.
+        focal = state.image_height / (2.0 * tan_y)
+        distance = np.maximum(np.linalg.norm(centers, axis=-1) - radius, state.near)
+        projected = 2.0 * radius / distance * focal
+        refine = projected > np.sqrt(octree.node_count)
+
+        selected: List[int] = []
+        total = 0
+        queue = [(-projected[0], 0)] if visible[0] else []
+        while len(queue) > 0:
+            _, node = heapq.heappop(queue)
+            count = int(octree.node_count[node])
+            if total + count > self._point_budget and len(selected) > 0:
+                continue
+            selected.append(node)
+            total += count
+            if refine[node]:
+                children = range(
+                    octree.child_start[node],
+                    octree.child_start[node] + octree.child_count[node],
+                )
+                for child in children:
+                    if visible[child]:
+                        heapq.heappush(queue, (-projected[child], child))
+        return selected
+
+    def _world_transform(self) -> Tuple[np.ndarray, object]:
+        """Get the transform from the point cloud's frame to the world frame,
+        and the point cloud's scale."""
+        impl = self._handle._impl
+        handles = impl.api._handle_from_node_name
+        T_world_cloud = np.eye(4)
+        parts = impl.name.split("/")
+        for i in range(2, len(parts) + 1):
+            handle = handles.get("/".join(parts[:i]), None)
+            if handle is None:
+                continue
+            T_world_cloud = (
+                T_world_cloud
+                @ tf.SE3.from_rotation_and_translation(
+                    tf.SO3(handle._impl.wxyz), handle._impl.position
+                ).as_matrix()
+            )
+        return T_world_cloud, impl.props.scale
+
+
+def _discard(callbacks: list, callback: object) -> None:
+    if callback in callbacks:
+        callbacks.remove(callback)
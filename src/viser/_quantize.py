@@ -0,0 +1,109 @@
+"""Quantization of positions to 16-bit integers, relative to an axis-aligned
+bounding box. Clients dequantize positions with the same bounding box."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+Bounds = Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+"""Axis-aligned bounding box, as `(lower, upper)` corners."""
+
+_LEVELS = 65535
+"""Largest quantized value. Lower bounds map to 0, and upper bounds to this."""
+
+_CHUNK_ROWS = 1 << 16
+"""Rows that are encoded at a time. Small enough for temporaries to stay in
+cache."""
+
+_PARALLEL_MIN_ROWS = 1 << 20
+"""Inputs with at least this many rows are encoded with multiple threads."""
+
+
+def quantize_positions(
+    positions: np.ndarray, *, num_threads: Optional[int] = None
+) -> Tuple[npt.NDArray[np.uint16], Bounds]:
+    """Quantize positions to uint16, using their bounding box.
+
+    Args:
+        positions: Positions, with shape (N, 3). Inputs that are far from the
+            origin should be float64 to avoid losing precision.
+        num_threads: Number of threads for large inputs. Defaults to the number
+            of CPUs.
+
+    Returns:
+        Quantized positions and their bounding box.
+    """
+    positions = np.asarray(positions)
+    assert len(positions.shape) == 2 and positions.shape[-1] == 3, (
+        "Shape of positions should be (N, 3)."
+    )
+    lower = _reduce_rows(positions, np.minimum)
+    upper = _reduce_rows(positions, np.maximum)
+    bounds: Bounds = (
+        (float(lower[0]), float(lower[1]), float(lower[2])),
+        (float(upper[0]), float(upper[1]), float(upper[2])),
+    )
+
+    # Degenerate axes are quantized to 0.
+    extent = upper - lower
+    step = np.divide(_LEVELS, extent, out=np.zeros(3), where=extent > 0)
+    out = np.empty(positions.shape, dtype=np.uint16)
+
+    def encode(start: int) -> None:
+        # Computed in float64, so the rounding error is negligible compared to
+        # the quantization step.
+        scaled = np.subtract(
+            positions[start : start + _CHUNK_ROWS], lower, dtype=np.float64
+        )
+        scaled *= step
+        # Offsets are non-negative, so this rounds to the nearest integer when
+        # it's truncated below.
+        scaled += 0.5
+        out[start : start + _CHUNK_ROWS] = scaled
+
+    starts = range(0, positions.shape[0], _CHUNK_ROWS)
+    if positions.shape[0] < _PARALLEL_MIN_ROWS:
+        for start in starts:
+            encode(start)
+    else:
+        with ThreadPoolExecutor(num_threads) as executor:
+            for _ in executor.map(encode, starts):
+                pass
+    return out, bounds
+
+
+def _reduce_rows(positions: np.ndarray, ufunc: np.ufunc) -> npt.NDArray[np.float64]:
+    """Reduce positions along the first axis. Rows are grouped first, which is
+    much faster than reducing a (N, 3) array along axis 0 directly."""
+    group = 256
+    grouped = positions.shape[0] // group * group
+    partial = [positions[grouped:].astype(np.float64)]
+    if grouped > 0:
+        partial.append(
+            ufunc.reduce(positions[:grouped].reshape(-1, 3 * group), axis=0)
+            .reshape(group, 3)
+            .astype(np.float64)
+        )
+    stacked = np.concatenate(partial, axis=0)
+    if stacked.shape[0] == 0:
+        return np.zeros(3)
+    return ufunc.reduce(stacked, axis=0)
+
+
+def dequantize_positions(
+    quantized: npt.NDArray[np.uint16], bounds: Bounds
+) -> npt.NDArray[np.float64]:
+    """Recover positions from `quantize_positions()` outputs."""
+    lower, upper = np.asarray(bounds, dtype=np.float64)
+    return lower + quantized * ((upper - lower) / _LEVELS)
+
+
+def quantization_error(bounds: Bounds) -> float:
+    """Largest difference between an input coordinate and its dequantized value,
+    which is half of the quantization step along the longest axis."""
+    lower, upper = np.asarray(bounds, dtype=np.float64)
+    return float(np.max(upper - lower)) / _LEVELS / 2.0
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import io
 import time
+import uuid
 import warnings
 from collections.abc import Coroutine
 from concurrent.futures import ThreadPoolExecutor
@@ -10,6 +11,7 @@ from functools import partial
 from typing import (
     TYPE_CHECKING,
     Callable,
+    Mapping,
     Tuple,
     TypeVar,
     Union,
@@ -27,6 +29,7 @@ from . import _messages
 from . import transforms as tf
 from ._assignable_props_api import colors_to_uint8
 from ._image_encoding import cv2_imencode_with_fallback
+from ._quantize import quantize_positions
 from ._scene_handles import (
     AmbientLightHandle,
     BatchedAxesHandle,
@@ -51,6 +54,8 @@ from ._scene_handles import (
     MeshSkinnedBoneHandle,
     MeshSkinnedHandle,
     PointCloudHandle,
+    PointCloudLodHandle,
+    PointCloudStreamHandle,
     PointLightHandle,
     RectAreaLightHandle,
     SceneNodeHandle,
@@ -1385,8 +1390,13 @@ class SceneApi:
         point_shape: Literal[
             "square", "diamond", "circle", "rounded", "sparkle"
         ] = "square",
-        precision: Literal["float16", "float32"] = "float16",
+        precision: Literal["float16", "float32", "uint16"] = "float16",
         scale: float | tuple[float, float, float] = 1.0,
+        scalars: Mapping[str, np.ndarray] | None = None,
+        color_by: str | None = None,
+        colormap: Literal["viridis", "plasma", "magma", "inferno", "gray"] = "viridis",
+        scalar_range: tuple[float, float] | None = None,
+        scalar_visible_range: tuple[float, float] | None = None,
         wxyz: tuple[float, float, float, float] | np.ndarray = (1.0, 0.0, 0.0, 0.0),
         position: tuple[float, float, float] | np.ndarray = (0.0, 0.0, 0.0),
         visible: bool = True,
@@ -1402,9 +1412,25 @@ class SceneApi:
             point_size: Size of each point.
             point_shape: Shape to draw each point.
             precision: Precision of the point cloud data. The input points array
-                will be cast to this precision.
+                will be cast to this precision. `uint16` quantizes points within
+                their bounding box, which keeps precision uniform for points
+                that are far from the origin. The largest error is available as
+                `quantization_error` on the returned handle.
             scale: Scale of the point cloud. A single float for uniform scaling
                 or a tuple of (x, y, z) for per-axis scaling.
+            scalars: Per-point scalar attributes, like intensity or height, as
+                a mapping from names to arrays of shape (N,). Attributes are
+                sent as uint8 if they're all uint8, as float16 if their values
+                fit in float16's range, and as float32 otherwise.
+            color_by: Name of the scalar attribute to color points by. If None,
+                points are colored by `colors`. Colormaps are evaluated by
+                clients, so changing this or the properties below on the
+                handle doesn't resend any per-point data.
+            colormap: Colormap for scalar attributes.
+            scalar_range: Attribute values that map to the ends of the
+                colormap. If None, the range of the attribute's values is used.
+            scalar_visible_range: Points with attribute values outside of this
+                range are hidden. If None, all points are shown.
             wxyz: Quaternion rotation to parent frame from local frame (R_pl).
             position: Translation to parent frame from local frame (t_pl).
             visible: Whether or not this scene node is initially visible.
@@ -1420,24 +1446,196 @@ class SceneApi:
             points.shape,
             (3,),
         }, "Shape of colors should be (N, 3) or (3,)."
+        if precision == "uint16":
+            points_cast, points_bounds = quantize_positions(points)
+        else:
+            points_cast = points.astype(
+                {
+                    "float16": np.float16,
+                    "float32": np.float32,
+                }[precision]
+            )
+            points_bounds = None
+        if scalars is not None and len(scalars) > 0:
+            columns = [np.asarray(values) for values in scalars.values()]
+            assert all(column.shape == (points.shape[0],) for column in columns), (
+                "Shape of each scalar attribute should be (N,)."
+            )
+            stacked = np.stack(columns, axis=-1)
+            finite = stacked[np.isfinite(stacked)]
+            if all(column.dtype == np.uint8 for column in columns):
+                scalars_array = stacked.astype(np.uint8)
+            elif finite.size == 0 or np.abs(finite).max() <= np.finfo(np.float16).max:
+                scalars_array = stacked.astype(np.float16)
+            else:
+                # Values would overflow to infinity as float16.
+                scalars_array = stacked.astype(np.float32)
+            scalar_names = tuple(scalars.keys())
+        else:
+            scalars_array = None
+            scalar_names = ()
+        assert color_by is None or color_by in scalar_names, (
+            f"color_by should be one of {scalar_names}, got {color_by!r}."
+        )
         message = _messages.PointCloudMessage(
             name=name,
             props=_messages.PointCloudProps(
-                points=points.astype(
-                    {
-                        "float16": np.float16,
-                        "float32": np.float32,
-                    }[precision]
-                ),
+                points=points_cast,
                 colors=colors_cast,
                 point_size=point_size,
                 point_shape=point_shape,
                 precision=precision,
                 scale=scale,
+                points_bounds=points_bounds,
+                scalars=scalars_array,
+                scalar_names=scalar_names,
+                color_by=color_by,
+                colormap=colormap,
+                scalar_range=scalar_range,
+                scalar_visible_range=scalar_visible_range,
             ),
         )
         return PointCloudHandle._make(self, message, name, wxyz, position, visible)
 
+    def add_point_cloud_lod(
+        self,
+        name: str,
+        points: np.ndarray,
+        colors: np.ndarray | RgbTupleOrArray,
+        *,
+        point_budget: int = 2_000_000,
+        points_per_node: int = 16384,
+        point_size: float = 0.1,
+        point_shape: Literal[
+            "square", "diamond", "circle", "rounded", "sparkle"
+        ] = "square",
+        precision: Literal["float16", "float32"] = "float16",
+        scale: float | tuple[float, float, float] = 1.0,
+        wxyz: tuple[float, float, float, float] | np.ndarray = (1.0, 0.0, 0.0, 0.0),
+        position: tuple[float, float, float] | np.ndarray = (0.0, 0.0, 0.0),
+        visible: bool = True,
+    ) -> PointCloudLodHandle:
+        """Add a point cloud that's too large to send to clients at once, like a
+        survey scan.
+
+        Points are split into an octree, where coarse nodes hold subsampled
+        points. Each client receives the nodes that are in view, coarse nodes
+        first, up to `point_budget` points. Finer nodes are sent as the camera
+        moves closer, and nodes that leave the view are evicted. The octree is
+        built when this method is called, using multiple threads for large
+        inputs.
+
+        Args:
+            name: Name of scene node. Determines location in kinematic tree.
+            points: Location of points. Should have shape (N, 3).
+            colors: Colors of the points. Can be a single color as an RGB tuple or
+                np.ndarray of shape (3,) to apply to all points, or an np.ndarray of
+                shape (N, 3) to specify colors for each point.
+            point_budget: Maximum number of points sent to each client.
+            points_per_node: Maximum number of points in each octree node, except
+                at the deepest level.
+            point_size: Size of each point.
+            point_shape: Shape to draw each point.
+            precision: Precision of the point locations that are sent, which are
+                relative to octree node centers.
+            scale: Scale of the point cloud. A single float for uniform scaling
+                or a tuple of (x, y, z) for per-axis scaling.
+            wxyz: Quaternion rotation to parent frame from local frame (R_pl).
+            position: Translation to parent frame from local frame (t_pl).
+            visible: Whether or not this scene node is initially visible.
+
+        Returns:
+            Handle for manipulating scene node.
+        """
+        from ._point_cloud_lod import PointCloudLodStreamer, build_octree
+
+        colors_cast = colors_to_uint8(np.asarray(colors))
+        assert len(points.shape) == 2 and points.shape[-1] == 3, (
+            "Shape of points should be (N, 3)."
+        )
+        assert colors_cast.shape in {
+            points.shape,
+            (3,),
+        }, "Shape of colors should be (N, 3) or (3,)."
+        octree = build_octree(points, colors_cast, points_per_node=points_per_node)
+        message = _messages.PointCloudLodMessage(
+            name=name,
+            props=_messages.PointCloudLodProps(
+                octree_id=str(uuid.uuid4()),
+                point_size=point_size,
+                point_shape=point_shape,
+                precision=precision,
+                scale=scale,
+            ),
+        )
+        handle = PointCloudLodHandle._make(self, message, name, wxyz, position, visible)
+        handle._streamer = PointCloudLodStreamer(
+            handle, octree, point_budget=point_budget
+        )
+        handle._streamer.attach(self._owner)
+        return handle
+
+    def add_point_cloud_stream(
+        self,
+        name: str,
+        capacity: int,
+        *,
+        point_size: float = 0.1,
+        point_shape: Literal[
+            "square", "diamond", "circle", "rounded", "sparkle"
+        ] = "square",
+        precision: Literal["float16", "float32"] = "float16",
+        age_fade: float = 0.0,
+        scale: float | tuple[float, float, float] = 1.0,
+        wxyz: tuple[float, float, float, float] | np.ndarray = (1.0, 0.0, 0.0, 0.0),
+        position: tuple[float, float, float] | np.ndarray = (0.0, 0.0, 0.0),
+        visible: bool = True,
+    ) -> PointCloudStreamHandle:
+        """Add a point cloud for live data, like LiDAR or depth sensor streams.
+        Points are added with :meth:`PointCloudStreamHandle.append()`, which only
+        sends the new points to clients. When the capacity is reached, new points
+        replace the oldest ones.
+
+        Args:
+            name: Name of scene node. Determines location in kinematic tree.
+            capacity: Maximum number of points. Memory for this many points is
+                allocated up front.
+            point_size: Size of each point.
+            point_shape: Shape to draw each point.
+            precision: Precision of the point locations.
+            age_fade: How much older points fade out, from 0.0 (not at all) to 1.0
+                (the oldest point is fully transparent).
+            scale: Scale of the point cloud. A single float for uniform scaling
+                or a tuple of (x, y, z) for per-axis scaling.
+            wxyz: Quaternion rotation to parent frame from local frame (R_pl).
+            position: Translation to parent frame from local frame (t_pl).
+            visible: Whether or not this scene node is initially visible.
+
+        Returns:
+            Handle for appending points.
+        """
+        assert capacity > 0, "Capacity should be positive."
+        message = _messages.PointCloudStreamMessage(
+            name=name,
+            props=_messages.PointCloudStreamProps(
+                points=np.zeros(
+                    (capacity, 3),
+                    dtype={"float16": np.float16, "float32": np.float32}[precision],
+                ),
+                colors=np.zeros((capacity, 3), dtype=np.uint8),
+                num_points=0,
+                head=0,
+                point_size=point_size,
+                point_shape=point_shape,
+                precision=precision,
+                age_fade=age_fade,
+                scale=scale,
+            ),
+        )
+        return PointCloudStreamHandle._make(
+            self, message, name, wxyz, position, visible
+        )
+
     @deprecated_positional_shim
     def add_mesh_skinned(
         self,
@@ -1529,6 +1727,7 @@ class SceneApi:
             name=name,
             props=_messages.SkinnedMeshProps(
                 vertices=vertices.astype(np.float32),
+                vertices_bounds=None,
                 faces=faces.astype(np.uint32),
                 color=_encode_rgb(color),
                 wireframe=wireframe,
@@ -1578,6 +1777,7 @@ class SceneApi:
         scale: float | tuple[float, float, float] = 1.0,
         cast_shadow: bool = True,
         receive_shadow: bool | float = True,
+        precision: Literal["float32", "uint16"] = "float32",
         wxyz: tuple[float, float, float, float] | np.ndarray = (1.0, 0.0, 0.0, 0.0),
         position: tuple[float, float, float] | np.ndarray = (0.0, 0.0, 0.0),
         visible: bool = True,
@@ -1605,6 +1805,10 @@ class SceneApi:
                 receives shadows normally. If False, no shadows. If a float
                 (0-1), shadows are rendered with a fixed opacity regardless of
                 lighting conditions.
+            precision: Precision of the vertices that are sent to clients.
+                `uint16` quantizes vertices within their bounding box, which
+                halves the size of vertex data. The largest error is available
+                as `quantization_error` on the returned handle.
             wxyz: Quaternion rotation to parent frame from local frame (R_pl).
             position: Translation from parent frame to local frame (t_pl).
             visible: Whether or not this mesh is initially visible.
@@ -1622,10 +1826,15 @@ class SceneApi:
                 f"Invalid combination of {wireframe=} and {flat_shading=}. Flat shading argument will be ignored.",
                 stacklevel=2,
             )
+        if precision == "uint16":
+            vertices_cast, vertices_bounds = quantize_positions(vertices)
+        else:
+            vertices_cast, vertices_bounds = vertices.astype(np.float32), None
         message = _messages.MeshMessage(
             name=name,
             props=_messages.MeshProps(
-                vertices=vertices.astype(np.float32),
+                vertices=vertices_cast,
+                vertices_bounds=vertices_bounds,
                 faces=faces.astype(np.uint32),
                 color=_encode_rgb(color),
                 wireframe=wireframe,
@@ -1709,6 +1918,7 @@ class SceneApi:
         cast_shadow: bool = True,
         receive_shadow: bool = True,
         scale: float | tuple[float, float, float] = 1.0,
+        positions_precision: Literal["float32", "uint16"] = "float32",
         wxyz: tuple[float, float, float, float] | np.ndarray = (1.0, 0.0, 0.0, 0.0),
         position: tuple[float, float, float] | np.ndarray = (0.0, 0.0, 0.0),
         visible: bool = True,
@@ -1746,6 +1956,10 @@ class SceneApi:
             receive_shadow: Whether these meshes should receive shadows.
             scale: Scale of the batched meshes. A single float for uniform
                 scaling or a tuple of (x, y, z) for per-axis scaling.
+            positions_precision: Precision of `batched_positions` when they're
+                sent to clients. `uint16` quantizes positions within their
+                bounding box. The largest error is available as
+                `quantization_error` on the returned handle.
             wxyz: Quaternion rotation to parent frame from local frame (R_pl).
             position: Translation from parent frame to local frame (t_pl).
             visible: Whether or not these meshes are initially visible.
@@ -1785,13 +1999,19 @@ class SceneApi:
         if batched_colors is not None:
             batched_colors_array = colors_to_uint8(np.asarray(batched_colors))
 
+        if positions_precision == "uint16":
+            positions_cast, positions_bounds = quantize_positions(batched_positions)
+        else:
+            positions_cast = batched_positions.astype(np.float32)
+            positions_bounds = None
         message = _messages.BatchedMeshesMessage(
             name=name,
             props=_messages.BatchedMeshesProps(
                 vertices=vertices.astype(np.float32),
                 faces=faces.astype(np.uint32),
                 batched_wxyzs=batched_wxyzs.astype(np.float32),
-                batched_positions=batched_positions.astype(np.float32),
+                batched_positions=positions_cast,
+                batched_positions_bounds=positions_bounds,
                 batched_scales=batched_scales,
                 batched_colors=batched_colors_array,
                 wireframe=wireframe,
@@ -1871,6 +2091,7 @@ class SceneApi:
                     glb_data=glb_data,
                     batched_wxyzs=batched_wxyzs.astype(np.float32),
                     batched_positions=batched_positions.astype(np.float32),
+                    batched_positions_bounds=None,
                     batched_scales=batched_scales,
                     lod=lod,
                     cast_shadow=cast_shadow,
@@ -1942,6 +2163,7 @@ class SceneApi:
                 glb_data=glb_data,
                 batched_wxyzs=batched_wxyzs.astype(np.float32),
                 batched_positions=batched_positions.astype(np.float32),
+                batched_positions_bounds=None,
                 batched_scales=batched_scales,
                 lod=lod,
                 cast_shadow=cast_shadow,
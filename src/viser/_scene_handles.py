@@ -22,12 +22,14 @@ import numpy.typing as npt
 from typing_extensions import Self, deprecated, override
 
 from . import _messages
-from ._assignable_props_api import AssignablePropsBase
+from ._assignable_props_api import AssignablePropsBase, colors_to_uint8
+from ._quantize import quantization_error, quantize_positions
 from .infra._infra import WebsockClientConnection, WebsockServer
 
 if TYPE_CHECKING:
     from ._gui_api import GuiApi
-    from ._scene_api import SceneApi
+    from ._point_cloud_lod import PointCloudLodStreamer, PointCloudOctree
+    from ._scene_api import RgbTupleOrArray, SceneApi
     from ._viser import ClientHandle
     from .infra import ClientId
 
@@ -99,6 +101,45 @@ class SceneNodeHandle(AssignablePropsBase[_SceneNodeHandleState]):
             _messages.SceneNodeUpdateMessage(self._impl.name, {name: value})
         )
 
+    @override
+    def _queue_updates(self, updates: Dict[str, Any]) -> None:
+        if len(updates) == 0:
+            return
+        self._impl.api._websock_interface.queue_message(
+            _messages.SceneNodeUpdateMessage(self._impl.name, updates)
+        )
+
+    @override
+    def _queue_array_patch(self, name: str, rows: npt.NDArray[np.int64] | None) -> None:
+        """Send only the assigned rows, unless the patch wouldn't be smaller
+        than the whole array."""
+        array = getattr(self._impl.props, name)
+        if rows is None or array.shape[0] == 0:
+            self._queue_update(name, np.array(array))
+            return
+        if len(rows) == 0:
+            return
+        row_bytes = array.nbytes // array.shape[0]
+        contiguous = rows[-1] - rows[0] + 1 == len(rows)
+        # Rows that aren't contiguous are sent with a uint32 index each.
+        patch_bytes = len(rows) * (row_bytes if contiguous else row_bytes + 4)
+        if patch_bytes >= array.nbytes:
+            self._queue_update(name, np.array(array))
+            return
+        if contiguous:
+            values = array[rows[0] : rows[-1] + 1].copy()
+        else:
+            values = array[rows]
+        self._impl.api._websock_interface.queue_message(
+            _messages.SceneNodeArrayPatchMessage.from_rows(
+                self._impl.name,
+                name,
+                row_bytes,
+                rows,
+                values.reshape(len(rows), -1).view(np.uint8),
+            )
+        )
+
     @property
     def name(self) -> str:
         """Read-only name of the scene node."""
@@ -479,12 +520,129 @@ class PointCloudHandle(
         value: np.ndarray,
     ) -> np.ndarray:
         """Casts assigned `points` based on the current value of `precision`."""
-        if prop_name == "points":
+        if prop_name == "points" and self.precision != "uint16":
             return value.astype(
                 {"float16": np.float16, "float32": np.float32}[self.precision]
             )
         return super()._cast_array_dtypes(prop_hints, prop_name, value)
 
+    @override
+    def _encode_prop(self, name: str, value: Any) -> Dict[str, Any] | None:
+        """Points are re-encoded when `precision` is set, and `color_by` is
+        checked against `scalar_names`."""
+        if name == "color_by":
+            assert value is None or value in self.scalar_names, (
+                f"color_by should be one of {self.scalar_names}, got {value!r}."
+            )
+            return None
+        if name != "precision":
+            return super()._encode_prop(name, value)
+        props = self._impl.props
+        if value == props.precision:
+            return {}
+        points = self.points
+        if value == "uint16":
+            quantized, bounds = quantize_positions(points)
+            return {"precision": value, "points_bounds": bounds, "points": quantized}
+        return {
+            "precision": value,
+            "points_bounds": None,
+            "points": np.asarray(points).astype(
+                {"float16": np.float16, "float32": np.float32}[value]
+            ),
+        }
+
+    @property
+    def quantization_error(self) -> float | None:
+        """Largest difference between a coordinate of a point and the value sent
+        to clients, for `uint16` precision. None for other precisions. Read-only."""
+        bounds = self._impl.props.points_bounds
+        return None if bounds is None else quantization_error(bounds)
+
+
+class PointCloudStreamHandle(
+    SceneNodeHandle,
+    _messages.PointCloudStreamProps,
+):
+    """Handle for streamed point clouds. Points are added with :meth:`append()`,
+    which only sends the new points to clients."""
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of points. Read-only."""
+        return self._impl.props.points.shape[0]
+
+    def append(self, points: np.ndarray, colors: np.ndarray | RgbTupleOrArray) -> None:
+        """Append points, overwriting the oldest points if the capacity is
+        reached. Bandwidth is proportional to the number of appended points.
+
+        Args:
+            points: Locations of new points. Should have shape (N, 3).
+            colors: Colors of the new points. Can be a single color as an RGB
+                tuple or np.ndarray of shape (3,), or an np.ndarray of shape (N, 3).
+        """
+        points = np.asarray(points)
+        assert len(points.shape) == 2 and points.shape[-1] == 3, (
+            "Shape of points should be (N, 3)."
+        )
+        colors_cast = np.broadcast_to(colors_to_uint8(np.asarray(colors)), points.shape)
+
+        # Only the newest points fit.
+        capacity = self.capacity
+        points = points[-capacity:]
+        colors_cast = colors_cast[-capacity:]
+        count = points.shape[0]
+        if count == 0:
+            return
+
+        # Writing to rows of the handle's arrays sends only those rows. Appends
+        # that wrap around are split in two.
+        head = self._impl.props.head
+        split = min(count, capacity - head)
+        self.points[head : head + split] = points[:split]
+        self.colors[head : head + split] = colors_cast[:split]
+        if split < count:
+            self.points[: count - split] = points[split:]
+            self.colors[: count - split] = colors_cast[split:]
+
+        self.num_points = min(self._impl.props.num_points + count, capacity)
+        self.head = (head + count) % capacity
+
+    def clear(self) -> None:
+        """Remove all points."""
+        self.num_points = 0
+        self.head = 0
+
+
+class PointCloudLodHandle(
+    SceneNodeHandle,
+    _messages.PointCloudLodProps,
+):
+    """Handle for level-of-detail point clouds. Octree nodes are streamed to each
+    client based on its camera."""
+
+    _streamer: PointCloudLodStreamer
+
+    @property
+    def point_budget(self) -> int:
+        """Maximum number of points sent to each client. Synchronized
+        automatically when assigned."""
+        return self._streamer.point_budget
+
+    @point_budget.setter
+    def point_budget(self, point_budget: int) -> None:
+        self._streamer.point_budget = point_budget
+
+    @property
+    def octree(self) -> PointCloudOctree:
+        """Octree that nodes are streamed from. Read-only."""
+        return self._streamer._octree
+
+    @override
+    def remove(self) -> None:
+        self._streamer.detach()
+        super().remove()
+
 
 class BatchedAxesHandle(
     _ClickableSceneNodeHandle,
@@ -506,6 +664,13 @@ class MeshHandle(
 ):
     """Handle for mesh objects."""
 
+    @property
+    def quantization_error(self) -> float | None:
+        """Largest difference between a coordinate of a vertex and the value sent
+        to clients, if vertices are quantized. Otherwise None. Read-only."""
+        bounds = self._impl.props.vertices_bounds
+        return None if bounds is None else quantization_error(bounds)
+
 
 class BoxHandle(
     _ClickableSceneNodeHandle,
@@ -534,6 +699,14 @@ class BatchedMeshHandle(
 ):
     """Handle for batched mesh objects."""
 
+    @property
+    def quantization_error(self) -> float | None:
+        """Largest difference between a coordinate of a batched position and the
+        value sent to clients, if positions are quantized. Otherwise None.
+        Read-only."""
+        bounds = self._impl.props.batched_positions_bounds
+        return None if bounds is None else quantization_error(bounds)
+
 
 class BatchedGlbHandle(
     _ClickableSceneNodeHandle,
@@ -541,6 +714,14 @@ class BatchedGlbHandle(
 ):
     """Handle for batched GLB objects."""
 
+    @property
+    def quantization_error(self) -> float | None:
+        """Largest difference between a coordinate of a batched position and the
+        value sent to clients, if positions are quantized. Otherwise None.
+        Read-only."""
+        bounds = self._impl.props.batched_positions_bounds
+        return None if bounds is None else quantization_error(bounds)
+
 
 class GaussianSplatHandle(
     _ClickableSceneNodeHandle,
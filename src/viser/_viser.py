@@ -9,7 +9,6 @@ import threading
 import time
 import warnings
 from collections.abc import Coroutine
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Callable, ContextManager, TypeVar, cast, overload
 
@@ -27,6 +26,7 @@ from ._scene_api import SceneApi, cast_vector
 from ._threadpool_exceptions import print_threadpool_errors
 from ._tunnel import ViserTunnel
 from .infra._infra import StateSerializer
+from .infra._tracing import TracedThreadPoolExecutor
 
 
 class InitialCameraConfig:
@@ -715,6 +715,15 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
         host: Host to bind server to.
         port: Port to bind server to.
         label: Label shown at the top of the GUI panel.
+        session_grace_sec: How long to wait for clients whose connection was
+            lost to reconnect. Clients that reconnect in time keep their
+            :class:`ClientHandle` and only receive the updates they missed.
+            Disconnection callbacks run when the grace period ends, instead of
+            when the connection is lost. Defaults to 0, which disables session
+            resumption. Setting a few seconds helps clients on unreliable
+            networks, like phones switching between access points.
+        metrics_route: Serve server statistics at `/metrics`, in Prometheus'
+            text format. See :meth:`ViserServer.get_stats()`.
     """
 
     # Hide deprecated arguments from docstring and type checkers.
@@ -724,6 +733,9 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
         port: int = 8080,
         label: str | None = None,
         verbose: bool = True,
+        *,
+        session_grace_sec: float = 0.0,
+        metrics_route: bool = False,
         **_deprecated_kwargs,
     ):
         # Check for port override environment variable
@@ -736,6 +748,8 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
                     f"Invalid _VISER_PORT_OVERRIDE value: {port_override}. Using default port {port}."
                 )
 
+        self._thread_executor = TracedThreadPoolExecutor(max_workers=32)
+
         # Create server.
         server = infra.WebsockServer(
             host=host,
@@ -743,7 +757,10 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
             message_class=_messages.Message,
             http_server_root=Path(__file__).absolute().parent / "client" / "build",
             verbose=verbose,
-            client_api_version=1,
+            client_api_version=2,
+            session_grace_sec=session_grace_sec,
+            callback_executor=self._thread_executor,
+            metrics_route=metrics_route,
         )
         self._websock_server = server
 
@@ -758,9 +775,9 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
             Callable[[ClientHandle], None | Coroutine]
         ] = []
 
-        self._thread_executor = ThreadPoolExecutor(max_workers=32)
-
-        # Run "garbage collector" on message buffer when new clients connect.
+        # Compact the message buffer when new clients connect. This is cheap:
+        # messages for removed scene nodes and GUI elements are pruned when
+        # they're removed.
         @server.on_client_connect
         async def _(_: infra.WebsockClientConnection) -> None:
             self._run_garbage_collector()
@@ -924,65 +941,16 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
         return self._initial_camera
 
     def _run_garbage_collector(self, force: bool = False) -> None:
-        """Clean up old messages. This is not elegant; a refactor of our
-        message persistence logic will significantly reduce complexity."""
-        buffer = self._websock_server._broadcast_buffer
-        with buffer.buffer_lock:
-            # Skip garbage collection if we have messages that are queeud but
-            # not yet processed by the window generators.
-            #
-            # This makes sure that we don't accidentally cull messages before
-            # they're sent to existing clients. RemoveSceneNodeMessage, for example,
-            # needs to be sent to old clients but not new ones.
-            if (
-                not force
-                and self._websock_server._broadcast_buffer.message_event.is_set()
-            ):
-                return
-
-            remove_message_ids: list[int] = []
-
-            remove_scene_names: set[str] = set()
-            remove_gui_uuids: set[str] = set()
-
-            for id, message in reversed(buffer.message_from_id.items()):
-                # Find scene nodes or GUI elements that were removed.
-                if isinstance(message, _messages.RemoveSceneNodeMessage):
-                    remove_message_ids.append(id)
-                    remove_scene_names.add(message.name)
-                elif isinstance(message, _messages.GuiRemoveMessage):
-                    remove_message_ids.append(id)
-                    remove_gui_uuids.add(message.uuid)
-                elif isinstance(message, _messages.GuiCloseModalMessage):
-                    remove_message_ids.append(id)
-
-                # For removed elements, no need to send any update messages.
-                if (
-                    isinstance(
-                        message,
-                        (
-                            _messages.SetPositionMessage,
-                            _messages.SetOrientationMessage,
-                            _messages.SetBonePositionMessage,
-                            _messages.SetBoneOrientationMessage,
-                            _messages.SetSceneNodeClickableMessage,
-                            _messages.SetSceneNodeVisibilityMessage,
-                        ),
-                    )
-                    and message.name in remove_scene_names
-                ):
-                    remove_message_ids.append(id)
-
-                if (
-                    isinstance(message, _messages.GuiUpdateMessage)
-                    and message.uuid in remove_gui_uuids
-                ):
-                    remove_message_ids.append(id)
-
-            # Remove old messages.
-            for id in remove_message_ids:
-                message = buffer.message_from_id.pop(id)
-                buffer.id_from_redundancy_key.pop(message.redundancy_key())
+        """Clean up old messages.
+
+        Messages for removed scene nodes and GUI elements are pruned by the
+        message buffer as soon as they're removed. This drops the removal
+        messages themselves, which are only needed by clients that were already
+        connected. Compaction only drops messages that every connected client
+        has consumed, so it's always safe to run; `force` is accepted for
+        backwards compatibility."""
+        del force
+        self._websock_server._broadcast_buffer.compact()
 
     def get_host(self) -> str:
         """Returns the host address of the Viser server.
@@ -1076,6 +1044,41 @@ class ViserServer(DeprecatedAttributeShim if not TYPE_CHECKING else object):
         if self._share_tunnel is not None:
             self._share_tunnel.close()
 
+    def start_trace(self, path: str | Path) -> None:
+        """Start recording a trace to a JSON file, in Chrome's trace event
+        format. This is useful for finding where time goes when the viewer
+        feels slow.
+
+        Spans are recorded for decoding incoming messages, dispatching them,
+        waiting for and running callbacks, pushing outgoing messages, forming,
+        encoding, and compressing windows, and sending them. Spans are labeled
+        with message and client IDs. Traces can be opened in
+        https://ui.perfetto.dev.
+
+        Args:
+            path: Where to write the trace.
+        """
+        self._websock_server.start_trace(path)
+
+    def stop_trace(self) -> Path | None:
+        """Stop recording a trace started with :meth:`start_trace()`, and wait
+        for it to be written.
+
+        Returns:
+            Path to the trace, or None if no trace was being recorded.
+        """
+        return self._websock_server.stop_trace()
+
+    def get_stats(self) -> infra.ServerStats:
+        """Get a snapshot of server statistics: bytes and messages sent and
+        received by each client, buffer sizes, window encoding times, and the
+        number of callbacks waiting to run.
+
+        Returns:
+            Server statistics.
+        """
+        return self._websock_server.get_stats()
+
     def get_clients(self) -> dict[int, ClientHandle]:
         """Creates and returns a copy of the mapping from connected client IDs to
         handles.
@@ -256,6 +256,9 @@ function ViewerRoot() {
     // Skinned mesh state.
     skinnedMeshState: {},
 
+    // Level-of-detail point cloud state.
+    pointCloudLodState: {},
+
     // Global hover state tracking.
     hoveredElementsCount: 0,
   });
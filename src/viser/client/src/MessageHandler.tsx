@@ -22,6 +22,10 @@ import { computeT_threeworld_world } from "./WorldTransformUtils";
 import { rootNodeTemplate } from "./SceneTreeState";
 import { GaussianSplatsContext } from "./Splatting/GaussianSplatsHelpers";
 
+/** Buffers of array props that were copied by the client to apply patches.
+ * These can be written to in place. */
+const patchedArrayBuffers = new WeakSet<ArrayBufferLike>();
+
 /** Returns a handler for all incoming messages. */
 function useMessageHandler() {
   const viewer = useContext(ViewerContext)!;
@@ -134,6 +138,74 @@ function useMessageHandler() {
         updateSceneNode(message.name, message.updates);
         return;
       }
+      // Add an octree node to a level-of-detail point cloud. Nodes are
+      // rendered by the PointCloudLod component.
+      case "PointCloudLodNodeMessage": {
+        let state = viewerMutable.pointCloudLodState[message.name];
+        if (state === undefined || state.octreeId !== message.octree_id) {
+          state = {
+            octreeId: message.octree_id,
+            nodes: new Map(),
+            dirty: true,
+          };
+          viewerMutable.pointCloudLodState[message.name] = state;
+        }
+        state.nodes.set(message.node_id, message);
+        state.dirty = true;
+        return;
+      }
+      // Remove octree nodes from a level-of-detail point cloud.
+      case "PointCloudLodEvictMessage": {
+        const state = viewerMutable.pointCloudLodState[message.name];
+        if (state === undefined || state.octreeId !== message.octree_id) return;
+        for (const nodeId of message.node_ids) state.nodes.delete(nodeId);
+        state.dirty = true;
+        return;
+      }
+      // Overwrite rows of an array prop.
+      case "SceneNodeArrayPatchMessage": {
+        const node = viewer.useSceneTree.getState()[message.name];
+        const current = (node?.message.props as any)?.[message.prop_name];
+        if (!(current instanceof Uint8Array)) {
+          console.error(
+            `Attempted to patch missing array ${message.prop_name} of ${message.name}`,
+          );
+          return;
+        }
+
+        // Arrays received from the server are copied once before they're
+        // patched; later patches write to the copy.
+        const data = patchedArrayBuffers.has(current.buffer)
+          ? current
+          : new Uint8Array(current);
+        patchedArrayBuffers.add(data.buffer);
+
+        const rowBytes = message.row_bytes;
+        const values = message.values;
+        if (message.indices === null) {
+          const offset = message.start * rowBytes;
+          if (offset + values.length > data.length) return;
+          data.set(values, offset);
+        } else {
+          // Copy to get an aligned buffer.
+          const indices = new Uint32Array(message.indices.slice().buffer);
+          for (let i = 0; i < indices.length; i++) {
+            const offset = indices[i] * rowBytes;
+            if (offset + rowBytes > data.length) continue;
+            data.set(values.subarray(i * rowBytes, (i + 1) * rowBytes), offset);
+          }
+        }
+
+        // Make a new view, so components that depend on the prop re-render.
+        updateSceneNode(message.name, {
+          [message.prop_name]: new Uint8Array(
+            data.buffer,
+            data.byteOffset,
+            data.byteLength,
+          ),
+        });
+        return;
+      }
       // Set the share URL.
       case "ShareUrlUpdated": {
         setShareUrl(message.share_url);
@@ -498,6 +570,8 @@ function useMessageHandler() {
 
         if (viewerMutable.skinnedMeshState[message.name] !== undefined)
           delete viewerMutable.skinnedMeshState[message.name];
+        if (viewerMutable.pointCloudLodState[message.name] !== undefined)
+          delete viewerMutable.pointCloudLodState[message.name];
         return;
       }
       // Set the clickability of a particular scene node.
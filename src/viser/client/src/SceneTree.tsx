@@ -38,6 +38,8 @@ import {
   CoordinateFrame,
   InstancedAxes,
   PointCloud,
+  PointCloudLod,
+  PointCloudStream,
   ViserImage,
   ViserLabel,
 } from "./ThreeAssets";
@@ -230,6 +232,25 @@ function createObjectFactory(
       };
     }
 
+    case "PointCloudLodMessage": {
+      return {
+        makeObject: (ref, children) => (
+          <PointCloudLod ref={ref} {...message}>
+            {children}
+          </PointCloudLod>
+        ),
+      };
+    }
+    case "PointCloudStreamMessage": {
+      return {
+        makeObject: (ref, children) => (
+          <PointCloudStream ref={ref} {...message}>
+            {children}
+          </PointCloudStream>
+        ),
+      };
+    }
+
     // Add mesh
     case "SkinnedMeshMessage": {
       return {
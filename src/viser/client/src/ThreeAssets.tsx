@@ -6,7 +6,9 @@ import * as THREE from "three";
 import {
   ImageMessage,
   LabelMessage,
+  PointCloudLodMessage,
   PointCloudMessage,
+  PointCloudStreamMessage,
 } from "./WebsocketMessages";
 import { BatchedMeshHoverOutlines } from "./mesh/BatchedMeshHoverOutlines";
 import { MeshBasicMaterial } from "three";
@@ -19,6 +21,59 @@ import { calculateBaseFontSize, LABEL_FONT } from "./LabelUtils";
 
 const originGeom = new THREE.SphereGeometry(1.0);
 
+/** Coefficients of polynomial fits to colormaps, from the constant term to the
+ * degree 6 term. The matplotlib colormaps are fit by Matt Zucker:
+ * https://www.shadertoy.com/view/WlfXRN */
+const colormapCoefficients: {
+  [key in PointCloudMessage["props"]["colormap"]]: [number, number, number][];
+} = {
+  viridis: [
+    [0.2777273272234177, 0.005407344544966578, 0.3340998053353061],
+    [0.1050930431085774, 1.404613529898575, 1.384590162594685],
+    [-0.3308618287255563, 0.214847559468213, 0.09509516302823659],
+    [-4.634230498983486, -5.799100973351585, -19.33244095627987],
+    [6.228269936347081, 14.17993336680509, 56.69055260068105],
+    [4.776384997670288, -13.74514537774601, -65.35303263337234],
+    [-5.435455855934631, 4.645852612178535, 26.3124352495832],
+  ],
+  plasma: [
+    [0.05873234392399702, 0.02333670892565664, 0.5433401826748754],
+    [2.176514634195958, 0.2383834171260182, 0.7539604599784036],
+    [-2.689460476458034, -7.455851135738909, 3.110799939717086],
+    [6.130348345893603, 42.3461881477227, -28.51885465332158],
+    [-11.10743619062271, -82.66631109428045, 60.13984767418263],
+    [10.02306557647065, 71.41361770095349, -54.07218655560067],
+    [-3.658713842777788, -22.93153465461149, 18.19190778539828],
+  ],
+  magma: [
+    [-0.002136485053939582, -0.000749655052795221, -0.005386127855323933],
+    [0.2516605407371642, 0.6775232436837668, 2.494026599312351],
+    [8.353717279216625, -3.577719514958484, 0.3144679030132573],
+    [-27.66873308576866, 14.26473078096533, -13.64921318813922],
+    [52.17613981234068, -27.94360607168351, 12.94416944238394],
+    [-50.76852536473588, 29.04658282127291, 4.23415299384598],
+    [18.65570506591883, -11.48977351997711, -5.601961508734096],
+  ],
+  inferno: [
+    [0.0002189403691192265, 0.001651004631001012, -0.01948089843709184],
+    [0.1065134194856116, 0.5639564367884091, 3.932712388889277],
+    [11.60249308247187, -3.972853965665698, -15.9423941062914],
+    [-41.70399613139459, 17.43639888205313, 44.35414519872813],
+    [77.162935699427, -33.40235894210092, -81.80730925738993],
+    [-71.31942824499214, 32.62606426397723, 73.20951985803202],
+    [25.13112622477341, -12.24266895238567, -23.07032500287172],
+  ],
+  gray: [
+    [0, 0, 0],
+    [1, 1, 1],
+    [0, 0, 0],
+    [0, 0, 0],
+    [0, 0, 0],
+    [0, 0, 0],
+    [0, 0, 0],
+  ],
+};
+
 const PointCloudMaterial = /* @__PURE__ */ shaderMaterial(
   {
     scale: 1.0,
@@ -27,14 +82,39 @@ const PointCloudMaterial = /* @__PURE__ */ shaderMaterial(
     fogColor: new THREE.Color(1, 1, 1),
     fogNear: 0.0,
     fogFar: 1000.0,
+    // Age fading for ring buffers of points. Disabled when ageFade is 0.
+    ageFade: 0.0,
+    ringHead: 0.0,
+    ringCount: 1.0,
+    // Dequantization of normalized uint16 positions. The defaults leave float
+    // positions unchanged.
+    quantLower: new THREE.Vector3(0, 0, 0),
+    quantExtent: new THREE.Vector3(1, 1, 1),
+    // Coloring and thresholding by a scalar attribute. Disabled when
+    // useScalar is 0.
+    useScalar: 0.0,
+    scalarRange: new THREE.Vector2(0, 1),
+    scalarVisibleRange: new THREE.Vector2(-3.4e38, 3.4e38),
+    colormap: Array.from({ length: 7 }, () => new THREE.Vector3()),
   },
   `
   precision mediump float;
 
   varying vec3 vPosition;
   varying vec3 vColor; // in the vertex shader
+  varying float vAlpha;
   uniform float scale;
   uniform vec3 uniformColor;
+  uniform float ageFade;
+  uniform float ringHead;
+  uniform float ringCount;
+  uniform highp vec3 quantLower;
+  uniform highp vec3 quantExtent;
+  uniform float useScalar;
+  uniform highp vec2 scalarRange;
+  uniform highp vec2 scalarVisibleRange;
+  uniform vec3 colormap[7];
+  attribute highp float scalar;
 
   #include <fog_pars_vertex>
   #include <logdepthbuf_pars_vertex>
@@ -43,13 +123,32 @@ const PointCloudMaterial = /* @__PURE__ */ shaderMaterial(
   #endif
 
   void main() {
-      vPosition = position;
+      highp vec3 localPosition = quantLower + position * quantExtent;
+      vPosition = localPosition;
       #ifdef USE_COLOR
       vColor = color;
       #else
       vColor = uniformColor;
       #endif
-      vec4 world_pos = modelViewMatrix * vec4(position, 1.0);
+      if (useScalar > 0.5) {
+          if (scalar < scalarVisibleRange.x || scalar > scalarVisibleRange.y) {
+              // Hidden points are moved outside of the clip volume.
+              gl_Position = vec4(0.0, 0.0, 2.0, 1.0);
+              gl_PointSize = 0.0;
+              return;
+          }
+          float t = clamp(
+              (scalar - scalarRange.x) / max(scalarRange.y - scalarRange.x, 1e-30),
+              0.0, 1.0);
+          vColor = colormap[0] + t * (colormap[1] + t * (colormap[2] + t * (
+              colormap[3] + t * (colormap[4] + t * (colormap[5] + t * colormap[6])))));
+      }
+      vAlpha = 1.0;
+      if (ageFade > 0.0) {
+          float age = mod(ringHead - 1.0 - float(gl_VertexID) + ringCount, ringCount);
+          vAlpha = 1.0 - ageFade * age / max(ringCount - 1.0, 1.0);
+      }
+      vec4 world_pos = modelViewMatrix * vec4(localPosition, 1.0);
       gl_Position = projectionMatrix * world_pos;
       gl_PointSize = (scale / -world_pos.z);
       #include <logdepthbuf_vertex>
@@ -60,6 +159,7 @@ const PointCloudMaterial = /* @__PURE__ */ shaderMaterial(
    `,
   `varying vec3 vPosition;
   varying vec3 vColor;
+  varying float vAlpha;
   uniform float point_ball_norm;
 
   #include <fog_pars_fragment>
@@ -73,7 +173,7 @@ const PointCloudMaterial = /* @__PURE__ */ shaderMaterial(
               1.0 / point_ball_norm);
           if (r > 0.5) discard;
       }
-      gl_FragColor = vec4(vColor, 1.0);
+      gl_FragColor = vec4(vColor, vAlpha);
       #include <logdepthbuf_fragment>
       #include <fog_fragment>
   }
@@ -92,7 +192,22 @@ export const PointCloud = React.forwardRef<
   const geometry = React.useMemo(() => {
     const geometry = new THREE.BufferGeometry();
 
-    if (message.props.precision === "float16") {
+    if (message.props.precision === "uint16") {
+      // Dequantized in the vertex shader.
+      geometry.setAttribute(
+        "position",
+        new THREE.Uint16BufferAttribute(
+          new Uint16Array(
+            props.points.buffer.slice(
+              props.points.byteOffset,
+              props.points.byteOffset + props.points.byteLength,
+            ),
+          ),
+          3,
+          true,
+        ),
+      );
+    } else if (message.props.precision === "float16") {
       geometry.setAttribute(
         "position",
         new THREE.Float16BufferAttribute(
@@ -152,6 +267,106 @@ export const PointCloud = React.forwardRef<
     return material;
   }, [props.colors]);
 
+  // Scalar attribute that points are colored by. Attributes are split out on
+  // the client, so switching between them doesn't need new data.
+  const scalarIndex =
+    props.scalars === null || props.color_by === null
+      ? -1
+      : props.scalar_names.indexOf(props.color_by);
+  const scalarAttribute = React.useMemo(() => {
+    if (props.scalars === null || scalarIndex === -1) return null;
+    const numAttributes = props.scalar_names.length;
+    const numPoints =
+      props.points.byteLength / (props.precision === "float32" ? 12 : 6);
+    const data = props.scalars.buffer.slice(
+      props.scalars.byteOffset,
+      props.scalars.byteOffset + props.scalars.byteLength,
+    );
+    // Attributes are uint8, float16, or float32.
+    const bytesPerValue =
+      props.scalars.byteLength / (numPoints * numAttributes);
+    const values =
+      bytesPerValue === 1
+        ? new Uint8Array(data)
+        : bytesPerValue === 2
+          ? new Uint16Array(data)
+          : new Float32Array(data);
+    const column =
+      bytesPerValue === 1
+        ? new Uint8Array(numPoints)
+        : bytesPerValue === 2
+          ? new Uint16Array(numPoints)
+          : new Float32Array(numPoints);
+    let min = Infinity;
+    let max = -Infinity;
+    for (let i = 0; i < numPoints; i++) {
+      const value = values[i * numAttributes + scalarIndex];
+      column[i] = value;
+      const decoded =
+        bytesPerValue === 2 ? THREE.DataUtils.fromHalfFloat(value) : value;
+      if (decoded < min) min = decoded;
+      if (decoded > max) max = decoded;
+    }
+    return {
+      attribute:
+        bytesPerValue === 2
+          ? new THREE.Float16BufferAttribute(column, 1)
+          : new THREE.BufferAttribute(column, 1),
+      min: min,
+      max: max,
+    };
+  }, [
+    props.scalars,
+    props.scalar_names,
+    scalarIndex,
+    props.points,
+    props.precision,
+  ]);
+
+  React.useEffect(() => {
+    if (scalarAttribute === null) geometry.deleteAttribute("scalar");
+    else geometry.setAttribute("scalar", scalarAttribute.attribute);
+  }, [geometry, scalarAttribute]);
+
+  React.useEffect(() => {
+    const uniforms = material.uniforms;
+    uniforms.useScalar.value = scalarAttribute === null ? 0.0 : 1.0;
+    if (scalarAttribute === null) return;
+    const range = props.scalar_range ?? [
+      scalarAttribute.min,
+      scalarAttribute.max,
+    ];
+    uniforms.scalarRange.value.set(range[0], range[1]);
+    const visibleRange = props.scalar_visible_range ?? [-3.4e38, 3.4e38];
+    uniforms.scalarVisibleRange.value.set(visibleRange[0], visibleRange[1]);
+    colormapCoefficients[props.colormap].forEach((coefficients, i) =>
+      uniforms.colormap.value[i].set(...coefficients),
+    );
+  }, [
+    material,
+    scalarAttribute,
+    props.scalar_range,
+    props.scalar_visible_range,
+    props.colormap,
+  ]);
+
+  // Bounding box for dequantizing positions.
+  React.useEffect(() => {
+    const bounds = props.points_bounds;
+    if (bounds === null) {
+      material.uniforms.quantLower.value.set(0, 0, 0);
+      material.uniforms.quantExtent.value.set(1, 1, 1);
+    } else {
+      const [lower, upper] = bounds;
+      material.uniforms.quantLower.value.set(...lower);
+      material.uniforms.quantExtent.value.set(
+        upper[0] - lower[0],
+        upper[1] - lower[1],
+        upper[2] - lower[2],
+      );
+    }
+  }, [props.points_bounds, material]);
+
   // Clean up resources when component unmounts.
   React.useEffect(() => {
     return () => {
@@ -203,6 +418,243 @@ export const PointCloud = React.forwardRef<
   );
 });
 
+/** Level-of-detail point cloud. Octree nodes are streamed by the server based
+ * on the camera, and are stored in `pointCloudLodState` until they're
+ * rendered. */
+export const PointCloudLod = React.forwardRef<
+  THREE.Group,
+  PointCloudLodMessage & { children?: React.ReactNode }
+>(function PointCloudLod({ children, ...message }, ref) {
+  const viewer = React.useContext(ViewerContext)!;
+  const viewerMutable = viewer.mutable.current;
+  const getThreeState = useThree((state) => state.get);
+  const props = message.props;
+  const nodesRef = React.useRef<THREE.Group>(null);
+
+  const material = React.useMemo(() => {
+    const material = new PointCloudMaterial();
+    material.fog = true;
+    material.vertexColors = true;
+    return material;
+  }, []);
+  React.useEffect(() => {
+    return () => material.dispose();
+  }, [material]);
+
+  // Rendered nodes. These are rebuilt if the octree is replaced.
+  const pointsFromNodeId = React.useMemo(
+    () => new Map<number, THREE.Points>(),
+    [props.octree_id, props.precision],
+  );
+  React.useEffect(() => {
+    const state = viewerMutable.pointCloudLodState[message.name];
+    if (state !== undefined) state.dirty = true;
+    return () => {
+      for (const points of pointsFromNodeId.values()) {
+        points.removeFromParent();
+        points.geometry.dispose();
+      }
+      pointsFromNodeId.clear();
+    };
+  }, [pointsFromNodeId, message.name, viewerMutable]);
+
+  React.useEffect(() => {
+    material.uniforms.point_ball_norm.value = {
+      square: Infinity,
+      diamond: 1.0,
+      circle: 2.0,
+      rounded: 3.0,
+      sparkle: 0.6,
+    }[props.point_shape];
+  }, [props.point_shape, material]);
+
+  const s = normalizeScale(props.scale);
+  const pointScaleFactor = Math.cbrt(s[0] * s[1] * s[2]);
+  const rendererSize = new THREE.Vector2();
+  useFrame(() => {
+    // Match point scale to behavior of THREE.PointsMaterial(). See PointCloud.
+    material.uniforms.scale.value =
+      ((props.point_size * pointScaleFactor) /
+        Math.tan(
+          (((getThreeState().camera as THREE.PerspectiveCamera).fov / 180.0) *
+            Math.PI) /
+            2.0,
+        )) *
+      getThreeState().gl.getSize(rendererSize).height *
+      getThreeState().gl.getPixelRatio();
+
+    // Sync rendered nodes with received nodes.
+    const state = viewerMutable.pointCloudLodState[message.name];
+    const group = nodesRef.current;
+    if (
+      state === undefined ||
+      group === null ||
+      !state.dirty ||
+      state.octreeId !== props.octree_id
+    )
+      return;
+    state.dirty = false;
+    for (const [nodeId, points] of pointsFromNodeId) {
+      if (state.nodes.has(nodeId)) continue;
+      group.remove(points);
+      points.geometry.dispose();
+      pointsFromNodeId.delete(nodeId);
+    }
+    for (const [nodeId, node] of state.nodes) {
+      if (pointsFromNodeId.has(nodeId)) continue;
+      const numPoints =
+        node.points.byteLength / (props.precision === "float16" ? 6 : 12);
+      const geometry = new THREE.BufferGeometry();
+      const positions = node.points.buffer.slice(
+        node.points.byteOffset,
+        node.points.byteOffset + node.points.byteLength,
+      );
+      geometry.setAttribute(
+        "position",
+        props.precision === "float16"
+          ? new THREE.Float16BufferAttribute(new Uint16Array(positions), 3)
+          : new THREE.Float32BufferAttribute(new Float32Array(positions), 3),
+      );
+      let colors = node.colors;
+      if (colors.length === 3 && numPoints !== 1) {
+        // Single color for all points.
+        colors = new Uint8Array(numPoints * 3);
+        for (let i = 0; i < numPoints; i++) colors.set(node.colors, i * 3);
+      }
+      geometry.setAttribute(
+        "color",
+        new THREE.BufferAttribute(new Uint8Array(colors), 3, true),
+      );
+      const points = new THREE.Points(geometry, material);
+      points.position.set(...node.offset);
+      points.frustumCulled = false;
+      group.add(points);
+      pointsFromNodeId.set(nodeId, points);
+    }
+  });
+  return (
+    <group ref={ref}>
+      <group scale={normalizeScale(props.scale)} ref={nodesRef} />
+      {children}
+    </group>
+  );
+});
+
+/** Point cloud with a fixed capacity. GPU buffers are allocated once, and
+ * refilled when points are appended. */
+export const PointCloudStream = React.forwardRef<
+  THREE.Group,
+  PointCloudStreamMessage & { children?: React.ReactNode }
+>(function PointCloudStream({ children, ...message }, ref) {
+  const getThreeState = useThree((state) => state.get);
+  const props = message.props;
+  const capacity = props.colors.length / 3;
+
+  const geometry = React.useMemo(() => {
+    const geometry = new THREE.BufferGeometry();
+    geometry.setAttribute(
+      "position",
+      props.precision === "float16"
+        ? new THREE.Float16BufferAttribute(new Uint16Array(capacity * 3), 3)
+        : new THREE.Float32BufferAttribute(new Float32Array(capacity * 3), 3),
+    );
+    geometry.setAttribute(
+      "color",
+      new THREE.BufferAttribute(new Uint8Array(capacity * 3), 3, true),
+    );
+    return geometry;
+  }, [capacity, props.precision]);
+
+  const material = React.useMemo(() => {
+    const material = new PointCloudMaterial();
+    material.fog = true;
+    material.vertexColors = true;
+    return material;
+  }, []);
+
+  // Clean up resources when component unmounts.
+  React.useEffect(() => {
+    return () => {
+      geometry.dispose();
+      material.dispose();
+    };
+  }, [geometry, material]);
+
+  // Copy points into the GPU buffers.
+  React.useEffect(() => {
+    const position = geometry.getAttribute("position") as THREE.BufferAttribute;
+    (position.array as Uint16Array | Float32Array).set(
+      props.precision === "float16"
+        ? new Uint16Array(
+            props.points.buffer.slice(
+              props.points.byteOffset,
+              props.points.byteOffset + props.points.byteLength,
+            ),
+          )
+        : new Float32Array(
+            props.points.buffer.slice(
+              props.points.byteOffset,
+              props.points.byteOffset + props.points.byteLength,
+            ),
+          ),
+    );
+    position.needsUpdate = true;
+  }, [geometry, props.points]);
+  React.useEffect(() => {
+    const color = geometry.getAttribute("color") as THREE.BufferAttribute;
+    (color.array as Uint8Array).set(props.colors);
+    color.needsUpdate = true;
+  }, [geometry, props.colors]);
+  React.useEffect(() => {
+    geometry.setDrawRange(0, props.num_points);
+  }, [geometry, props.num_points]);
+
+  // Update material uniforms.
+  React.useEffect(() => {
+    material.uniforms.point_ball_norm.value = {
+      square: Infinity,
+      diamond: 1.0,
+      circle: 2.0,
+      rounded: 3.0,
+      sparkle: 0.6,
+    }[props.point_shape];
+    material.uniforms.ageFade.value = props.age_fade;
+    material.uniforms.ringHead.value = props.head;
+    material.uniforms.ringCount.value = Math.max(props.num_points, 1);
+    material.transparent = props.age_fade > 0.0;
+  }, [
+    material,
+    props.point_shape,
+    props.age_fade,
+    props.head,
+    props.num_points,
+  ]);
+
+  // Match point scale to behavior of THREE.PointsMaterial(). See PointCloud.
+  const s = normalizeScale(props.scale);
+  const pointScaleFactor = Math.cbrt(s[0] * s[1] * s[2]);
+  const rendererSize = new THREE.Vector2();
+  useFrame(() => {
+    material.uniforms.scale.value =
+      ((props.point_size * pointScaleFactor) /
+        Math.tan(
+          (((getThreeState().camera as THREE.PerspectiveCamera).fov / 180.0) *
+            Math.PI) /
+            2.0,
+        )) *
+      getThreeState().gl.getSize(rendererSize).height *
+      getThreeState().gl.getPixelRatio();
+  });
+  return (
+    <group ref={ref}>
+      <group scale={normalizeScale(props.scale)}>
+        <points frustumCulled={false} geometry={geometry} material={material} />
+      </group>
+      {children}
+    </group>
+  );
+});
+
 /** Helper for adding coordinate frames as scene nodes. */
 export const CoordinateFrame = React.forwardRef<
   THREE.Group,
@@ -10,7 +10,11 @@ import { UseSceneTree } from "./SceneTree";
 
 import { UseGui } from "./ControlPanel/GuiState";
 import { UseInitialCamera } from "./InitialCameraState";
-import { GetRenderRequestMessage, Message } from "./WebsocketMessages";
+import {
+  GetRenderRequestMessage,
+  Message,
+  PointCloudLodNodeMessage,
+} from "./WebsocketMessages";
 
 // Type definitions for all mutable state.
 export type ViewerMutable = {
@@ -57,6 +61,16 @@ export type ViewerMutable = {
     };
   };
 
+  // Octree nodes of level-of-detail point clouds. Nodes can arrive before the
+  // scene node that they belong to.
+  pointCloudLodState: {
+    [name: string]: {
+      octreeId: string;
+      nodes: Map<number, PointCloudLodNodeMessage>;
+      dirty: boolean; // Flag to track if rendered nodes need updating.
+    };
+  };
+
   // Global hover state tracking.
   hoveredElementsCount: number;
 };
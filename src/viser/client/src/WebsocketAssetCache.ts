@@ -0,0 +1,147 @@
+/** Content-addressed cache for large buffers received from the server, kept in
+ * IndexedDB so it survives page reloads. See `viser/infra/_asset_store.py`.
+ *
+ * When connecting, we send the hashes of cached buffers to the server, which
+ * then leaves those buffers out of the windows it sends us. */
+
+const DB_NAME = "viser-assets";
+const MAX_CACHED_BYTES = 2 * 1024 * 1024 * 1024;
+
+type AssetMeta = { hash: string; size: number; lastUsed: number };
+
+function requestToPromise<T>(request: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+export class AssetCache {
+  private db: Promise<IDBDatabase | null>;
+  // Set once `db` resolves, so writes can start synchronously.
+  private openedDb: IDBDatabase | null | undefined = undefined;
+
+  // Buffers in IndexedDB. This is loaded by `inventory()`, and kept up to date
+  // by writes, so we can skip buffers we already have and enforce the size
+  // limit without reading the database.
+  private metas = new Map<string, AssetMeta>();
+  private totalBytes = 0;
+
+  // Buffers that couldn't be written to IndexedDB. These are still needed for
+  // the rest of the session.
+  private pending = new Map<string, Uint8Array>();
+
+  constructor() {
+    this.db = new Promise<IDBDatabase | null>((resolve) => {
+      if (typeof indexedDB === "undefined") {
+        resolve(null);
+        return;
+      }
+      const request = indexedDB.open(DB_NAME, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore("blobs");
+        request.result.createObjectStore("meta", { keyPath: "hash" });
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => resolve(null);
+    }).then((db) => (this.openedDb = db));
+  }
+
+  /** Evict least recently used buffers, then list the hashes we have. */
+  async inventory(): Promise<string[]> {
+    const db = await this.db;
+    if (db !== null) {
+      const metas = await requestToPromise<AssetMeta[]>(
+        db.transaction("meta").objectStore("meta").getAll(),
+      ).catch(() => [] as AssetMeta[]);
+      this.metas = new Map(metas.map((meta) => [meta.hash, meta]));
+      this.totalBytes = metas.reduce((total, meta) => total + meta.size, 0);
+      this.evict(db);
+    }
+    return [...this.pending.keys(), ...this.metas.keys()];
+  }
+
+  /** Store a buffer, unless we already have it. `data` can be transferred as
+   * soon as this returns. */
+  put(hash: string, data: Uint8Array): void {
+    const meta = this.metas.get(hash);
+    if (meta !== undefined) {
+      meta.lastUsed = Date.now();
+      return;
+    }
+    if (this.pending.has(hash)) return;
+
+    const db = this.openedDb;
+    if (db === undefined || db === null) {
+      this.pending.set(hash, data.slice());
+      return;
+    }
+
+    // IndexedDB copies the whole underlying buffer, which may be an entire
+    // websocket frame, so we only copy views. Reads are ordered after this
+    // write, so we don't need to keep the data around.
+    const value =
+      data.byteOffset === 0 && data.byteLength === data.buffer.byteLength
+        ? data
+        : data.slice();
+    const newMeta: AssetMeta = {
+      hash: hash,
+      size: value.byteLength,
+      lastUsed: Date.now(),
+    };
+    this.metas.set(hash, newMeta);
+    this.totalBytes += newMeta.size;
+    const tx = db.transaction(["blobs", "meta"], "readwrite");
+    tx.objectStore("blobs").put(value, hash);
+    tx.objectStore("meta").put(newMeta);
+    tx.onabort = () => {
+      // Probably out of quota. Later windows fall back to fetching the
+      // buffer, or to a new session if the server doesn't serve it.
+      if (this.metas.get(hash) === newMeta) {
+        this.metas.delete(hash);
+        this.totalBytes -= newMeta.size;
+      }
+    };
+    this.evict(db);
+  }
+
+  /** Get a copy of a cached buffer, or undefined if it isn't cached. */
+  async get(hash: string): Promise<Uint8Array | undefined> {
+    const pending = this.pending.get(hash);
+    if (pending !== undefined) return pending.slice();
+
+    const db = await this.db;
+    const data =
+      db === null
+        ? undefined
+        : await requestToPromise<Uint8Array | undefined>(
+            db.transaction("blobs").objectStore("blobs").get(hash),
+          );
+    if (data === undefined) return undefined;
+    const meta: AssetMeta = {
+      hash: hash,
+      size: data.byteLength,
+      lastUsed: Date.now(),
+    };
+    if (!this.metas.has(hash)) this.totalBytes += meta.size;
+    this.metas.set(hash, meta);
+    db!.transaction("meta", "readwrite").objectStore("meta").put(meta);
+    return data;
+  }
+
+  /** Delete least recently used buffers until we're under the size limit. */
+  private evict(db: IDBDatabase): void {
+    if (this.totalBytes <= MAX_CACHED_BYTES) return;
+    const metas = [...this.metas.values()].sort(
+      (a, b) => a.lastUsed - b.lastUsed,
+    );
+    const tx = db.transaction(["blobs", "meta"], "readwrite");
+    for (const meta of metas) {
+      if (this.totalBytes <= MAX_CACHED_BYTES) break;
+      tx.objectStore("blobs").delete(meta.hash);
+      tx.objectStore("meta").delete(meta.hash);
+      this.metas.delete(meta.hash);
+      this.totalBytes -= meta.size;
+    }
+  }
+}
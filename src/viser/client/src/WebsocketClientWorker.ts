@@ -1,12 +1,20 @@
 import * as msgpack from "@msgpack/msgpack";
-import { Message } from "./WebsocketMessages";
+import { Message, decodeCompactMessage } from "./WebsocketMessages";
 import AwaitLock from "await-lock";
 import { VISER_VERSION } from "./VersionInfo";
 import { ZSTDDecoder } from "zstddec";
+import { AssetCache } from "./WebsocketAssetCache";
+import {
+  ZstdDictionary,
+  parseZstdDictionary,
+  zstdDecompress,
+  zstdFrameDictionaryId,
+} from "./utils/zstdDecompress";
 
 // Initialize zstd decoder at module load.
 const zstdDecoder = new ZSTDDecoder();
 const zstdReady = zstdDecoder.init();
+const assetCache = new AssetCache();
 
 export type WsWorkerIncoming =
   | { type: "send"; message: Message }
@@ -15,7 +23,7 @@ export type WsWorkerIncoming =
   | { type: "close" };
 
 export type WsWorkerOutgoing =
-  | { type: "connected" }
+  | { type: "connected"; resumed: boolean }
   | {
       type: "closed";
       versionMismatch?: boolean;
@@ -24,6 +32,186 @@ export type WsWorkerOutgoing =
     }
   | { type: "message_batch"; messages: Message[] };
 
+/** Placeholder for a buffer that's being read from the asset cache or fetched.
+ * These are replaced once the buffer arrives. */
+class PendingBuffer {
+  constructor(readonly index: number) {}
+}
+
+// msgpack extension type used by the server to reference out-of-band buffers.
+// See `viser/infra/_window_encoding.py`.
+const OOB_BUFFER_EXT_TYPE = 1;
+const extensionCodec = new msgpack.ExtensionCodec<
+  (Uint8Array | PendingBuffer)[]
+>();
+extensionCodec.register({
+  type: OOB_BUFFER_EXT_TYPE,
+  encode: () => null,
+  decode: (
+    data: Uint8Array,
+    _extType: number,
+    buffers: (Uint8Array | PendingBuffer)[],
+  ) =>
+    buffers[new DataView(data.buffer, data.byteOffset, 4).getUint32(0, true)],
+});
+
+// Size of content hashes for cached buffers.
+const ASSET_HASH_BYTES = 16;
+
+type DecodedWindow = {
+  data: unknown;
+  bufferCount: number;
+  /** Buffers that are read from the asset cache or fetched, by index. These
+   * are `PendingBuffer` placeholders in `data` until they arrive. */
+  pendingBuffers: Map<number, Promise<Uint8Array>>;
+};
+
+/** Decode a window of messages. Large arrays are stored after the msgpack
+ * header as out-of-band buffers, which we reference without copying unless
+ * they need to be decompressed. Trailing bytes are ignored.
+ *
+ * Large buffers have content hashes. Buffers that we've received before are
+ * left out by the server, and read from the asset cache instead. The server
+ * also leaves out very large buffers, which we fetch in parallel over HTTP.
+ * Neither is awaited here, so a large download doesn't hold up the windows
+ * after it. */
+function decodeWindow(
+  buffer: ArrayBuffer,
+  assetBaseUrl: URL,
+  headerDictionary: ZstdDictionary | null,
+): DecodedWindow {
+  const view = new DataView(buffer);
+  const headerSize = Number(view.getBigUint64(0, true));
+  const headerStoredSize = Number(view.getBigUint64(8, true));
+  const bufferCount = Number(view.getBigUint64(16, true));
+  const hashTableStart = 24 + bufferCount * 24;
+
+  const buffers: (Uint8Array | PendingBuffer)[] = [];
+  const pendingBuffers = new Map<number, Promise<Uint8Array>>();
+  for (let i = 0; i < bufferCount; i++) {
+    const offset = Number(view.getBigUint64(24 + i * 24, true));
+    const storedSize = Number(view.getBigUint64(24 + i * 24 + 8, true));
+    const size = Number(view.getBigUint64(24 + i * 24 + 16, true));
+    const hashBytes = new Uint8Array(
+      buffer,
+      hashTableStart + i * ASSET_HASH_BYTES,
+      ASSET_HASH_BYTES,
+    );
+    const hash = hashBytes.every((b) => b === 0)
+      ? null
+      : Array.from(hashBytes, (b) => b.toString(16).padStart(2, "0")).join("");
+
+    if (hash !== null && storedSize === 0) {
+      pendingBuffers.set(i, requestBuffer(hash, assetBaseUrl));
+      buffers.push(new PendingBuffer(i));
+      continue;
+    }
+    const stored = new Uint8Array(buffer, offset, storedSize);
+    const data =
+      storedSize === size ? stored : zstdDecoder.decode(stored, size);
+    if (hash !== null) assetCache.put(hash, data);
+    buffers.push(data);
+  }
+
+  // Like buffers, the header is only compressed when that makes it smaller.
+  // Small headers can use the dictionary that we got from the server, which
+  // zstddec doesn't support.
+  const headerStart = hashTableStart + bufferCount * ASSET_HASH_BYTES;
+  const storedHeader = new Uint8Array(buffer, headerStart, headerStoredSize);
+  const header =
+    headerStoredSize === headerSize
+      ? storedHeader
+      : zstdFrameDictionaryId(storedHeader) !== 0
+        ? zstdDecompress(storedHeader, headerSize, headerDictionary)
+        : zstdDecoder.decode(storedHeader, headerSize);
+  return {
+    data: msgpack.decode(header, { extensionCodec, context: buffers }),
+    bufferCount: bufferCount,
+    pendingBuffers: pendingBuffers,
+  };
+}
+
+/** Wait for the pending buffers of a window, and put them in place of their
+ * placeholders. */
+async function fillPendingBuffers(
+  value: unknown,
+  pendingBuffers: Map<number, Promise<Uint8Array>>,
+): Promise<void> {
+  const arrived = new Map<number, Uint8Array>();
+  for (const [index, request] of pendingBuffers) {
+    arrived.set(index, await request);
+  }
+  const fill = (value: any): any => {
+    if (value instanceof PendingBuffer) return arrived.get(value.index);
+    if (value instanceof Uint8Array || value === null) return value;
+    if (typeof value === "object") {
+      for (const key in value) {
+        if (Object.prototype.hasOwnProperty.call(value, key)) {
+          value[key] = fill(value[key]);
+        }
+      }
+    }
+    return value;
+  };
+  fill(value);
+}
+
+// Cache reads and fetches that are in progress, by hash. Windows that
+// reference the same buffer share these.
+const bufferRequests = new Map<string, Promise<Uint8Array>>();
+
+/** Read a buffer from the asset cache, or fetch it if it isn't cached. Each
+ * caller gets its own copy, since buffers are transferred to the main
+ * thread. */
+function requestBuffer(hash: string, assetBaseUrl: URL): Promise<Uint8Array> {
+  let request = bufferRequests.get(hash);
+  if (request === undefined) {
+    request = assetCache
+      .get(hash)
+      .then((cached) => cached ?? fetchAsset(hash, assetBaseUrl));
+    bufferRequests.set(hash, request);
+    const forget = () => bufferRequests.delete(hash);
+    request.then(forget, forget);
+  }
+  return request.then((data) => data.slice());
+}
+
+/** Key for messages that can't be reordered with each other, like
+ * `Message.ordering_key()` on the server. Messages with a null key can't be
+ * reordered with anything. */
+function orderingKey(message: Message): string | null {
+  if (message.type.startsWith("SetCamera")) return "camera";
+  if ("name" in message) return `scene-${message.name}`;
+  if ("uuid" in message) return `gui-${message.uuid}`;
+  return null;
+}
+
+/** Fetch the server's zstd dictionary for msgpack headers. Returns null if the
+ * server doesn't have one; we then connect without advertising support. */
+async function fetchHeaderDictionary(
+  assetBaseUrl: URL,
+): Promise<ZstdDictionary | null> {
+  try {
+    const response = await fetch(new URL("zstd-dictionary", assetBaseUrl));
+    if (!response.ok) return null;
+    return parseZstdDictionary(new Uint8Array(await response.arrayBuffer()));
+  } catch (e) {
+    console.warn("Failed to load zstd dictionary:", e);
+    return null;
+  }
+}
+
+/** Fetch a buffer from the server's `/assets/{hash}` route, and cache it. */
+async function fetchAsset(hash: string, assetBaseUrl: URL): Promise<Uint8Array> {
+  const response = await fetch(new URL(`assets/${hash}`, assetBaseUrl));
+  if (!response.ok) {
+    throw new Error(`Failed to fetch buffer ${hash}: ${response.status}`);
+  }
+  const data = new Uint8Array(await response.arrayBuffer());
+  assetCache.put(hash, data);
+  return data;
+}
+
 // Helper function to collect all ArrayBuffer objects. This is used for postMessage() move semantics.
 function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
   if (obj instanceof ArrayBuffer) {
@@ -45,6 +233,21 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
   let ws: WebSocket | null = null;
   const orderLock = new AwaitLock();
 
+  // Session state, for resuming after the connection is lost. The server
+  // appends a resume ID to each window it sends for a session; once a window
+  // is delivered, we have every broadcast message up to that ID.
+  let session: string | null = null;
+  let resumeId = -1;
+
+  // The server's header dictionary. This is fetched once per server, before
+  // the first connection.
+  let headerDictionary: Promise<ZstdDictionary | null> | null = null;
+
+  // Windows are decoded one at a time, so buffers are added to the asset cache
+  // before later windows that reference them are decoded. Buffers that are
+  // read from the cache or fetched are awaited outside of this queue.
+  let decodeQueue: Promise<unknown> = Promise.resolve();
+
   const postOutgoing = (
     data: WsWorkerOutgoing,
     transferable?: Transferable[],
@@ -53,27 +256,52 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
     self.postMessage(data, transferable);
   };
 
-  const tryConnect = () => {
+  const tryConnect = async () => {
+    const target = server!;
+    const assetBaseUrl = new URL(target);
+    assetBaseUrl.protocol = assetBaseUrl.protocol === "wss:" ? "https:" : "http:";
+    assetBaseUrl.search = "";
+    if (!assetBaseUrl.pathname.endsWith("/")) assetBaseUrl.pathname += "/";
+    if (headerDictionary === null) {
+      headerDictionary = fetchHeaderDictionary(assetBaseUrl);
+    }
+    const dictionary = await headerDictionary;
+    // Try again on the next connection if the server wasn't reachable.
+    if (dictionary === null) headerDictionary = null;
+    // The server may have changed or been closed while we were waiting.
+    if (server !== target) return;
     if (ws !== null) ws.close();
 
-    // Use a single protocol that includes both client identification and version.
-    const protocol = `viser-v${VISER_VERSION}`;
+    // Use a single protocol that includes client identification, version, and
+    // capabilities. We can decode compact (positional) messages, resume
+    // sessions, cache large buffers, fetch them over HTTP, and decompress
+    // headers with the server's zstd dictionary.
+    const protocol =
+      `viser-v${VISER_VERSION}+compact+resume+assets+http-assets` +
+      (dictionary !== null ? "+zstd-dict" : "");
+    const url = new URL(server!);
+    if (session !== null) {
+      url.searchParams.set("viser_session", session);
+      url.searchParams.set("viser_resume_from", resumeId.toString());
+    }
     console.log(`Connecting to: ${server!} with protocol: ${protocol}`);
-    ws = new WebSocket(server!, [protocol]);
+    ws = new WebSocket(url.toString(), [protocol]);
 
     // Timeout is necessary when we're connecting to an SSH/tunneled port.
     const retryTimeout = setTimeout(() => {
       ws?.close();
     }, 5000);
 
-    ws.onopen = () => {
+    ws.onopen = async () => {
       clearTimeout(retryTimeout);
       console.log(`Connected! ${server}`);
 
-      // Just indicate that we're connected.
-      postOutgoing({
-        type: "connected",
-      });
+      // Tell the server which buffers we already have.
+      const socket = ws!;
+      const assets = await assetCache.inventory();
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ assets: assets }));
+      }
     };
 
     ws.onclose = (event) => {
@@ -108,28 +336,81 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
       jsTimeMinusPythonTime: number;
     } = { jsTimeMinusPythonTime: Infinity };
     type SerializedStruct = {
-      messages: Message[];
+      messages: (Message | any[])[];
       timestampSec: number;
     };
 
-    ws.onmessage = async (event) => {
-      const dataPromise = (async () => {
-        const buffer = await (event.data.arrayBuffer() as Promise<ArrayBuffer>);
-        const bytes = new Uint8Array(buffer);
+    // Windows that are waiting for buffers from the asset cache or from HTTP.
+    // Later windows can be delivered before these, as long as they're small
+    // and don't contain messages that need to stay ordered after them.
+    const heldWindows: {
+      keys: Set<string> | null;
+      delivered: Promise<unknown>;
+    }[] = [];
+    const canOvertakeHeldWindows = (messages: Message[]) =>
+      messages.every((message) => {
+        const key = orderingKey(message);
+        return (
+          key !== null &&
+          // Scene nodes and GUI elements are created and removed in order.
+          !("props" in message) &&
+          message.type !== "RemoveSceneNodeMessage" &&
+          heldWindows.every((held) => held.keys !== null && !held.keys.has(key))
+        );
+      });
 
-        // Read decompressed size from 8-byte little-endian header.
-        const view = new DataView(buffer);
-        const decompressedSize = Number(view.getBigUint64(0, true));
-        const compressedData = bytes.slice(8);
+    // Windows are numbered in the order they're received. The resume ID only
+    // advances once every earlier window has been delivered.
+    let windowsReceived = 0;
+    let windowsConfirmed = 0;
+    const resumeIdFromWindow = new Map<number, number>();
+    const deliver = (
+      windowIndex: number,
+      messages: Message[],
+      windowResumeId: number,
+    ) => {
+      postOutgoing(
+        { type: "message_batch", messages: messages },
+        Array.from(collectArrayBuffers(messages, new Set())),
+      );
+      resumeIdFromWindow.set(windowIndex, windowResumeId);
+      while (resumeIdFromWindow.has(windowsConfirmed)) {
+        const confirmedResumeId = resumeIdFromWindow.get(windowsConfirmed)!;
+        resumeIdFromWindow.delete(windowsConfirmed);
+        windowsConfirmed++;
+        if (confirmedResumeId >= 0) resumeId = confirmedResumeId;
+      }
+    };
 
-        // Decompress and decode.
-        await zstdReady;
-        const decompressed = zstdDecoder.decode(
-          compressedData,
-          decompressedSize,
+    ws.onmessage = async (event) => {
+      // The first message is a text frame that tells us whether our session
+      // was resumed. Windows are only sent after it.
+      if (typeof event.data === "string") {
+        const hello: { session: string | null; resumed: boolean } = JSON.parse(
+          event.data,
         );
-        return msgpack.decode(decompressed) as SerializedStruct;
-      })();
+        session = hello.session;
+        if (!hello.resumed) resumeId = -1;
+        postOutgoing({ type: "connected", resumed: hello.resumed });
+        return;
+      }
+
+      const windowIndex = windowsReceived++;
+      const hasTrailer = session !== null;
+      const bufferPromise = event.data.arrayBuffer() as Promise<ArrayBuffer>;
+      const dataPromise = decodeQueue.then(async () => {
+        const buffer = await bufferPromise;
+        await zstdReady;
+        return {
+          ...decodeWindow(buffer, assetBaseUrl, dictionary),
+          windowResumeId: hasTrailer
+            ? Number(
+                new DataView(buffer).getBigInt64(buffer.byteLength - 8, true),
+              )
+            : -1,
+        };
+      });
+      decodeQueue = dataPromise.catch(() => undefined);
 
       // Try our best to handle messages in order. If this takes more than 10 seconds, we give up. :)
       const jsReceivedMs = performance.now();
@@ -137,7 +418,24 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
         console.log("Order lock timed out.");
         orderLock.release();
       });
-      const data = await dataPromise;
+      const fail = (e: unknown) => {
+        // Most likely a buffer went missing from the cache or the server.
+        // Start over with a new session, which will send everything we don't
+        // have.
+        console.error(e);
+        session = null;
+        (event.target as WebSocket).close();
+      };
+      let decoded: Awaited<typeof dataPromise>;
+      try {
+        decoded = await dataPromise;
+      } catch (e) {
+        fail(e);
+        orderLock.release();
+        return;
+      }
+      const { bufferCount, pendingBuffers, windowResumeId } = decoded;
+      const data = decoded.data as SerializedStruct;
 
       // Compute offset between JavaScript and Python time.
       state.jsTimeMinusPythonTime = Math.min(
@@ -145,14 +443,61 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
         state.jsTimeMinusPythonTime,
       );
 
+      const messages = data.messages.map((message) =>
+        Array.isArray(message) ? decodeCompactMessage(message) : message,
+      );
+
+      // Windows that wait for buffers are delivered once they arrive, in order
+      // with each other. We release the order lock right away, so a large
+      // download doesn't hold up later GUI, camera, or scene updates.
+      if (pendingBuffers.size > 0) {
+        let keys: Set<string> | null = new Set();
+        for (const message of messages) {
+          const key = orderingKey(message);
+          if (key === null) {
+            keys = null;
+            break;
+          }
+          keys.add(key);
+        }
+        const delivered = Promise.all(
+          heldWindows.map((held) => held.delivered),
+        ).then(async () => {
+          await fillPendingBuffers(messages, pendingBuffers);
+          deliver(windowIndex, messages, windowResumeId);
+        });
+        const held = { keys: keys, delivered: delivered };
+        heldWindows.push(held);
+        orderLock.release();
+        try {
+          await delivered;
+        } catch (e) {
+          fail(e);
+        } finally {
+          heldWindows.splice(heldWindows.indexOf(held), 1);
+        }
+        return;
+      }
+
+      // Other windows are delivered in order, unless they can overtake every
+      // held window. While we wait, the order lock keeps later windows behind
+      // this one.
+      if (
+        heldWindows.length > 0 &&
+        (bufferCount > 0 || !canOvertakeHeldWindows(messages))
+      ) {
+        try {
+          await Promise.all(heldWindows.map((held) => held.delivered));
+        } catch (e) {
+          fail(e);
+          orderLock.release();
+          return;
+        }
+      }
+
       // Function to send the message and release the order lock.
-      const messages = data.messages;
-      const arrayBuffers = collectArrayBuffers(messages, new Set());
       const sendFn = () => {
-        postOutgoing(
-          { type: "message_batch", messages: messages },
-          Array.from(arrayBuffers),
-        );
+        deliver(windowIndex, messages, windowResumeId);
         orderLock.release();
       };
 
@@ -203,6 +548,7 @@ function collectArrayBuffers(obj: any, buffers: Set<ArrayBufferLike>) {
       ws!.send(msgpack.encode(data.message));
     } else if (data.type === "set_server") {
       server = data.server;
+      headerDictionary = null;
       tryConnect();
     } else if (data.type === "retry") {
       if (server !== null) {
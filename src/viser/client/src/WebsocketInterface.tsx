@@ -54,8 +54,12 @@ export function WebsocketMessageProducer() {
       const data: WsWorkerOutgoing = event.data;
       if (data.type === "connected") {
         isConnected = true;
-        resetGui();
-        resetScene();
+        // Resumed sessions only receive what they missed, so we keep the
+        // current state.
+        if (!data.resumed) {
+          resetGui();
+          resetScene();
+        }
         viewer.useGui.setState({ websocketState: "connected" });
         updateRetryInterval();
         viewerMutable.sendMessage = (message) => {
@@ -63,7 +67,6 @@ export function WebsocketMessageProducer() {
         };
       } else if (data.type === "closed") {
         isConnected = false;
-        resetGui();
         updateRetryInterval();
         viewerMutable.sendMessage = (message) => {
           console.log(
@@ -149,6 +149,51 @@ export interface PointCloudMessage {
     colors: Uint8Array<ArrayBuffer>;
     point_size: number;
     point_shape: "square" | "diamond" | "circle" | "rounded" | "sparkle";
+    precision: "float16" | "float32" | "uint16";
+    scale: number | [number, number, number];
+    points_bounds: [[number, number, number], [number, number, number]] | null;
+    scalars: Uint8Array<ArrayBuffer> | null;
+    scalar_names: string[];
+    color_by: string | null;
+    colormap: "viridis" | "plasma" | "magma" | "inferno" | "gray";
+    scalar_range: [number, number] | null;
+    scalar_visible_range: [number, number] | null;
+  };
+}
+/** Point cloud with a fixed capacity, which new points are appended to.
+ *
+ * Points are stored in a ring buffer: once it's full, new points overwrite the
+ * oldest ones.
+ *
+ * (automatically generated)
+ */
+export interface PointCloudStreamMessage {
+  type: "PointCloudStreamMessage";
+  name: string;
+  props: {
+    points: Uint8Array<ArrayBuffer>;
+    colors: Uint8Array<ArrayBuffer>;
+    num_points: number;
+    head: number;
+    point_size: number;
+    point_shape: "square" | "diamond" | "circle" | "rounded" | "sparkle";
+    precision: "float16" | "float32";
+    age_fade: number;
+    scale: number | [number, number, number];
+  };
+}
+/** Point cloud that's streamed to each client in octree nodes, based on the
+ * client's camera. Nodes are sent with `PointCloudLodNodeMessage`.
+ *
+ * (automatically generated)
+ */
+export interface PointCloudLodMessage {
+  type: "PointCloudLodMessage";
+  name: string;
+  props: {
+    octree_id: string;
+    point_size: number;
+    point_shape: "square" | "diamond" | "circle" | "rounded" | "sparkle";
     precision: "float16" | "float32";
     scale: number | [number, number, number];
   };
@@ -245,6 +290,9 @@ export interface MeshMessage {
   name: string;
   props: {
     vertices: Uint8Array<ArrayBuffer>;
+    vertices_bounds:
+      | [[number, number, number], [number, number, number]]
+      | null;
     faces: Uint8Array<ArrayBuffer>;
     color: [number, number, number];
     wireframe: boolean;
@@ -329,6 +377,9 @@ export interface SkinnedMeshMessage {
   name: string;
   props: {
     vertices: Uint8Array<ArrayBuffer>;
+    vertices_bounds:
+      | [[number, number, number], [number, number, number]]
+      | null;
     faces: Uint8Array<ArrayBuffer>;
     color: [number, number, number];
     wireframe: boolean;
@@ -355,6 +406,9 @@ export interface BatchedMeshesMessage {
   props: {
     batched_wxyzs: Uint8Array<ArrayBuffer>;
     batched_positions: Uint8Array<ArrayBuffer>;
+    batched_positions_bounds:
+      | [[number, number, number], [number, number, number]]
+      | null;
     batched_scales: Uint8Array<ArrayBuffer> | null;
     lod: "auto" | "off" | [number, number][];
     vertices: Uint8Array<ArrayBuffer>;
@@ -381,6 +435,9 @@ export interface BatchedGlbMessage {
   props: {
     batched_wxyzs: Uint8Array<ArrayBuffer>;
     batched_positions: Uint8Array<ArrayBuffer>;
+    batched_positions_bounds:
+      | [[number, number, number], [number, number, number]]
+      | null;
     batched_scales: Uint8Array<ArrayBuffer> | null;
     lod: "auto" | "off" | [number, number][];
     glb_data: Uint8Array<ArrayBuffer>;
@@ -1186,6 +1243,31 @@ export interface ScenePointerEnableMessage {
   enable: boolean;
   event_type: "click" | "rect-select";
 }
+/** Sent server->client to add an octree node to a level-of-detail point
+ * cloud. Points in different nodes are disjoint.
+ *
+ * (automatically generated)
+ */
+export interface PointCloudLodNodeMessage {
+  type: "PointCloudLodNodeMessage";
+  name: string;
+  octree_id: string;
+  node_id: number;
+  offset: [number, number, number];
+  points: Uint8Array<ArrayBuffer>;
+  colors: Uint8Array<ArrayBuffer>;
+}
+/** Sent server->client to remove octree nodes from a level-of-detail point
+ * cloud.
+ *
+ * (automatically generated)
+ */
+export interface PointCloudLodEvictMessage {
+  type: "PointCloudLodEvictMessage";
+  name: string;
+  octree_id: string;
+  node_ids: number[];
+}
 /** Fog message.
  *
  * (automatically generated)
@@ -1453,6 +1535,22 @@ export interface SceneNodeUpdateMessage {
   name: string;
   updates: { [key: string]: any };
 }
+/** Sent server->client to overwrite rows of an array property of a scene
+ * node, without resending the whole array.
+ *
+ * Rows index the first axis of the array. Each row is `row_bytes` bytes.
+ *
+ * (automatically generated)
+ */
+export interface SceneNodeArrayPatchMessage {
+  type: "SceneNodeArrayPatchMessage";
+  name: string;
+  prop_name: string;
+  row_bytes: number;
+  start: number;
+  indices: Uint8Array<ArrayBuffer> | null;
+  values: Uint8Array<ArrayBuffer>;
+}
 /** Message from server->client to configure parts of the GUI.
  *
  * (automatically generated)
@@ -1611,6 +1709,8 @@ export type Message =
   | LabelMessage
   | Gui3DMessage
   | PointCloudMessage
+  | PointCloudStreamMessage
+  | PointCloudLodMessage
   | DirectionalLightMessage
   | AmbientLightMessage
   | HemisphereLightMessage
@@ -1659,6 +1759,8 @@ export type Message =
   | ViewerCameraMessage
   | ScenePointerMessage
   | ScenePointerEnableMessage
+  | PointCloudLodNodeMessage
+  | PointCloudLodEvictMessage
   | EnvironmentMapMessage
   | FogMessage
   | EnableLightsMessage
@@ -1685,6 +1787,7 @@ export type Message =
   | GuiButtonHoldMessage
   | GuiUpdateMessage
   | SceneNodeUpdateMessage
+  | SceneNodeArrayPatchMessage
   | ThemeConfigurationMessage
   | GetRenderRequestMessage
   | GetRenderResponseMessage
@@ -1705,6 +1808,8 @@ export type SceneNodeMessage =
   | LabelMessage
   | Gui3DMessage
   | PointCloudMessage
+  | PointCloudStreamMessage
+  | PointCloudLodMessage
   | DirectionalLightMessage
   | AmbientLightMessage
   | HemisphereLightMessage
@@ -1755,6 +1860,8 @@ const typeSetSceneNodeMessage = new Set([
   "LabelMessage",
   "Gui3DMessage",
   "PointCloudMessage",
+  "PointCloudStreamMessage",
+  "PointCloudLodMessage",
   "DirectionalLightMessage",
   "AmbientLightMessage",
   "HemisphereLightMessage",
@@ -1808,3 +1915,417 @@ export function isGuiComponentMessage(
 ): message is GuiComponentMessage {
   return typeSetGuiComponentMessage.has(message.type);
 }
+// Decoders for compact messages: [type_id, field0, field1, ...].
+const compactMessageDecoders: ((data: any[]) => Message)[] = [
+  (data) => ({ type: "CameraFrustumMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "GlbMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "FrameMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "BatchedAxesMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "GridMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "LabelMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "Gui3DMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "PointCloudMessage", name: data[1], props: data[2] }),
+  (data) => ({
+    type: "PointCloudStreamMessage",
+    name: data[1],
+    props: data[2],
+  }),
+  (data) => ({ type: "PointCloudLodMessage", name: data[1], props: data[2] }),
+  (data) => ({
+    type: "DirectionalLightMessage",
+    name: data[1],
+    props: data[2],
+  }),
+  (data) => ({ type: "AmbientLightMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "HemisphereLightMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "PointLightMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "RectAreaLightMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "SpotLightMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "MeshMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "BoxMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "IcosphereMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "CylinderMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "SkinnedMeshMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "BatchedMeshesMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "BatchedGlbMessage", name: data[1], props: data[2] }),
+  (data) => ({
+    type: "TransformControlsMessage",
+    name: data[1],
+    props: data[2],
+  }),
+  (data) => ({ type: "ImageMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "LineSegmentsMessage", name: data[1], props: data[2] }),
+  (data) => ({
+    type: "CatmullRomSplineMessage",
+    name: data[1],
+    props: data[2],
+  }),
+  (data) => ({
+    type: "CubicBezierSplineMessage",
+    name: data[1],
+    props: data[2],
+  }),
+  (data) => ({ type: "GaussianSplatsMessage", name: data[1], props: data[2] }),
+  (data) => ({ type: "RemoveSceneNodeMessage", name: data[1] }),
+  (data) => ({
+    type: "GuiFolderMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiMarkdownMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiHtmlMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiProgressBarMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiPlotlyMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiUplotMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiImageMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiTabGroupMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiButtonMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiUploadButtonMessage",
+    uuid: data[1],
+    container_uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({
+    type: "GuiSliderMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiMultiSliderMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiNumberMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiRgbMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiRgbaMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiCheckboxMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiVector2Message",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiVector3Message",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiTextMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiDropdownMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({
+    type: "GuiButtonGroupMessage",
+    uuid: data[1],
+    value: data[2],
+    container_uuid: data[3],
+    props: data[4],
+  }),
+  (data) => ({ type: "GuiRemoveMessage", uuid: data[1] }),
+  (data) => ({ type: "RunJavascriptMessage", source: data[1] }),
+  (data) => ({
+    type: "NotificationMessage",
+    mode: data[1],
+    uuid: data[2],
+    props: data[3],
+  }),
+  (data) => ({ type: "RemoveNotificationMessage", uuid: data[1] }),
+  (data) => ({
+    type: "ViewerCameraMessage",
+    wxyz: data[1],
+    position: data[2],
+    fov: data[3],
+    near: data[4],
+    far: data[5],
+    image_height: data[6],
+    image_width: data[7],
+    look_at: data[8],
+    up_direction: data[9],
+  }),
+  (data) => ({
+    type: "ScenePointerMessage",
+    event_type: data[1],
+    ray_origin: data[2],
+    ray_direction: data[3],
+    screen_pos: data[4],
+  }),
+  (data) => ({
+    type: "ScenePointerEnableMessage",
+    enable: data[1],
+    event_type: data[2],
+  }),
+  (data) => ({
+    type: "PointCloudLodNodeMessage",
+    name: data[1],
+    octree_id: data[2],
+    node_id: data[3],
+    offset: data[4],
+    points: data[5],
+    colors: data[6],
+  }),
+  (data) => ({
+    type: "PointCloudLodEvictMessage",
+    name: data[1],
+    octree_id: data[2],
+    node_ids: data[3],
+  }),
+  (data) => ({
+    type: "FogMessage",
+    near: data[1],
+    far: data[2],
+    color: data[3],
+    enabled: data[4],
+  }),
+  (data) => ({
+    type: "EnvironmentMapMessage",
+    hdri: data[1],
+    background: data[2],
+    background_blurriness: data[3],
+    background_intensity: data[4],
+    background_wxyz: data[5],
+    environment_intensity: data[6],
+    environment_wxyz: data[7],
+  }),
+  (data) => ({
+    type: "EnableLightsMessage",
+    enabled: data[1],
+    cast_shadow: data[2],
+  }),
+  (data) => ({
+    type: "SetBoneOrientationMessage",
+    name: data[1],
+    bone_index: data[2],
+    wxyz: data[3],
+  }),
+  (data) => ({
+    type: "SetBonePositionMessage",
+    name: data[1],
+    bone_index: data[2],
+    position: data[3],
+  }),
+  (data) => ({
+    type: "SetCameraPositionMessage",
+    position: data[1],
+    initial: data[2],
+  }),
+  (data) => ({
+    type: "SetCameraUpDirectionMessage",
+    position: data[1],
+    initial: data[2],
+  }),
+  (data) => ({
+    type: "SetCameraLookAtMessage",
+    look_at: data[1],
+    initial: data[2],
+  }),
+  (data) => ({ type: "SetCameraNearMessage", near: data[1], initial: data[2] }),
+  (data) => ({ type: "SetCameraFarMessage", far: data[1], initial: data[2] }),
+  (data) => ({ type: "SetCameraFovMessage", fov: data[1], initial: data[2] }),
+  (data) => ({ type: "SetOrientationMessage", name: data[1], wxyz: data[2] }),
+  (data) => ({ type: "SetPositionMessage", name: data[1], position: data[2] }),
+  (data) => ({
+    type: "TransformControlsUpdateMessage",
+    name: data[1],
+    wxyz: data[2],
+    position: data[3],
+  }),
+  (data) => ({ type: "TransformControlsDragStartMessage", name: data[1] }),
+  (data) => ({ type: "TransformControlsDragEndMessage", name: data[1] }),
+  (data) => ({
+    type: "BackgroundImageMessage",
+    format: data[1],
+    rgb_data: data[2],
+    depth_data: data[3],
+  }),
+  (data) => ({
+    type: "SetSceneNodeVisibilityMessage",
+    name: data[1],
+    visible: data[2],
+  }),
+  (data) => ({
+    type: "SetSceneNodeClickableMessage",
+    name: data[1],
+    clickable: data[2],
+  }),
+  (data) => ({
+    type: "SceneNodeClickMessage",
+    name: data[1],
+    instance_index: data[2],
+    ray_origin: data[3],
+    ray_direction: data[4],
+    screen_pos: data[5],
+  }),
+  (data) => ({ type: "ResetGuiMessage" }),
+  (data) => ({
+    type: "GuiModalMessage",
+    order: data[1],
+    uuid: data[2],
+    title: data[3],
+  }),
+  (data) => ({ type: "GuiCloseModalMessage", uuid: data[1] }),
+  (data) => ({
+    type: "GuiButtonHoldMessage",
+    uuid: data[1],
+    frequency: data[2],
+  }),
+  (data) => ({ type: "GuiUpdateMessage", uuid: data[1], updates: data[2] }),
+  (data) => ({
+    type: "SceneNodeUpdateMessage",
+    name: data[1],
+    updates: data[2],
+  }),
+  (data) => ({
+    type: "SceneNodeArrayPatchMessage",
+    name: data[1],
+    prop_name: data[2],
+    row_bytes: data[3],
+    start: data[4],
+    indices: data[5],
+    values: data[6],
+  }),
+  (data) => ({
+    type: "ThemeConfigurationMessage",
+    titlebar_content: data[1],
+    control_layout: data[2],
+    control_width: data[3],
+    show_logo: data[4],
+    show_share_button: data[5],
+    dark_mode: data[6],
+    colors: data[7],
+  }),
+  (data) => ({
+    type: "GetRenderRequestMessage",
+    format: data[1],
+    height: data[2],
+    width: data[3],
+    quality: data[4],
+    wxyz: data[5],
+    position: data[6],
+    fov: data[7],
+  }),
+  (data) => ({ type: "GetRenderResponseMessage", payload: data[1] }),
+  (data) => ({
+    type: "FileTransferStartUpload",
+    source_component_uuid: data[1],
+    transfer_uuid: data[2],
+    filename: data[3],
+    mime_type: data[4],
+    part_count: data[5],
+    size_bytes: data[6],
+  }),
+  (data) => ({
+    type: "FileTransferStartDownload",
+    save_immediately: data[1],
+    transfer_uuid: data[2],
+    filename: data[3],
+    mime_type: data[4],
+    part_count: data[5],
+    size_bytes: data[6],
+  }),
+  (data) => ({
+    type: "FileTransferPart",
+    source_component_uuid: data[1],
+    transfer_uuid: data[2],
+    part_index: data[3],
+    content: data[4],
+  }),
+  (data) => ({
+    type: "FileTransferPartAck",
+    source_component_uuid: data[1],
+    transfer_uuid: data[2],
+    transferred_bytes: data[3],
+    total_bytes: data[4],
+  }),
+  (data) => ({ type: "ShareUrlRequest" }),
+  (data) => ({ type: "ShareUrlUpdated", share_url: data[1] }),
+  (data) => ({ type: "ShareUrlDisconnect" }),
+  (data) => ({ type: "SetGuiPanelLabelMessage", label: data[1] }),
+];
+export function decodeCompactMessage(data: any[]): Message {
+  return compactMessageDecoders[data[0]](data);
+}
@@ -4,6 +4,7 @@ import { createStandardMaterial } from "./MeshUtils";
 import { MeshMessage } from "../WebsocketMessages";
 import { OutlinesIfHovered } from "../OutlinesIfHovered";
 import { normalizeScale } from "../utils/normalizeScale";
+import { dequantizePositions } from "../utils/dequantizePositions";
 
 /**
  * Component for rendering basic THREE.js meshes
@@ -33,12 +34,9 @@ export const BasicMesh = React.forwardRef<
     geometry.setAttribute(
       "position",
       new THREE.BufferAttribute(
-        new Float32Array(
-          message.props.vertices.buffer.slice(
-            message.props.vertices.byteOffset,
-            message.props.vertices.byteOffset +
-              message.props.vertices.byteLength,
-          ),
+        dequantizePositions(
+          message.props.vertices,
+          message.props.vertices_bounds,
         ),
         3,
       ),
@@ -57,7 +55,11 @@ export const BasicMesh = React.forwardRef<
     geometry.computeVertexNormals();
     geometry.computeBoundingSphere();
     return geometry;
-  }, [message.props.vertices, message.props.faces]);
+  }, [
+    message.props.vertices,
+    message.props.vertices_bounds,
+    message.props.faces,
+  ]);
 
   // Clean up geometry when it changes.
   React.useEffect(() => {
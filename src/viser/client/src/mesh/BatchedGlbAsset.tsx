@@ -6,6 +6,7 @@ import { ViewerContext } from "../ViewerContext";
 import { mergeBufferGeometries } from "three-stdlib";
 import { BatchedMeshBase } from "./BatchedMeshBase";
 import { normalizeScale } from "../utils/normalizeScale";
+import { dequantizePositions } from "../utils/dequantizePositions";
 
 /**
  * Component for rendering batched/instanced GLB models
@@ -57,6 +58,21 @@ export const BatchedGlbAsset = React.forwardRef<
     };
   }, [gltf]);
 
+  // Quantized positions are decoded once, to the float32 layout that
+  // BatchedMeshBase reads.
+  const batchedPositions = useMemo(
+    () =>
+      message.props.batched_positions_bounds === null
+        ? message.props.batched_positions
+        : new Uint8Array(
+            dequantizePositions(
+              message.props.batched_positions,
+              message.props.batched_positions_bounds,
+            ).buffer,
+          ),
+    [message.props.batched_positions, message.props.batched_positions_bounds],
+  );
+
   if (!geometry || !material) return null;
 
   return (
@@ -65,7 +81,7 @@ export const BatchedGlbAsset = React.forwardRef<
         <BatchedMeshBase
           geometry={geometry}
           material={material}
-          batched_positions={message.props.batched_positions}
+          batched_positions={batchedPositions}
           batched_wxyzs={message.props.batched_wxyzs}
           batched_scales={message.props.batched_scales}
           batched_colors={null}
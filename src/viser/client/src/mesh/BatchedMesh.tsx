@@ -6,6 +6,7 @@ import { InstancedMesh2 } from "@three.ez/instanced-mesh";
 import { ViewerContext } from "../ViewerContext";
 import { BatchedMeshBase } from "./BatchedMeshBase";
 import { normalizeScale } from "../utils/normalizeScale";
+import { dequantizePositions } from "../utils/dequantizePositions";
 
 /**
  * Component for rendering batched/instanced meshes
@@ -80,13 +81,28 @@ export const BatchedMesh = React.forwardRef<
     return geometry;
   }, [message.props.vertices.buffer, message.props.faces.buffer]);
 
+  // Quantized positions are decoded once, to the float32 layout that
+  // BatchedMeshBase reads.
+  const batchedPositions = useMemo(
+    () =>
+      message.props.batched_positions_bounds === null
+        ? message.props.batched_positions
+        : new Uint8Array(
+            dequantizePositions(
+              message.props.batched_positions,
+              message.props.batched_positions_bounds,
+            ).buffer,
+          ),
+    [message.props.batched_positions, message.props.batched_positions_bounds],
+  );
+
   return (
     <group ref={ref}>
       <group scale={normalizeScale(message.props.scale)}>
         <BatchedMeshBase
           geometry={geometry}
           material={material}
-          batched_positions={message.props.batched_positions}
+          batched_positions={batchedPositions}
           batched_wxyzs={message.props.batched_wxyzs}
           batched_scales={message.props.batched_scales}
           batched_colors={message.props.batched_colors}
@@ -6,6 +6,7 @@ import { OutlinesIfHovered } from "../OutlinesIfHovered";
 import { ViewerContext } from "../ViewerContext";
 import { useFrame } from "@react-three/fiber";
 import { normalizeScale } from "../utils/normalizeScale";
+import { dequantizePositions } from "../utils/dequantizePositions";
 
 /**
  * Component for rendering skinned meshes with animations
@@ -41,12 +42,9 @@ export const SkinnedMesh = React.forwardRef<
     geometry.setAttribute(
       "position",
       new THREE.BufferAttribute(
-        new Float32Array(
-          message.props.vertices.buffer.slice(
-            message.props.vertices.byteOffset,
-            message.props.vertices.byteOffset +
-              message.props.vertices.byteLength,
-          ),
+        dequantizePositions(
+          message.props.vertices,
+          message.props.vertices_bounds,
         ),
         3,
       ),
@@ -146,6 +144,7 @@ export const SkinnedMesh = React.forwardRef<
     return { geometry, skeleton };
   }, [
     message.props.vertices.buffer,
+    message.props.vertices_bounds,
     message.props.faces.buffer,
     message.props.skin_indices.buffer,
     message.props.skin_weights?.buffer,
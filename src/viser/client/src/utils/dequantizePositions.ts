@@ -0,0 +1,30 @@
+/** Bounding box of quantized positions, as lower and upper corners. */
+export type PositionBounds = [
+  [number, number, number],
+  [number, number, number],
+];
+
+/** Decode an (N, 3) position buffer. Positions are float32, or uint16 values
+ * quantized within `bounds` when bounds are set. Returns a new array. */
+export function dequantizePositions(
+  data: Uint8Array,
+  bounds: PositionBounds | null,
+): Float32Array {
+  // Copy so typed array views are aligned.
+  const buffer = data.buffer.slice(
+    data.byteOffset,
+    data.byteOffset + data.byteLength,
+  );
+  if (bounds === null) return new Float32Array(buffer);
+
+  const quantized = new Uint16Array(buffer);
+  const out = new Float32Array(quantized.length);
+  const [lower, upper] = bounds;
+  const step = [0, 1, 2].map((i) => (upper[i] - lower[i]) / 65535);
+  for (let i = 0; i < quantized.length; i += 3) {
+    out[i] = lower[0] + quantized[i] * step[0];
+    out[i + 1] = lower[1] + quantized[i + 1] * step[1];
+    out[i + 2] = lower[2] + quantized[i + 2] * step[2];
+  }
+  return out;
+}
@@ -0,0 +1,692 @@
+/** zstd decoder with dictionary support, following RFC 8878.
+ *
+ * zstddec is much faster for large buffers, but it can't use dictionaries. We
+ * use this for msgpack headers, which the server compresses with a shared
+ * dictionary when we advertise the `zstd-dict` capability. See
+ * `viser/infra/_window_encoding.py`. */
+
+const FRAME_MAGIC = 0xfd2fb528;
+const DICTIONARY_MAGIC = 0xec30a437;
+
+type FseTable = {
+  accuracyLog: number;
+  symbol: Uint8Array;
+  numBits: Uint8Array;
+  baseline: Uint16Array;
+};
+
+type HuffmanTable = {
+  maxBits: number;
+  symbol: Uint8Array;
+  numBits: Uint8Array;
+};
+
+/** Entropy tables and repeat offsets that carry over between blocks. */
+type EntropyState = {
+  huffman: HuffmanTable | null;
+  literalLengths: FseTable | null;
+  offsets: FseTable | null;
+  matchLengths: FseTable | null;
+  repeatOffsets: [number, number, number];
+};
+
+export type ZstdDictionary = {
+  id: number;
+  content: Uint8Array;
+  entropy: EntropyState;
+};
+
+// Predefined distributions and (baseline, extra bits) codes for sequences.
+const LITERAL_LENGTH_DEFAULT = [
+  4, 3, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 3,
+  2, 1, 1, 1, 1, 1, -1, -1, -1, -1,
+];
+const MATCH_LENGTH_DEFAULT = [
+  1, 4, 3, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+  1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, -1, -1, -1, -1,
+  -1, -1, -1,
+];
+const OFFSET_DEFAULT = [
+  1, 1, 1, 1, 1, 1, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, -1,
+  -1, -1, -1, -1,
+];
+const LITERAL_LENGTH_BASELINES = [
+  0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 18, 20, 22, 24, 28,
+  32, 40, 48, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536,
+];
+const LITERAL_LENGTH_EXTRA_BITS = [
+  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 3, 3, 4, 6,
+  7, 8, 9, 10, 11, 12, 13, 14, 15, 16,
+];
+const MATCH_LENGTH_BASELINES = [
+  3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23,
+  24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 37, 39, 41, 43, 47, 51, 59,
+  67, 83, 99, 131, 259, 515, 1027, 2051, 4099, 8195, 16387, 32771, 65539,
+];
+const MATCH_LENGTH_EXTRA_BITS = [
+  0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+  0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 3, 3, 4, 4, 5, 7, 8, 9, 10, 11, 12, 13,
+  14, 15, 16,
+];
+
+const literalLengthDefaultTable = buildFseTable(LITERAL_LENGTH_DEFAULT, 6);
+const matchLengthDefaultTable = buildFseTable(MATCH_LENGTH_DEFAULT, 6);
+const offsetDefaultTable = buildFseTable(OFFSET_DEFAULT, 5);
+
+function readUint32(data: Uint8Array, offset: number): number {
+  return (
+    (data[offset] |
+      (data[offset + 1] << 8) |
+      (data[offset + 2] << 16) |
+      (data[offset + 3] << 24)) >>>
+    0
+  );
+}
+
+function highBit(value: number): number {
+  return 31 - Math.clz32(value);
+}
+
+/** Get `count` bits starting at bit `position` of a little-endian bit string.
+ * Bits before the start of the string are read as zeros. */
+function bitsAt(
+  data: Uint8Array,
+  start: number,
+  position: number,
+  count: number,
+): number {
+  if (position < 0) {
+    count += position;
+    return count <= 0 ? 0 : bitsAt(data, start, 0, count) * 2 ** -position;
+  }
+  let value = 0;
+  const firstByte = position >> 3;
+  const lastByte = (position + count - 1) >> 3;
+  for (let i = lastByte; i >= firstByte; i--) {
+    value = value * 256 + (data[start + i] ?? 0);
+  }
+  return Math.floor(value / 2 ** (position & 7)) % 2 ** count;
+}
+
+/** Reads a bitstream backward, from its padding marker to its start. */
+class BackwardBitReader {
+  private position: number;
+
+  constructor(
+    private data: Uint8Array,
+    private start: number,
+    end: number,
+  ) {
+    const last = data[end - 1];
+    if (end <= start || last === 0) throw new Error("Corrupt zstd bitstream.");
+    this.position = (end - start - 1) * 8 + highBit(last);
+  }
+
+  read(count: number): number {
+    if (count === 0) return 0;
+    this.position -= count;
+    return bitsAt(this.data, this.start, this.position, count);
+  }
+
+  peek(count: number): number {
+    return bitsAt(this.data, this.start, this.position - count, count);
+  }
+
+  skip(count: number): void {
+    this.position -= count;
+  }
+
+  /** Whether more bits were read than the stream contains. */
+  overflowed(): boolean {
+    return this.position < 0;
+  }
+
+  finished(): boolean {
+    return this.position === 0;
+  }
+}
+
+function buildFseTable(counts: number[], accuracyLog: number): FseTable {
+  const size = 1 << accuracyLog;
+  const symbol = new Uint8Array(size);
+  const numBits = new Uint8Array(size);
+  const baseline = new Uint16Array(size);
+  const next = new Array<number>(counts.length);
+
+  // Symbols with a "less than 1" probability go at the end of the table.
+  let highThreshold = size - 1;
+  for (let s = 0; s < counts.length; s++) {
+    if (counts[s] === -1) {
+      symbol[highThreshold--] = s;
+      next[s] = 1;
+    } else {
+      next[s] = counts[s];
+    }
+  }
+
+  const step = (size >> 1) + (size >> 3) + 3;
+  let position = 0;
+  for (let s = 0; s < counts.length; s++) {
+    for (let i = 0; i < counts[s]; i++) {
+      symbol[position] = s;
+      do {
+        position = (position + step) & (size - 1);
+      } while (position > highThreshold);
+    }
+  }
+  if (position !== 0) throw new Error("Corrupt zstd FSE table.");
+
+  for (let i = 0; i < size; i++) {
+    const state = next[symbol[i]]++;
+    numBits[i] = accuracyLog - highBit(state);
+    baseline[i] = (state << numBits[i]) - size;
+  }
+  return { accuracyLog, symbol, numBits, baseline };
+}
+
+/** Read an FSE table description. Returns the table and the number of bytes
+ * read. */
+function readFseTable(
+  data: Uint8Array,
+  start: number,
+  maxAccuracyLog: number,
+  maxSymbol: number,
+): [FseTable, number] {
+  let bit = 0;
+  const read = (count: number) => {
+    const out = bitsAt(data, start, bit, count);
+    bit += count;
+    return out;
+  };
+  const accuracyLog = read(4) + 5;
+  if (accuracyLog > maxAccuracyLog) throw new Error("Corrupt zstd FSE table.");
+
+  const counts: number[] = [];
+  let remaining = (1 << accuracyLog) + 1;
+  let threshold = 1 << accuracyLog;
+  let valueBits = accuracyLog + 1;
+  while (remaining > 1 && counts.length <= maxSymbol) {
+    const max = 2 * threshold - 1 - remaining;
+    let value = bitsAt(data, start, bit, valueBits);
+    if ((value & (threshold - 1)) < max) {
+      value &= threshold - 1;
+      bit += valueBits - 1;
+    } else {
+      value &= 2 * threshold - 1;
+      if (value >= threshold) value -= max;
+      bit += valueBits;
+    }
+    const count = value - 1;
+    remaining -= Math.abs(count);
+    counts.push(count);
+    while (remaining < threshold) {
+      valueBits--;
+      threshold >>= 1;
+    }
+
+    // Zero probabilities are followed by the number of repeated zeros.
+    if (count === 0) {
+      let repeat: number;
+      do {
+        repeat = read(2);
+        for (let i = 0; i < repeat; i++) counts.push(0);
+      } while (repeat === 3);
+    }
+  }
+  if (remaining !== 1 || counts.length > maxSymbol + 1) {
+    throw new Error("Corrupt zstd FSE table.");
+  }
+  return [buildFseTable(counts, accuracyLog), (bit + 7) >> 3];
+}
+
+/** Read a Huffman tree description. Returns the table and the number of bytes
+ * read. */
+function readHuffmanTable(
+  data: Uint8Array,
+  start: number,
+): [HuffmanTable, number] {
+  const header = data[start];
+  const weights: number[] = [];
+  let size: number;
+  if (header >= 128) {
+    // Weights are stored directly, as 4-bit values.
+    const count = header - 127;
+    size = 1 + ((count + 1) >> 1);
+    for (let i = 0; i < count; i++) {
+      const byte = data[start + 1 + (i >> 1)];
+      weights.push(i % 2 === 0 ? byte >> 4 : byte & 15);
+    }
+  } else {
+    // Weights are FSE-compressed, and decoded with two interleaved states.
+    size = 1 + header;
+    const [table, tableSize] = readFseTable(data, start + 1, 6, 255);
+    const reader = new BackwardBitReader(
+      data,
+      start + 1 + tableSize,
+      start + size,
+    );
+    const states = [
+      reader.read(table.accuracyLog),
+      reader.read(table.accuracyLog),
+    ];
+    for (let i = 0; weights.length < 255; i ^= 1) {
+      const state = states[i];
+      weights.push(table.symbol[state]);
+      states[i] = table.baseline[state] + reader.read(table.numBits[state]);
+      if (reader.overflowed()) {
+        weights.push(table.symbol[states[i ^ 1]]);
+        break;
+      }
+    }
+  }
+
+  // The weight of the last symbol is implied by the others.
+  let total = 0;
+  for (const weight of weights) if (weight > 0) total += 1 << (weight - 1);
+  if (total === 0) throw new Error("Corrupt zstd Huffman table.");
+  const maxBits = highBit(total) + 1;
+  const leftover = (1 << maxBits) - total;
+  if ((leftover & (leftover - 1)) !== 0) {
+    throw new Error("Corrupt zstd Huffman table.");
+  }
+  weights.push(highBit(leftover) + 1);
+
+  // Symbols with longer codes come first, in symbol order.
+  const symbol = new Uint8Array(1 << maxBits);
+  const numBits = new Uint8Array(1 << maxBits);
+  let position = 0;
+  for (let weight = 1; weight <= maxBits; weight++) {
+    for (let s = 0; s < weights.length; s++) {
+      if (weights[s] !== weight) continue;
+      const length = 1 << (weight - 1);
+      symbol.fill(s, position, position + length);
+      numBits.fill(maxBits + 1 - weight, position, position + length);
+      position += length;
+    }
+  }
+  return [{ maxBits, symbol, numBits }, size];
+}
+
+function decodeHuffmanStream(
+  table: HuffmanTable,
+  data: Uint8Array,
+  start: number,
+  end: number,
+  out: Uint8Array,
+  outStart: number,
+  outEnd: number,
+): void {
+  const reader = new BackwardBitReader(data, start, end);
+  for (let i = outStart; i < outEnd; i++) {
+    const index = reader.peek(table.maxBits);
+    out[i] = table.symbol[index];
+    reader.skip(table.numBits[index]);
+  }
+  if (!reader.finished()) throw new Error("Corrupt zstd literals.");
+}
+
+/** Decode the literals section of a compressed block. Returns the literals and
+ * the number of bytes read. */
+function readLiterals(
+  data: Uint8Array,
+  start: number,
+  entropy: EntropyState,
+): [Uint8Array, number] {
+  const type = data[start] & 3;
+  const sizeFormat = (data[start] >> 2) & 3;
+
+  if (type === 0 || type === 1) {
+    // Raw or RLE literals.
+    let size: number;
+    let headerSize: number;
+    if ((sizeFormat & 1) === 0) {
+      size = data[start] >> 3;
+      headerSize = 1;
+    } else if (sizeFormat === 1) {
+      size = (data[start] >> 4) + (data[start + 1] << 4);
+      headerSize = 2;
+    } else {
+      size =
+        (data[start] >> 4) + (data[start + 1] << 4) + (data[start + 2] << 12);
+      headerSize = 3;
+    }
+    if (type === 0) {
+      const begin = start + headerSize;
+      return [data.subarray(begin, begin + size), headerSize + size];
+    }
+    return [
+      new Uint8Array(size).fill(data[start + headerSize]),
+      headerSize + 1,
+    ];
+  }
+
+  // Huffman-compressed literals, with a new or repeated tree.
+  const headerSize = [3, 3, 4, 5][sizeFormat];
+  const sizeBits = [10, 10, 14, 18][sizeFormat];
+  const header = bitsAt(data, start, 4, 2 * sizeBits);
+  const size = header % 2 ** sizeBits;
+  const compressedSize = Math.floor(header / 2 ** sizeBits);
+  let position = start + headerSize;
+  const end = position + compressedSize;
+  if (type === 2) {
+    const [table, tableSize] = readHuffmanTable(data, position);
+    entropy.huffman = table;
+    position += tableSize;
+  }
+  const table = entropy.huffman;
+  if (table === null) throw new Error("Missing zstd Huffman table.");
+
+  const out = new Uint8Array(size);
+  if (sizeFormat === 0) {
+    decodeHuffmanStream(table, data, position, end, out, 0, size);
+  } else {
+    const streamSize = (size + 3) >> 2;
+    let streamStart = position + 6;
+    for (let i = 0; i < 4; i++) {
+      const streamEnd =
+        i < 3
+          ? streamStart +
+            (data[position + 2 * i] | (data[position + 2 * i + 1] << 8))
+          : end;
+      decodeHuffmanStream(
+        table,
+        data,
+        streamStart,
+        streamEnd,
+        out,
+        i * streamSize,
+        Math.min(size, (i + 1) * streamSize),
+      );
+      streamStart = streamEnd;
+    }
+  }
+  return [out, headerSize + compressedSize];
+}
+
+/** Read the table for one sequence field, based on its compression mode.
+ * Returns the table and the number of bytes read. */
+function readSequenceTable(
+  mode: number,
+  data: Uint8Array,
+  start: number,
+  defaultTable: FseTable,
+  previous: FseTable | null,
+  maxAccuracyLog: number,
+  maxSymbol: number,
+): [FseTable, number] {
+  if (mode === 0) return [defaultTable, 0];
+  if (mode === 1) return [buildRleTable(data[start]), 1];
+  if (mode === 2) return readFseTable(data, start, maxAccuracyLog, maxSymbol);
+  if (previous === null) throw new Error("Missing zstd FSE table.");
+  return [previous, 0];
+}
+
+function buildRleTable(symbol: number): FseTable {
+  return {
+    accuracyLog: 0,
+    symbol: new Uint8Array([symbol]),
+    numBits: new Uint8Array(1),
+    baseline: new Uint16Array(1),
+  };
+}
+
+/** Decode a compressed block into `out`, starting at `outPosition`. Returns the
+ * new output position. */
+function decodeBlock(
+  data: Uint8Array,
+  start: number,
+  end: number,
+  out: Uint8Array,
+  outPosition: number,
+  history: Uint8Array,
+  entropy: EntropyState,
+): number {
+  const [literals, literalsSize] = readLiterals(data, start, entropy);
+  let position = start + literalsSize;
+
+  let numSequences = data[position++];
+  if (numSequences >= 255) {
+    numSequences = data[position] + (data[position + 1] << 8) + 0x7f00;
+    position += 2;
+  } else if (numSequences >= 128) {
+    numSequences = ((numSequences - 128) << 8) + data[position++];
+  }
+
+  let literalPosition = 0;
+  if (numSequences > 0) {
+    const modes = data[position++];
+    const [literalLengths, literalLengthsSize] = readSequenceTable(
+      modes >> 6,
+      data,
+      position,
+      literalLengthDefaultTable,
+      entropy.literalLengths,
+      9,
+      35,
+    );
+    position += literalLengthsSize;
+    const [offsets, offsetsSize] = readSequenceTable(
+      (modes >> 4) & 3,
+      data,
+      position,
+      offsetDefaultTable,
+      entropy.offsets,
+      8,
+      31,
+    );
+    position += offsetsSize;
+    const [matchLengths, matchLengthsSize] = readSequenceTable(
+      (modes >> 2) & 3,
+      data,
+      position,
+      matchLengthDefaultTable,
+      entropy.matchLengths,
+      9,
+      52,
+    );
+    position += matchLengthsSize;
+    entropy.literalLengths = literalLengths;
+    entropy.offsets = offsets;
+    entropy.matchLengths = matchLengths;
+
+    const repeat = entropy.repeatOffsets;
+    const reader = new BackwardBitReader(data, position, end);
+    let literalLengthState = reader.read(literalLengths.accuracyLog);
+    let offsetState = reader.read(offsets.accuracyLog);
+    let matchLengthState = reader.read(matchLengths.accuracyLog);
+
+    for (let i = 0; i < numSequences; i++) {
+      const offsetCode = offsets.symbol[offsetState];
+      const matchLengthCode = matchLengths.symbol[matchLengthState];
+      const literalLengthCode = literalLengths.symbol[literalLengthState];
+      const offsetValue = 2 ** offsetCode + reader.read(offsetCode);
+      const matchLength =
+        MATCH_LENGTH_BASELINES[matchLengthCode] +
+        reader.read(MATCH_LENGTH_EXTRA_BITS[matchLengthCode]);
+      const literalLength =
+        LITERAL_LENGTH_BASELINES[literalLengthCode] +
+        reader.read(LITERAL_LENGTH_EXTRA_BITS[literalLengthCode]);
+
+      // Resolve repeat offsets.
+      let offset: number;
+      if (offsetValue > 3) {
+        offset = offsetValue - 3;
+        repeat[2] = repeat[1];
+        repeat[1] = repeat[0];
+        repeat[0] = offset;
+      } else {
+        const index = offsetValue - 1 + (literalLength === 0 ? 1 : 0);
+        if (index === 0) {
+          offset = repeat[0];
+        } else {
+          offset = index === 3 ? repeat[0] - 1 : repeat[index];
+          if (index !== 1) repeat[2] = repeat[1];
+          repeat[1] = repeat[0];
+          repeat[0] = offset;
+        }
+      }
+
+      if (i < numSequences - 1) {
+        literalLengthState =
+          literalLengths.baseline[literalLengthState] +
+          reader.read(literalLengths.numBits[literalLengthState]);
+        matchLengthState =
+          matchLengths.baseline[matchLengthState] +
+          reader.read(matchLengths.numBits[matchLengthState]);
+        offsetState =
+          offsets.baseline[offsetState] +
+          reader.read(offsets.numBits[offsetState]);
+      }
+
+      // Execute the sequence. Matches can reach back into the dictionary.
+      if (outPosition + literalLength + matchLength > out.length) {
+        throw new Error("zstd output is larger than expected.");
+      }
+      out.set(
+        literals.subarray(literalPosition, literalPosition + literalLength),
+        outPosition,
+      );
+      literalPosition += literalLength;
+      outPosition += literalLength;
+      if (offset > outPosition + history.length) {
+        throw new Error("Corrupt zstd match offset.");
+      }
+      for (let j = 0; j < matchLength; j++) {
+        const source = outPosition - offset;
+        out[outPosition++] =
+          source >= 0 ? out[source] : history[history.length + source];
+      }
+    }
+    if (!reader.finished()) throw new Error("Corrupt zstd sequences.");
+  }
+
+  const rest = literals.subarray(literalPosition);
+  if (outPosition + rest.length > out.length) {
+    throw new Error("zstd output is larger than expected.");
+  }
+  out.set(rest, outPosition);
+  return outPosition + rest.length;
+}
+
+/** Parse a zstd dictionary. Dictionaries without the zstd dictionary magic
+ * number are used as raw content. */
+export function parseZstdDictionary(data: Uint8Array): ZstdDictionary {
+  const entropy: EntropyState = {
+    huffman: null,
+    literalLengths: null,
+    offsets: null,
+    matchLengths: null,
+    repeatOffsets: [1, 4, 8],
+  };
+  if (data.length < 8 || readUint32(data, 0) !== DICTIONARY_MAGIC) {
+    return { id: 0, content: data, entropy };
+  }
+
+  const id = readUint32(data, 4);
+  let position = 8;
+  let size: number;
+  [entropy.huffman, size] = readHuffmanTable(data, position);
+  position += size;
+  [entropy.offsets, size] = readFseTable(data, position, 8, 31);
+  position += size;
+  [entropy.matchLengths, size] = readFseTable(data, position, 9, 52);
+  position += size;
+  [entropy.literalLengths, size] = readFseTable(data, position, 9, 35);
+  position += size;
+  entropy.repeatOffsets = [
+    readUint32(data, position),
+    readUint32(data, position + 4),
+    readUint32(data, position + 8),
+  ];
+  return { id, content: data.subarray(position + 12), entropy };
+}
+
+/** Read a zstd frame header. Returns the dictionary ID, which is 0 if there
+ * isn't one, and the header size. */
+function readFrameHeader(data: Uint8Array): [number, number] {
+  if (data.length < 6 || readUint32(data, 0) !== FRAME_MAGIC) {
+    throw new Error("Not a zstd frame.");
+  }
+  const descriptor = data[4];
+  const singleSegment = (descriptor >> 5) & 1;
+  const dictionaryIdSize = [0, 1, 2, 4][descriptor & 3];
+  const contentSizeSize = [singleSegment, 2, 4, 8][descriptor >> 6];
+  const position = 5 + (singleSegment ? 0 : 1);
+  let dictionaryId = 0;
+  for (let i = dictionaryIdSize - 1; i >= 0; i--) {
+    dictionaryId = dictionaryId * 256 + data[position + i];
+  }
+  return [dictionaryId, position + dictionaryIdSize + contentSizeSize];
+}
+
+/** Get the ID of the dictionary that a zstd frame was compressed with, or 0 if
+ * it doesn't use one. */
+export function zstdFrameDictionaryId(data: Uint8Array): number {
+  return readFrameHeader(data)[0];
+}
+
+/** Decompress a single zstd frame with a known decompressed size. */
+export function zstdDecompress(
+  data: Uint8Array,
+  size: number,
+  dictionary: ZstdDictionary | null,
+): Uint8Array {
+  const [dictionaryId, headerSize] = readFrameHeader(data);
+  let position = headerSize;
+  if (dictionaryId !== 0 && dictionaryId !== dictionary?.id) {
+    throw new Error(`Missing zstd dictionary ${dictionaryId}.`);
+  }
+
+  // Tables and repeat offsets start from the dictionary's, and are updated by
+  // each block.
+  const entropy: EntropyState =
+    dictionary === null
+      ? {
+          huffman: null,
+          literalLengths: null,
+          offsets: null,
+          matchLengths: null,
+          repeatOffsets: [1, 4, 8],
+        }
+      : {
+          ...dictionary.entropy,
+          repeatOffsets: [...dictionary.entropy.repeatOffsets],
+        };
+  const history = dictionary === null ? new Uint8Array(0) : dictionary.content;
+
+  const out = new Uint8Array(size);
+  let outPosition = 0;
+  for (;;) {
+    const header =
+      data[position] | (data[position + 1] << 8) | (data[position + 2] << 16);
+    position += 3;
+    const lastBlock = header & 1;
+    const blockType = (header >> 1) & 3;
+    const blockSize = header >> 3;
+    if (blockType === 0) {
+      out.set(data.subarray(position, position + blockSize), outPosition);
+      outPosition += blockSize;
+      position += blockSize;
+    } else if (blockType === 1) {
+      out.fill(data[position], outPosition, outPosition + blockSize);
+      outPosition += blockSize;
+      position += 1;
+    } else if (blockType === 2) {
+      outPosition = decodeBlock(
+        data,
+        position,
+        position + blockSize,
+        out,
+        outPosition,
+        history,
+        entropy,
+      );
+      position += blockSize;
+    } else {
+      throw new Error("Corrupt zstd block.");
+    }
+    if (lastBlock) break;
+  }
+  if (outPosition !== size) throw new Error("Unexpected zstd output size.");
+  return out;
+}
@@ -11,12 +11,19 @@ These are what `viser` runs on under-the-hood, and generally won't be useful unl
 you're building a web-based application from scratch.
 """
 
+from ._async_message_buffer import ClientSendStats as ClientSendStats
+from ._client import ClientReceiveStats as ClientReceiveStats
+from ._client import WebsockClient as WebsockClient
 from ._infra import ClientId as ClientId
 from ._infra import StateSerializer as StateSerializer
 from ._infra import WebsockClientConnection as WebsockClientConnection
 from ._infra import WebsockMessageHandler as WebsockMessageHandler
 from ._infra import WebsockServer as WebsockServer
+from ._messages import MESSAGE_PRIORITIES as MESSAGE_PRIORITIES
 from ._messages import Message as Message
+from ._messages import MessagePriority as MessagePriority
+from ._metrics import Histogram as Histogram
+from ._metrics import ServerStats as ServerStats
 from ._typescript_interface_gen import (
     TypeScriptAnnotationOverride as TypeScriptAnnotationOverride,
 )
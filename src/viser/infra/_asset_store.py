@@ -0,0 +1,154 @@
+"""Content-addressed storage for large binary payloads.
+
+Large arrays and byte strings in outgoing messages (meshes, splats, images, GLB
+files) are identified by a hash of their contents. This lets us:
+
+- Keep a single copy of identical payloads in the persistent message buffer,
+  for example when the same mesh is added under many scene node names.
+- Skip sending payloads to clients that already have them cached. See
+  :func:`viser.infra._window_encoding.omit_held_assets`.
+- Serve payloads over HTTP, at ``/assets/{hash}``, instead of over the websocket.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ._messages import Message
+
+ASSET_MIN_BYTES = 256 * 1024
+"""Arrays and byte strings at least this large are content-addressed."""
+
+ASSET_HASH_BYTES = 16
+"""Size of asset hashes, in bytes."""
+
+HTTP_ASSET_MIN_BYTES = 1024 * 1024
+"""Stored payloads at least this large are fetched over HTTP by clients that
+support it, instead of being sent over the websocket."""
+
+
+def asset_hash(data: Union[bytes, memoryview]) -> bytes:
+    """Compute the content hash of a payload."""
+    return hashlib.blake2b(
+        memoryview(data).cast("B"), digest_size=ASSET_HASH_BYTES
+    ).digest()
+
+
+_AssetKey = Tuple[bytes, Tuple[Any, ...]]
+"""(content hash, payload kind) pairs."""
+
+
+def _asset_kind(value: Any) -> Optional[Tuple[Any, ...]]:
+    """Get a key that distinguishes payloads with the same bytes but different
+    interpretations, or None if the value shouldn't be content-addressed."""
+    if isinstance(value, bytes) and len(value) >= ASSET_MIN_BYTES:
+        return (bytes,)
+    if (
+        isinstance(value, np.ndarray)
+        and value.nbytes >= ASSET_MIN_BYTES
+        and value.flags.c_contiguous
+    ):
+        return (np.ndarray, value.dtype.str, value.shape)
+    return None
+
+
+class AssetStore:
+    """Deduplicates large payloads in buffered messages.
+
+    Interned payloads are reference counted by the messages that use them.
+    Arrays are stored as read-only copies: payloads are served with immutable
+    cache headers, so they can't change after they've been hashed."""
+
+    def __init__(self) -> None:
+        self._value_from_key: Dict[_AssetKey, Any] = {}
+        self._refcount_from_key: Dict[_AssetKey, int] = {}
+        self._key_from_hash: Dict[bytes, _AssetKey] = {}
+        self._keys_from_message_id: Dict[int, List[_AssetKey]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._value_from_key)
+
+    def intern_message(self, message: Message) -> List[_AssetKey]:
+        """Replace large payloads in a message with identical payloads that are
+        already stored, and store new ones. Hashing and copying happen here, so
+        this should be called without holding any buffer locks.
+
+        Returns keys that should be passed to :meth:`register_message()`."""
+        keys: List[_AssetKey] = []
+        self._intern(message, keys)
+        return keys
+
+    def register_message(self, message_id: int, keys: List[_AssetKey]) -> None:
+        """Associate interned payloads with a buffered message, so they're
+        released in :meth:`release_message()`."""
+        if len(keys) > 0:
+            self._keys_from_message_id[message_id] = keys
+
+    def release_message(self, message_id: int) -> None:
+        """Release payloads that were interned for a message."""
+        keys = self._keys_from_message_id.pop(message_id, None)
+        if keys is None:
+            return
+        with self._lock:
+            for key in keys:
+                self._refcount_from_key[key] -= 1
+                if self._refcount_from_key[key] == 0:
+                    self._refcount_from_key.pop(key)
+                    self._value_from_key.pop(key)
+                    if self._key_from_hash.get(key[0], None) == key:
+                        # Payloads with different kinds can share a hash.
+                        self._key_from_hash.pop(key[0])
+                        for other_key in self._value_from_key:
+                            if other_key[0] == key[0]:
+                                self._key_from_hash[key[0]] = other_key
+                                break
+
+    def get_payload(self, payload_hash: bytes) -> Optional[memoryview]:
+        """Get the bytes of a stored payload by hash."""
+        with self._lock:
+            key = self._key_from_hash.get(payload_hash, None)
+            if key is None:
+                return None
+            return memoryview(self._value_from_key[key]).cast("B")
+
+    def _intern(self, value: Any, keys: List[_AssetKey]) -> Any:
+        kind = _asset_kind(value)
+        if kind is not None:
+            if isinstance(value, np.ndarray):
+                # The message may share the array with its caller, so we hash
+                # and store a copy that can't change.
+                value = value.copy()
+                value.flags.writeable = False
+            key = (asset_hash(value), kind)
+            with self._lock:
+                if key in self._value_from_key:
+                    value = self._value_from_key[key]
+                    self._refcount_from_key[key] += 1
+                else:
+                    self._value_from_key[key] = value
+                    self._refcount_from_key[key] = 1
+                    self._key_from_hash.setdefault(key[0], key)
+            keys.append(key)
+            return value
+        elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+            for name, inner in tuple(vars(value).items()):
+                interned = self._intern(inner, keys)
+                if interned is not inner:
+                    object.__setattr__(value, name, interned)
+            return value
+        elif isinstance(value, dict):
+            for k, inner in tuple(value.items()):
+                interned = self._intern(inner, keys)
+                if interned is not inner:
+                    value[k] = interned
+            return value
+        elif isinstance(value, tuple):
+            out = tuple(self._intern(inner, keys) for inner in value)
+            return value if all(a is b for a, b in zip(out, value)) else out
+        return value
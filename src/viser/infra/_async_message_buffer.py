@@ -1,12 +1,254 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import dataclasses
+import itertools
 import threading
+import time
 from asyncio.events import AbstractEventLoop
-from typing import AsyncGenerator, Callable, Dict, List, Sequence
+from concurrent.futures import Executor
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from ._messages import Message
+from ._asset_store import AssetStore
+from ._messages import MESSAGE_PRIORITIES, Message
+from ._metrics import ENCODE_SECONDS_BOUNDS, WINDOW_MESSAGES_BOUNDS, Histogram
+from ._tracing import get_tracer, traced_ids
+from ._window_encoding import EncodedWindow, encoded_nbytes
+
+
+@dataclasses.dataclass(frozen=True)
+class MessageWindow:
+    """A window of messages yielded by :meth:`AsyncMessageBuffer.window_generator`."""
+
+    messages: Sequence[Message]
+    message_ids: Tuple[int, ...]
+    """Buffer IDs of each message in the window, in send order."""
+    estimated_bytes: int
+    """Sum of estimated payload sizes for messages in the window."""
+    shareable: bool = True
+    """Whether the encoded window can be shared with other clients. This is false
+    for windows that contain folded snapshot messages; see
+    :meth:`Message.fold()`."""
+    resume_id: int = -1
+    """Once this window is delivered, every message with an ID up to and
+    including this one has been delivered too. Clients that reconnect can resume
+    from here; see :meth:`AsyncMessageBuffer.can_resume_from()`."""
+
+    def cache_key(self) -> Tuple[int, ...]:
+        """Key for sharing encoded windows between clients. Two windows with the
+        same key contain the same messages."""
+        return self.message_ids
+
+
+@dataclasses.dataclass
+class ClientSendStats:
+    """Send statistics and backpressure state for a single client connection.
+    Shared between the producers for the broadcast and per-client buffers."""
+
+    lagging: bool = False
+    """Whether the client is currently falling behind. While this is set,
+    pending messages are coalesced; see :meth:`Message.coalesce_key()`."""
+    bytes_sent: int = 0
+    windows_sent: int = 0
+    coalesced_message_count: int = 0
+    """Number of pending messages that were dropped in favor of newer ones."""
+    omitted_asset_bytes: int = 0
+    """Bytes of large buffers that weren't sent because the client already had
+    them cached."""
+    last_send_latency_sec: float = 0.0
+    write_buffer_bytes: int = 0
+    """Size of the transport's write buffer after the most recent send."""
+    bytes_received: int = 0
+    sent_count_from_type: Dict[str, int] = dataclasses.field(default_factory=dict)
+    """Number of sent messages, by message type."""
+    received_count_from_type: Dict[str, int] = dataclasses.field(default_factory=dict)
+    """Number of received messages, by message type."""
+
+    def copy(self) -> ClientSendStats:
+        """Get a snapshot of these statistics."""
+        return dataclasses.replace(
+            self,
+            sent_count_from_type=dict(self.sent_count_from_type),
+            received_count_from_type=dict(self.received_count_from_type),
+        )
+
+
+_LaneEntry = Tuple[int, Tuple[Tuple[int, Message], ...], Optional[str]]
+"""(first message ID, (message ID, message) pairs, ordering key) for a pending
+message, or for the messages of an atomic block."""
+
+
+class _PriorityLanes:
+    """Per-client queues of messages that have been polled from the buffer but
+    not yet sent, split by priority lane.
+
+    Messages from higher-priority lanes are sent first; within a lane, messages
+    can also overtake earlier messages that are waiting on another lane. A
+    message is never sent before an earlier message with the same ordering key,
+    and messages with an ordering key of `None` are never reordered.
+
+    Messages from the same atomic block are queued as a single entry, in the
+    lane of their highest-priority message, so they're always sent together."""
+
+    def __init__(self) -> None:
+        self._lanes: Tuple[Deque[_LaneEntry], ...] = tuple(
+            collections.deque() for _ in MESSAGE_PRIORITIES
+        )
+        self._lane_ids_from_key: Tuple[Dict[Optional[str], Deque[int]], ...] = tuple(
+            {} for _ in MESSAGE_PRIORITIES
+        )
+        self._lane_from_priority = {p: i for i, p in enumerate(MESSAGE_PRIORITIES)}
+        self._pending_from_coalesce_key: Dict[str, Tuple[int, int]] = {}
+        """Maps coalescing keys to (lane index, message ID) of pending messages."""
+        self._group: List[Tuple[int, Message]] = []
+        """Messages from the most recently polled atomic block. These are queued
+        once the block is complete; see :meth:`end_group()`."""
+        self._group_id: Optional[int] = None
+
+    _MAX_LANE_SCAN = 32
+    """Maximum number of messages to look at in each lane when searching for
+    a message that's ready to send."""
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes) + len(self._group)
+
+    def min_pending_id(self) -> Optional[int]:
+        heads = [lane[0][0] for lane in self._lanes if len(lane) > 0]
+        if len(self._group) > 0:
+            heads.append(self._group[0][0])
+        return min(heads) if len(heads) > 0 else None
+
+    def append(
+        self,
+        message_id: int,
+        message: Message,
+        coalesce: bool,
+        atomic_group: Optional[int] = None,
+    ) -> bool:
+        """Add a message to its priority lane. If `coalesce` is set, a pending
+        message with the same coalescing key is dropped. Returns True if a
+        message was dropped.
+
+        Messages with the same `atomic_group` are collected until
+        :meth:`end_group()` is called, or until a message from another group is
+        added; they're then queued together."""
+        if len(self._group) > 0 and atomic_group != self._group_id:
+            self._queue_group()
+        if atomic_group is not None:
+            self._group.append((message_id, message))
+            self._group_id = atomic_group
+            return False
+
+        dropped = False
+        coalesce_key = message.coalesce_key()
+        if coalesce_key is not None:
+            prev = self._pending_from_coalesce_key.get(coalesce_key, None)
+            if coalesce and prev is not None:
+                self._remove(*prev)
+                dropped = True
+
+        lane_index = self._lane_from_priority[message.priority()]
+        self._queue(lane_index, ((message_id, message),), message.ordering_key())
+        if coalesce_key is not None:
+            self._pending_from_coalesce_key[coalesce_key] = (lane_index, message_id)
+        return dropped
+
+    def end_group(self, open_group: Optional[int]) -> None:
+        """Queue messages from the most recently polled atomic block, unless
+        it's `open_group`: a block that more messages can still be pushed to."""
+        if len(self._group) > 0 and self._group_id != open_group:
+            self._queue_group()
+
+    def _queue_group(self) -> None:
+        members = tuple(self._group)
+        self._group.clear()
+        self._group_id = None
+        lane_index = min(
+            self._lane_from_priority[message.priority()] for _, message in members
+        )
+        # Groups can only overtake other messages if all of their messages can.
+        keys = {message.ordering_key() for _, message in members}
+        self._queue(lane_index, members, keys.pop() if len(keys) == 1 else None)
+
+    def _queue(
+        self,
+        lane_index: int,
+        members: Tuple[Tuple[int, Message], ...],
+        key: Optional[str],
+    ) -> None:
+        entry_id = members[0][0]
+        self._lanes[lane_index].append((entry_id, members, key))
+        ids_from_key = self._lane_ids_from_key[lane_index]
+        if key not in ids_from_key:
+            ids_from_key[key] = collections.deque()
+        ids_from_key[key].append(entry_id)
+
+    def peek(self) -> Optional[Tuple[int, Tuple[Tuple[int, Message], ...]]]:
+        """Get the highest-priority entry that can be sent without breaking
+        causal ordering, without removing it. Returns the ID of the entry and
+        its (message ID, message) pairs, which contain more than one message
+        for atomic blocks."""
+        for lane in self._lanes:
+            for entry_id, members, key in itertools.islice(lane, self._MAX_LANE_SCAN):
+                if not self._blocked(entry_id, key):
+                    return entry_id, members
+        return None
+
+    def pop(self, entry_id: int) -> None:
+        """Remove an entry returned by `peek()`."""
+        for lane_index, lane in enumerate(self._lanes):
+            for other_id, _, _ in itertools.islice(lane, self._MAX_LANE_SCAN):
+                if other_id == entry_id:
+                    self._remove(lane_index, entry_id)
+                    return
+        assert False, "Popped message was not returned by peek()."
+
+    def _remove(self, lane_index: int, entry_id: int) -> None:
+        lane = self._lanes[lane_index]
+        for i, (other_id, members, key) in enumerate(lane):
+            if other_id != entry_id:
+                continue
+            del lane[i]
+            ids = self._lane_ids_from_key[lane_index][key]
+            ids.remove(entry_id)
+            if len(ids) == 0:
+                self._lane_ids_from_key[lane_index].pop(key)
+            for message_id, message in members:
+                coalesce_key = message.coalesce_key()
+                if coalesce_key is not None and self._pending_from_coalesce_key.get(
+                    coalesce_key, None
+                ) == (lane_index, message_id):
+                    self._pending_from_coalesce_key.pop(coalesce_key)
+            return
+        assert False, "Removed message is not pending."
+
+    def _blocked(self, entry_id: int, key: Optional[str]) -> bool:
+        """Check if any earlier pending message needs to be sent first."""
+        for lane, ids_from_key in zip(self._lanes, self._lane_ids_from_key):
+            if len(lane) == 0:
+                continue
+            if key is None:
+                # Messages without a key can't overtake anything.
+                if lane[0][0] < entry_id:
+                    return True
+                continue
+            for blocking_key in (key, None):
+                ids = ids_from_key.get(blocking_key, None)
+                if ids is not None and ids[0] < entry_id:
+                    return True
+        return False
 
 
 @dataclasses.dataclass
@@ -17,20 +259,90 @@ class AsyncMessageBuffer:
 
     event_loop: AbstractEventLoop
     persistent_messages: bool
+    client_id: Optional[int] = None
+    """Client that this buffer belongs to, or None for the broadcast buffer.
+    Only used for tracing."""
     message_event: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
     flush_event: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
 
     message_counter: int = 0
     message_from_id: Dict[int, Message] = dataclasses.field(default_factory=dict)
     id_from_redundancy_key: Dict[str, int] = dataclasses.field(default_factory=dict)
+    redundancy_key_from_id: Dict[int, str] = dataclasses.field(default_factory=dict)
+    """Redundancy key of each buffered message. Keys are looked up here instead
+    of being recomputed, since messages that are never redundant use random
+    keys."""
+    ids_from_owner_key: Dict[str, Set[int]] = dataclasses.field(default_factory=dict)
+    """Index from :meth:`Message.owner_key()` to message IDs. Only maintained for
+    persistent buffers."""
+    removal_ids: Dict[int, None] = dataclasses.field(default_factory=dict)
+    """Ordered set of IDs for buffered messages where
+    :meth:`Message.removes_owner()` is true. Only maintained for persistent
+    buffers."""
+    ids_from_superseding_key: Dict[str, Set[int]] = dataclasses.field(
+        default_factory=dict
+    )
+    """Index from each key in :meth:`Message.superseded_by()` to message IDs."""
+    fold_ids: Dict[int, None] = dataclasses.field(default_factory=dict)
+    """Ordered set of IDs for buffered messages where
+    :meth:`Message.folds_when_consumed()` is true. Only maintained for
+    persistent buffers."""
+
+    asset_store: AssetStore = dataclasses.field(default_factory=AssetStore)
+    """Content-addressed store for large payloads. Payloads are only interned
+    for persistent buffers, but hashes can be computed for any buffer."""
 
     buffer_lock: threading.Lock = dataclasses.field(default_factory=threading.Lock)
     """Lock to prevent race conditions when pushing messages from different threads."""
 
     max_window_size: int = 128
+    max_window_bytes: int = 4 * 1024 * 1024
+    """Byte budget for each window, based on estimated payload sizes. Messages
+    larger than this budget are sent in a window by themselves, so they don't
+    delay smaller messages that were queued before them."""
     window_duration_sec: float = 1.0 / 60.0
     done: bool = False
     atomic_counter: int = 0
+    atomic_group_counter: int = 0
+    """ID of the most recently started atomic block."""
+    atomic_group_from_id: Dict[int, int] = dataclasses.field(default_factory=dict)
+    """Atomic block that each message was pushed in, for messages that were
+    pushed inside of one. Messages from the same block are sent in one window."""
+
+    encoded_window_cache: Dict[
+        Tuple[Hashable, Tuple[int, ...]], asyncio.Future[EncodedWindow]
+    ] = dataclasses.field(default_factory=dict)
+    """Encoded windows, shared between clients. Only used for persistent buffers,
+    where multiple clients read from the same buffer."""
+    window_cursor_from_client: Dict[int, int] = dataclasses.field(default_factory=dict)
+    """For each active window generator, the ID below which all messages have been
+    consumed. Used for evicting encoded windows that no client will need again."""
+    retained_cursor_from_client: Dict[int, int] = dataclasses.field(
+        default_factory=dict
+    )
+    """Cursors for disconnected clients that may resume their session. Removal
+    messages after these cursors are kept; see :meth:`compact()`."""
+    compacted_through: int = -1
+    """ID of the newest removal message dropped by :meth:`compact()`."""
+    encode_stats: Deque[Tuple[int, float]] = dataclasses.field(
+        default_factory=lambda: collections.deque(maxlen=128)
+    )
+    """(encoded bytes, encode + compression seconds) for recently encoded
+    windows. Useful for tuning `max_window_bytes`."""
+    pushed_count_from_type: Dict[str, int] = dataclasses.field(default_factory=dict)
+    """Number of pushed messages, by message type."""
+    encode_seconds: Histogram = dataclasses.field(
+        default_factory=lambda: Histogram(ENCODE_SECONDS_BOUNDS)
+    )
+    """Encode + compression time for each window."""
+    window_message_counts: Histogram = dataclasses.field(
+        default_factory=lambda: Histogram(WINDOW_MESSAGES_BOUNDS)
+    )
+    """Number of messages in each yielded window."""
+    offload_min_bytes: int = 256 * 1024
+    """Windows with estimated payloads smaller than this are always encoded
+    directly on the event loop. Larger windows can be offloaded to a thread
+    pool; see :meth:`get_or_encode_window()`."""
 
     def remove_from_buffer(self, match_fn: Callable[[Message], bool]) -> None:
         """Remove messages that match some condition."""
@@ -41,13 +353,145 @@ class AsyncMessageBuffer:
                 lambda kv_pair: match_fn(self.message_from_id[kv_pair[0]]),
                 tuple(self.message_from_id.items()),
             ):
-                self.message_from_id.pop(id)
-                self.id_from_redundancy_key.pop(message.redundancy_key())
+                self._pop_message(id)
+
+    def _pop_message(self, message_id: int) -> Optional[Message]:
+        """Remove a message and its index entries. Should be called with
+        `buffer_lock` held."""
+        message = self.message_from_id.pop(message_id, None)
+        if message is None:
+            return None
+
+        redundancy_key = self.redundancy_key_from_id.pop(message_id)
+        if self.id_from_redundancy_key.get(redundancy_key, None) == message_id:
+            self.id_from_redundancy_key.pop(redundancy_key)
+        for key in message.superseded_by():
+            superseded_ids = self.ids_from_superseding_key.get(key, None)
+            if superseded_ids is not None:
+                superseded_ids.discard(message_id)
+                if len(superseded_ids) == 0:
+                    self.ids_from_superseding_key.pop(key)
+
+        if self.persistent_messages:
+            self.asset_store.release_message(message_id)
+            owner_key = message.owner_key()
+            if owner_key is not None and owner_key in self.ids_from_owner_key:
+                owned_ids = self.ids_from_owner_key[owner_key]
+                owned_ids.discard(message_id)
+                if len(owned_ids) == 0:
+                    self.ids_from_owner_key.pop(owner_key)
+            self.removal_ids.pop(message_id, None)
+            self.fold_ids.pop(message_id, None)
+        self.atomic_group_from_id.pop(message_id, None)
+        return message
+
+    def compact(self) -> None:
+        """Drop removal messages that every connected client has already consumed,
+        and fold consumed messages where :meth:`Message.folds_when_consumed()` is
+        true into the messages they modify.
+
+        Clients that connect later never saw the removed entities, so they don't
+        need these messages. Messages that belong to removed entities are pruned
+        eagerly in :meth:`push()`; this makes the buffer size proportional to the
+        live scene instead of its history."""
+        with self.buffer_lock:
+            if len(self.removal_ids) == 0 and len(self.fold_ids) == 0:
+                return
+            min_cursor = min(
+                itertools.chain(
+                    self.window_cursor_from_client.values(),
+                    self.retained_cursor_from_client.values(),
+                ),
+                default=None,
+            )
+            for message_id in tuple(self.removal_ids.keys()):
+                if min_cursor is not None and message_id > min_cursor:
+                    break
+                self._pop_message(message_id)
+                self.compacted_through = max(self.compacted_through, message_id)
+            # Fold newest first, so runs of consumed updates are merged with each
+            # other before they're folded into a (potentially large) base message.
+            consumed_fold_ids = [
+                message_id
+                for message_id in self.fold_ids
+                if min_cursor is None or message_id <= min_cursor
+            ]
+            for message_id in reversed(consumed_fold_ids):
+                self._fold_consumed(message_id)
+
+    def _fold_consumed(self, message_id: int) -> None:
+        """Fold a message into an earlier one. See
+        :meth:`Message.folds_when_consumed()`. Should be called with
+        `buffer_lock` held."""
+        self.fold_ids.pop(message_id)
+        message = self.message_from_id.get(message_id, None)
+        if message is None:
+            return
+        owner_key = message.owner_key()
+        assert owner_key is not None
+        bounding_ids = {
+            self.id_from_redundancy_key[key]
+            for key in message.superseded_by()
+            if key in self.id_from_redundancy_key
+        }
+        candidate_ids = sorted(
+            (
+                i
+                for i in itertools.chain(
+                    self.ids_from_owner_key.get(owner_key, ()), bounding_ids
+                )
+                if i < message_id
+            ),
+            reverse=True,
+        )
+        for candidate_id in candidate_ids:
+            candidate = self.message_from_id[candidate_id]
+            folded = candidate.fold(message)
+            if folded is None:
+                if candidate_id in bounding_ids:
+                    return
+                continue
+
+            self.message_from_id[candidate_id] = folded
+            old_key = self.redundancy_key_from_id[candidate_id]
+            if self.id_from_redundancy_key.get(old_key, None) == candidate_id:
+                self.id_from_redundancy_key.pop(old_key)
+            new_key = folded.redundancy_key()
+            self.id_from_redundancy_key[new_key] = candidate_id
+            self.redundancy_key_from_id[candidate_id] = new_key
+            self._pop_message(message_id)
+            # The folded message holds new payloads, which are hashed when they're
+            # sent instead of being interned.
+            self.asset_store.release_message(candidate_id)
+            self.compacted_through = max(self.compacted_through, message_id)
+
+            # Encoded windows that contain the old message are stale.
+            for key in tuple(self.encoded_window_cache.keys()):
+                if candidate_id in key[1]:
+                    self.encoded_window_cache.pop(key)
+            return
+
+    def can_resume_from(self, resume_id: int) -> bool:
+        """Check whether a client that has received every message up to and
+        including `resume_id` can catch up from the buffer. This is false if
+        a removal message it hasn't seen was already compacted away."""
+        return self.compacted_through <= resume_id < self.message_counter
 
     def push(self, message: Message) -> None:
         """Push a new message to our buffer, and remove old redundant ones."""
 
         assert isinstance(message, Message)
+        tracer = get_tracer()
+        start_us = tracer.now_us() if tracer is not None else 0.0
+
+        # Deduplicate large payloads. Identical meshes, images, etc. that are
+        # added under different names are only stored once. Updates that can be
+        # coalesced are high-churn, so they're left out to avoid hashing them.
+        asset_keys = (
+            self.asset_store.intern_message(message)
+            if self.persistent_messages and message.coalesce_key() is None
+            else []
+        )
 
         # Add message to buffer.
         redundancy_key = message.redundancy_key()
@@ -55,6 +499,14 @@ class AsyncMessageBuffer:
             new_message_id = self.message_counter
             self.message_from_id[new_message_id] = message
             self.message_counter += 1
+            type_name = type(message).__name__
+            self.pushed_count_from_type[type_name] = (
+                self.pushed_count_from_type.get(type_name, 0) + 1
+            )
+            if len(asset_keys) > 0:
+                self.asset_store.register_message(new_message_id, asset_keys)
+            if self.atomic_counter > 0:
+                self.atomic_group_from_id[new_message_id] = self.atomic_group_counter
 
             # If an existing message with the same key already exists in our buffer, we
             # don't need the old one anymore. :-)
@@ -62,9 +514,31 @@ class AsyncMessageBuffer:
                 redundancy_key is not None
                 and redundancy_key in self.id_from_redundancy_key
             ):
-                old_message_id = self.id_from_redundancy_key.pop(redundancy_key)
-                self.message_from_id.pop(old_message_id)
+                self._pop_message(self.id_from_redundancy_key[redundancy_key])
             self.id_from_redundancy_key[redundancy_key] = new_message_id
+            self.redundancy_key_from_id[new_message_id] = redundancy_key
+
+            # Drop messages that this one makes unnecessary, and index this one
+            # by the keys of messages that would do the same.
+            for superseded_id in tuple(
+                self.ids_from_superseding_key.pop(redundancy_key, ())
+            ):
+                self._pop_message(superseded_id)
+            for key in message.superseded_by():
+                self.ids_from_superseding_key.setdefault(key, set()).add(new_message_id)
+
+            # Index messages by owner. When an owner is removed, none of its
+            # messages are needed anymore: clients that haven't consumed them
+            # yet will receive the removal message instead.
+            owner_key = message.owner_key() if self.persistent_messages else None
+            if owner_key is not None and message.removes_owner():
+                for owned_id in tuple(self.ids_from_owner_key.pop(owner_key, ())):
+                    self._pop_message(owned_id)
+                self.removal_ids[new_message_id] = None
+            elif owner_key is not None:
+                self.ids_from_owner_key.setdefault(owner_key, set()).add(new_message_id)
+                if message.folds_when_consumed():
+                    self.fold_ids[new_message_id] = None
 
             # Pulse message event to notify consumers that a new message is
             # available.
@@ -82,16 +556,46 @@ class AsyncMessageBuffer:
                 # atomic_end() is called.
                 self.event_loop.call_soon_threadsafe(self.message_event.set)
 
+        # Without connected clients, incremental updates can be folded right
+        # away.
+        if (
+            new_message_id in self.fold_ids
+            and len(self.window_cursor_from_client) == 0
+            and len(self.retained_cursor_from_client) == 0
+        ):
+            self.compact()
+
+        if tracer is not None:
+            tracer.complete(
+                "push",
+                "buffer",
+                start_us,
+                message_id=new_message_id,
+                type=type(message).__name__,
+                client_id=self.client_id,
+                persistent=self.persistent_messages,
+            )
+
     def atomic_start(self) -> None:
-        """Start an atomic block. No new messages/windows should be sent."""
-        self.atomic_counter += 1
+        """Start an atomic block. No new messages/windows should be sent, and
+        messages pushed before the block ends are sent in the same window."""
+        with self.buffer_lock:
+            if self.atomic_counter == 0:
+                self.atomic_group_counter += 1
+            self.atomic_counter += 1
 
     def atomic_end(self) -> None:
         """End an atomic block."""
-        self.atomic_counter -= 1
-        if self.atomic_counter == 0:
+        with self.buffer_lock:
+            self.atomic_counter -= 1
+            ended = self.atomic_counter == 0
+        if ended:
             self.event_loop.call_soon_threadsafe(self.message_event.set)
 
+    def _open_atomic_group(self) -> Optional[int]:
+        """Get the atomic block that messages can still be pushed to, if any."""
+        return self.atomic_group_counter if self.atomic_counter > 0 else None
+
     def flush(self) -> None:
         """Flush the message buffer; signals to yield a message window immediately."""
         self.event_loop.call_soon_threadsafe(self.flush_event.set)
@@ -106,52 +610,293 @@ class AsyncMessageBuffer:
         # Pulse flush event to skip any windowing delay.
         self.event_loop.call_soon_threadsafe(self.flush_event.set)
 
+    async def get_or_encode_window(
+        self,
+        window: MessageWindow,
+        encode: Callable[[Sequence[Message]], EncodedWindow],
+        executor: Optional[Executor] = None,
+        encoding_variant: Hashable = None,
+    ) -> EncodedWindow:
+        """Get the encoded bytes for a window of messages. For persistent buffers,
+        each window is only encoded once per `encoding_variant`; the same bytes
+        object is then sent to every client that polls the same window.
+
+        If an executor is passed in, windows with estimated payloads of at least
+        `offload_min_bytes` are encoded in it instead of on the event loop."""
+        if not self.persistent_messages or not window.shareable:
+            return await self._timed_encode(window, encode, executor)
+
+        key = (encoding_variant, window.cache_key())
+        out = self.encoded_window_cache.get(key, None)
+        if out is None:
+            out = asyncio.ensure_future(self._timed_encode(window, encode, executor))
+            self.encoded_window_cache[key] = out
+        self._evict_encoded_windows()
+
+        # Shield: other clients may be waiting on the same encoded window.
+        return await asyncio.shield(out)
+
+    async def _timed_encode(
+        self,
+        window: MessageWindow,
+        encode: Callable[[Sequence[Message]], EncodedWindow],
+        executor: Optional[Executor],
+    ) -> EncodedWindow:
+        def timed_encode() -> EncodedWindow:
+            tracer = get_tracer()
+            start = time.perf_counter()
+            start_us = tracer.now_us() if tracer is not None else 0.0
+            out = encode(window.messages)
+            elapsed = time.perf_counter() - start
+            nbytes = encoded_nbytes(out)
+            self.encode_stats.append((nbytes, elapsed))
+            self.encode_seconds.observe(elapsed)
+            if tracer is not None:
+                tracer.complete(
+                    "encode",
+                    "encode",
+                    start_us,
+                    message_ids=traced_ids(window.message_ids),
+                    nbytes=nbytes,
+                    client_id=self.client_id,
+                    persistent=self.persistent_messages,
+                )
+            return out
+
+        if executor is None or window.estimated_bytes < self.offload_min_bytes:
+            return timed_encode()
+        return await self.event_loop.run_in_executor(executor, timed_encode)
+
+    def _evict_encoded_windows(self) -> None:
+        """Drop encoded windows that every active client has already consumed."""
+        if len(self.window_cursor_from_client) == 0:
+            self.encoded_window_cache.clear()
+            return
+        min_cursor = min(self.window_cursor_from_client.values())
+        for key in tuple(self.encoded_window_cache.keys()):
+            if max(key[1]) <= min_cursor:
+                self.encoded_window_cache.pop(key)
+
+    def _poll_snapshot(
+        self, client_id: int, lanes: _PriorityLanes, folded_ids: Set[int]
+    ) -> int:
+        """Poll every buffered message into `lanes`, folding updates into the
+        messages they modify; see :meth:`Message.fold()`. IDs of messages that
+        were changed by folding are added to `folded_ids`.
+
+        Returns the ID of the last polled message."""
+        with self.buffer_lock:
+            snapshot = tuple(self.message_from_id.items())
+            last_id = self.message_counter - 1
+
+        # Fold each message into the newest earlier message with the same
+        # ordering key that accepts it.
+        folded: Dict[int, Message] = {}
+        ids_from_key: Dict[str, List[int]] = {}
+        for message_id, message in snapshot:
+            if message.excluded_self_client == client_id:
+                continue
+            key = message.ordering_key()
+            if key is None:
+                folded[message_id] = message
+                continue
+            candidate_ids = ids_from_key.setdefault(key, [])
+            for candidate_id in reversed(candidate_ids):
+                out = folded[candidate_id].fold(message)
+                if out is not None:
+                    folded[candidate_id] = out
+                    folded_ids.add(candidate_id)
+                    break
+            else:
+                folded[message_id] = message
+                candidate_ids.append(message_id)
+
+        for message_id, message in folded.items():
+            lanes.append(
+                message_id,
+                message,
+                coalesce=False,
+                atomic_group=self.atomic_group_from_id.get(message_id, None),
+            )
+        lanes.end_group(self._open_atomic_group())
+        return last_id
+
     async def window_generator(
-        self, client_id: int
-    ) -> AsyncGenerator[Sequence[Message], None]:
+        self,
+        client_id: int,
+        send_stats: Optional[ClientSendStats] = None,
+        resume_from: Optional[int] = None,
+    ) -> AsyncGenerator[MessageWindow, None]:
         """Async iterator over messages. Loops infinitely, and waits when no messages
-        are available."""
+        are available.
+
+        Polled messages are placed in priority lanes; each window is filled from
+        the highest-priority lane first. See :meth:`Message.priority()` and
+        :meth:`Message.ordering_key()`.
+
+        For persistent buffers, the first poll folds updates into the messages
+        they modify, so clients that join late receive the current state instead
+        of the full history. See :meth:`Message.fold()`.
+
+        If `send_stats` is passed in and the client is lagging, pending messages
+        are coalesced to the newest value for each :meth:`Message.coalesce_key()`.
 
-        last_sent_id = -1
+        If `resume_from` is set, the client already has every message up to and
+        including that ID, and only newer messages are sent. This should be
+        checked with :meth:`can_resume_from()` first."""
+
+        last_polled_id = -1 if resume_from is None else resume_from
+        lanes = _PriorityLanes()
+        folded_ids: Set[int] = set()
+        polled_snapshot = resume_from is not None
+        self.window_cursor_from_client[client_id] = last_polled_id
+        self.retained_cursor_from_client.pop(client_id, None)
         flush_wait = self.event_loop.create_task(self.flush_event.wait())
-        while not self.done:
-            window: List[Message] = []
-            most_recent_message_id = self.message_counter - 1
-            while (
-                last_sent_id < most_recent_message_id
-                and len(window) < self.max_window_size
-                # We should only be polling for new messages if we aren't in an atomic block.
-                and self.atomic_counter == 0
-            ):
-                last_sent_id += 1
-                if self.persistent_messages:
-                    message = self.message_from_id.get(last_sent_id, None)
-                else:
-                    # If we're not persisting messages, remove them from the buffer.
-                    with self.buffer_lock:
-                        message = self.message_from_id.pop(last_sent_id, None)
-                        if message is not None:
-                            redundancy_key = message.redundancy_key()
-                            self.id_from_redundancy_key.pop(redundancy_key, None)
-
-                if message is not None and message.excluded_self_client != client_id:
-                    window.append(message)
-
-            if len(window) > 0:
-                # Yield a window!
-                yield window
-            else:
-                # Wait for a new message to come in.
-                await self.message_event.wait()
-                self.message_event.clear()
-
-            # Add a delay if either (a) we failed to yield or (b) there's currently no messages to send.
-            most_recent_message_id = self.message_counter - 1
-            if len(window) == 0 or most_recent_message_id == last_sent_id:
-                done, pending = await asyncio.wait(
-                    [flush_wait], timeout=self.window_duration_sec
+        try:
+            while not self.done:
+                # Poll new messages into our priority lanes. We should only be
+                # polling for new messages if we aren't in an atomic block.
+                # Clients that join late start from a folded snapshot of the buffer.
+                if (
+                    self.persistent_messages
+                    and not polled_snapshot
+                    and self.atomic_counter == 0
+                ):
+                    last_polled_id = self._poll_snapshot(client_id, lanes, folded_ids)
+                    polled_snapshot = True
+
+                most_recent_message_id = self.message_counter - 1
+                while (
+                    last_polled_id < most_recent_message_id and self.atomic_counter == 0
+                ):
+                    last_polled_id += 1
+                    atomic_group = self.atomic_group_from_id.get(last_polled_id, None)
+                    if self.persistent_messages:
+                        message = self.message_from_id.get(last_polled_id, None)
+                    else:
+                        # If we're not persisting messages, remove them from the buffer.
+                        with self.buffer_lock:
+                            message = self._pop_message(last_polled_id)
+
+                    if (
+                        message is not None
+                        and message.excluded_self_client != client_id
+                    ):
+                        lagging = send_stats is not None and send_stats.lagging
+                        if lanes.append(
+                            last_polled_id,
+                            message,
+                            coalesce=lagging,
+                            atomic_group=atomic_group,
+                        ):
+                            assert send_stats is not None
+                            send_stats.coalesced_message_count += 1
+                lanes.end_group(self._open_atomic_group())
+
+                # Track progress: the previous window has been consumed by the
+                # time we get here. Encoded windows that every client has
+                # consumed can be evicted from the cache.
+                min_pending_id = lanes.min_pending_id()
+                cursor = (
+                    last_polled_id if min_pending_id is None else min_pending_id - 1
                 )
-                del pending
-                if flush_wait in done and not self.done:
-                    self.flush_event.clear()
-                    flush_wait = self.event_loop.create_task(self.flush_event.wait())
+                self.window_cursor_from_client[client_id] = cursor
+
+                # Removal messages can be dropped, and incremental updates folded,
+                # once every client has consumed them.
+                if len(self.removal_ids) > 0 or len(self.fold_ids) > 0:
+                    self.compact()
+
+                # Form a window.
+                tracer = get_tracer()
+                start_us = tracer.now_us() if tracer is not None else 0.0
+                window: List[Message] = []
+                window_ids: List[int] = []
+                window_bytes = 0
+                while (
+                    len(window) < self.max_window_size
+                    and window_bytes < self.max_window_bytes
+                ):
+                    next_entry = lanes.peek()
+                    if next_entry is None:
+                        break
+                    entry_id, members = next_entry
+
+                    # Skip messages that were culled from a persistent buffer
+                    # after they were polled.
+                    if self.persistent_messages:
+                        members = tuple(
+                            (message_id, message)
+                            for message_id, message in members
+                            if message_id in self.message_from_id
+                        )
+                        if len(members) == 0:
+                            lanes.pop(entry_id)
+                            continue
+
+                    # Stop before going over the byte budget or window size.
+                    # Messages from an atomic block are never split up: if
+                    # they're larger than the budget, they're sent by
+                    # themselves.
+                    entry_bytes = sum(
+                        message.estimate_payload_bytes() for _, message in members
+                    )
+                    if len(window) > 0 and (
+                        window_bytes + entry_bytes > self.max_window_bytes
+                        or len(window) + len(members) > self.max_window_size
+                    ):
+                        break
+
+                    lanes.pop(entry_id)
+                    for message_id, message in members:
+                        window.append(message)
+                        window_ids.append(message_id)
+                    window_bytes += entry_bytes
+
+                if len(window) > 0:
+                    # Yield a window!
+                    self.window_message_counts.observe(len(window))
+                    if tracer is not None:
+                        tracer.complete(
+                            "window",
+                            "buffer",
+                            start_us,
+                            client_id=client_id,
+                            message_ids=traced_ids(window_ids),
+                            persistent=self.persistent_messages,
+                        )
+                    min_pending_id = lanes.min_pending_id()
+                    yield MessageWindow(
+                        window,
+                        tuple(window_ids),
+                        window_bytes,
+                        shareable=folded_ids.isdisjoint(window_ids),
+                        resume_id=(
+                            last_polled_id
+                            if min_pending_id is None
+                            else min_pending_id - 1
+                        ),
+                    )
+                else:
+                    # Wait for a new message to come in.
+                    await self.message_event.wait()
+                    self.message_event.clear()
+
+                # Add a delay if either (a) we failed to yield or (b) there's currently no messages to send.
+                most_recent_message_id = self.message_counter - 1
+                if len(window) == 0 or (
+                    most_recent_message_id == last_polled_id and len(lanes) == 0
+                ):
+                    done, pending = await asyncio.wait(
+                        [flush_wait], timeout=self.window_duration_sec
+                    )
+                    del pending
+                    if flush_wait in done and not self.done:
+                        self.flush_event.clear()
+                        flush_wait = self.event_loop.create_task(
+                            self.flush_event.wait()
+                        )
+        finally:
+            self.window_cursor_from_client.pop(client_id, None)
+            self._evict_encoded_windows()
+            self.compact()
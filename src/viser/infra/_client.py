@@ -0,0 +1,208 @@
+"""Headless asyncio client for :class:`WebsockServer`.
+
+This speaks the same protocol as the browser client, but without rendering
+anything. It's useful for load testing and for scripting against a running
+server. Clients are cheap: hundreds can run in a single event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import msgspec.msgpack
+import websockets.asyncio.client
+import zstandard
+from typing_extensions import Self
+from websockets.typing import Subprotocol
+
+from ._messages import Message
+from ._metrics import WINDOW_LATENCY_SECONDS_BOUNDS, Histogram
+from ._window_encoding import (
+    COMPACT_CAPABILITY,
+    ZSTD_DICT_CAPABILITY,
+    decode_window_v2,
+    header_dictionary,
+)
+
+
+@dataclasses.dataclass
+class ClientReceiveStats:
+    """Receive statistics for a :class:`WebsockClient`."""
+
+    connect_sec: Optional[float] = None
+    """Time taken to open the websocket connection."""
+    first_window_sec: Optional[float] = None
+    """Time from opening the connection to receiving the first window."""
+    bytes_received: int = 0
+    windows_received: int = 0
+    messages_received: int = 0
+    decode_sec: float = 0.0
+    """Total time spent decompressing and decoding windows."""
+    window_latency_sec: Histogram = dataclasses.field(
+        default_factory=lambda: Histogram(WINDOW_LATENCY_SECONDS_BOUNDS)
+    )
+    """Time from the server encoding each window to the client receiving it.
+    This uses the window's `timestampSec`, which is read from
+    `time.perf_counter()`, so it's only meaningful when the client and server
+    run on the same machine."""
+
+
+class WebsockClient:
+    """Headless client for a :class:`WebsockServer` with
+    `client_api_version=2`.
+
+    Received messages are decoded to dictionaries, in the same shape that the
+    browser client sees: message fields, plus a `"type"` key with the message
+    class name. Large arrays are decoded as `bytes` or `memoryview` objects.
+    Subclasses can override :meth:`_handle_message()` to track state.
+
+    Args:
+        url: Websocket URL of the server, like ``ws://localhost:8080``.
+        message_class: Base class for message types. This should match the
+            server's `message_class`.
+        compact: Request the compact positional message format from the server.
+            This is decoded transparently.
+        dictionary_compression: Ask the server to compress small message
+            headers with the bundled zstd dictionary.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        message_class: Type[Message] = Message,
+        compact: bool = True,
+        dictionary_compression: bool = True,
+    ) -> None:
+        import viser
+
+        self._url = url
+        self._message_class = message_class
+        capabilities = (COMPACT_CAPABILITY,) if compact else ()
+        if dictionary_compression:
+            capabilities += (ZSTD_DICT_CAPABILITY,)
+        self._subprotocol = Subprotocol(
+            "+".join((f"viser-v{viser.__version__}",) + capabilities)
+        )
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._dictionary_decompressor = (
+            zstandard.ZstdDecompressor(dict_data=header_dictionary())
+            if dictionary_compression
+            else None
+        )
+        self._field_names_from_type_id: Dict[int, Tuple[str, Tuple[str, ...]]] = {}
+
+        self._connection: Optional[websockets.asyncio.client.ClientConnection] = None
+        self._receive_task: Optional[asyncio.Task[None]] = None
+        self._window_waiters: List[asyncio.Future[None]] = []
+        self.stats = ClientReceiveStats()
+
+    async def __aenter__(self) -> Self:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        """Connect to the server, and start receiving messages."""
+        assert self._connection is None, "Already connected."
+        start = time.perf_counter()
+        self._connection = await websockets.asyncio.client.connect(
+            self._url, subprotocols=[self._subprotocol], max_size=None
+        )
+        self._connected_time = time.perf_counter()
+        self.stats.connect_sec = self._connected_time - start
+        self._receive_task = asyncio.create_task(self._receive_loop())
+
+    async def close(self) -> None:
+        """Close the connection."""
+        if self._connection is not None:
+            await self._connection.close()
+        if self._receive_task is not None:
+            await asyncio.gather(self._receive_task, return_exceptions=True)
+
+    async def send(self, message: Message) -> None:
+        """Send a message to the server."""
+        assert self._connection is not None, "Not connected."
+        await self._connection.send(
+            msgspec.msgpack.encode(message.as_serializable_dict())
+        )
+
+    async def wait_until(
+        self, condition: Callable[[], bool], timeout: Optional[float] = None
+    ) -> None:
+        """Wait until a condition on client state is true. The condition is
+        checked now, and then after each received window.
+
+        Raises `asyncio.TimeoutError` on timeout, and `ConnectionError` if the
+        connection closes first."""
+
+        async def wait() -> None:
+            while not condition():
+                if self._receive_task is None or self._receive_task.done():
+                    raise ConnectionError("Connection closed.")
+                waiter = asyncio.get_running_loop().create_future()
+                self._window_waiters.append(waiter)
+                await waiter
+
+        await asyncio.wait_for(wait(), timeout)
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        """Called for each received message. No-op by default."""
+
+    async def _receive_loop(self) -> None:
+        assert self._connection is not None
+        try:
+            async for frame in self._connection:
+                if not isinstance(frame, bytes):
+                    continue
+                start = time.perf_counter()
+                window = decode_window_v2(
+                    frame, self._decompressor, self._dictionary_decompressor
+                )
+                messages = [self._to_dict(message) for message in window["messages"]]
+                for message in messages:
+                    self._handle_message(message)
+                end = time.perf_counter()
+
+                stats = self.stats
+                if stats.first_window_sec is None:
+                    stats.first_window_sec = end - self._connected_time
+                stats.bytes_received += len(frame)
+                stats.windows_received += 1
+                stats.messages_received += len(messages)
+                stats.decode_sec += end - start
+                stats.window_latency_sec.observe(start - window["timestampSec"])
+                self._notify_waiters()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._notify_waiters()
+
+    def _notify_waiters(self) -> None:
+        waiters = self._window_waiters
+        self._window_waiters = []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _to_dict(self, message: Any) -> Dict[str, Any]:
+        """Convert a message in the compact format to the dictionary format."""
+        if isinstance(message, dict):
+            return message
+        type_id = message[0]
+        entry = self._field_names_from_type_id.get(type_id, None)
+        if entry is None:
+            message_type = self._message_class.get_subclasses()[type_id]
+            entry = (
+                message_type.__name__,
+                tuple(field.name for field in dataclasses.fields(message_type)),
+            )
+            self._field_names_from_type_id[type_id] = entry
+        type_name, field_names = entry
+        out = dict(zip(field_names, message[1:]))
+        out["type"] = type_name
+        return out
@@ -6,22 +6,25 @@ import atexit
 import base64
 import contextlib
 import dataclasses
-import gzip
+import functools
 import http
+import json
 import logging
-import mimetypes
 import queue
+import re
+import secrets
 import threading
 import time
+import urllib.parse
 import webbrowser
 from asyncio.events import AbstractEventLoop
 from collections.abc import Coroutine
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Callable, Generator, NewType, TypeVar
+from typing import Any, Callable, Generator, List, NewType, TypeVar, cast
 
 import msgspec.msgpack
 import websockets.asyncio.server
-import websockets.datastructures
 import websockets.exceptions
 import zstandard
 from typing_extensions import Literal, assert_never, override
@@ -32,8 +35,47 @@ from websockets.typing import Subprotocol
 
 import viser  # Import for version checking
 
-from ._async_message_buffer import AsyncMessageBuffer
+from ._asset_store import ASSET_HASH_BYTES, HTTP_ASSET_MIN_BYTES, AssetStore
+from ._async_message_buffer import AsyncMessageBuffer, ClientSendStats
 from ._messages import Message
+from ._metrics import (
+    ENCODE_SECONDS_BOUNDS,
+    WINDOW_MESSAGES_BOUNDS,
+    Histogram,
+    ServerStats,
+    format_prometheus,
+)
+from ._static_files import StaticFileServer
+from ._tracing import (
+    current_span_args,
+    get_tracer,
+    span_args,
+    start_trace,
+    stop_trace,
+    traced_ids,
+)
+from ._window_encoding import (
+    ASSET_CACHE_CAPABILITY,
+    COMPACT_CAPABILITY,
+    DEFAULT_COMPRESSION_POLICY,
+    HTTP_ASSETS_CAPABILITY,
+    RESUME_CAPABILITY,
+    ZSTD_DICT_CAPABILITY,
+    CompressionPolicy,
+    encode_window_v1,
+    encode_window_v2,
+    encoded_nbytes,
+    header_dictionary,
+    omit_held_assets,
+    resume_trailer,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _dictionary_compression_policy() -> CompressionPolicy:
+    """Compression policy for clients that support the bundled dictionary.
+    Shared between clients, so encoded windows can be shared too."""
+    return CompressionPolicy(dictionary=header_dictionary())
 
 
 @dataclasses.dataclass
@@ -42,6 +84,29 @@ class _ClientHandleState:
     # message_buffer: asyncio.Queue
     message_buffer: AsyncMessageBuffer
     event_loop: AbstractEventLoop
+    send_stats: ClientSendStats = dataclasses.field(default_factory=ClientSendStats)
+    compression_policy: CompressionPolicy = DEFAULT_COMPRESSION_POLICY
+    compact_root: type[Message] | None = None
+    """If set, messages are sent in the compact positional format, with type IDs
+    relative to this class."""
+    session_token: str | None = None
+    """Token that the client can send when reconnecting to resume this session.
+    Only set for clients with the ``resume`` capability."""
+    sent_resume_id: int = -1
+    """Resume ID of the most recent broadcast window sent to the client."""
+    held_assets: set[bytes] | None = None
+    """Hashes of large buffers that the client has cached. Only set for clients
+    with the ``assets`` capability."""
+    fetch_assets_over_http: bool = False
+    """Whether the client fetches large buffers from ``/assets/{hash}``."""
+
+
+@dataclasses.dataclass
+class _SuspendedSession:
+    # A session whose websocket was closed, kept around for a grace period in
+    # case the client reconnects.
+    client_connection: WebsockClientConnection
+    expire_handle: asyncio.TimerHandle
 
 
 ClientId = NewType("ClientId", int)
@@ -218,11 +283,22 @@ class WebsockMessageHandler:
     ) -> None:
         """Handle incoming messages."""
         if type(message) in self._incoming_handlers:
+            tracer = get_tracer()
+            start_us = tracer.now_us() if tracer is not None else 0.0
             for cb in self._incoming_handlers[type(message)]:
                 if asyncio.iscoroutinefunction(cb):
                     await cb(client_id, message)
                 else:
                     cb(client_id, message)
+            if tracer is not None:
+                tracer.complete(
+                    "dispatch",
+                    "incoming",
+                    start_us,
+                    client_id=client_id,
+                    message_id=current_span_args().get("message_id", None),
+                    type=type(message).__name__,
+                )
 
     @abc.abstractmethod
     def get_message_buffer(self) -> AsyncMessageBuffer: ...
@@ -270,6 +346,10 @@ class WebsockClientConnection(WebsockMessageHandler):
         """Get client message buffer."""
         return self._state.message_buffer
 
+    def get_send_stats(self) -> ClientSendStats:
+        """Get send statistics and backpressure state for this client."""
+        return self._state.send_stats
+
 
 class WebsockServer(WebsockMessageHandler):
     """Websocket server abstraction. Communicates asynchronously with client
@@ -289,7 +369,18 @@ class WebsockServer(WebsockMessageHandler):
         http_server_root: Path to root for HTTP server.
         verbose: Toggle for print messages.
         client_api_version: Flag for backwards compatibility. 0 sends individual
-            messages. 1 sends windowed messages.
+            messages. 1 sends windowed messages. 2 sends windowed messages, with
+            large arrays sent as out-of-band binary buffers.
+        session_grace_sec: How long to keep the session of a disconnected client
+            around. Clients that reconnect within this period keep their
+            `ClientId` and per-client state, skip connection callbacks, and only
+            receive the broadcast messages they missed. Disconnection callbacks
+            run when the grace period ends. Connections that are closed cleanly
+            by the client end immediately. Requires `client_api_version=2`.
+        callback_executor: Executor used for running callbacks. Only used to
+            report its queue depth in :meth:`get_stats()`.
+        metrics_route: Serve statistics at `/metrics`, in Prometheus' text
+            format.
     """
 
     def __init__(
@@ -299,7 +390,10 @@ class WebsockServer(WebsockMessageHandler):
         message_class: type[Message] = Message,
         http_server_root: Path | None = None,
         verbose: bool = True,
-        client_api_version: Literal[0, 1] = 0,
+        client_api_version: Literal[0, 1, 2] = 0,
+        session_grace_sec: float = 0.0,
+        callback_executor: ThreadPoolExecutor | None = None,
+        metrics_route: bool = False,
     ):
         super().__init__()
 
@@ -316,14 +410,23 @@ class WebsockServer(WebsockMessageHandler):
         self._message_class = message_class
         self._http_server_root = http_server_root
         self._verbose = verbose
-        self._client_api_version: Literal[0, 1] = client_api_version
+        self._client_api_version: Literal[0, 1, 2] = client_api_version
+        self._session_grace_sec = session_grace_sec
+        self._callback_executor = callback_executor
+        self._metrics_route = metrics_route
         self._background_event_loop: asyncio.AbstractEventLoop | None = None
 
         self._stop_event: asyncio.Event | None = None
 
         self._client_state_from_id: dict[int, _ClientHandleState] = {}
+        self._suspended_session_from_token: dict[str, _SuspendedSession] = {}
         self._server_thread: threading.Thread | None = None
 
+        # Thread pool for encoding + compressing large message windows.
+        self._encode_executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="viser-encode"
+        )
+
     def start(self) -> None:
         """Start the server."""
 
@@ -357,17 +460,19 @@ class WebsockServer(WebsockMessageHandler):
         # Unregister the atexit handler to prevent double-stop.
         atexit.unregister(self.stop)
 
-        # Signal the background thread to stop.
-        self._background_event_loop.call_soon_threadsafe(self._stop_event.set)
-
         # Clean up the message buffers. This isn't really necessary, but helps
-        # avoid "task destroyed" errors.
+        # avoid "task destroyed" errors. This is scheduled before the stop
+        # signal, which can otherwise close the event loop first.
         self._broadcast_buffer.set_done()
         for client in self._client_state_from_id.values():
             client.message_buffer.set_done()
 
+        # Signal the background thread to stop.
+        self._background_event_loop.call_soon_threadsafe(self._stop_event.set)
+
         # Wait for the server thread to finish.
         self._server_thread.join(timeout=0.1)
+        self._encode_executor.shutdown(wait=False)
 
     def on_client_connect(
         self, cb: Callable[[WebsockClientConnection], None | Coroutine]
@@ -386,6 +491,61 @@ class WebsockServer(WebsockMessageHandler):
         """Get the broadcast queue. Message will be sent to all clients."""
         return self._broadcast_buffer
 
+    def start_trace(self, path: str | Path) -> None:
+        """Start recording a trace of the message lifecycle to a JSON file, in
+        Chrome's trace event format. Traces can be viewed in Perfetto.
+
+        Tracing is process-wide: if multiple servers are running, spans from
+        all of them are recorded."""
+        start_trace(path)
+
+    def stop_trace(self) -> Path | None:
+        """Stop recording a trace, and wait for it to be written. Returns the
+        path of the trace file, or None if no trace was being recorded."""
+        return stop_trace()
+
+    def get_stats(self) -> ServerStats:
+        """Get a snapshot of server statistics. Safe to call from any thread."""
+        # Copy containers before iterating; they're mutated by the event loop.
+        client_states = tuple(self._client_state_from_id.items())
+        buffers = (self._broadcast_buffer,) + tuple(
+            state.message_buffer for _, state in client_states
+        )
+
+        pushed_count_from_type: dict[str, int] = {}
+        encode_seconds = Histogram(ENCODE_SECONDS_BOUNDS)
+        window_message_counts = Histogram(WINDOW_MESSAGES_BOUNDS)
+        for buffer in buffers:
+            for type_name, count in tuple(buffer.pushed_count_from_type.items()):
+                pushed_count_from_type[type_name] = (
+                    pushed_count_from_type.get(type_name, 0) + count
+                )
+            encode_seconds = encode_seconds.merged(buffer.encode_seconds)
+            window_message_counts = window_message_counts.merged(
+                buffer.window_message_counts
+            )
+
+        # ThreadPoolExecutor doesn't expose its queue publicly.
+        callback_queue_depth = (
+            self._callback_executor._work_queue.qsize()
+            if self._callback_executor is not None
+            else None
+        )
+        suspended_sessions = len(self._suspended_session_from_token)
+        return ServerStats(
+            connected_clients=len(client_states) - suspended_sessions,
+            suspended_sessions=suspended_sessions,
+            buffered_messages=len(self._broadcast_buffer.message_from_id),
+            buffered_assets=len(self._broadcast_buffer.asset_store),
+            callback_queue_depth=callback_queue_depth,
+            pushed_count_from_type=pushed_count_from_type,
+            encode_seconds=encode_seconds,
+            window_message_counts=window_message_counts,
+            client_stats={
+                client_id: state.send_stats.copy() for client_id, state in client_states
+            },
+        )
+
     def flush(self) -> None:
         """Flush the outgoing message buffer for broadcasted messages. Any buffered
         messages will immediately be sent. (by default they are windowed)"""
@@ -420,6 +580,33 @@ class WebsockServer(WebsockMessageHandler):
         connection_count = 0
         total_connections = 0
 
+        async def end_session(client_connection: WebsockClientConnection) -> None:
+            """Run disconnection callbacks and clean up after a client."""
+            # Signal that the client producer should exit.
+            client_connection._state.message_buffer.set_done()
+
+            # Disconnection callbacks.
+            for cb in self._client_disconnect_cb:
+                if asyncio.iscoroutinefunction(cb):
+                    await cb(client_connection)
+                else:
+                    cb(client_connection)
+
+            # Cleanup.
+            self._client_state_from_id.pop(client_connection.client_id)
+
+        async def expire_session(session_token: str) -> None:
+            """End a suspended session once its grace period is over."""
+            session = self._suspended_session_from_token.pop(session_token, None)
+            if session is None:
+                return
+            client_id = session.client_connection.client_id
+            self._broadcast_buffer.retained_cursor_from_client.pop(client_id, None)
+            self._broadcast_buffer.compact()
+            await end_session(session.client_connection)
+            if self._verbose:
+                rich.print(f"[bold](viser)[/bold] Session expired ({client_id})")
+
         async def ws_handler(
             connection: websockets.asyncio.server.ServerConnection,
         ) -> None:
@@ -432,16 +619,21 @@ class WebsockServer(WebsockMessageHandler):
                 nonlocal total_connections
                 total_connections += 1
 
+            # Extract client version and capabilities from the selected
+            # subprotocol, which looks like `viser-v{version}+{capability}+...`.
+            client_version_str = "unknown"
+            client_capabilities: set[str] = set()
+            if connection.subprotocol is not None:
+                if connection.subprotocol.startswith("viser-v"):
+                    client_version_str, *capabilities = (
+                        connection.subprotocol[7:].strip().split("+")
+                    )
+                    client_capabilities = set(capabilities)
+
             # Version check to make sure Viser server/client match.
-            if self._client_api_version == 1:
+            if self._client_api_version >= 1:
                 import viser
 
-                # Extract client version from the selected subprotocol.
-                client_version_str = "unknown"
-                if connection.subprotocol is not None:
-                    if connection.subprotocol.startswith("viser-v"):
-                        client_version_str = connection.subprotocol[7:].strip()
-
                 if client_version_str != viser.__version__:
                     rich.print(
                         f"[bold red](viser)[/bold red] Version mismatch - connection rejected. "
@@ -453,12 +645,87 @@ class WebsockServer(WebsockMessageHandler):
                     )
                     return  # Exit handler to prevent further processing.
 
-            client_state = _ClientHandleState(
-                AsyncMessageBuffer(event_loop, persistent_messages=False),
-                event_loop,
+            # Clients that cache large buffers send the hashes they have before
+            # anything else.
+            held_assets: set[bytes] | None = None
+            if (
+                ASSET_CACHE_CAPABILITY in client_capabilities
+                and self._client_api_version == 2
+            ):
+                try:
+                    held_assets = _parse_asset_inventory(await connection.recv())
+                except websockets.exceptions.ConnectionClosed:
+                    total_connections -= 1
+                    return
+
+            # Clients that reconnect within the grace period can resume their
+            # session, using the token and the last resume ID they received.
+            query = urllib.parse.parse_qs(
+                urllib.parse.urlsplit(
+                    connection.request.path if connection.request is not None else ""
+                ).query
+            )
+            session_token = query.get("viser_session", [None])[0]
+            resume_from_str = query.get("viser_resume_from", [""])[0]
+            resume_from = (
+                int(resume_from_str) if resume_from_str.lstrip("-").isdigit() else None
             )
-            client_connection = WebsockClientConnection(client_id, client_state)
-            self._client_state_from_id[client_id] = client_state
+            suspended = (
+                self._suspended_session_from_token.pop(session_token, None)
+                if session_token is not None
+                else None
+            )
+            if suspended is not None:
+                suspended.expire_handle.cancel()
+                if resume_from is None or not self._broadcast_buffer.can_resume_from(
+                    resume_from
+                ):
+                    # Messages that the client missed are no longer buffered.
+                    # Start over with a new session.
+                    self._broadcast_buffer.retained_cursor_from_client.pop(
+                        suspended.client_connection.client_id, None
+                    )
+                    await end_session(suspended.client_connection)
+                    suspended = None
+
+            if suspended is not None:
+                client_connection = suspended.client_connection
+                client_id = ClientId(client_connection.client_id)
+                client_state = client_connection._state
+                client_state.held_assets = held_assets
+            else:
+                resume_from = None
+                client_state = _ClientHandleState(
+                    AsyncMessageBuffer(
+                        event_loop, persistent_messages=False, client_id=client_id
+                    ),
+                    event_loop,
+                    compression_policy=(
+                        _dictionary_compression_policy()
+                        if ZSTD_DICT_CAPABILITY in client_capabilities
+                        else DEFAULT_COMPRESSION_POLICY
+                    ),
+                    compact_root=(
+                        message_class
+                        if COMPACT_CAPABILITY in client_capabilities
+                        else None
+                    ),
+                    session_token=(
+                        secrets.token_urlsafe(16)
+                        if RESUME_CAPABILITY in client_capabilities
+                        and self._client_api_version == 2
+                        and self._session_grace_sec > 0.0
+                        else None
+                    ),
+                    held_assets=held_assets,
+                    fetch_assets_over_http=(
+                        held_assets is not None
+                        and HTTP_ASSETS_CAPABILITY in client_capabilities
+                        and http_server_root is not None
+                    ),
+                )
+                client_connection = WebsockClientConnection(client_id, client_state)
+                self._client_state_from_id[client_id] = client_state
 
             def handle_incoming(message: Message) -> None:
                 event_loop.create_task(
@@ -468,74 +735,123 @@ class WebsockServer(WebsockMessageHandler):
                     client_connection._handle_incoming_message(client_id, message)
                 )
 
-            # New connection callbacks.
-            for cb in self._client_connect_cb:
-                if asyncio.iscoroutinefunction(cb):
-                    await cb(client_connection)
-                else:
-                    cb(client_connection)
+            # New connection callbacks. These already ran for resumed sessions.
+            if resume_from is None:
+                for cb in self._client_connect_cb:
+                    if asyncio.iscoroutinefunction(cb):
+                        await cb(client_connection)
+                    else:
+                        cb(client_connection)
+
+            # Tell clients that can resume sessions whether this one was resumed.
+            # This is sent before any message windows.
+            if RESUME_CAPABILITY in client_capabilities:
+                await connection.send(
+                    json.dumps(
+                        {
+                            "session": client_state.session_token,
+                            "resumed": resume_from is not None,
+                        }
+                    )
+                )
 
             if self._verbose:
                 rich.print(
-                    f"[bold](viser)[/bold] Connection opened ({client_id},"
+                    f"[bold](viser)[/bold] Connection"
+                    f" {'opened' if resume_from is None else 'resumed'} ({client_id},"
                     f" {total_connections} total),"
                     f" {len(self._broadcast_buffer.message_from_id)} persistent"
                     " messages"
                 )
 
-            try:
-                # For each client: infinite loop over producers (which send messages)
-                # and consumers (which receive messages).
-                await asyncio.gather(
+            # For each client: infinite loop over producers (which send messages)
+            # and consumers (which receive messages).
+            tasks = [
+                event_loop.create_task(
                     _message_producer(
                         connection,
                         client_state.message_buffer,
                         client_id,
                         self._client_api_version,
-                    ),
+                        client_state,
+                        encode_executor=self._encode_executor,
+                    )
+                ),
+                event_loop.create_task(
                     _message_producer(
                         connection,
                         self._broadcast_buffer,
                         client_id,
                         self._client_api_version,
-                    ),
-                    _message_consumer(connection, handle_incoming, message_class),
-                )
+                        client_state,
+                        encode_executor=self._encode_executor,
+                        resume_from=resume_from,
+                    )
+                ),
+                event_loop.create_task(
+                    _message_consumer(
+                        connection,
+                        handle_incoming,
+                        message_class,
+                        client_id,
+                        client_state.send_stats,
+                    )
+                ),
+            ]
+            try:
+                await asyncio.gather(*tasks)
             except (
                 websockets.exceptions.ConnectionClosedOK,
                 websockets.exceptions.ConnectionClosedError,
-            ):
-                # We use a sentinel value to signal that the client producer thread
-                # should exit.
-                #
-                # This is partially cosmetic: it allows us to safely finish pending
-                # queue get() tasks, which suppresses a "Task was destroyed but it is
-                # pending" error.
-                client_state.message_buffer.set_done()
-
-                # Disconnection callbacks.
-                for cb in self._client_disconnect_cb:
-                    if asyncio.iscoroutinefunction(cb):
-                        await cb(client_connection)
-                    else:
-                        cb(client_connection)
+            ) as e:
+                # Keep resumable sessions around for the grace period if the
+                # connection was lost, as opposed to closed by the client. Removal
+                # messages that the client hasn't received are retained until
+                # then.
+                suspend = client_state.session_token is not None and isinstance(
+                    e, websockets.exceptions.ConnectionClosedError
+                )
+                if suspend:
+                    self._broadcast_buffer.retained_cursor_from_client[client_id] = (
+                        client_state.sent_resume_id
+                    )
 
-                # Cleanup.
-                self._client_state_from_id.pop(client_id)
+                # Stop the remaining producers and consumer. This also
+                # suppresses "Task was destroyed but it is pending" errors.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
                 total_connections -= 1
+
+                if suspend:
+                    token = client_state.session_token
+                    assert token is not None
+                    self._suspended_session_from_token[token] = _SuspendedSession(
+                        client_connection,
+                        event_loop.call_later(
+                            self._session_grace_sec,
+                            lambda: event_loop.create_task(expire_session(token)),
+                        ),
+                    )
+                else:
+                    await end_session(client_connection)
                 if self._verbose:
                     rich.print(
-                        f"[bold](viser)[/bold] Connection closed ({client_id},"
+                        f"[bold](viser)[/bold] Connection"
+                        f" {'suspended' if suspend else 'closed'} ({client_id},"
                         f" {total_connections} total)"
                     )
 
         # Host client on the same port as the websocket.
-        file_cache: dict[Path, bytes] = {}
-        file_cache_gzipped: dict[Path, bytes] = {}
+        static_files = (
+            StaticFileServer(http_server_root) if http_server_root is not None else None
+        )
+        if static_files is not None:
+            static_files.warm_in_background()
 
         filter_added = False
 
-        def viser_http_server(
+        async def viser_http_server(
             connection: ServerConnection,
             request: Request,
         ) -> Response | None:
@@ -552,6 +868,7 @@ class WebsockServer(WebsockMessageHandler):
                         return record.getMessage() not in (
                             "opening handshake failed",
                             "connection rejected (200 OK)",
+                            "connection rejected (304 Not Modified)",
                         )
 
                 connection.logger.logger.addFilter(NoHttpErrors())  # type: ignore
@@ -565,69 +882,49 @@ class WebsockServer(WebsockMessageHandler):
             # Strip out search params, get relative path.
             path = request.path
             path = path.partition("?")[0]
-            relpath = str(Path(path).relative_to("/"))
-            if relpath == ".":
-                relpath = "index.html"
-            assert http_server_root is not None
 
-            source_path = http_server_root / relpath
-            if not source_path.exists():
-                return Response(http.HTTPStatus.NOT_FOUND, "NOT FOUND", Headers())
+            # Large payloads from the scene, by content hash. Other paths under
+            # /assets/ are left for the client build.
+            if _ASSET_PATH_PATTERN.fullmatch(path) is not None:
+                return _asset_http_response(
+                    self._broadcast_buffer.asset_store,
+                    path[len("/assets/") :],
+                    request.headers,
+                )
 
-            use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
-
-            # First, try some known MIME types. Using guess_type() can cause
-            # problems for Javascript on some Windows machines.
-            #
-            # Some references:
-            #     https://github.com/viser-project/viser/issues/256#issuecomment-2369684252
-            #     https://bugs.python.org/issue43975
-            #     https://github.com/golang/go/issues/32350#issuecomment-525111557
-            #
-            # We're assuming UTF-8, this is mostly reasonable but might want to revisit.
-            mime_type = {
-                ".css": "text/css; charset=utf-8",
-                ".gif": "image/gif",
-                ".htm": "text/html; charset=utf-8",
-                ".html": "text/html; charset=utf-8",
-                ".jpg": "image/jpeg",
-                ".js": "application/javascript",
-                ".wasm": "application/wasm",
-                ".pdf": "application/pdf",
-                ".png": "image/png",
-                ".svg": "image/svg+xml",
-                ".xml": "text/xml; charset=utf-8",
-            }.get(Path(path).suffix.lower(), None)
-            if mime_type is None:
-                mime_type = mimetypes.guess_type(relpath)[0]
-            if mime_type is None:
-                mime_type = "application/octet-stream"
-
-            if source_path not in file_cache:
-                file_cache[source_path] = source_path.read_bytes()
-            if use_gzip:
-                if source_path not in file_cache_gzipped:
-                    file_cache_gzipped[source_path] = gzip.compress(
-                        file_cache[source_path]
-                    )
-                response_payload = file_cache_gzipped[source_path]
-            else:
-                response_payload = file_cache[source_path]
+            # The zstd dictionary for msgpack headers, for web clients.
+            if path == "/zstd-dictionary":
+                return Response(
+                    http.HTTPStatus.OK,
+                    "OK",
+                    Headers(
+                        {
+                            "Content-Type": "application/octet-stream",
+                            "Cache-Control": "no-cache",
+                        }
+                    ),
+                    header_dictionary().as_bytes(),
+                )
 
-            response_headers = {
-                "Content-Type": mime_type,
-                "Content-Length": str(len(response_payload)),
-                "Content-Encoding": "gzip" if use_gzip else "identity",
-            }
+            if path == "/metrics" and self._metrics_route:
+                return Response(
+                    http.HTTPStatus.OK,
+                    "OK",
+                    Headers(
+                        {
+                            "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+                            "Cache-Control": "no-store",
+                        }
+                    ),
+                    format_prometheus(self.get_stats()).encode(),
+                )
 
-            # Try to read + send over file.
-            return Response(
-                http.HTTPStatus.OK,
-                "OK",
-                websockets.datastructures.Headers(**response_headers),
-                response_payload,
-            )
-            # return (http.HTTPStatus.OK, response_headers, response_payload)
+            if static_files is None:
+                return Response(http.HTTPStatus.NOT_FOUND, "NOT FOUND", Headers())
+            relpath = str(Path(path).relative_to("/"))
+            if relpath == ".":
+                relpath = "index.html"
+            return await static_files.respond(relpath, request.headers)
 
         async def start_server() -> None:
             port_attempt = port
@@ -643,7 +940,9 @@ class WebsockServer(WebsockMessageHandler):
                         # Compression can be too slow for our use cases.
                         compression=None,
                         process_request=(
-                            viser_http_server if http_server_root is not None else None
+                            viser_http_server
+                            if http_server_root is not None or self._metrics_route
+                            else None
                         ),
                         # Accept connections with version-based protocol and extract version in handler.
                         subprotocols=None,
@@ -674,15 +973,144 @@ class WebsockServer(WebsockMessageHandler):
         event_loop.close()
 
 
+_ASSET_PATH_PATTERN = re.compile(r"/assets/[0-9a-fA-F]{%d}" % (2 * ASSET_HASH_BYTES))
+
+
+def _parse_asset_inventory(frame: str | bytes) -> set[bytes]:
+    """Parse the hashes of buffers that a client has cached. Malformed
+    inventories are treated as empty: the client is then sent everything."""
+    try:
+        inventory = json.loads(frame)
+    except ValueError:
+        return set()
+    assets = inventory.get("assets", None) if isinstance(inventory, dict) else None
+    if not isinstance(assets, list):
+        return set()
+    out: set[bytes] = set()
+    for h in assets:
+        if isinstance(h, str) and len(h) == 2 * ASSET_HASH_BYTES:
+            try:
+                out.add(bytes.fromhex(h))
+            except ValueError:
+                continue
+    return out
+
+
+def _asset_http_response(
+    asset_store: AssetStore, name: str, request_headers: Headers
+) -> Response:
+    """Serve a stored payload by hash. Payloads are immutable, so they can be
+    cached indefinitely. Single byte ranges are supported."""
+    try:
+        payload_hash = bytes.fromhex(name)
+    except ValueError:
+        payload_hash = b""
+    payload = (
+        asset_store.get_payload(payload_hash)
+        if len(payload_hash) == ASSET_HASH_BYTES
+        else None
+    )
+    if payload is None:
+        return Response(http.HTTPStatus.NOT_FOUND, "NOT FOUND", Headers())
+
+    etag = f'"{name.lower()}"'
+    response_headers = Headers(
+        {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Accept-Ranges": "bytes",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
+    if_none_match = request_headers.get("If-None-Match", None)
+    if if_none_match is not None and (
+        if_none_match.strip() == "*"
+        or etag in (t.strip().lstrip("W/") for t in if_none_match.split(","))
+    ):
+        return Response(http.HTTPStatus.NOT_MODIFIED, "Not Modified", response_headers)
+
+    size = payload.nbytes
+    status = http.HTTPStatus.OK
+    body = payload
+    range_header = request_headers.get("Range", None)
+    if range_header is not None and range_header.startswith("bytes="):
+        byte_range = _parse_byte_range(range_header[len("bytes=") :], size)
+        if byte_range is None:
+            response_headers["Content-Range"] = f"bytes */{size}"
+            return Response(
+                http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                "Range Not Satisfiable",
+                response_headers,
+            )
+        start, stop = byte_range
+        status = http.HTTPStatus.PARTIAL_CONTENT
+        body = payload[start:stop]
+        response_headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+
+    response_headers["Content-Type"] = "application/octet-stream"
+    response_headers["Content-Length"] = str(body.nbytes)
+    return Response(status, status.phrase, response_headers, body)  # type: ignore
+
+
+def _parse_byte_range(spec: str, size: int) -> tuple[int, int] | None:
+    """Parse a single range from a `Range: bytes=...` header into a (start, stop)
+    slice. Returns None if the range can't be satisfied. Multiple ranges aren't
+    supported; we serve the span from the first start to the last end."""
+    starts: list[int] = []
+    stops: list[int] = []
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        try:
+            if first == "":
+                # Suffix range: the last N bytes.
+                starts.append(max(size - int(last), 0))
+                stops.append(size)
+            else:
+                starts.append(int(first))
+                stops.append(size if last == "" else min(int(last) + 1, size))
+        except ValueError:
+            return None
+    start, stop = min(starts), max(stops)
+    if start >= stop or start >= size:
+        return None
+    return start, stop
+
+
+_LAGGING_WRITE_BUFFER_BYTES = 1024 * 1024
+_LAGGING_SEND_LATENCY_SEC = 0.2
+
+
 async def _message_producer(
     websocket: ServerConnection,
     buffer: AsyncMessageBuffer,
     client_id: int,
-    client_api_version: Literal[0, 1],
+    client_api_version: Literal[0, 1, 2],
+    client_state: _ClientHandleState,
+    *,
+    encode_executor: Executor | None,
+    resume_from: int | None = None,
 ) -> None:
-    """Infinite loop to broadcast windows of messages from a buffer."""
-    window_generator = buffer.window_generator(client_id)
-    zstd = zstandard.ZstdCompressor(level=1)
+    """Infinite loop to broadcast windows of messages from a buffer.
+
+    Large windows are encoded and compressed in `encode_executor`, so they don't
+    block the event loop. msgspec and zstandard both release the GIL for the
+    heavy lifting.
+
+    If `resume_from` is set, the client already has every message in the buffer
+    up to and including that ID."""
+    send_stats = client_state.send_stats
+    compression_policy = client_state.compression_policy
+    compact_root = client_state.compact_root
+    hash_assets = client_state.held_assets is not None
+
+    def fetchable(payload_hash: bytes, size: int) -> bool:
+        # Only payloads in the persistent buffer are served over HTTP.
+        return (
+            size >= HTTP_ASSET_MIN_BYTES
+            and buffer.asset_store.get_payload(payload_hash) is not None
+        )
+
+    window_generator = buffer.window_generator(client_id, send_stats, resume_from)
     while not buffer.done:
         try:
             outgoing = await window_generator.__anext__()
@@ -690,39 +1118,136 @@ async def _message_producer(
             break
 
         if client_api_version == 1:
-            # Encode the message structure.
-            inner = msgspec.msgpack.encode(
-                {
-                    "messages": tuple(
-                        message.as_serializable_dict() for message in outgoing
-                    ),
-                    "timestampSec": time.perf_counter(),
-                }
+            # For the broadcast buffer, windows are encoded once and the same
+            # bytes are sent to every client.
+            serialized = await buffer.get_or_encode_window(
+                outgoing,
+                lambda messages: encode_window_v1(messages, compression_policy),
+                encode_executor,
+                encoding_variant=compression_policy,
             )
-            # Compress and prepend size header (8 bytes, little-endian uint64).
-            compressed = zstd.compress(inner)
-            serialized = len(inner).to_bytes(8, "little") + compressed
+            assert isinstance(serialized, bytes)
+            send_start = time.perf_counter()
             await websocket.send(serialized)
+            send_stats.bytes_sent += len(serialized)
+        elif client_api_version == 2:
+            # Chunks are sent as fragments of a single websocket message. This
+            # lets us send array buffers without copying them.
+            serialized = await buffer.get_or_encode_window(
+                outgoing,
+                lambda messages: encode_window_v2(
+                    messages, compression_policy, compact_root, hash_assets
+                ),
+                encode_executor,
+                encoding_variant=(compression_policy, compact_root, hash_assets),
+            )
+            assert isinstance(serialized, list)
+            if client_state.held_assets is not None:
+                serialized, omitted_bytes = omit_held_assets(
+                    serialized,
+                    client_state.held_assets,
+                    fetchable
+                    if client_state.fetch_assets_over_http
+                    and buffer.persistent_messages
+                    else None,
+                )
+                send_stats.omitted_asset_bytes += omitted_bytes
+            if client_state.session_token is not None:
+                # Resume IDs are only meaningful for the broadcast buffer.
+                serialized = [
+                    *serialized,
+                    resume_trailer(
+                        outgoing.resume_id if buffer.persistent_messages else -1
+                    ),
+                ]
+            send_start = time.perf_counter()
+            # Fragments can be any bytes-like object, including memoryviews.
+            await websocket.send(cast(List[bytes], serialized))
+            send_stats.bytes_sent += encoded_nbytes(serialized)
+            if buffer.persistent_messages:
+                client_state.sent_resume_id = outgoing.resume_id
         elif client_api_version == 0:
-            for msg in outgoing:
+            send_start = time.perf_counter()
+            for msg in outgoing.messages:
                 serialized = msgspec.msgpack.encode(msg.as_serializable_dict())
                 assert isinstance(serialized, bytes)
                 await websocket.send(serialized)
+                send_stats.bytes_sent += len(serialized)
         else:
             assert_never(client_api_version)
 
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.complete(
+                "send",
+                "send",
+                send_start * 1e6,
+                client_id=client_id,
+                message_ids=traced_ids(outgoing.message_ids),
+                persistent=buffer.persistent_messages,
+            )
+
+        sent_count_from_type = send_stats.sent_count_from_type
+        for message in outgoing.messages:
+            type_name = type(message).__name__
+            sent_count_from_type[type_name] = sent_count_from_type.get(type_name, 0) + 1
+
+        # Detect backpressure. Clients that are falling behind will have pending
+        # updates coalesced until they catch up.
+        send_stats.windows_sent += 1
+        send_stats.last_send_latency_sec = time.perf_counter() - send_start
+        send_stats.write_buffer_bytes = websocket.transport.get_write_buffer_size()
+        if (
+            send_stats.write_buffer_bytes > _LAGGING_WRITE_BUFFER_BYTES
+            or send_stats.last_send_latency_sec > _LAGGING_SEND_LATENCY_SEC
+        ):
+            send_stats.lagging = True
+        elif (
+            send_stats.write_buffer_bytes < _LAGGING_WRITE_BUFFER_BYTES // 16
+            and send_stats.last_send_latency_sec < _LAGGING_SEND_LATENCY_SEC / 2
+        ):
+            send_stats.lagging = False
+
 
 async def _message_consumer(
     websocket: ServerConnection,
     handle_message: Callable[[Message], None],
     message_class: type[Message],
+    client_id: int,
+    send_stats: ClientSendStats,
 ) -> None:
     """Infinite loop waiting for and then handling incoming messages."""
+    received_count_from_type = send_stats.received_count_from_type
+    message_id = 0
     while True:
         raw = await websocket.recv()
         assert isinstance(raw, bytes)
+        tracer = get_tracer()
+        start_us = tracer.now_us() if tracer is not None else 0.0
         message = message_class.deserialize(raw)
-        handle_message(message)
+        if tracer is not None:
+            tracer.complete(
+                "decode",
+                "incoming",
+                start_us,
+                client_id=client_id,
+                message_id=message_id,
+                type=type(message).__name__,
+                nbytes=len(raw),
+            )
+        send_stats.bytes_received += len(raw)
+        type_name = type(message).__name__
+        received_count_from_type[type_name] = (
+            received_count_from_type.get(type_name, 0) + 1
+        )
+        # Handlers and the callbacks they submit share the IDs of the message.
+        with (
+            span_args(client_id=client_id, message_id=message_id)
+            if tracer is not None
+            else contextlib.nullcontext()
+        ):
+            handle_message(message)
+        message_id += 1
 
 
 def error_print_wrapper(inner: Callable[[], Any]) -> Callable[[], None]:
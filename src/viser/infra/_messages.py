@@ -7,11 +7,22 @@ import abc
 import dataclasses
 import functools
 import warnings
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, TypeVar, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
 
 import msgspec.msgpack
 import numpy as np
-from typing_extensions import get_args, get_origin, get_type_hints
+from typing_extensions import Literal, get_args, get_origin, get_type_hints
 
 if TYPE_CHECKING:
     from ._infra import ClientId
@@ -20,6 +31,8 @@ else:
 
 
 def _prepare_for_deserialization(value: Any, annotation: Type) -> Any:
+    """Reference implementation for deserializing a field. Messages use the
+    equivalent converters built by `_get_deserializer()`."""
     # If annotated as a float but we got an integer, cast to float. These
     # are both `number` in Javascript.
     if annotation is float:
@@ -46,7 +59,11 @@ def _prepare_for_deserialization(value: Any, annotation: Type) -> Any:
 
 
 def _prepare_for_serialization(value: Any, annotation: object) -> Any:
-    """Prepare any special types for serialization."""
+    """Prepare any special types for serialization.
+
+    This is the reference implementation. Messages use the equivalent
+    converters built by `_get_serializer()`, which only inspect each annotation
+    once."""
     if annotation is Any:
         annotation = type(value)
 
@@ -92,8 +109,178 @@ def _prepare_for_serialization(value: Any, annotation: object) -> Any:
     return value
 
 
+_PASSTHROUGH_TYPES = (str, bool, int, float, type(None), bytes)
+"""Types that serialization and deserialization leave unchanged."""
+
+
+def _serialize_any(value: Any) -> Any:
+    """Compiled equivalent of `_prepare_for_serialization(value, Any)`."""
+    value_type = type(value)
+    if value_type in _PASSTHROUGH_TYPES:
+        return value
+    return _get_serializer(value_type)(value)
+
+
+def _serialize_vars(value: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _serialize_any(v) for k, v in value.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_serializer(annotation: Any) -> Callable[[Any], Any]:
+    """Build a function that's equivalent to `_prepare_for_serialization(value,
+    annotation)`, but with the annotation inspected once instead of for every
+    value."""
+    if annotation is Any:
+        return _serialize_any
+    if annotation is float:
+        return float
+    if annotation is int:
+        return lambda value: (
+            float(value) if isinstance(value, np.floating) else int(value)
+        )
+
+    is_dataclass = dataclasses.is_dataclass(annotation)
+    tuple_args: Optional[Tuple[Any, ...]] = None
+    tuple_variadic = False
+    if get_origin(annotation) is tuple:
+        tuple_args = get_args(annotation)
+        tuple_variadic = len(tuple_args) >= 2 and tuple_args[1] == ...
+    element_serializers = (
+        None
+        if tuple_args is None
+        else tuple(
+            map(_get_serializer, tuple_args[:1] if tuple_variadic else tuple_args)
+        )
+    )
+
+    def serialize(value: Any) -> Any:
+        if type(value) in _PASSTHROUGH_TYPES:
+            return value
+        if isinstance(value, np.floating):
+            return float(value)
+        if isinstance(value, np.integer):
+            return int(value)
+        if is_dataclass:
+            return _serialize_vars(vars(value))
+        if isinstance(value, tuple):
+            if element_serializers is None:
+                return tuple([_serialize_any(v) for v in value])
+            if tuple_variadic:
+                return tuple(map(element_serializers[0], value))
+            if len(value) != len(element_serializers):
+                return _prepare_for_serialization(value, annotation)  # Warns.
+            return tuple([f(v) for f, v in zip(element_serializers, value)])
+        if isinstance(value, np.ndarray):
+            return value.data if value.data.c_contiguous else value.copy().data
+        if isinstance(value, dict):
+            return _serialize_vars(value)
+        return value
+
+    if element_serializers is None:
+        return serialize
+
+    # Fast path for the common case of tuple annotations with tuple values.
+    def serialize_tuple(value: Any) -> Any:
+        if type(value) is tuple:
+            if tuple_variadic:
+                return tuple(map(element_serializers[0], value))
+            if len(value) == len(element_serializers):
+                return tuple([f(v) for f, v in zip(element_serializers, value)])
+        return serialize(value)
+
+    return serialize_tuple
+
+
+def _lists_to_tuple(obj: Any) -> Any:
+    """msgpack deserializes to lists by default, but all of our annotations use
+    tuples."""
+    if isinstance(obj, list):
+        return tuple(_lists_to_tuple(x) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _lists_to_tuple(v) for k, v in obj.items()}
+    else:
+        return obj
+
+
+def _deserialize_any(value: Any) -> Any:
+    if type(value) in _PASSTHROUGH_TYPES:
+        return value
+    return _lists_to_tuple(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_deserializer(annotation: Any) -> Callable[[Any], Any]:
+    """Build a function that's equivalent to
+    `_prepare_for_deserialization(_lists_to_tuple(value), annotation)`."""
+    if annotation is float:
+        return float
+    if annotation is int:
+        return int
+    if get_origin(annotation) is not tuple:
+        return _deserialize_any
+
+    args = get_args(annotation)
+    variadic = len(args) >= 2 and args[1] == ...
+    element_deserializers = tuple(
+        map(_get_deserializer, args[:1] if variadic else args)
+    )
+
+    def deserialize(value: Any) -> Any:
+        if type(value) is list:
+            if variadic:
+                return tuple(map(element_deserializers[0], value))
+            if len(value) == len(element_deserializers):
+                return tuple([f(v) for f, v in zip(element_deserializers, value)])
+        return _prepare_for_deserialization(_lists_to_tuple(value), annotation)
+
+    return deserialize
+
+
+@functools.lru_cache(maxsize=None)
+def _get_field_serializers(cls: Type[Any]) -> Dict[str, Callable[[Any], Any]]:
+    return {k: _get_serializer(v) for k, v in get_type_hints_cached(cls).items()}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_field_deserializers(cls: Type[Any]) -> Dict[str, Callable[[Any], Any]]:
+    return {k: _get_deserializer(v) for k, v in get_type_hints_cached(cls).items()}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_compact_field_serializers(
+    cls: Type[Any],
+) -> Tuple[Tuple[str, Callable[[Any], Any]], ...]:
+    """Field names and serializers for the compact wire format, in dataclass
+    field order."""
+    serializers = _get_field_serializers(cls)
+    return tuple(
+        (field.name, serializers[field.name]) for field in dataclasses.fields(cls)
+    )
+
+
+def _estimate_payload_bytes(value: Any) -> int:
+    """Cheap estimate of the serialized size of a value. Used for budgeting
+    message windows; this only needs to be accurate for large payloads."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_estimate_payload_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_estimate_payload_bytes(v) + 8 for v in value.values())
+    if dataclasses.is_dataclass(value):
+        return _estimate_payload_bytes(vars(value))
+    return 8
+
+
 T = TypeVar("T", bound="Message")
 
+MessagePriority = Literal["interactive", "transform", "bulk"]
+"""Priority lanes for outgoing messages, from highest to lowest priority."""
+
+MESSAGE_PRIORITIES: tuple[MessagePriority, ...] = ("interactive", "transform", "bulk")
+
 
 @functools.lru_cache(maxsize=None)
 def get_type_hints_cached(cls: Type[Any]) -> Dict[str, Any]:
@@ -107,13 +294,72 @@ class Message(abc.ABC):
     """Don't send this message to a particular client. Useful when a client wants to
     send synchronization information to other clients."""
 
+    def priority(self) -> MessagePriority:
+        """Priority lane for this message. Messages in higher-priority lanes can be
+        sent before earlier messages in lower-priority lanes, as long as this
+        doesn't reorder messages with the same ordering key."""
+        return "interactive"
+
+    def ordering_key(self) -> Optional[str]:
+        """Key for causal ordering. Messages with the same key are always sent in
+        the order they were queued. Messages with a key of `None` are never
+        reordered with respect to any other message."""
+        return None
+
+    def coalesce_key(self) -> Optional[str]:
+        """Key for latest-wins coalescing. When a client falls behind, pending
+        messages are replaced by newer messages with the same key. Messages with a
+        key of `None` are never dropped."""
+        return None
+
+    def owner_key(self) -> Optional[str]:
+        """Key for the entity (for example, a scene node) that this message
+        belongs to. Persistent buffers index messages by this key, so they can be
+        pruned when the entity is removed; see :meth:`removes_owner()`."""
+        return None
+
+    def removes_owner(self) -> bool:
+        """Whether this message removes the entity identified by
+        :meth:`owner_key()`. Pushing it to a persistent buffer drops earlier
+        messages with the same owner key. The removal message itself is dropped
+        once every connected client has received it."""
+        return False
+
+    def superseded_by(self) -> Tuple[str, ...]:
+        """Redundancy keys of messages that make this one unnecessary. Pushing a
+        message with one of these redundancy keys drops this one from the
+        buffer. As with messages that share a redundancy key, clients that
+        haven't consumed this message will receive the newer one instead."""
+        return ()
+
+    def fold(self, update: Message) -> Optional[Message]:
+        """Fold a later message into this one. Used to build snapshots for new
+        clients, which only need the current state of each entity.
+
+        The folded message replaces this one, at this message's position in the
+        stream; `update` is dropped. Returns `None` if the messages can't be
+        folded."""
+        return None
+
+    def folds_when_consumed(self) -> bool:
+        """Whether persistent buffers should fold this message into an earlier
+        message, using :meth:`fold()`, once every client has consumed it. This
+        keeps incremental updates from accumulating in the buffer.
+
+        Candidates are earlier messages with the same owner key or with a
+        redundancy key from :meth:`superseded_by()`, newest first. The search
+        stops at the latter, even if they can't fold this message."""
+        return False
+
+    def estimate_payload_bytes(self) -> int:
+        """Estimate the serialized size of this message, in bytes."""
+        return _estimate_payload_bytes(vars(self))
+
     def as_serializable_dict(self) -> Dict[str, Any]:
         """Convert a Python Message object into bytes."""
         message_type = type(self)
-        hints = get_type_hints_cached(message_type)
-        out = {
-            k: _prepare_for_serialization(v, hints[k]) for k, v in vars(self).items()
-        }
+        serializers = _get_field_serializers(message_type)
+        out = {k: serializers[k](v) for k, v in vars(self).items()}
         out["type"] = message_type.__name__
         return out
 
@@ -121,33 +367,34 @@ class Message(abc.ABC):
     def _from_serializable_dict(cls, mapping: Dict[str, Any]) -> Dict[str, Any]:
         """Convert a dict message back into a Python Message object."""
 
-        hints = get_type_hints_cached(cls)
-
-        mapping = {
-            k: _prepare_for_deserialization(v, hints[k]) for k, v in mapping.items()
-        }
-        return mapping
+        deserializers = _get_field_deserializers(cls)
+        return {k: deserializers[k](v) for k, v in mapping.items()}
 
     @classmethod
     def deserialize(cls, message: bytes) -> Message:
         """Convert bytes into a Python Message object."""
         mapping = msgspec.msgpack.decode(message)
-
-        # msgpack deserializes to lists by default, but all of our annotations use
-        # tuples.
-        def lists_to_tuple(obj: Any) -> Any:
-            if isinstance(obj, list):
-                return tuple(lists_to_tuple(x) for x in obj)
-            elif isinstance(obj, dict):
-                return {k: lists_to_tuple(v) for k, v in obj.items()}
-            else:
-                return obj
-
-        mapping = lists_to_tuple(mapping)
         message_type = cls._subclass_from_type_string()[cast(str, mapping.pop("type"))]
         message_kwargs = message_type._from_serializable_dict(mapping)
         return message_type(**message_kwargs)
 
+    def as_serializable_tuple(self, root: Type[Message]) -> Tuple[Any, ...]:
+        """Convert a Python Message object into the compact wire format: a
+        numeric type ID followed by field values, in dataclass field order.
+
+        Type IDs are indices into `root.get_subclasses()`; this matches the
+        decoders emitted by `generate_typescript_interfaces(root)`."""
+        message_type = type(self)
+        return (root._type_id_from_subclass()[message_type],) + tuple(
+            serialize(getattr(self, name))
+            for name, serialize in _get_compact_field_serializers(message_type)
+        )
+
+    @classmethod
+    @functools.lru_cache(maxsize=100)
+    def _type_id_from_subclass(cls: Type[T]) -> Dict[Type[T], int]:
+        return {s: i for i, s in enumerate(cls.get_subclasses())}
+
     @classmethod
     @functools.lru_cache(maxsize=100)
     def _subclass_from_type_string(cls: Type[T]) -> Dict[str, Type[T]]:
@@ -0,0 +1,278 @@
+"""Counters and histograms for observing a running server.
+
+Instrumentation is limited to dictionary increments and fixed-bucket
+histograms, which is cheap enough to leave on in production. Statistics are
+read with :meth:`WebsockServer.get_stats()`, and can optionally be served in
+Prometheus' text format at ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import dataclasses
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from ._async_message_buffer import ClientSendStats
+
+ENCODE_SECONDS_BOUNDS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+)
+"""Histogram bucket bounds for window encode + compression times."""
+
+WINDOW_MESSAGES_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128)
+"""Histogram bucket bounds for the number of messages per window."""
+
+WINDOW_LATENCY_SECONDS_BOUNDS = (
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+)
+"""Histogram bucket bounds for time from encoding a window to receiving it."""
+
+
+class Histogram:
+    """Histogram with fixed bucket upper bounds.
+
+    Observations are recorded without locking. Concurrent observations from
+    different threads can occasionally be lost, which is fine for statistics."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds: Tuple[float, ...] = tuple(bounds)
+        self.bucket_counts: List[int] = [0] * (len(self.bounds) + 1)
+        """Number of observations in each bucket. The last bucket counts
+        observations larger than every bound."""
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merged(self, other: Histogram) -> Histogram:
+        """Get a new histogram that contains observations from both inputs."""
+        assert self.bounds == other.bounds
+        out = Histogram(self.bounds)
+        out.bucket_counts = [
+            a + b for a, b in zip(self.bucket_counts, other.bucket_counts)
+        ]
+        out.count = self.count + other.count
+        out.sum = self.sum + other.sum
+        return out
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile, as the upper bound of the bucket that contains
+        it. Returns None if there are no observations, and `inf` if the quantile
+        is past the last bound."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+@dataclasses.dataclass(frozen=True)
+class ServerStats:
+    """Snapshot of server statistics. Counters are totals since the server
+    started."""
+
+    connected_clients: int
+    suspended_sessions: int
+    """Sessions with lost connections that are waiting for the client to
+    reconnect."""
+    buffered_messages: int
+    """Number of messages in the broadcast buffer. This is what new clients
+    receive when they connect."""
+    buffered_assets: int
+    """Number of distinct large payloads in the broadcast buffer."""
+    callback_queue_depth: Optional[int]
+    """Number of callbacks waiting for a thread, or None if unknown."""
+    pushed_count_from_type: Dict[str, int]
+    """Messages queued for sending, by message type."""
+    encode_seconds: Histogram
+    """Time spent encoding and compressing each window."""
+    window_message_counts: Histogram
+    """Number of messages in each window."""
+    client_stats: Dict[int, ClientSendStats]
+    """Statistics for each connected client, by client ID."""
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_histogram(name: str, help: str, histogram: Histogram) -> List[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.bounds, histogram.bucket_counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum {histogram.sum}")
+    lines.append(f"{name}_count {histogram.count}")
+    return lines
+
+
+def format_prometheus(stats: ServerStats) -> str:
+    """Format statistics in the Prometheus text exposition format."""
+    lines: List[str] = []
+
+    def metric(
+        name: str,
+        kind: str,
+        help: str,
+        samples: Sequence[Tuple[Dict[str, object], float]],
+    ) -> None:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if len(labels) == 0:
+                lines.append(f"{name} {value}")
+            else:
+                label_str = ",".join(
+                    f'{k}="{_escape_label(str(v))}"' for k, v in labels.items()
+                )
+                lines.append(f"{name}{{{label_str}}} {value}")
+
+    metric(
+        "viser_connected_clients",
+        "gauge",
+        "Number of connected clients.",
+        [({}, stats.connected_clients)],
+    )
+    metric(
+        "viser_suspended_sessions",
+        "gauge",
+        "Number of sessions waiting for a client to reconnect.",
+        [({}, stats.suspended_sessions)],
+    )
+    metric(
+        "viser_buffered_messages",
+        "gauge",
+        "Number of messages in the broadcast buffer.",
+        [({}, stats.buffered_messages)],
+    )
+    metric(
+        "viser_buffered_assets",
+        "gauge",
+        "Number of distinct large payloads in the broadcast buffer.",
+        [({}, stats.buffered_assets)],
+    )
+    if stats.callback_queue_depth is not None:
+        metric(
+            "viser_callback_queue_depth",
+            "gauge",
+            "Number of callbacks waiting for a thread.",
+            [({}, stats.callback_queue_depth)],
+        )
+    metric(
+        "viser_messages_pushed_total",
+        "counter",
+        "Messages queued for sending, by type.",
+        [({"type": t}, n) for t, n in sorted(stats.pushed_count_from_type.items())],
+    )
+    lines.extend(
+        _format_histogram(
+            "viser_window_encode_seconds",
+            "Time spent encoding and compressing each window.",
+            stats.encode_seconds,
+        )
+    )
+    lines.extend(
+        _format_histogram(
+            "viser_window_messages",
+            "Number of messages in each window.",
+            stats.window_message_counts,
+        )
+    )
+
+    clients = sorted(stats.client_stats.items())
+    for name, kind, help, field in (
+        ("bytes_sent_total", "counter", "Bytes sent.", "bytes_sent"),
+        ("bytes_received_total", "counter", "Bytes received.", "bytes_received"),
+        ("windows_sent_total", "counter", "Windows sent.", "windows_sent"),
+        (
+            "coalesced_messages_total",
+            "counter",
+            "Pending messages dropped in favor of newer ones.",
+            "coalesced_message_count",
+        ),
+        (
+            "omitted_asset_bytes_total",
+            "counter",
+            "Bytes of large payloads not sent because the client had them.",
+            "omitted_asset_bytes",
+        ),
+        (
+            "write_buffer_bytes",
+            "gauge",
+            "Size of the transport write buffer after the last send.",
+            "write_buffer_bytes",
+        ),
+        (
+            "last_send_latency_seconds",
+            "gauge",
+            "Time taken by the last send.",
+            "last_send_latency_sec",
+        ),
+    ):
+        metric(
+            f"viser_client_{name}",
+            kind,
+            help,
+            [({"client": i}, getattr(s, field)) for i, s in clients],
+        )
+    metric(
+        "viser_client_lagging",
+        "gauge",
+        "Whether the client is falling behind.",
+        [({"client": i}, int(s.lagging)) for i, s in clients],
+    )
+    metric(
+        "viser_client_messages_sent_total",
+        "counter",
+        "Messages sent, by type.",
+        [
+            ({"client": i, "type": t}, n)
+            for i, s in clients
+            for t, n in sorted(s.sent_count_from_type.items())
+        ],
+    )
+    metric(
+        "viser_client_messages_received_total",
+        "counter",
+        "Messages received, by type.",
+        [
+            ({"client": i, "type": t}, n)
+            for i, s in clients
+            for t, n in sorted(s.received_count_from_type.items())
+        ],
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,300 @@
+"""Serving for static files, like the client build.
+
+Files are served with strong ETags, and requests with a matching
+``If-None-Match`` header get a 304 response. Compressed variants are read from
+``.gz`` and ``.br`` files next to each source file, which are written when the
+client is built; see :func:`precompress_directory()`. Missing variants are
+compressed in a background thread. Brotli is only used if the optional `brotli`
+package is installed.
+
+File contents are kept in a bounded LRU cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import gzip
+import hashlib
+import http
+import mimetypes
+import re
+import threading
+from pathlib import Path
+from typing import Optional, OrderedDict, Tuple
+
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+_COMPRESSIBLE_SUFFIXES = frozenset(
+    (".css", ".htm", ".html", ".js", ".json", ".map", ".mjs", ".svg", ".txt")
+    + (".wasm", ".xml")
+)
+_SIDECAR_SUFFIX_FROM_ENCODING = {"br": ".br", "gzip": ".gz"}
+
+_MAX_FILE_ENTRIES = 4096
+"""Upper bound for per-file metadata, like ETags, that's kept in memory."""
+
+_HASHED_FILENAME_PATTERN = re.compile(r"[-.][0-9a-zA-Z_-]{8,}\.[0-9a-z]+$")
+"""Matches build outputs with content hashes in their names, like
+`index-B2x9fLqa.js`. These are safe to cache forever."""
+
+# First, try some known MIME types. Using guess_type() can cause problems for
+# Javascript on some Windows machines.
+#
+# Some references:
+#     https://github.com/viser-project/viser/issues/256#issuecomment-2369684252
+#     https://bugs.python.org/issue43975
+#     https://github.com/golang/go/issues/32350#issuecomment-525111557
+#
+# We're assuming UTF-8, this is mostly reasonable but might want to revisit.
+_MIME_TYPE_FROM_SUFFIX = {
+    ".css": "text/css; charset=utf-8",
+    ".gif": "image/gif",
+    ".htm": "text/html; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".jpg": "image/jpeg",
+    ".js": "application/javascript",
+    ".wasm": "application/wasm",
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".xml": "text/xml; charset=utf-8",
+}
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    assert encoding == "br" and brotli is not None
+    return brotli.compress(data, quality=11)
+
+
+def _available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def precompress_directory(root: Path) -> None:
+    """Write compressed variants next to each compressible file in a directory.
+    Variants that don't make the file smaller are skipped."""
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in _COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        for encoding in _available_encodings():
+            sidecar = path.with_name(
+                path.name + _SIDECAR_SUFFIX_FROM_ENCODING[encoding]
+            )
+            compressed = _compress(data, encoding)
+            if len(compressed) < len(data):
+                sidecar.write_bytes(compressed)
+            elif sidecar.exists():
+                sidecar.unlink()
+
+
+def _accepted_encodings(accept_encoding: str) -> Tuple[str, ...]:
+    """Parse an `Accept-Encoding` header, ignoring q-values except for q=0."""
+    out = []
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        out.append(token.strip().lower())
+    return tuple(out)
+
+
+class StaticFileServer:
+    """Serves files under a root directory.
+
+    Args:
+        root: Directory to serve files from.
+        max_cache_bytes: Upper bound for cached file contents, including
+            compressed variants. Files larger than an eighth of this are read
+            from disk for each request.
+    """
+
+    def __init__(self, root: Path, max_cache_bytes: int = 64 * 1024 * 1024) -> None:
+        self._root = root.resolve()
+        self._max_cache_bytes = max_cache_bytes
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[Tuple[Path, int, int, str], bytes] = (
+            collections.OrderedDict()
+        )
+        self._cache_bytes = 0
+        self._etag_from_file: OrderedDict[Tuple[Path, int, int], str] = (
+            collections.OrderedDict()
+        )
+        self._incompressible: OrderedDict[Tuple[Path, int, int, str], None] = (
+            collections.OrderedDict()
+        )
+        """Compressed variants that aren't smaller than their source file."""
+
+    def warm_in_background(self) -> None:
+        """Load and compress every file in a daemon thread, so the first
+        requests don't need to wait."""
+
+        def warm() -> None:
+            for path in sorted(self._root.rglob("*")):
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+                key = (path, stat.st_mtime_ns, stat.st_size)
+                self._get_etag(key)
+                if path.suffix.lower() in _COMPRESSIBLE_SUFFIXES:
+                    for encoding in _available_encodings():
+                        self._get_variant(key, encoding)
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    async def respond(self, relpath: str, request_headers: Headers) -> Response:
+        """Respond to a GET request for a file."""
+        path = (self._root / relpath).resolve()
+        if self._root not in path.parents or not path.is_file():
+            return Response(http.HTTPStatus.NOT_FOUND, "NOT FOUND", Headers())
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        # Reading and compressing files can be slow, so we do it in a thread
+        # unless the result is already cached.
+        loop = asyncio.get_running_loop()
+        etag = self._cached_etag(key)
+        if etag is None:
+            etag = await loop.run_in_executor(None, self._get_etag, key)
+
+        response_headers = Headers(
+            {
+                "Content-Type": self._mime_type(path),
+                "Cache-Control": (
+                    "public, max-age=31536000, immutable"
+                    if _HASHED_FILENAME_PATTERN.search(path.name) is not None
+                    else "no-cache"
+                ),
+                "Vary": "Accept-Encoding",
+            }
+        )
+
+        # Any representation of the same file is still valid.
+        if_none_match = request_headers.get("If-None-Match", None)
+        if if_none_match is not None and any(
+            t.strip() == "*" or t.strip().lstrip("W/").startswith(etag[:-1])
+            for t in if_none_match.split(",")
+        ):
+            response_headers["ETag"] = etag
+            return Response(
+                http.HTTPStatus.NOT_MODIFIED, "Not Modified", response_headers
+            )
+
+        encoding = "identity"
+        variant: Optional[bytes] = None
+        if path.suffix.lower() in _COMPRESSIBLE_SUFFIXES:
+            accepted = _accepted_encodings(request_headers.get("Accept-Encoding", ""))
+            for candidate in _available_encodings():
+                if candidate not in accepted or self._is_incompressible(
+                    (*key, candidate)
+                ):
+                    continue
+                variant = self._cached((*key, candidate))
+                if variant is None:
+                    variant = await loop.run_in_executor(
+                        None, self._get_variant, key, candidate
+                    )
+                if variant is not None:
+                    encoding = candidate
+                    break
+        body = variant if variant is not None else self._cached((*key, "identity"))
+        if body is None:
+            body = await loop.run_in_executor(None, self._read, key)
+
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+            etag = f'{etag[:-1]}.{encoding}"'
+        response_headers["ETag"] = etag
+        response_headers["Content-Length"] = str(len(body))
+        return Response(http.HTTPStatus.OK, "OK", response_headers, body)
+
+    def _mime_type(self, path: Path) -> str:
+        mime_type = _MIME_TYPE_FROM_SUFFIX.get(path.suffix.lower(), None)
+        if mime_type is None:
+            mime_type = mimetypes.guess_type(path.name)[0]
+        if mime_type is None:
+            mime_type = "application/octet-stream"
+        return mime_type
+
+    def _cached(self, cache_key: Tuple[Path, int, int, str]) -> Optional[bytes]:
+        with self._lock:
+            out = self._cache.get(cache_key, None)
+            if out is not None:
+                self._cache.move_to_end(cache_key)
+            return out
+
+    def _insert(self, cache_key: Tuple[Path, int, int, str], data: bytes) -> None:
+        if len(data) > self._max_cache_bytes // 8:
+            return
+        with self._lock:
+            if cache_key in self._cache:
+                return
+            self._cache[cache_key] = data
+            self._cache_bytes += len(data)
+            while self._cache_bytes > self._max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def _read(self, key: Tuple[Path, int, int]) -> bytes:
+        data = self._cached((*key, "identity"))
+        if data is None:
+            data = key[0].read_bytes()
+            self._insert((*key, "identity"), data)
+        return data
+
+    def _cached_etag(self, key: Tuple[Path, int, int]) -> Optional[str]:
+        with self._lock:
+            out = self._etag_from_file.get(key, None)
+            if out is not None:
+                self._etag_from_file.move_to_end(key)
+            return out
+
+    def _get_etag(self, key: Tuple[Path, int, int]) -> str:
+        etag = self._cached_etag(key)
+        if etag is None:
+            digest = hashlib.blake2b(self._read(key), digest_size=16).hexdigest()
+            etag = f'"{digest}"'
+            with self._lock:
+                self._etag_from_file[key] = etag
+                if len(self._etag_from_file) > _MAX_FILE_ENTRIES:
+                    self._etag_from_file.popitem(last=False)
+        return etag
+
+    def _is_incompressible(self, cache_key: Tuple[Path, int, int, str]) -> bool:
+        with self._lock:
+            return cache_key in self._incompressible
+
+    def _get_variant(
+        self, key: Tuple[Path, int, int], encoding: str
+    ) -> Optional[bytes]:
+        """Get a compressed variant of a file, or None if compression doesn't
+        make it smaller."""
+        out = self._cached((*key, encoding))
+        if out is not None or self._is_incompressible((*key, encoding)):
+            return out
+
+        path = key[0]
+        sidecar = path.with_name(path.name + _SIDECAR_SUFFIX_FROM_ENCODING[encoding])
+        if sidecar.is_file() and sidecar.stat().st_mtime_ns >= key[1]:
+            out = sidecar.read_bytes()
+        else:
+            data = self._read(key)
+            out = _compress(data, encoding)
+            if len(out) >= len(data):
+                with self._lock:
+                    self._incompressible[(*key, encoding)] = None
+                    if len(self._incompressible) > _MAX_FILE_ENTRIES:
+                        self._incompressible.popitem(last=False)
+                return None
+        self._insert((*key, encoding), out)
+        return out
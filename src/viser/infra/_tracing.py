@@ -0,0 +1,198 @@
+"""Opt-in tracing for the message lifecycle, in Chrome's trace event format.
+
+Spans are recorded for each stage that a message passes through:
+
+- Incoming messages: ``decode`` and ``dispatch`` to handlers, followed by
+  ``executor wait`` and ``callback`` for callbacks that run in a thread pool.
+- Outgoing messages: ``push`` into a message buffer, ``window`` formation,
+  ``encode`` (which contains ``compress`` spans), and ``send``.
+
+Spans include message IDs, message types, and client IDs where they're known.
+Outgoing message IDs are counted per buffer: spans for the broadcast buffer have
+``persistent`` set, and spans for a client's own buffer have its client ID.
+Incoming message IDs are counted per client, and are also attached to
+``executor wait`` and ``callback`` spans for callbacks that were submitted
+while handling the message. Traces can be opened in https://ui.perfetto.dev or
+``chrome://tracing``.
+
+Events are serialized and written by a background thread. While no trace is
+active, instrumentation costs a single global lookup.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, Optional, Set, Union
+
+_MAX_TRACED_IDS = 64
+"""Maximum number of message IDs to record per span."""
+
+_active_tracer: Optional[Tracer] = None
+
+_span_args: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar(
+    "viser_span_args"
+)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Get the active tracer, or None if no trace is being recorded."""
+    return _active_tracer
+
+
+def start_trace(path: Union[str, Path]) -> None:
+    """Start recording a trace to a JSON file. Only one trace can be recorded
+    at a time."""
+    global _active_tracer
+    if _active_tracer is not None:
+        raise RuntimeError("A trace is already being recorded.")
+    _active_tracer = Tracer(Path(path))
+
+
+def stop_trace() -> Optional[Path]:
+    """Stop recording the active trace, and wait for it to be written. Returns
+    the path of the trace, or None if no trace was being recorded."""
+    global _active_tracer
+    tracer = _active_tracer
+    if tracer is None:
+        return None
+    _active_tracer = None
+    tracer.close()
+    return tracer.path
+
+
+def traced_ids(message_ids: Any) -> list:
+    """Get a list of message IDs to attach to a span, truncated if long."""
+    return list(message_ids[:_MAX_TRACED_IDS])
+
+
+@contextlib.contextmanager
+def span_args(**args: Any) -> Generator[None, None, None]:
+    """Context for arguments that spans recorded later should share, like the
+    client and message IDs of the incoming message that's being handled. Tasks
+    created in this context and functions submitted to a
+    :class:`TracedThreadPoolExecutor` inherit the arguments."""
+    token = _span_args.set({**current_span_args(), **args})
+    try:
+        yield
+    finally:
+        _span_args.reset(token)
+
+
+def current_span_args() -> Dict[str, Any]:
+    """Get arguments set by :func:`span_args()`."""
+    return _span_args.get({})
+
+
+class Tracer:
+    """Records trace events to a file from a background thread."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._pid = os.getpid()
+        self._named_thread_ids: Set[int] = set()
+        self._queue: queue.SimpleQueue[Optional[Dict[str, Any]]] = queue.SimpleQueue()
+        self._writer = threading.Thread(
+            target=self._write, name="viser-trace-writer", daemon=True
+        )
+        self._writer.start()
+
+    @staticmethod
+    def now_us() -> float:
+        """Get the current timestamp, in microseconds."""
+        return time.perf_counter_ns() / 1000.0
+
+    def complete(
+        self,
+        name: str,
+        category: str,
+        start_us: float,
+        end_us: Optional[float] = None,
+        **args: Any,
+    ) -> None:
+        """Record a span that ran on the current thread."""
+        if end_us is None:
+            end_us = self.now_us()
+        thread_id = threading.get_ident()
+        if thread_id not in self._named_thread_ids:
+            self._named_thread_ids.add(thread_id)
+            self._queue.put(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": thread_id,
+                    "args": {"name": threading.current_thread().name},
+                }
+            )
+        self._queue.put(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start_us,
+                "dur": end_us - start_us,
+                "pid": self._pid,
+                "tid": thread_id,
+                "args": args,
+            }
+        )
+
+    def close(self) -> None:
+        """Finish writing the trace."""
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write(self) -> None:
+        with open(self.path, "w") as f:
+            f.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+            first = True
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    break
+                if not first:
+                    f.write(",\n")
+                first = False
+                f.write(json.dumps(event, default=str))
+            f.write("\n]}\n")
+
+
+class TracedThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool that records how long each submitted function waited for a
+    thread and how long it ran, while a trace is active."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        tracer = _active_tracer
+        if tracer is None:
+            return super().submit(fn, *args, **kwargs)
+
+        submitted_us = tracer.now_us()
+        name = getattr(fn, "__qualname__", type(fn).__name__)
+        context_args = current_span_args()
+
+        def traced() -> Any:
+            started_us = tracer.now_us()
+            tracer.complete(
+                "executor wait",
+                "callback",
+                submitted_us,
+                started_us,
+                callback=name,
+                **context_args,
+            )
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                tracer.complete(
+                    "callback", "callback", started_us, callback=name, **context_args
+                )
+
+        return super().submit(traced)
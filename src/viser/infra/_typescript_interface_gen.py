@@ -177,6 +177,28 @@ def generate_typescript_interfaces(message_cls: Type[Message]) -> str:
             ]
         )
 
+    # Generate decoders for the compact wire format, where messages are sent as
+    # positional arrays. Type IDs are indices into `message_cls.get_subclasses()`;
+    # see `Message.as_serializable_tuple()`.
+    out_lines.append(
+        "// Decoders for compact messages: [type_id, field0, field1, ...]."
+    )
+    out_lines.append("const compactMessageDecoders: ((data: any[]) => Message)[] = [")
+    for cls in message_types:
+        fields = "".join(
+            f", {field.name}: data[{i + 1}]"
+            for i, field in enumerate(dataclasses.fields(cls))  # type: ignore
+        )
+        out_lines.append(f'  (data) => ({{ type: "{cls.__name__}"{fields} }}),')
+    out_lines.append("];")
+    out_lines.extend(
+        [
+            "export function decodeCompactMessage(data: any[]): Message {",
+            "  return compactMessageDecoders[data[0]](data);",
+            "}",
+        ]
+    )
+
     generated_typescript = "\n".join(out_lines) + "\n"
 
     # Add header and return.
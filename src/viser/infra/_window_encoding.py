@@ -0,0 +1,454 @@
+"""Wire formats for windows of outgoing messages.
+
+``client_api_version=1`` windows are a single zstd-compressed msgpack blob.
+
+``client_api_version=2`` windows keep large array payloads out of the msgpack
+structure. Each array is replaced by a msgpack extension value that references a
+buffer by index, and the raw buffers are appended after the header at 8-byte
+aligned offsets. Buffers are compressed individually, and only when that
+actually helps; float noise is sent as-is. The layout is::
+
+    u64 header_size             (decompressed msgpack header size)
+    u64 header_stored_size      (stored msgpack header size)
+    u64 buffer_count
+    buffer_count x [u64 offset, u64 stored_size, u64 size]
+    msgpack header, optionally zstd-compressed
+    <padding to 8 bytes> buffer 0 <padding to 8 bytes> buffer 1 ...
+
+The header and each buffer are zstd-compressed if and only if their stored
+size differs from their decompressed size. All integers are little-endian, and
+offsets are relative to the start of the frame.
+
+Clients that advertise the ``assets`` capability cache large buffers by content
+hash. For them, the buffer table is followed by ``buffer_count x [16-byte
+hash]``, where the hash is all zeros for buffers that aren't cached. Buffers
+that the client already has are left out of the frame, and their table entry
+is ``[0, 0, size]``. Identical buffers in a window are only stored once. See
+:func:`omit_held_assets()`. Clients that also advertise ``http-assets`` fetch
+large buffers that they don't have from ``/assets/{hash}``, so these are left
+out of the frame too.
+
+How payloads are compressed is decided by a :class:`CompressionPolicy`. Clients
+that advertise the ``zstd-dict`` capability receive msgpack headers compressed
+with a shared dictionary, trained on real message streams; see
+:func:`header_dictionary()`. Frames that use it have its dictionary ID set.
+
+Clients that advertise the ``compact`` capability receive each message in the
+header as a positional array, ``[type_id, field0, field1, ...]``, instead of a
+map with field names and a type string. See :meth:`Message.as_serializable_tuple`.
+
+Clients that advertise the ``resume`` capability receive an 8-byte trailer after
+each ``client_api_version=2`` window: an i64 resume ID. After receiving a window
+from the broadcast buffer, every message with an ID up to and including the
+resume ID has been delivered, so a client that reconnects can ask to resume from
+there. The trailer is -1 for windows that don't advance the resume ID.
+"""
+
+from __future__ import annotations
+
+import functools
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+import msgspec.msgpack
+import zstandard
+
+from ._asset_store import ASSET_HASH_BYTES, ASSET_MIN_BYTES, asset_hash
+from ._messages import Message
+from ._tracing import get_tracer
+
+OOB_BUFFER_EXT_TYPE = 1
+"""msgpack extension type used to reference out-of-band buffers."""
+
+OOB_MIN_BYTES = 16 * 1024
+"""Arrays smaller than this are embedded directly in the msgpack header."""
+
+_COMPRESSION_SAMPLE_BYTES = 64 * 1024
+_COMPRESSION_MIN_RATIO = 0.9
+
+ASSET_CACHE_CAPABILITY = "assets"
+"""Capability advertised by clients that cache large buffers by content hash.
+These clients send the hashes they have cached when they connect."""
+
+HTTP_ASSETS_CAPABILITY = "http-assets"
+"""Capability advertised by clients that can fetch buffers over HTTP."""
+
+COMPACT_CAPABILITY = "compact"
+"""Capability advertised by clients that can decode positional messages."""
+
+RESUME_CAPABILITY = "resume"
+"""Capability advertised by clients that can resume sessions after reconnecting."""
+
+ZSTD_DICT_CAPABILITY = "zstd-dict"
+"""Capability advertised by clients that can decompress msgpack headers that use
+:func:`header_dictionary()`."""
+
+HEADER_DICTIONARY_PATH = Path(__file__).parent / "_zstd_header_dictionary.bin"
+"""Bundled zstd dictionary for msgpack headers. It's trained on windows from
+representative sessions by ``train_zstd_dictionary.py``, and served to web
+clients from ``/zstd-dictionary``."""
+
+_DICTIONARY_MAX_BYTES = 64 * 1024
+"""Headers larger than this are compressed without the dictionary. It mostly
+helps small windows, and clients decode frames that use it more slowly."""
+
+
+@functools.lru_cache(maxsize=None)
+def header_dictionary() -> zstandard.ZstdCompressionDict:
+    """Get the bundled zstd dictionary for msgpack headers.
+
+    Live traffic is dominated by small windows of msgpack messages that repeat
+    the same type names, field names, and node names. A trained dictionary lets
+    zstd reference these from the first byte."""
+    return zstandard.ZstdCompressionDict(HEADER_DICTIONARY_PATH.read_bytes())
+
+
+class CompressionPolicy:
+    """Decides how outgoing payloads are compressed.
+
+    - The zstd level is chosen based on payload size: small windows are cheap to
+      compress harder, while large payloads use a fast level.
+    - If a dictionary is set, it's used for small msgpack headers. Clients need
+      to advertise support for it.
+    - Binary buffers that don't compress well are stored as-is.
+
+    Args:
+        dictionary: Optional zstd dictionary to use for msgpack headers.
+        levels: Sorted (max size in bytes, zstd level) pairs.
+    """
+
+    def __init__(
+        self,
+        dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+        levels: Sequence[Tuple[int, int]] = (
+            (16 * 1024, 6),
+            (1024 * 1024, 3),
+            (sys.maxsize, 1),
+        ),
+    ) -> None:
+        self.dictionary = dictionary
+        self.levels = tuple(levels)
+
+        # zstandard compressors aren't thread-safe, and windows can be encoded
+        # from multiple threads.
+        self._thread_local = threading.local()
+
+    def level_for_size(self, nbytes: int) -> int:
+        for max_size, level in self.levels:
+            if nbytes <= max_size:
+                return level
+        return self.levels[-1][1]
+
+    def _compressor(self, level: int, use_dictionary: bool) -> zstandard.ZstdCompressor:
+        compressors: Dict[Tuple[int, bool], zstandard.ZstdCompressor] = getattr(
+            self._thread_local, "compressors", {}
+        )
+        self._thread_local.compressors = compressors
+        key = (level, use_dictionary)
+        if key not in compressors:
+            compressors[key] = zstandard.ZstdCompressor(
+                level=level,
+                dict_data=self.dictionary if use_dictionary else None,
+            )
+        return compressors[key]
+
+    def compress(
+        self, data: Union[bytes, memoryview], use_dictionary: bool = False
+    ) -> bytes:
+        """Compress data into a zstd frame. If `use_dictionary` is set, small
+        payloads are compressed with the policy's dictionary."""
+        nbytes = memoryview(data).nbytes
+        tracer = get_tracer()
+        start_us = tracer.now_us() if tracer is not None else 0.0
+        out = self._compressor(
+            self.level_for_size(nbytes),
+            use_dictionary
+            and self.dictionary is not None
+            and nbytes <= _DICTIONARY_MAX_BYTES,
+        ).compress(data)
+        if tracer is not None:
+            tracer.complete("compress", "encode", start_us, nbytes=nbytes)
+        return out
+
+    def maybe_compress(
+        self, data: Union[bytes, memoryview], use_dictionary: bool = False
+    ) -> memoryview:
+        """Compress data if it's worth it. Data that doesn't compress well is
+        returned as-is, without copying. The result is compressed if and only if
+        its size is different from the input size."""
+        data = memoryview(data)
+        if data.nbytes > _COMPRESSION_SAMPLE_BYTES:
+            # Check a sample first to skip compressing incompressible data.
+            sample = data[:_COMPRESSION_SAMPLE_BYTES]
+            if len(self.compress(sample)) > _COMPRESSION_MIN_RATIO * sample.nbytes:
+                return data
+        compressed = self.compress(data, use_dictionary)
+        if len(compressed) >= data.nbytes:
+            return data
+        return memoryview(compressed)
+
+
+DEFAULT_COMPRESSION_POLICY = CompressionPolicy()
+
+EncodedWindow = Union[bytes, List[Union[bytes, memoryview]]]
+"""Encoded windows are either a single bytes object, or a list of chunks that
+should be sent as fragments of a single websocket message."""
+
+
+def encoded_nbytes(window: EncodedWindow) -> int:
+    """Number of bytes in an encoded window."""
+    if isinstance(window, bytes):
+        return len(window)
+    return sum(memoryview(chunk).nbytes for chunk in window)
+
+
+def encode_window_v1(messages: Sequence[Message], policy: CompressionPolicy) -> bytes:
+    """Encode a window as a single compressed msgpack blob."""
+    # Encode the message structure.
+    inner = msgspec.msgpack.encode(
+        {
+            "messages": tuple(message.as_serializable_dict() for message in messages),
+            "timestampSec": time.perf_counter(),
+        }
+    )
+    # Compress and prepend size header (8 bytes, little-endian uint64).
+    compressed = policy.compress(inner, use_dictionary=True)
+    return len(inner).to_bytes(8, "little") + compressed
+
+
+def encode_window_v2(
+    messages: Sequence[Message],
+    policy: CompressionPolicy,
+    compact_root: Optional[Type[Message]] = None,
+    hash_assets: bool = False,
+) -> List[Union[bytes, memoryview]]:
+    """Encode a window with large arrays sent as out-of-band buffers. If
+    `compact_root` is set, messages are sent as positional arrays with type IDs
+    relative to it. If `hash_assets` is set, large buffers are hashed for
+    clients with the ``assets`` capability.
+
+    Buffers in messages with a coalesce key aren't hashed. These are high-churn
+    updates, which aren't worth hashing or caching on clients."""
+    buffers = _BufferTable(hash_assets)
+    header = msgspec.msgpack.encode(
+        {
+            "messages": tuple(
+                _extract_buffers(
+                    message.as_serializable_dict()
+                    if compact_root is None
+                    else message.as_serializable_tuple(compact_root),
+                    buffers,
+                    hash_assets and message.coalesce_key() is None,
+                )
+                for message in messages
+            ),
+            "timestampSec": time.perf_counter(),
+        }
+    )
+    stored_header = policy.maybe_compress(header, use_dictionary=True)
+
+    # Compress buffers individually, skipping those that don't compress well.
+    stored_buffers = [policy.maybe_compress(buf) for buf in buffers.buffers]
+
+    buffer_count = len(buffers.buffers)
+    hash_table = b"" if buffers.hashes is None else b"".join(buffers.hashes)
+    preamble_size = 24 + 24 * buffer_count + len(hash_table)
+    offset = _align8(preamble_size + stored_header.nbytes)
+    table = bytearray()
+    chunks: List[Union[bytes, memoryview]] = [b"", stored_header]
+    prev_end = preamble_size + stored_header.nbytes
+    for buf, stored in zip(buffers.buffers, stored_buffers):
+        if offset != prev_end:
+            chunks.append(bytes(offset - prev_end))
+        chunks.append(stored)
+        table += struct.pack("<QQQ", offset, stored.nbytes, buf.nbytes)
+        prev_end = offset + stored.nbytes
+        offset = _align8(prev_end)
+
+    chunks[0] = struct.pack("<QQQ", len(header), stored_header.nbytes, buffer_count)
+    chunks[0] += bytes(table) + hash_table
+    return chunks
+
+
+_NO_HASH = bytes(ASSET_HASH_BYTES)
+
+
+def decode_window_v2(
+    frame: bytes,
+    decompressor: zstandard.ZstdDecompressor,
+    dictionary_decompressor: Optional[zstandard.ZstdDecompressor] = None,
+) -> Dict[str, Any]:
+    """Decode a window from :func:`encode_window_v2()`, for clients that don't
+    advertise the ``assets`` or ``resume`` capabilities. Out-of-band buffers
+    are decoded as `bytes` or `memoryview` objects.
+
+    Clients that advertise ``zstd-dict`` should pass in a decompressor created
+    with :func:`header_dictionary()`, which is used for headers that need it."""
+    view = memoryview(frame)
+    header_size, header_stored_size, buffer_count = struct.unpack_from("<QQQ", view)
+    buffers: List[Union[bytes, memoryview]] = []
+    for i in range(buffer_count):
+        offset, stored_size, size = struct.unpack_from("<QQQ", view, 24 + 24 * i)
+        stored = view[offset : offset + stored_size]
+        buffers.append(
+            stored
+            if stored_size == size
+            else decompressor.decompress(stored, max_output_size=size)
+        )
+
+    header_start = 24 + 24 * buffer_count
+    header: Union[bytes, memoryview] = view[
+        header_start : header_start + header_stored_size
+    ]
+    if header_stored_size != header_size:
+        # Frames compressed without the dictionary need to be decompressed
+        # without it too, since it changes the initial decoder state.
+        header_decompressor = (
+            dictionary_decompressor
+            if dictionary_decompressor is not None
+            and zstandard.get_frame_parameters(header).dict_id != 0
+            else decompressor
+        )
+        header = header_decompressor.decompress(header, max_output_size=header_size)
+
+    def ext_hook(code: int, data: memoryview) -> Any:
+        assert code == OOB_BUFFER_EXT_TYPE
+        return buffers[struct.unpack("<I", data)[0]]
+
+    return msgspec.msgpack.decode(header, ext_hook=ext_hook)
+
+
+def omit_held_assets(
+    chunks: List[Union[bytes, memoryview]],
+    held: Set[bytes],
+    fetchable: Optional[Callable[[bytes, int], bool]] = None,
+) -> Tuple[List[Union[bytes, memoryview]], int]:
+    """Leave buffers that a client already has out of a window encoded with
+    `hash_assets`, and add the hashes of buffers that are sent to `held`. This
+    is cheap: only the preamble is rewritten, and other chunks are reused.
+
+    If `fetchable` is passed in, it's called with the hash and size of each
+    buffer that the client doesn't have. Buffers that it returns True for are
+    left out too; the client fetches them over HTTP.
+
+    Returns the chunks to send and the number of buffer bytes that were left
+    out."""
+    preamble = chunks[0]
+    header_size, header_stored_size, buffer_count = struct.unpack_from("<QQQ", preamble)
+    hash_table_start = 24 + 24 * buffer_count
+    hashes = [
+        bytes(preamble[start : start + ASSET_HASH_BYTES])
+        for start in range(
+            hash_table_start,
+            hash_table_start + ASSET_HASH_BYTES * buffer_count,
+            ASSET_HASH_BYTES,
+        )
+    ]
+    if fetchable is None and not any(h != _NO_HASH and h in held for h in hashes):
+        held.update(h for h in hashes if h != _NO_HASH)
+        return chunks, 0
+
+    header = chunks[1]
+    out: List[Union[bytes, memoryview]] = [b"", header]
+    table = bytearray()
+    omitted_bytes = 0
+    chunk_index = 2
+    prev_end = len(preamble) + memoryview(header).nbytes
+    new_prev_end = prev_end
+    for i, buffer_hash in enumerate(hashes):
+        offset, stored_size, size = struct.unpack_from("<QQQ", preamble, 24 + 24 * i)
+        if offset != prev_end:
+            chunk_index += 1  # Skip padding.
+        stored = chunks[chunk_index]
+        chunk_index += 1
+        prev_end = offset + stored_size
+
+        if buffer_hash != _NO_HASH and (
+            buffer_hash in held
+            or (fetchable is not None and fetchable(buffer_hash, size))
+        ):
+            held.add(buffer_hash)
+            table += struct.pack("<QQQ", 0, 0, size)
+            omitted_bytes += stored_size
+            continue
+        if buffer_hash != _NO_HASH:
+            held.add(buffer_hash)
+        new_offset = _align8(new_prev_end)
+        if new_offset != new_prev_end:
+            out.append(bytes(new_offset - new_prev_end))
+        out.append(stored)
+        table += struct.pack("<QQQ", new_offset, stored_size, size)
+        new_prev_end = new_offset + stored_size
+
+    out[0] = (
+        struct.pack("<QQQ", header_size, header_stored_size, buffer_count)
+        + bytes(table)
+        + bytes(preamble[hash_table_start:])
+    )
+    return out, omitted_bytes
+
+
+def resume_trailer(resume_id: int) -> bytes:
+    """Trailer appended to windows sent to clients with the ``resume``
+    capability. This is per-client, so it's kept out of the shared encoding."""
+    return struct.pack("<q", resume_id)
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _BufferTable:
+    """Out-of-band buffers for a window. If `hash_assets` is set, the window has
+    a hash table; large buffers can be hashed, and identical hashed buffers are
+    only stored once."""
+
+    def __init__(self, hash_assets: bool) -> None:
+        self.buffers: List[memoryview] = []
+        self.hashes: Optional[List[bytes]] = [] if hash_assets else None
+        self._index_from_hash: Dict[bytes, int] = {}
+
+    def add(self, buffer: memoryview, hashed: bool) -> int:
+        # Hashes are computed from the bytes being sent, so they always match.
+        buffer_hash = _NO_HASH
+        if hashed and buffer.nbytes >= ASSET_MIN_BYTES:
+            buffer_hash = asset_hash(buffer)
+            if buffer_hash in self._index_from_hash:
+                return self._index_from_hash[buffer_hash]
+            self._index_from_hash[buffer_hash] = len(self.buffers)
+        self.buffers.append(buffer.cast("B"))
+        if self.hashes is not None:
+            self.hashes.append(buffer_hash)
+        return len(self.buffers) - 1
+
+
+def _extract_buffers(value: Any, buffers: _BufferTable, hashed: bool) -> Any:
+    """Recursively replace large buffers and byte strings with extension values
+    that reference them by index. If `hashed` is set, large buffers are hashed."""
+    if isinstance(value, (memoryview, bytes)):
+        view = memoryview(value)
+        if view.nbytes < OOB_MIN_BYTES:
+            return value
+        return msgspec.msgpack.Ext(
+            OOB_BUFFER_EXT_TYPE, struct.pack("<I", buffers.add(view, hashed))
+        )
+    elif isinstance(value, dict):
+        return {k: _extract_buffers(v, buffers, hashed) for k, v in value.items()}
+    elif isinstance(value, tuple):
+        return tuple(_extract_buffers(v, buffers, hashed) for v in value)
+    return value
@@ -0,0 +1,135 @@
+import dataclasses
+import http
+import json
+from unittest.mock import patch
+
+import numpy as np
+from websockets.datastructures import Headers
+
+import viser
+import viser._client_autobuild
+from viser import _messages
+from viser.infra._asset_store import ASSET_HASH_BYTES, AssetStore, asset_hash
+from viser.infra._infra import _asset_http_response, _parse_asset_inventory
+from viser.infra._messages import Message
+
+
+@dataclasses.dataclass
+class _BlobMessage(Message):
+    data: np.ndarray
+
+    def redundancy_key(self) -> str:
+        return "blob"
+
+
+def _store_with_payload() -> tuple:
+    payload = np.arange(2**20, dtype=np.uint8)
+    store = AssetStore()
+    store.register_message(0, store.intern_message(_BlobMessage(payload)))
+    return store, asset_hash(payload.data).hex(), payload.tobytes()
+
+
+def test_asset_route_serves_payloads() -> None:
+    store, name, payload = _store_with_payload()
+    response = _asset_http_response(store, name, Headers())
+    assert response.status_code == http.HTTPStatus.OK
+    assert bytes(response.body) == payload
+    assert response.headers["ETag"] == f'"{name}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+    # Revalidation.
+    response = _asset_http_response(
+        store, name, Headers({"If-None-Match": f'W/"{name}"'})
+    )
+    assert response.status_code == http.HTTPStatus.NOT_MODIFIED
+
+    # Unknown and malformed hashes.
+    for bad_name in ("00" * 16, "not-a-hash", name[:-2]):
+        response = _asset_http_response(store, bad_name, Headers())
+        assert response.status_code == http.HTTPStatus.NOT_FOUND
+
+    # Released payloads are no longer served.
+    store.release_message(0)
+    assert _asset_http_response(store, name, Headers()).status_code == 404
+
+
+def test_asset_route_ranges() -> None:
+    store, name, payload = _store_with_payload()
+    size = len(payload)
+    for spec, expected in (
+        ("bytes=0-9", payload[:10]),
+        ("bytes=100-", payload[100:]),
+        ("bytes=-5", payload[-5:]),
+        (f"bytes=10-{size * 2}", payload[10:]),
+    ):
+        response = _asset_http_response(store, name, Headers({"Range": spec}))
+        assert response.status_code == http.HTTPStatus.PARTIAL_CONTENT
+        assert bytes(response.body) == expected
+        assert response.headers["Content-Length"] == str(len(expected))
+
+    for spec in (f"bytes={size}-", "bytes=a-b"):
+        response = _asset_http_response(store, name, Headers({"Range": spec}))
+        assert response.status_code == http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response.headers["Content-Range"] == f"bytes */{size}"
+
+
+def test_served_payloads_match_their_hash() -> None:
+    """Changing an array after it's queued shouldn't change what's served under
+    its hash."""
+    payload = np.arange(2**20, dtype=np.uint8)
+    original = payload.tobytes()
+    store = AssetStore()
+    store.register_message(0, store.intern_message(_BlobMessage(payload)))
+    payload[:] = 0
+
+    response = _asset_http_response(store, asset_hash(original).hex(), Headers())
+    assert bytes(response.body) == original
+    assert (
+        _asset_http_response(
+            store, asset_hash(payload.data).hex(), Headers()
+        ).status_code
+        == 404
+    )
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_assigned_arrays_are_copied() -> None:
+    """Buffered updates shouldn't change when the assigned array does."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        point_cloud = server.scene.add_point_cloud(
+            "/points",
+            points=np.zeros((100_000, 3), dtype=np.float32),
+            colors=(255, 0, 0),
+            precision="float32",
+        )
+        points = np.ones((100_000, 3), dtype=np.float32)
+        point_cloud.points = points
+        points[:] = 2.0
+
+        (update,) = [
+            message
+            for message in server._websock_server._broadcast_buffer.message_from_id.values()
+            if isinstance(message, _messages.SceneNodeUpdateMessage)
+        ]
+        assert np.all(update.updates["points"] == 1.0)
+        assert np.all(point_cloud.points == 1.0)
+    finally:
+        server.stop()
+
+
+def test_malformed_inventories_are_empty() -> None:
+    payload_hash = "ab" * ASSET_HASH_BYTES
+    assert _parse_asset_inventory(json.dumps({"assets": [payload_hash]})) == {
+        bytes.fromhex(payload_hash)
+    }
+    for frame in (
+        "not json",
+        b"\xff",
+        "[1, 2]",
+        "null",
+        '{"assets": 3}',
+        '{"assets": "abc"}',
+        json.dumps({"assets": ["zz" * ASSET_HASH_BYTES, 5]}),
+    ):
+        assert _parse_asset_inventory(frame) == set()
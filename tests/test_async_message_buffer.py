@@ -0,0 +1,548 @@
+import asyncio
+import dataclasses
+
+import numpy as np
+
+from viser.infra import ClientId
+from viser.infra._async_message_buffer import AsyncMessageBuffer
+from viser.infra._messages import Message
+
+
+@dataclasses.dataclass
+class _DummyMessage(Message):
+    key: str
+    value: int
+
+    def redundancy_key(self) -> str:
+        return self.key
+
+
+def test_encoded_windows_are_shared() -> None:
+    """Windows polled by multiple clients should only be encoded once."""
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+
+        # Start both generators before any messages are pushed, like clients
+        # that are already connected.
+        gen_a = buffer.window_generator(0)
+        gen_b = buffer.window_generator(1)
+        next_a = asyncio.ensure_future(gen_a.__anext__())
+        next_b = asyncio.ensure_future(gen_b.__anext__())
+        await asyncio.sleep(0)
+
+        for i in range(10):
+            buffer.push(_DummyMessage(f"key_{i}", i))
+        window_a = await next_a
+        window_b = await next_b
+
+        encode_count = 0
+
+        def encode(messages) -> bytes:
+            nonlocal encode_count
+            encode_count += 1
+            return bytes(m.value for m in messages)
+
+        bytes_a = await buffer.get_or_encode_window(window_a, encode)
+        bytes_b = await buffer.get_or_encode_window(window_b, encode)
+        assert bytes_a is bytes_b
+        assert encode_count == 1
+
+        # Once both clients are done with the window, it should be evicted.
+        assert len(buffer.encoded_window_cache) == 1
+        buffer.set_done()
+        await gen_a.aclose()
+        await gen_b.aclose()
+        assert len(buffer.encoded_window_cache) == 0
+
+    asyncio.run(main())
+
+
+def test_excluded_client_windows_not_shared() -> None:
+    """Windows with messages excluded for one client shouldn't be reused."""
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        buffer.push(_DummyMessage("a", 1))
+        excluded = _DummyMessage("b", 2)
+        excluded.excluded_self_client = ClientId(0)
+        buffer.push(excluded)
+
+        gen_a = buffer.window_generator(0)
+        gen_b = buffer.window_generator(1)
+        window_a = await gen_a.__anext__()
+        window_b = await gen_b.__anext__()
+        assert window_a.cache_key() != window_b.cache_key()
+
+        encode = lambda messages: bytes(m.value for m in messages)
+        assert await buffer.get_or_encode_window(window_a, encode) == bytes([1])
+        assert await buffer.get_or_encode_window(window_b, encode) == bytes([1, 2])
+
+        buffer.set_done()
+        await gen_a.aclose()
+        await gen_b.aclose()
+
+    asyncio.run(main())
+
+
+@dataclasses.dataclass
+class _DummyArrayMessage(Message):
+    key: str
+    value: np.ndarray
+
+    def redundancy_key(self) -> str:
+        return self.key
+
+
+def test_windows_respect_byte_budget() -> None:
+    """Large messages should be sent alone, without delaying smaller messages."""
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(
+            asyncio.get_event_loop(),
+            persistent_messages=False,
+            max_window_bytes=1024,
+        )
+        buffer.push(_DummyMessage("a", 1))
+        buffer.push(_DummyMessage("b", 2))
+        buffer.push(_DummyArrayMessage("big", np.zeros(10_000, dtype=np.uint8)))
+        buffer.push(_DummyMessage("c", 3))
+
+        gen = buffer.window_generator(0)
+        windows = [(await gen.__anext__()).messages for _ in range(3)]
+        assert [len(w) for w in windows] == [2, 1, 1]
+        assert isinstance(windows[1][0], _DummyArrayMessage)
+
+        buffer.set_done()
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_priority_lanes() -> None:
+    """Interactive messages should overtake bulk data, without reordering
+    messages for the same scene node."""
+    from viser import _messages
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(
+            asyncio.get_event_loop(),
+            persistent_messages=False,
+            max_window_bytes=1024,
+        )
+        points = np.zeros((100_000, 3), dtype=np.float32)
+        buffer.push(
+            _messages.PointCloudMessage(
+                "/points",
+                _messages.PointCloudProps(
+                    points=points,
+                    colors=np.zeros(3, dtype=np.uint8),
+                    point_size=0.1,
+                    point_shape="square",
+                    precision="float32",
+                ),
+            )
+        )
+        buffer.push(_messages.SetPositionMessage("/points", (1.0, 2.0, 3.0)))
+        buffer.push(_messages.SetPositionMessage("/other", (1.0, 2.0, 3.0)))
+        buffer.push(_messages.GuiUpdateMessage("uuid", {"value": 1.0}))
+
+        gen = buffer.window_generator(0)
+        windows = [(await gen.__anext__()).messages for _ in range(2)]
+        assert [type(m).__name__ for m in windows[0]] == [
+            "GuiUpdateMessage",
+            "SetPositionMessage",
+        ]
+        assert windows[0][1].name == "/other"  # type: ignore
+        assert [type(m).__name__ for m in windows[1]] == ["PointCloudMessage"]
+        window = (await gen.__anext__()).messages
+        assert [type(m).__name__ for m in window] == ["SetPositionMessage"]
+
+        buffer.set_done()
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_camera_messages_overtake_bulk_data() -> None:
+    """Camera and notification messages shouldn't wait for large point clouds,
+    but should stay in order with each other."""
+    from viser import _messages
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(
+            asyncio.get_event_loop(),
+            persistent_messages=False,
+            max_window_bytes=1024,
+        )
+        buffer.push(
+            _messages.PointCloudMessage(
+                "/points",
+                _messages.PointCloudProps(
+                    points=np.zeros((100_000, 3), dtype=np.float32),
+                    colors=np.zeros(3, dtype=np.uint8),
+                    point_size=0.1,
+                    point_shape="square",
+                    precision="float32",
+                ),
+            )
+        )
+        buffer.push(_messages.SetCameraPositionMessage((1.0, 2.0, 3.0)))
+        buffer.push(_messages.SetCameraLookAtMessage((0.0, 0.0, 0.0)))
+        buffer.push(
+            _messages.NotificationMessage(
+                "show",
+                "notification",
+                _messages.NotificationProps("Title", "", False, True, None, None),
+            )
+        )
+        buffer.push(_messages.RemoveNotificationMessage("notification"))
+
+        gen = buffer.window_generator(0)
+        window = (await gen.__anext__()).messages
+        assert [type(m).__name__ for m in window] == [
+            "SetCameraPositionMessage",
+            "SetCameraLookAtMessage",
+            "NotificationMessage",
+            "RemoveNotificationMessage",
+        ]
+        window = (await gen.__anext__()).messages
+        assert [type(m).__name__ for m in window] == ["PointCloudMessage"]
+
+        buffer.set_done()
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_atomic_blocks_are_sent_in_one_window() -> None:
+    """Messages from an atomic block should be sent together and in order, even
+    if they have different priorities and go over the byte budget."""
+    from viser import _messages
+
+    def point_cloud(name: str) -> _messages.PointCloudMessage:
+        return _messages.PointCloudMessage(
+            name,
+            _messages.PointCloudProps(
+                points=np.zeros((10_000, 3), dtype=np.float32),
+                colors=np.zeros(3, dtype=np.uint8),
+                point_size=0.1,
+                point_shape="square",
+                precision="float32",
+            ),
+        )
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(
+            asyncio.get_event_loop(),
+            persistent_messages=False,
+            max_window_bytes=1024,
+        )
+        buffer.push(point_cloud("/before"))
+        buffer.atomic_start()
+        buffer.push(point_cloud("/points"))
+        buffer.push(_messages.SetCameraPositionMessage((1.0, 2.0, 3.0)))
+        buffer.push(_messages.SceneNodeUpdateMessage("/points", {"visible": False}))
+        buffer.atomic_end()
+        buffer.push(_messages.SetCameraLookAtMessage((0.0, 0.0, 0.0)))
+
+        gen = buffer.window_generator(0)
+        windows = [(await gen.__anext__()).messages for _ in range(3)]
+        assert [[type(m).__name__ for m in window] for window in windows] == [
+            ["PointCloudMessage"],
+            ["PointCloudMessage", "SetCameraPositionMessage", "SceneNodeUpdateMessage"],
+            ["SetCameraLookAtMessage"],
+        ]
+        assert windows[1][0].name == "/points"  # type: ignore
+
+        buffer.set_done()
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_lagging_clients_coalesce_updates() -> None:
+    """Pending updates for lagging clients should collapse to the newest value."""
+    from viser import _messages
+    from viser.infra import ClientSendStats
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(
+            asyncio.get_event_loop(), persistent_messages=False, max_window_size=1
+        )
+        send_stats = ClientSendStats()
+        gen = buffer.window_generator(0, send_stats)
+
+        buffer.push(_messages.SetPositionMessage("/a", (0.0, 0.0, 0.0)))
+        buffer.push(_messages.SetPositionMessage("/b", (0.0, 0.0, 0.0)))
+        buffer.push(_messages.SetPositionMessage("/c", (0.0, 0.0, 0.0)))
+        assert [m.name for m in (await gen.__anext__()).messages] == ["/a"]  # type: ignore
+
+        # "/b" and "/c" are now pending. Once the client falls behind, they should
+        # be replaced by newer values.
+        send_stats.lagging = True
+        buffer.push(_messages.SetPositionMessage("/b", (1.0, 0.0, 0.0)))
+        window = (await gen.__anext__()).messages
+        assert [m.name for m in window] == ["/c"]  # type: ignore
+        window = (await gen.__anext__()).messages
+        assert window[0].position == (1.0, 0.0, 0.0)  # type: ignore
+        assert send_stats.coalesced_message_count == 1
+
+        buffer.set_done()
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_removal_messages_kept_for_pending_clients() -> None:
+    """Removal messages should only be compacted away once every connected
+    client has consumed them."""
+    from viser import _messages
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        gen = buffer.window_generator(0)
+        buffer.push(
+            _messages.FrameMessage(
+                "/frame", _messages.FrameProps(True, 0.5, 0.05, 0.1, (0, 0, 0))
+            )
+        )
+        buffer.push(_messages.SetPositionMessage("/frame", (1.0, 2.0, 3.0)))
+        await gen.__anext__()
+
+        # The position update is pruned immediately, and the creation message is
+        # culled. The removal needs to reach the client before it's dropped.
+        buffer.push(_messages.RemoveSceneNodeMessage("/frame"))
+        assert len(buffer.message_from_id) == 1
+        buffer.compact()
+        assert len(buffer.message_from_id) == 1
+
+        window = await gen.__anext__()
+        assert [type(m).__name__ for m in window.messages] == ["RemoveSceneNodeMessage"]
+        buffer.set_done()
+        await gen.aclose()
+        assert len(buffer.message_from_id) == 0
+        assert len(buffer.ids_from_owner_key) == 0
+
+    asyncio.run(main())
+
+
+def test_joining_clients_receive_folded_snapshot() -> None:
+    """Prop updates should be folded into creation messages for clients that
+    join late, while connected clients receive every update."""
+    from viser import _messages
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        live_gen = buffer.window_generator(0)
+        live_next = asyncio.ensure_future(live_gen.__anext__())
+        await asyncio.sleep(0)
+
+        buffer.push(
+            _messages.PointCloudMessage(
+                "/points",
+                _messages.PointCloudProps(
+                    points=np.zeros((10, 3), dtype=np.float32),
+                    colors=np.zeros(3, dtype=np.uint8),
+                    point_size=0.1,
+                    point_shape="square",
+                    precision="float32",
+                ),
+            )
+        )
+        buffer.push(_messages.SetPositionMessage("/points", (1.0, 2.0, 3.0)))
+        new_points = np.ones((20, 3), dtype=np.float32)
+        buffer.push(_messages.SceneNodeUpdateMessage("/points", {"points": new_points}))
+        buffer.push(_messages.SceneNodeUpdateMessage("/points", {"point_size": 0.5}))
+
+        live_window = await live_next
+        assert len(live_window.messages) == 4
+        assert live_window.shareable
+
+        join_gen = buffer.window_generator(1)
+        join_window = await join_gen.__anext__()
+        assert not join_window.shareable
+        assert [type(m).__name__ for m in join_window.messages] == [
+            "PointCloudMessage",
+            "SetPositionMessage",
+        ]
+        props = join_window.messages[0].props  # type: ignore
+        assert props.points is new_points
+        assert props.point_size == 0.5
+
+        # Folding shouldn't modify buffered messages.
+        assert buffer.message_from_id[0].props.point_size == 0.1  # type: ignore
+
+        buffer.set_done()
+        await live_gen.aclose()
+        await join_gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_array_patches_fold_once_consumed() -> None:
+    """Array patches should reach connected clients as-is, then be merged into
+    the creation message so joining clients receive the current array."""
+    from viser import _messages
+
+    def patch(rows: list, value: int) -> _messages.SceneNodeArrayPatchMessage:
+        return _messages.SceneNodeArrayPatchMessage.from_rows(
+            "/points",
+            "colors",
+            3,
+            np.array(rows),
+            np.full((len(rows), 3), value, dtype=np.uint8),
+        )
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        colors = np.zeros((10, 3), dtype=np.uint8)
+        buffer.push(
+            _messages.PointCloudMessage(
+                "/points",
+                _messages.PointCloudProps(
+                    points=np.zeros((10, 3), dtype=np.float32),
+                    colors=colors,
+                    point_size=0.1,
+                    point_shape="square",
+                    precision="float32",
+                ),
+            )
+        )
+        gen = buffer.window_generator(0)
+        await gen.__anext__()
+
+        buffer.push(patch([2, 3, 4], 1))
+        buffer.push(patch([4, 8], 2))
+        assert buffer.message_from_id[1].indices is None  # type: ignore
+        window = await gen.__anext__()
+        assert [type(m).__name__ for m in window.messages] == [
+            "SceneNodeArrayPatchMessage",
+            "SceneNodeArrayPatchMessage",
+        ]
+
+        # Once consumed, patches are merged into the creation message.
+        next_window = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0.05)
+        assert list(buffer.message_from_id.keys()) == [0]
+        folded = buffer.message_from_id[0].props.colors  # type: ignore
+        assert folded[:, 0].tolist() == [0, 0, 1, 1, 2, 0, 0, 0, 2, 0]
+        assert not np.any(colors)
+        assert not buffer.can_resume_from(1)
+
+        # Patches are dropped by full updates of the same property.
+        buffer.push(patch([0], 3))
+        buffer.push(
+            _messages.SceneNodeUpdateMessage("/points", {"colors": np.ones((5, 3))})
+        )
+        assert [type(m).__name__ for m in buffer.message_from_id.values()] == [
+            "PointCloudMessage",
+            "SceneNodeUpdateMessage",
+        ]
+        # Patches have random redundancy keys, which shouldn't be left behind.
+        assert sorted(buffer.id_from_redundancy_key.values()) == sorted(
+            buffer.message_from_id.keys()
+        )
+        window = await next_window
+        assert [type(m).__name__ for m in window.messages] == ["SceneNodeUpdateMessage"]
+
+        buffer.set_done()
+        await gen.aclose()
+        assert len(buffer.fold_ids) == 0
+        assert len(buffer.ids_from_superseding_key) == 0
+
+    asyncio.run(main())
+
+
+def test_merged_array_patches() -> None:
+    """Later patches should win when rows overlap, and contiguous results
+    shouldn't need indices."""
+    from viser import _messages
+
+    first = _messages.SceneNodeArrayPatchMessage.from_rows(
+        "/a", "points", 2, np.array([1, 3]), np.array([1, 1, 3, 3], dtype=np.uint8)
+    )
+    second = _messages.SceneNodeArrayPatchMessage.from_rows(
+        "/a", "points", 2, np.array([2, 3]), np.array([2, 2, 4, 4], dtype=np.uint8)
+    )
+    merged = first.fold(second)
+    assert isinstance(merged, _messages.SceneNodeArrayPatchMessage)
+    assert merged.indices is None and merged.start == 1
+    assert merged.values.tolist() == [1, 1, 2, 2, 4, 4]
+    assert first.fold(dataclasses.replace(second, prop_name="colors")) is None
+
+    array = np.zeros((3, 1), dtype=np.uint16)
+    assert merged.apply(array) is None
+    patched = first.apply(np.zeros((4, 1), dtype=np.uint16))
+    assert patched is not None
+    assert patched[:, 0].tolist() == [0, 257, 0, 3 * 257]
+
+
+def test_resume_from_cursor() -> None:
+    """Clients that resume a session should only receive the messages they
+    missed, unless a removal message they haven't seen was compacted away."""
+    from viser import _messages
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        for i in range(4):
+            buffer.push(_DummyMessage(f"key_{i}", i))
+        gen = buffer.window_generator(0)
+        window = await gen.__anext__()
+        assert window.resume_id == 3
+        await gen.aclose()
+
+        # While the client is away, removal messages after its last resume ID
+        # are retained.
+        buffer.retained_cursor_from_client[0] = window.resume_id
+        buffer.push(_DummyMessage("key_4", 4))
+        buffer.push(_messages.RemoveSceneNodeMessage("/frame"))
+        buffer.compact()
+        assert buffer.can_resume_from(window.resume_id)
+
+        gen = buffer.window_generator(0, resume_from=window.resume_id)
+        window = await gen.__anext__()
+        assert window.message_ids == (4, 5)
+        assert 0 not in buffer.retained_cursor_from_client
+        await gen.aclose()
+
+        # Without a retained cursor, the removal message is compacted and the
+        # client can't resume from before it.
+        buffer.compact()
+        assert not buffer.can_resume_from(3)
+        assert buffer.can_resume_from(5)
+        assert not buffer.can_resume_from(6)
+
+    asyncio.run(main())
+
+
+def test_identical_payloads_are_stored_once() -> None:
+    """Identical large arrays added under different names should share memory,
+    and be released when the messages that use them are removed."""
+    from viser import _messages
+
+    def point_cloud(name: str) -> _messages.PointCloudMessage:
+        return _messages.PointCloudMessage(
+            name,
+            _messages.PointCloudProps(
+                points=np.ones((100_000, 3), dtype=np.float32),
+                colors=np.zeros(3, dtype=np.uint8),
+                point_size=0.1,
+                point_shape="square",
+                precision="float32",
+            ),
+        )
+
+    async def main() -> None:
+        buffer = AsyncMessageBuffer(asyncio.get_event_loop(), persistent_messages=True)
+        for i in range(8):
+            buffer.push(point_cloud(f"/points_{i}"))
+        assert len(buffer.asset_store) == 1
+        points = [m.props.points for m in buffer.message_from_id.values()]  # type: ignore
+        assert all(p is points[0] for p in points)
+
+        for i in range(8):
+            buffer.push(_messages.RemoveSceneNodeMessage(f"/points_{i}"))
+        assert len(buffer.asset_store) == 0
+
+    asyncio.run(main())
@@ -67,3 +67,25 @@ def test_remove_gui_in_modal() -> None:
     assert len(internal_message_dict) > orig_len
     server._run_garbage_collector(force=True)
     assert len(internal_message_dict) == orig_len
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_add_remove_churn() -> None:
+    """Updates for removed scene nodes should be pruned as soon as the node is
+    removed, without waiting for the garbage collector."""
+
+    server = viser.ViserServer()
+
+    internal_message_dict = server._websock_server._broadcast_buffer.message_from_id
+    orig_len = len(internal_message_dict)
+
+    for i in range(100):
+        frame = server.scene.add_frame(f"/frame_{i}")
+        frame.position = (1.0, 2.0, 3.0)
+        frame.visible = False
+        frame.remove()
+
+    # Only the removal messages should be left.
+    assert len(internal_message_dict) == orig_len + 100
+    server._run_garbage_collector()
+    assert len(internal_message_dict) == orig_len
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import urllib.request
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import viser
+import viser._client_autobuild
+from viser.infra._window_encoding import header_dictionary
+
+
+@pytest.mark.parametrize(
+    "compact, dictionary_compression", [(True, True), (True, False), (False, True)]
+)
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_headless_client_mirrors_state(
+    compact: bool, dictionary_compression: bool
+) -> None:
+    server = viser.ViserServer(port=8192, verbose=False)
+    clicked = threading.Event()
+    camera_positions = []
+
+    # Clients count as connected after their first camera message.
+    server.on_client_connect(
+        lambda client: camera_positions.append(tuple(client.camera.position))
+    )
+    try:
+        server.scene.add_frame("/parent", position=(1.0, 2.0, 3.0))
+        server.scene.add_frame("/parent/child")
+        points = server.scene.add_point_cloud(
+            "/points",
+            points=np.zeros((100, 3), dtype=np.float32),
+            colors=(255, 0, 0),
+            point_size=0.1,
+        )
+        server.gui.add_button("Go").on_click(lambda _: clicked.set())
+        slider = server.gui.add_slider(
+            "Slider", min=0.0, max=10.0, step=1.0, initial_value=1.0
+        )
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(
+                url, compact=compact, dictionary_compression=dictionary_compression
+            ) as client:
+                await client.wait_until(
+                    lambda: (
+                        "/points" in client.scene
+                        and client.find_gui("Slider") is not None
+                    ),
+                    timeout=10.0,
+                )
+                assert client.scene["/points"]["type"] == "PointCloudMessage"
+                assert client.scene["/points"]["props"]["point_size"] == 0.1
+                # Positions are sent as float16 by default.
+                assert len(client.scene["/points"]["props"]["points"]) == 100 * 3 * 2
+                assert tuple(client.scene_attributes["/parent"]["position"]) == (
+                    1.0,
+                    2.0,
+                    3.0,
+                )
+
+                # Server -> client updates.
+                points.point_size = 0.5
+                server.scene.remove_by_name("/parent")
+                slider.value = 4.0
+                await client.wait_until(
+                    lambda: (
+                        "/parent/child" not in client.scene
+                        and client.scene["/points"]["props"]["point_size"] == 0.5
+                        and client.find_gui("Slider")["value"] == 4.0  # type: ignore
+                    ),
+                    timeout=10.0,
+                )
+                assert "/parent" not in client.scene
+
+                # Client -> server updates.
+                await client.send_camera(position=(0.0, 1.0, 2.0))
+                button = client.find_gui("Go")
+                assert button is not None
+                await client.click_button(button["uuid"])
+                await client.update_gui(client.find_gui("Slider")["uuid"], value=7.0)  # type: ignore
+                for _ in range(100):
+                    if clicked.is_set() and slider.value == 7.0 and camera_positions:
+                        break
+                    await asyncio.sleep(0.05)
+
+                assert client.stats.windows_received > 0
+                assert client.stats.first_window_sec is not None
+
+        asyncio.run(run())
+        assert camera_positions == [(0.0, 1.0, 2.0)]
+        assert clicked.is_set()
+        assert slider.value == 7.0
+    finally:
+        server.stop()
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_array_slice_assignment() -> None:
+    """Assigning to rows of an array prop should send only those rows, to both
+    connected and joining clients."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        points = server.scene.add_point_cloud(
+            "/points",
+            points=np.zeros((100, 3), dtype=np.float32),
+            colors=np.zeros((100, 3), dtype=np.uint8),
+            point_size=0.1,
+            precision="float32",
+        )
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/points" in client.scene, 10.0)
+                points.colors[10:20] = (255, 0, 0)
+                points.colors[[3, 50]] = 1.0
+                points.points[-1] = (1.0, 2.0, 3.0)
+                await client.wait_until(
+                    lambda: (
+                        client.received_count_from_type.get(
+                            "SceneNodeArrayPatchMessage", 0
+                        )
+                        == 3
+                    ),
+                    10.0,
+                )
+                assert "SceneNodeUpdateMessage" not in client.received_count_from_type
+                props = client.scene["/points"]["props"]
+                assert np.array_equal(
+                    np.frombuffer(props["colors"], np.uint8).reshape(100, 3),
+                    points.colors,
+                )
+
+            # Joining clients receive the merged array.
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/points" in client.scene, 10.0)
+                props = client.scene["/points"]["props"]
+                assert np.array_equal(
+                    np.frombuffer(props["points"], np.float32).reshape(100, 3),
+                    points.points,
+                )
+                assert np.array_equal(
+                    np.frombuffer(props["colors"], np.uint8).reshape(100, 3),
+                    points.colors,
+                )
+
+        asyncio.run(run())
+        assert points.colors[3].tolist() == [255, 255, 255]
+        assert points.points[-1].tolist() == [1.0, 2.0, 3.0]
+    finally:
+        server.stop()
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_zstd_dictionary_route() -> None:
+    """Web clients fetch the header dictionary before connecting."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        url = f"http://127.0.0.1:{server.get_port()}/zstd-dictionary"
+        with urllib.request.urlopen(url) as response:
+            assert response.read() == header_dictionary().as_bytes()
+    finally:
+        server.stop()
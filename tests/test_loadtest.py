@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import viser
+import viser._client_autobuild
+from viser._loadtest import (
+    _load_scenario,
+    _process_usage,
+    _resolve_scenario,
+    _run_levels,
+    _write_report,
+)
+
+
+def test_resolve_scenario(tmp_path: Path) -> None:
+    assert _resolve_scenario("animation").name == "animation.py"
+    with pytest.raises(FileNotFoundError):
+        _resolve_scenario("not_a_scenario")
+
+    path = tmp_path / "empty.py"
+    path.write_text("NUM_FRAMES = 3\n")
+    assert _resolve_scenario(str(path)) == path.resolve()
+    with pytest.raises(ValueError):
+        _load_scenario(path)
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_run_levels(tmp_path: Path) -> None:
+    scenario = _load_scenario(_resolve_scenario("animation"))
+    server = viser.ViserServer(port=8193, verbose=False)
+    try:
+        scenario.setup(server)
+        levels = asyncio.run(
+            _run_levels(
+                f"ws://localhost:{server.get_port()}",
+                levels=(1, 3),
+                expected_nodes=list(server.scene._handle_from_node_name.keys()),
+                sample_usage=lambda: _process_usage(os.getpid()),
+                ramp_per_sec=100.0,
+                hold_sec=0.2,
+                join_timeout_sec=10.0,
+            )
+        )
+    finally:
+        server.stop()
+
+    assert [level.num_clients for level in levels] == [1, 3]
+    assert [len(level.time_to_first_frame_sec) for level in levels] == [1, 2]
+    assert all(level.failed_joins == 0 for level in levels)
+
+    _write_report(tmp_path, "animation", levels)
+    results = json.loads((tmp_path / "results.json").read_text())
+    assert results["metadata"]["scenario"] == "animation"
+    assert [level["num_clients"] for level in results["levels"]] == [1, 3]
+    assert "<svg" in (tmp_path / "report.html").read_text()
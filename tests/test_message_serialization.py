@@ -0,0 +1,100 @@
+from typing import Any, Dict
+from unittest.mock import patch
+
+import msgspec.msgpack
+import numpy as np
+
+import viser
+import viser._client_autobuild
+from viser import _messages
+from viser.infra._messages import (
+    Message,
+    _prepare_for_deserialization,
+    _prepare_for_serialization,
+    get_type_hints_cached,
+)
+
+
+def _reference_serializable_dict(message: Message) -> Dict[str, Any]:
+    hints = get_type_hints_cached(type(message))
+    out = {k: _prepare_for_serialization(v, hints[k]) for k, v in vars(message).items()}
+    out["type"] = type(message).__name__
+    return out
+
+
+def _reference_deserialize(raw: bytes) -> Message:
+    def lists_to_tuple(obj: Any) -> Any:
+        if isinstance(obj, list):
+            return tuple(lists_to_tuple(x) for x in obj)
+        elif isinstance(obj, dict):
+            return {k: lists_to_tuple(v) for k, v in obj.items()}
+        return obj
+
+    mapping = lists_to_tuple(msgspec.msgpack.decode(raw))
+    message_type = Message._subclass_from_type_string()[mapping.pop("type")]
+    hints = get_type_hints_cached(message_type)
+    return message_type(
+        **{k: _prepare_for_deserialization(v, hints[k]) for k, v in mapping.items()}
+    )
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_serialization_matches_reference() -> None:
+    """Compiled per-class serializers should produce identical bytes."""
+    server = viser.ViserServer()
+    server.scene.add_frame("/frame", position=np.array([1.0, 2.0, 3.0]))
+    points = server.scene.add_point_cloud(
+        "/points",
+        points=np.random.default_rng(0).normal(size=(100, 3)),
+        colors=(255, 0, 0),
+        point_size=np.float32(0.1),  # type: ignore
+    )
+    points.point_size = np.float64(0.2)  # type: ignore
+    server.scene.add_box("/box", color=(1, 2, 3), dimensions=(1, 2, 3))
+    server.scene.add_label("/label", "hello")
+    server.gui.add_slider("slider", 0, 10, 1, np.int64(5))  # type: ignore
+    server.gui.add_vector3("vector", (1.0, 2.0, 3.0))
+    server.gui.add_dropdown("dropdown", ("a", "b"))
+    with server.gui.add_folder("folder"):
+        server.gui.add_button("button")
+
+    messages = list(server._websock_server._broadcast_buffer.message_from_id.values())
+    messages.append(
+        _messages.SceneNodeUpdateMessage(
+            "/points", {"colors": np.zeros((100, 3), dtype=np.uint8), "size": 3}
+        )
+    )
+    assert len(messages) > 10
+    for message in messages:
+        assert msgspec.msgpack.encode(
+            message.as_serializable_dict()
+        ) == msgspec.msgpack.encode(_reference_serializable_dict(message))
+
+
+def test_deserialization_matches_reference() -> None:
+    """Compiled per-class deserializers should produce identical messages."""
+    messages = [
+        _messages.ViewerCameraMessage(
+            wxyz=(1.0, 0.0, 0.0, 0.0),
+            position=(1.0, 2.0, 3.0),
+            fov=1.0,
+            near=0.01,
+            far=100.0,
+            image_height=480,
+            image_width=640,
+            look_at=(0.0, 0.0, 0.0),
+            up_direction=(0.0, 0.0, 1.0),
+        ),
+        _messages.GuiUpdateMessage("uuid", {"value": [[1, 2], [3, 4]]}),
+        _messages.TransformControlsUpdateMessage(
+            "/controls", (1.0, 0.0, 0.0, 0.0), (1.0, 2.0, 3.0)
+        ),
+    ]
+    for message in messages:
+        raw = msgspec.msgpack.encode(message.as_serializable_dict())
+        # JavaScript numbers are untyped; integers should still come back as floats.
+        raw = raw.replace(msgspec.msgpack.encode(1.0), msgspec.msgpack.encode(1))
+        out = Message.deserialize(raw)
+        reference = _reference_deserialize(raw)
+        assert type(out) is type(reference)
+        assert vars(out) == vars(reference)
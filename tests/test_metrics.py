@@ -0,0 +1,53 @@
+import urllib.request
+from unittest.mock import patch
+
+import numpy as np
+
+import viser
+import viser._client_autobuild
+from viser.infra._metrics import Histogram
+
+
+def test_histogram() -> None:
+    histogram = Histogram((1, 2, 4))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1, 3, 3, 10):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [2, 0, 2, 1]
+    assert histogram.count == 5
+    assert histogram.sum == 17.5
+    assert histogram.quantile(0.4) == 1
+    assert histogram.quantile(0.8) == 4
+    assert histogram.quantile(1.0) == float("inf")
+
+    merged = histogram.merged(histogram)
+    assert merged.bucket_counts == [4, 0, 4, 2]
+    assert histogram.count == 5
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_stats_and_metrics_route() -> None:
+    server = viser.ViserServer(port=8190, metrics_route=True, verbose=False)
+    try:
+        for i in range(3):
+            server.scene.add_point_cloud(
+                f"/points/{i}",
+                points=np.zeros((10, 3), dtype=np.float32),
+                colors=(255, 0, 0),
+            )
+
+        stats = server.get_stats()
+        assert stats.connected_clients == 0
+        assert stats.callback_queue_depth == 0
+        assert stats.pushed_count_from_type["PointCloudMessage"] == 3
+        assert stats.buffered_messages >= 3
+
+        port = server.get_port()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            body = response.read().decode()
+        assert 'viser_messages_pushed_total{type="PointCloudMessage"} 3' in body
+        assert 'viser_window_encode_seconds_bucket{le="+Inf"}' in body
+        assert "viser_connected_clients 0" in body
+    finally:
+        server.stop()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import viser
+import viser._client_autobuild
+from viser._point_cloud_lod import build_octree
+
+
+@pytest.mark.parametrize("num_points", [1, 1000, 300_000])
+def test_build_octree(num_points: int) -> None:
+    """Every point should be in exactly one node, inside of that node's cell."""
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(num_points, 3)).astype(np.float32)
+    colors = rng.integers(0, 256, size=(num_points, 3), dtype=np.uint8)
+    octree = build_octree(points, colors, points_per_node=1024)
+
+    assert octree.node_count.sum() == num_points
+    assert np.array_equal(
+        octree.node_start[1:], (octree.node_start + octree.node_count)[:-1]
+    )
+    assert octree.node_level[0] == 0
+    assert np.all(np.diff(octree.node_level) >= 0)
+
+    # Points and colors should be reordered together.
+    order = np.lexsort(points.T)
+    lod_order = np.lexsort(octree.points.T)
+    assert np.array_equal(points[order], octree.points[lod_order])
+    assert np.array_equal(colors[order], octree.colors[lod_order])
+
+    for node in range(octree.num_nodes):
+        start, count = octree.node_start[node], octree.node_count[node]
+        offsets = octree.points[start : start + count] - octree.node_center[node]
+        assert np.all(np.abs(offsets) <= octree.node_half_size[node] * (1 + 1e-5))
+
+        children = np.arange(
+            octree.child_start[node],
+            octree.child_start[node] + octree.child_count[node],
+        )
+        assert np.all(octree.node_level[children] == octree.node_level[node] + 1)
+        assert np.all(
+            octree.node_half_size[children] == octree.node_half_size[node] / 2
+        )
+        if octree.child_count[node] > 0:
+            assert count == 1024
+
+
+def test_build_octree_single_color() -> None:
+    points = np.random.default_rng(0).uniform(size=(5000, 3))
+    octree = build_octree(points, np.array([255, 0, 0], np.uint8), points_per_node=100)
+    assert octree.colors.shape == (3,)
+    assert octree.node_count.sum() == 5000
+    assert np.all(octree.node_count[octree.child_count > 0] == 100)
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_point_cloud_lod() -> None:
+    """Octree nodes should be streamed within the point budget, and evicted
+    when they leave the view."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        points = np.random.default_rng(0).uniform(-1.0, 1.0, size=(200_000, 3))
+        lod = server.scene.add_point_cloud_lod(
+            "/lod",
+            points=points,
+            colors=(255, 0, 0),
+            point_budget=50_000,
+            points_per_node=4096,
+        )
+
+        def num_points(client: viser.HeadlessClient) -> int:
+            nodes = client.point_cloud_lod_nodes.get("/lod", {})
+            return sum(len(node["points"]) // 6 for node in nodes.values())
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/lod" in client.scene, 10.0)
+                await client.send_camera(position=(0.0, 0.0, -100.0))
+                await client.wait_until(lambda: num_points(client) > 0, 10.0)
+                far_nodes = len(client.point_cloud_lod_nodes["/lod"])
+
+                await client.send_camera(position=(0.0, 0.0, -1.5))
+                await client.wait_until(
+                    lambda: len(client.point_cloud_lod_nodes["/lod"]) > far_nodes,
+                    10.0,
+                )
+                await asyncio.sleep(0.5)
+                assert 0 < num_points(client) <= 50_000
+
+                # Looking away from the points.
+                await client.send_camera(
+                    wxyz=(0.0, 0.0, 1.0, 0.0), position=(0.0, 0.0, -3.0)
+                )
+                await client.wait_until(lambda: num_points(client) == 0, 10.0)
+
+        asyncio.run(run())
+        assert lod.octree.node_count.sum() == 200_000
+
+        # Per-client state is dropped once clients disconnect.
+        streamer = lod._streamer
+        deadline = time.time() + 5.0
+        while len(streamer._stream_from_client) > 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(streamer._stream_from_client) == 0
+        assert len(streamer._detach) == 2
+    finally:
+        server.stop()
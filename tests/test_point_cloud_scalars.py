@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import viser
+import viser._client_autobuild
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_point_cloud_scalars() -> None:
+    """Changing how scalar attributes are displayed shouldn't resend them."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        points = np.random.default_rng(0).uniform(size=(1000, 3))
+        point_cloud = server.scene.add_point_cloud(
+            "/points",
+            points,
+            colors=(255, 0, 0),
+            scalars={"height": points[:, 2], "label": np.arange(1000) % 4},
+            color_by="height",
+        )
+        assert point_cloud.scalars is not None
+        assert point_cloud.scalars.dtype == np.float16
+        assert point_cloud.scalar_names == ("height", "label")
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/points" in client.scene, 10.0)
+                props = client.scene["/points"]["props"]
+                scalars = np.frombuffer(props["scalars"], np.float16).reshape(1000, 2)
+                assert np.array_equal(scalars, point_cloud._impl.props.scalars)
+
+                point_cloud.color_by = "label"
+                point_cloud.colormap = "magma"
+                point_cloud.scalar_visible_range = (1.0, 2.0)
+                await client.wait_until(
+                    lambda: props["scalar_visible_range"] == [1.0, 2.0], 10.0
+                )
+                assert props["color_by"] == "label"
+                assert props["colormap"] == "magma"
+                assert client.received_count_from_type["SceneNodeUpdateMessage"] == 3
+
+        asyncio.run(run())
+        assert point_cloud.scalar_visible_range == (1.0, 2.0)
+    finally:
+        server.stop()
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_point_cloud_scalar_dtypes() -> None:
+    """Scalars that don't fit in float16 should be sent as float32, and points
+    can only be colored by attributes that exist."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        points = np.zeros((3, 3))
+        scalars = {
+            "uint8": np.array([0, 1, 255], dtype=np.uint8),
+            "small": np.array([0.0, np.inf, -1e4]),
+            "large": np.array([0.0, 1.0, 1e5]),
+        }
+        for names, dtype in (
+            (("uint8",), np.uint8),
+            (("uint8", "small"), np.float16),
+            (("small", "large"), np.float32),
+        ):
+            point_cloud = server.scene.add_point_cloud(
+                "/points",
+                points,
+                colors=(255, 0, 0),
+                scalars={name: scalars[name] for name in names},
+            )
+            assert point_cloud.scalars is not None
+            assert point_cloud.scalars.dtype == dtype
+            assert np.all(np.isin(point_cloud.scalars, list(scalars.values())))
+
+        point_cloud.color_by = "large"
+        with pytest.raises(AssertionError):
+            point_cloud.color_by = "missing"
+        assert point_cloud.color_by == "large"
+    finally:
+        server.stop()
@@ -0,0 +1,102 @@
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+
+import viser
+import viser._client_autobuild
+from viser import _messages
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_point_cloud_stream() -> None:
+    """Appended points should be sent as patches, and overwrite the oldest
+    points once the capacity is reached."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        stream = server.scene.add_point_cloud_stream(
+            "/stream", capacity=10, precision="float32"
+        )
+
+        def mirrored_points(client: viser.HeadlessClient) -> np.ndarray:
+            props = client.scene["/stream"]["props"]
+            points = np.frombuffer(props["points"], np.float32).reshape(10, 3)
+            return points[: props["num_points"]]
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/stream" in client.scene, 10.0)
+                for i in range(4):
+                    stream.append(np.full((3, 3), float(i)), (255, 0, 0))
+                await client.wait_until(
+                    lambda: client.scene["/stream"]["props"]["head"] == 2, 10.0
+                )
+                await client.wait_until(
+                    lambda: np.array_equal(mirrored_points(client), stream.points),
+                    10.0,
+                )
+                # Points and colors for each append. The last one wraps around.
+                patch_count = client.received_count_from_type[
+                    "SceneNodeArrayPatchMessage"
+                ]
+                assert patch_count == 2 * 3 + 4
+
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(lambda: "/stream" in client.scene, 10.0)
+                await client.wait_until(
+                    lambda: client.scene["/stream"]["props"]["head"] == 2, 10.0
+                )
+                assert np.array_equal(mirrored_points(client), stream.points)
+
+        asyncio.run(run())
+        assert stream.num_points == 10
+        assert stream.points[:, 0].tolist() == [3, 3, 0, 1, 1, 1, 2, 2, 2, 3]
+        assert np.all(stream.colors == (255, 0, 0))
+    finally:
+        server.stop()
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_point_cloud_stream_large_appends() -> None:
+    """Appends of most of the capacity, including ones that wrap around, should
+    still be sent as patches."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        stream = server.scene.add_point_cloud_stream(
+            "/stream", capacity=10, precision="float32"
+        )
+        buffer = server._websock_server._broadcast_buffer
+        first_id = buffer.message_counter
+        stream.append(np.full((8, 3), 1.0), (255, 0, 0))
+        stream.append(np.full((9, 3), 2.0), (0, 255, 0))
+        with buffer.buffer_lock:
+            messages = [
+                message
+                for message_id, message in buffer.message_from_id.items()
+                if message_id >= first_id
+            ]
+        assert not any(
+            isinstance(message, _messages.SceneNodeUpdateMessage)
+            and ("points" in message.updates or "colors" in message.updates)
+            for message in messages
+        )
+
+        async def run() -> None:
+            url = f"ws://localhost:{server.get_port()}"
+            async with viser.HeadlessClient(url) as client:
+                await client.wait_until(
+                    lambda: (
+                        "/stream" in client.scene
+                        and client.scene["/stream"]["props"]["head"] == 7
+                    ),
+                    10.0,
+                )
+                props = client.scene["/stream"]["props"]
+                points = np.frombuffer(props["points"], np.float32).reshape(10, 3)
+                assert np.array_equal(points, stream.points)
+
+        asyncio.run(run())
+        assert stream.points[:, 0].tolist() == [2, 2, 2, 2, 2, 2, 2, 1, 2, 2]
+    finally:
+        server.stop()
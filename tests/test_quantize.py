@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import viser
+import viser._client_autobuild
+from viser import _messages
+from viser._quantize import (
+    dequantize_positions,
+    quantization_error,
+    quantize_positions,
+)
+
+
+@pytest.mark.parametrize("num_points", [0, 1, 1000, 100_000])
+@pytest.mark.parametrize("dtype", [np.float16, np.float32, np.float64])
+def test_quantize_positions(num_points: int, dtype: type) -> None:
+    """Dequantized positions should be within the reported error."""
+    rng = np.random.default_rng(0)
+    positions = (rng.normal(size=(num_points, 3)) * (1.0, 10.0, 0.0)).astype(dtype)
+    quantized, bounds = quantize_positions(positions)
+    assert quantized.dtype == np.uint16 and quantized.shape == positions.shape
+    if num_points > 1:
+        # Bounding boxes are tight.
+        assert quantized[:, :2].min() == 0 and quantized[:, :2].max() == 65535
+    error = np.abs(dequantize_positions(quantized, bounds) - positions)
+    assert np.all(error <= quantization_error(bounds) * (1.0 + 1e-9))
+
+
+def test_quantize_georeferenced_positions() -> None:
+    """Precision shouldn't depend on the distance from the origin."""
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0.0, 100.0, size=(10_000, 3)) + (4.5e5, 5.4e6, 100.0)
+    quantized, bounds = quantize_positions(positions)
+    error = quantization_error(bounds)
+    assert error < 1e-3
+    assert np.all(np.abs(dequantize_positions(quantized, bounds) - positions) <= error)
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_quantized_handles() -> None:
+    """Handles should read dequantized positions, and re-quantize assigned
+    positions."""
+    server = viser.ViserServer(port=8192, verbose=False)
+    try:
+        rng = np.random.default_rng(0)
+        points = rng.uniform(-1.0, 1.0, size=(100, 3)) + (1e5, 0.0, 0.0)
+        point_cloud = server.scene.add_point_cloud(
+            "/points", points, (255, 0, 0), precision="uint16"
+        )
+        assert point_cloud._impl.props.points.dtype == np.uint16
+        error = point_cloud.quantization_error
+        assert error is not None
+        assert np.all(np.abs(point_cloud.points - points) <= error)
+
+        # Quantized positions can be assigned from float64 arrays.
+        point_cloud.points = points * 2.0  # type: ignore
+        assert point_cloud._impl.props.points_bounds is not None
+        assert point_cloud._impl.props.points_bounds[0][0] > 1.9e5
+        assert np.all(np.abs(point_cloud.points - points * 2.0) <= 2.0 * error)
+
+        # Dequantized positions are a copy, so assigning to them would do
+        # nothing.
+        with pytest.raises(ValueError):
+            point_cloud.points[0] = (0.0, 0.0, 0.0)
+
+        point_cloud.precision = "float32"
+        assert point_cloud._impl.props.points.dtype == np.float32
+        assert point_cloud.quantization_error is None
+        assert point_cloud._impl.props.points_bounds is None
+
+        # Points are re-encoded together with their precision and bounds.
+        (update,) = [
+            message
+            for message in server._websock_server._broadcast_buffer.message_from_id.values()
+            if isinstance(message, _messages.SceneNodeUpdateMessage)
+            and "precision" in message.updates
+        ]
+        assert list(update.updates.keys()) == ["precision", "points_bounds", "points"]
+
+        mesh = server.scene.add_mesh_simple(
+            "/mesh", points, np.array([[0, 1, 2]]), precision="uint16"
+        )
+        assert mesh._impl.props.vertices.dtype == np.uint16
+        assert mesh.quantization_error is not None
+        assert np.all(np.abs(mesh.vertices - points) <= mesh.quantization_error)
+
+        batched = server.scene.add_batched_meshes_simple(
+            "/batched",
+            points,
+            np.array([[0, 1, 2]]),
+            batched_wxyzs=np.tile((1.0, 0.0, 0.0, 0.0), (100, 1)),
+            batched_positions=points,
+            positions_precision="uint16",
+        )
+        assert batched._impl.props.batched_positions.dtype == np.uint16
+        assert batched._impl.props.vertices.dtype == np.float32
+        batched.batched_positions = points + 1.0  # type: ignore
+        assert batched.quantization_error is not None
+        assert np.all(
+            np.abs(batched.batched_positions - (points + 1.0))
+            <= batched.quantization_error
+        )
+    finally:
+        server.stop()
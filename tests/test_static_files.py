@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+import http
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from websockets.datastructures import Headers
+
+from viser.infra import _static_files
+from viser.infra._static_files import StaticFileServer, precompress_directory
+
+
+def _get(server: StaticFileServer, relpath: str, **headers: str):
+    return asyncio.run(server.respond(relpath, Headers(headers)))
+
+
+def test_etags_and_revalidation(tmp_path: Path) -> None:
+    source = b"<html>" + b"hello world " * 1000 + b"</html>"
+    (tmp_path / "index.html").write_bytes(source)
+    server = StaticFileServer(tmp_path)
+
+    response = _get(server, "index.html")
+    assert response.status_code == http.HTTPStatus.OK
+    assert response.body == source
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Content-Encoding" not in response.headers
+    etag = response.headers["ETag"]
+
+    response = _get(server, "index.html", **{"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.body) == source
+    assert response.headers["ETag"] != etag
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+    # Either representation can be revalidated.
+    for tag in (etag, response.headers["ETag"]):
+        response = _get(server, "index.html", **{"If-None-Match": tag})
+        assert response.status_code == http.HTTPStatus.NOT_MODIFIED
+
+    # Changing the file changes its ETag.
+    (tmp_path / "index.html").write_bytes(source + b"\n")
+    response = _get(server, "index.html", **{"If-None-Match": etag})
+    assert response.status_code == http.HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+
+
+def test_hashed_files_and_sidecars(tmp_path: Path) -> None:
+    (tmp_path / "assets").mkdir()
+    source = b"console.log(1);" * 1000
+    (tmp_path / "assets" / "index-B2x9fLqa.js").write_bytes(source)
+    (tmp_path / "image.png").write_bytes(b"\x89PNG" * 1000)
+    precompress_directory(tmp_path)
+    assert (tmp_path / "assets" / "index-B2x9fLqa.js.gz").exists()
+    assert not (tmp_path / "image.png.gz").exists()
+
+    # Sidecars are served as-is.
+    (tmp_path / "assets" / "index-B2x9fLqa.js.gz").write_bytes(gzip.compress(b"ok"))
+    server = StaticFileServer(tmp_path)
+    response = _get(
+        server, "assets/index-B2x9fLqa.js", **{"Accept-Encoding": "gzip;q=1.0"}
+    )
+    assert gzip.decompress(response.body) == b"ok"
+    assert "immutable" in response.headers["Cache-Control"]
+
+    response = _get(server, "image.png", **{"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Content-Type"] == "image/png"
+
+    response = _get(
+        server, "assets/index-B2x9fLqa.js", **{"Accept-Encoding": "gzip;q=0"}
+    )
+    assert response.body == source
+
+
+def test_paths_outside_root(tmp_path: Path) -> None:
+    (tmp_path / "root").mkdir()
+    (tmp_path / "secret.txt").write_text("secret")
+    server = StaticFileServer(tmp_path / "root")
+    for relpath in ("../secret.txt", "missing.html", "."):
+        assert _get(server, relpath).status_code == http.HTTPStatus.NOT_FOUND
+
+
+@patch.object(_static_files, "_MAX_FILE_ENTRIES", 8)
+def test_cache_is_bounded(tmp_path: Path) -> None:
+    server = StaticFileServer(tmp_path, max_cache_bytes=64 * 1024)
+    for i in range(32):
+        (tmp_path / f"{i}.bin").write_bytes(bytes([i]) * 4096)
+        assert _get(server, f"{i}.bin").body == bytes([i]) * 4096
+    assert server._cache_bytes <= 64 * 1024
+    assert len(server._etag_from_file) == 8
+
+
+def test_incompressible_files_are_remembered(tmp_path: Path) -> None:
+    source = np.random.default_rng(0).bytes(16 * 1024)
+    (tmp_path / "random.txt").write_bytes(source)
+    server = StaticFileServer(tmp_path)
+    with patch.object(
+        _static_files, "_compress", wraps=_static_files._compress
+    ) as compress:
+        for _ in range(3):
+            response = _get(server, "random.txt", **{"Accept-Encoding": "gzip"})
+            assert "Content-Encoding" not in response.headers
+            assert response.body == source
+    assert compress.call_count == 1
@@ -0,0 +1,121 @@
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import msgspec
+import numpy as np
+import websockets
+
+import viser
+import viser._client_autobuild
+
+
+@patch.object(viser._client_autobuild, "ensure_client_is_built", lambda: None)
+def test_trace_covers_message_lifecycle(tmp_path: Path) -> None:
+    server = viser.ViserServer(port=8191, verbose=False)
+    try:
+        camera_updates = []
+
+        @server.on_client_connect
+        def _(client: viser.ClientHandle) -> None:
+            client.camera.on_update(camera_updates.append)
+            client.scene.add_frame("/client_frame")
+
+        trace_path = tmp_path / "trace.json"
+        server.start_trace(trace_path)
+        server.scene.add_point_cloud(
+            "/points",
+            points=np.zeros((100, 3), dtype=np.float32),
+            colors=(255, 0, 0),
+        )
+
+        async def connect() -> None:
+            async with websockets.connect(
+                f"ws://localhost:{server.get_port()}",
+                subprotocols=[websockets.Subprotocol(f"viser-v{viser.__version__}")],
+            ) as ws:
+                camera = dict(
+                    type="ViewerCameraMessage",
+                    wxyz=(1.0, 0.0, 0.0, 0.0),
+                    position=(0.0, 0.0, 0.0),
+                    fov=1.0,
+                    near=0.01,
+                    far=100.0,
+                    image_height=10,
+                    image_width=10,
+                    look_at=(0.0, 0.0, 0.0),
+                    up_direction=(0.0, 0.0, 1.0),
+                )
+                await ws.send(msgspec.msgpack.encode(camera))
+                await ws.send(msgspec.msgpack.encode(camera))
+                try:
+                    while True:
+                        await asyncio.wait_for(ws.recv(), 0.5)
+                except asyncio.TimeoutError:
+                    pass
+
+        asyncio.run(connect())
+        assert server.stop_trace() == trace_path
+        assert server.stop_trace() is None
+    finally:
+        server.stop()
+
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    names = {event["name"] for event in events}
+    for name in (
+        "push",
+        "window",
+        "encode",
+        "compress",
+        "send",
+        "decode",
+        "dispatch",
+        "executor wait",
+        "callback",
+    ):
+        assert name in names, name
+
+    # Spans can be correlated by message and client IDs.
+    (push,) = [
+        e
+        for e in events
+        if e["name"] == "push" and e["args"]["type"] == "PointCloudMessage"
+    ]
+    assert any(
+        e["name"] == "send" and push["args"]["message_id"] in e["args"]["message_ids"]
+        for e in events
+    )
+    assert all(
+        e["args"]["client_id"] == 0
+        for e in events
+        if e["name"] in ("decode", "dispatch", "send")
+    )
+
+    # Outgoing messages for a single client are traced with its ID, since
+    # message IDs are counted per buffer.
+    client_pushes = [
+        e for e in events if e["name"] == "push" and e["args"]["type"] == "FrameMessage"
+    ]
+    assert len(client_pushes) > 0
+    for push in client_pushes:
+        assert push["args"]["client_id"] == 0
+        assert not push["args"]["persistent"]
+        assert any(
+            e["name"] == "send"
+            and not e["args"]["persistent"]
+            and push["args"]["message_id"] in e["args"]["message_ids"]
+            for e in events
+        )
+
+    # Callbacks share the client and message IDs of the incoming message that
+    # triggered them.
+    decoded = {
+        (e["args"]["client_id"], e["args"]["message_id"])
+        for e in events
+        if e["name"] == "decode"
+    }
+    callbacks = [e for e in events if e["name"] in ("executor wait", "callback")]
+    assert len(callbacks) > 0
+    for e in callbacks:
+        assert (e["args"]["client_id"], e["args"]["message_id"]) in decoded
@@ -0,0 +1,261 @@
+import dataclasses
+import re
+import struct
+import sys
+from typing import Any, List
+
+import msgspec.msgpack
+import numpy as np
+import zstandard
+
+from viser import _messages
+from viser.infra import generate_typescript_interfaces
+from viser.infra._asset_store import ASSET_HASH_BYTES, asset_hash
+from viser.infra._window_encoding import (
+    DEFAULT_COMPRESSION_POLICY,
+    OOB_BUFFER_EXT_TYPE,
+    CompressionPolicy,
+    decode_window_v2,
+    encode_window_v2,
+    header_dictionary,
+    omit_held_assets,
+)
+
+
+def _decode_window_v2(frame: bytes, held: Any = None) -> Any:
+    """Decode a window. If `held` is set, the window is expected to have a hash
+    table, and buffers that were left out are looked up in `held`."""
+    header_size, header_stored_size, buffer_count = struct.unpack_from("<QQQ", frame)
+    decompressor = zstandard.ZstdDecompressor()
+    buffers: List[bytes] = []
+    for i in range(buffer_count):
+        offset, stored_size, size = struct.unpack_from("<QQQ", frame, 24 + 24 * i)
+        assert offset % 8 == 0
+        if held is not None and stored_size == 0:
+            hash_start = 24 + 24 * buffer_count + ASSET_HASH_BYTES * i
+            buffers.append(held[frame[hash_start : hash_start + ASSET_HASH_BYTES]])
+            continue
+        stored = frame[offset : offset + stored_size]
+        buffers.append(
+            stored
+            if stored_size == size
+            else decompressor.decompress(stored, max_output_size=size)
+        )
+
+    header_start = 24 + 24 * buffer_count
+    if held is not None:
+        header_start += ASSET_HASH_BYTES * buffer_count
+    header = frame[header_start : header_start + header_stored_size]
+    if header_stored_size != header_size:
+        header = decompressor.decompress(header, max_output_size=header_size)
+
+    def ext_hook(code: int, data: memoryview) -> Any:
+        assert code == OOB_BUFFER_EXT_TYPE
+        return buffers[struct.unpack("<I", data)[0]]
+
+    return msgspec.msgpack.decode(header, ext_hook=ext_hook), buffers
+
+
+def test_large_arrays_are_out_of_band() -> None:
+    points = np.random.default_rng(0).normal(size=(100_000, 3)).astype(np.float32)
+    colors = np.zeros((100_000, 3), dtype=np.uint8)
+    message = _messages.PointCloudMessage(
+        "/points",
+        _messages.PointCloudProps(
+            points=points,
+            colors=colors,
+            point_size=0.1,
+            point_shape="square",
+            precision="float32",
+        ),
+    )
+    chunks = encode_window_v2([message], DEFAULT_COMPRESSION_POLICY)
+    frame = b"".join(chunks)
+    decoded, buffers = _decode_window_v2(frame)
+
+    assert len(buffers) == 2
+    props = decoded["messages"][0]["props"]
+    assert np.array_equal(np.frombuffer(props["points"], np.float32), points.ravel())
+    assert np.array_equal(np.frombuffer(props["colors"], np.uint8), colors.ravel())
+
+    # Random floats should be sent as-is, without copying. Zeros should be
+    # compressed.
+    assert any(isinstance(c, memoryview) and c.obj is points for c in chunks)
+    assert struct.unpack_from("<QQQ", frame, 24 + 24)[1] < colors.nbytes
+
+
+def test_small_arrays_are_inline() -> None:
+    message = _messages.SetPositionMessage("/frame", (1.0, 2.0, 3.0))
+    decoded, buffers = _decode_window_v2(
+        b"".join(encode_window_v2([message], DEFAULT_COMPRESSION_POLICY))
+    )
+    assert len(buffers) == 0
+    assert decoded["messages"][0]["position"] == [1.0, 2.0, 3.0]
+
+
+def test_compression_levels() -> None:
+    """Small payloads should be compressed harder than large ones."""
+    policy = CompressionPolicy(levels=((1024, 9), (sys.maxsize, 1)))
+    assert policy.level_for_size(100) == 9
+    assert policy.level_for_size(1024 * 1024) == 1
+
+    small = msgspec.msgpack.encode({"messages": [{"type": "A"}] * 50})
+    assert zstandard.ZstdDecompressor().decompress(policy.compress(small)) == small
+
+
+def test_header_dictionary() -> None:
+    """Small headers should use the trained dictionary, and be smaller for it.
+    Large headers shouldn't use it."""
+    policy = CompressionPolicy(dictionary=header_dictionary())
+    decompressor = zstandard.ZstdDecompressor()
+    dictionary_decompressor = zstandard.ZstdDecompressor(dict_data=header_dictionary())
+
+    def header_frame(window_policy: CompressionPolicy, count: int) -> bytes:
+        messages = [
+            _messages.SetPositionMessage(f"/frames/{i}", (0.1 * i, 0.0, 1.0))
+            for i in range(count)
+        ]
+        return b"".join(encode_window_v2(messages, window_policy))
+
+    def stored_header(frame: bytes) -> bytes:
+        stored_size = struct.unpack_from("<QQQ", frame)[1]
+        return frame[24 : 24 + stored_size]
+
+    for count in (1, 20):
+        frame = header_frame(policy, count)
+        plain_frame = header_frame(DEFAULT_COMPRESSION_POLICY, count)
+        assert zstandard.get_frame_parameters(stored_header(frame)).dict_id == (
+            header_dictionary().dict_id()
+        )
+        assert len(frame) < len(plain_frame)
+        decoded = decode_window_v2(frame, decompressor, dictionary_decompressor)
+        assert decoded["messages"][count - 1]["name"] == f"/frames/{count - 1}"
+
+    frame = header_frame(policy, 5000)
+    assert zstandard.get_frame_parameters(stored_header(frame)).dict_id == 0
+    decoded = decode_window_v2(frame, decompressor, dictionary_decompressor)
+    assert len(decoded["messages"]) == 5000
+
+
+def test_compact_messages() -> None:
+    """Compact messages should carry the same values as maps, in fewer bytes."""
+    messages: List[_messages.Message] = [
+        _messages.SetPositionMessage(f"/frame_{i}", (1.0, 2.0, 3.0)) for i in range(8)
+    ]
+    messages.append(
+        _messages.PointCloudMessage(
+            "/points",
+            _messages.PointCloudProps(
+                points=np.zeros((10_000, 3), dtype=np.float32),
+                colors=np.zeros(3, dtype=np.uint8),
+                point_size=0.1,
+                point_shape="square",
+                precision="float32",
+            ),
+        )
+    )
+    plain = b"".join(encode_window_v2(messages, DEFAULT_COMPRESSION_POLICY))
+    compact = b"".join(
+        encode_window_v2(messages, DEFAULT_COMPRESSION_POLICY, _messages.Message)
+    )
+    assert struct.unpack_from("<Q", compact)[0] < struct.unpack_from("<Q", plain)[0]
+
+    subclasses = _messages.Message.get_subclasses()
+    decoded_plain, _ = _decode_window_v2(plain)
+    decoded_compact, buffers = _decode_window_v2(compact)
+    assert len(buffers) == 1
+    for as_dict, as_list in zip(decoded_plain["messages"], decoded_compact["messages"]):
+        message_cls = subclasses[as_list[0]]
+        assert as_dict["type"] == message_cls.__name__
+        field_names = [field.name for field in dataclasses.fields(message_cls)]
+        assert dict(zip(field_names, as_list[1:])) == {
+            k: v for k, v in as_dict.items() if k != "type"
+        }
+
+
+def test_held_assets_are_omitted() -> None:
+    """Large buffers should only be sent to a client once, even when they're
+    used by multiple messages."""
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(100_000, 3)).astype(np.float32)
+    colors = rng.integers(0, 255, size=(100_000, 3), dtype=np.uint8)
+
+    def point_cloud(name: str) -> _messages.Message:
+        return _messages.PointCloudMessage(
+            name,
+            _messages.PointCloudProps(
+                points=points.copy(),
+                colors=colors,
+                point_size=0.1,
+                point_shape="square",
+                precision="float32",
+            ),
+        )
+
+    # Identical buffers in a window are stored once.
+    chunks = encode_window_v2(
+        [point_cloud("/a"), point_cloud("/b")],
+        DEFAULT_COMPRESSION_POLICY,
+        hash_assets=True,
+    )
+    assert struct.unpack_from("<Q", chunks[0], 16)[0] == 2
+
+    # The first time, the client receives both buffers. After that, neither.
+    held: dict = {}
+    held_hashes: set = set()
+    for i in range(2):
+        sent, omitted_bytes = omit_held_assets(chunks, held_hashes)
+        frame = b"".join(sent)
+        decoded, buffers = _decode_window_v2(frame, held)
+        if i == 0:
+            assert omitted_bytes == 0
+            held.update({asset_hash(b): b for b in buffers})
+        else:
+            assert omitted_bytes > 0 and len(frame) < 4096
+        assert held_hashes == set(held.keys())
+        for message in decoded["messages"]:
+            props = message["props"]
+            assert np.array_equal(
+                np.frombuffer(props["points"], np.float32), points.ravel()
+            )
+            assert np.array_equal(
+                np.frombuffer(props["colors"], np.uint8), colors.ravel()
+            )
+
+
+def test_fetchable_assets_are_omitted() -> None:
+    """Buffers that the client can fetch over HTTP should be left out, even the
+    first time they're sent."""
+    points = np.random.default_rng(0).normal(size=(100_000, 3)).astype(np.float32)
+    message = _messages.PointCloudMessage(
+        "/points",
+        _messages.PointCloudProps(
+            points=points,
+            colors=np.zeros(3, dtype=np.uint8),
+            point_size=0.1,
+            point_shape="square",
+            precision="float32",
+        ),
+    )
+    chunks = encode_window_v2([message], DEFAULT_COMPRESSION_POLICY, hash_assets=True)
+    held: set = set()
+    sent, omitted_bytes = omit_held_assets(
+        chunks, held, lambda payload_hash, size: size == points.nbytes
+    )
+    assert omitted_bytes == points.nbytes
+    assert held == {asset_hash(points.data)}
+    decoded, _ = _decode_window_v2(b"".join(sent), {asset_hash(points.data): points})
+    assert decoded["messages"][0]["props"]["points"] is points
+
+
+def test_compact_typescript_decoders() -> None:
+    """Generated TypeScript decoders should use the same type IDs and field
+    order as the server."""
+    typescript = generate_typescript_interfaces(_messages.Message)
+    decoders = typescript.split("const compactMessageDecoders")[1].split("];")[0]
+    decoder_types = re.findall(r'type: "(\w+)"', decoders)
+    assert decoder_types == [cls.__name__ for cls in _messages.Message.get_subclasses()]
+    assert (
+        '(data) => ({ type: "SetPositionMessage", name: data[1], position: data[2] })'
+        in decoders
+    )
@@ -0,0 +1,261 @@
+"""Train the zstd dictionary used for msgpack window headers.
+
+This script:
+1. Runs representative sessions against a local server: GUI and scene setup,
+   animation, prop updates, camera messages, and notifications. Each session is
+   mirrored by headless clients in both the compact and non-compact message
+   formats.
+2. Records every window header that the server compresses.
+3. Trains dictionaries of a few sizes, compares them on held-out headers, and
+   writes the chosen one to `src/viser/infra/_zstd_header_dictionary.bin`.
+
+The dictionary should be retrained when messages change significantly. Clients
+don't need to be updated: the dictionary is served to them by the server.
+"""
+
+import asyncio
+import random
+import time
+from typing import (
+    Any,
+    ByteString,
+    Callable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from unittest import mock
+
+import numpy as np
+import tyro
+import zstandard
+
+import viser
+from viser.infra import _window_encoding
+from viser.infra._window_encoding import CompressionPolicy
+
+Session = Callable[[viser.ViserServer, int], None]
+"""Called once per step, after clients have connected."""
+
+
+_gui_handles: List[Any] = []
+
+
+def _gui_session(server: viser.ViserServer, step: int) -> None:
+    if step == 0:
+        _gui_handles.clear()
+        with server.gui.add_folder("Controls"):
+            _gui_handles.extend(
+                [
+                    server.gui.add_button("Reset", icon=viser.Icon.REFRESH),
+                    server.gui.add_slider(
+                        "Speed", min=0.0, max=10.0, step=0.1, initial_value=1.0
+                    ),
+                    server.gui.add_number("Count", initial_value=3),
+                    server.gui.add_checkbox("Show grid", initial_value=True),
+                    server.gui.add_text("Name", initial_value="robot"),
+                    server.gui.add_dropdown("Mode", options=("orbit", "fly", "walk")),
+                    server.gui.add_vector3("Offset", initial_value=(0.0, 0.0, 0.0)),
+                    server.gui.add_rgb("Color", initial_value=(255, 0, 0)),
+                    server.gui.add_multi_slider(
+                        "Range", min=0, max=100, step=1, initial_value=(10, 90)
+                    ),
+                ]
+            )
+        with server.gui.add_folder("Stats"):
+            server.gui.add_markdown("**Status:** ready")
+            server.gui.add_progress_bar(0.0)
+            server.gui.add_upload_button("Upload")
+        return
+    handle = _gui_handles[step % len(_gui_handles)]
+    if isinstance(handle, viser.GuiSliderHandle):
+        handle.value = step % 10
+    elif step % 2 == 0:
+        handle.disabled = step % 4 == 0
+    else:
+        handle.visible = step % 3 != 0
+
+
+def _scene_session(server: viser.ViserServer, step: int) -> None:
+    rng = np.random.default_rng(step)
+    if step == 0:
+        server.scene.add_grid("/grid", width=10.0, height=10.0)
+        for i in range(20):
+            server.scene.add_frame(f"/robot/link_{i}", axes_length=0.1)
+            server.scene.add_label(f"/robot/link_{i}/label", f"link {i}")
+        server.scene.add_icosphere("/ball", radius=0.1, color=(0, 128, 255))
+        server.scene.add_box("/box", dimensions=(1.0, 0.5, 0.2), color=(200, 50, 50))
+        server.scene.add_mesh_simple(
+            "/mesh",
+            vertices=rng.normal(size=(50, 3)).astype(np.float32),
+            faces=rng.integers(0, 50, size=(80, 3)).astype(np.uint32),
+        )
+        server.scene.add_point_cloud(
+            "/points",
+            points=rng.normal(size=(500, 3)).astype(np.float32),
+            colors=(255, 255, 255),
+            point_size=0.01,
+        )
+        server.scene.add_camera_frustum("/camera", fov=1.0, aspect=1.5, scale=0.2)
+        server.scene.add_transform_controls("/gizmo", scale=0.5)
+        server.scene.add_batched_axes(
+            "/axes",
+            batched_wxyzs=np.tile([1.0, 0.0, 0.0, 0.0], (10, 1)),
+            batched_positions=rng.normal(size=(10, 3)),
+        )
+        return
+    with server.atomic():
+        for i in range(20):
+            frame = server.scene._handle_from_node_name[f"/robot/link_{i}"]
+            frame.position = tuple(rng.normal(size=3))
+            frame.wxyz = tuple(rng.normal(size=4))
+    if step % 5 == 0:
+        server.scene._handle_from_node_name["/ball"].visible = step % 10 == 0
+    if step % 7 == 0:
+        server.scene.add_point_cloud(
+            "/points",
+            points=rng.normal(size=(500, 3)).astype(np.float32),
+            colors=(255, 255, 255),
+            point_size=0.01,
+        )
+
+
+def _client_session(server: viser.ViserServer, step: int) -> None:
+    for client in server.get_clients().values():
+        if step % 5 == 0:
+            client.add_notification(
+                f"Step {step}", "Processing finished.", auto_close_seconds=2.0
+            )
+        client.camera.position = (np.cos(step), np.sin(step), 2.0)
+
+
+def _animation_session(server: viser.ViserServer, step: int) -> None:
+    from viser._loadtest_scenarios import animation
+
+    if step == 0:
+        animation._frames.clear()
+        animation.setup(server)
+    else:
+        animation.update(server, step)
+
+
+SESSIONS: Tuple[Session, ...] = (
+    _gui_session,
+    _scene_session,
+    _client_session,
+    _animation_session,
+)
+
+
+async def _record_session(session: Session, steps: int) -> None:
+    server = viser.ViserServer(verbose=False)
+    clients = [
+        viser.HeadlessClient(
+            f"ws://localhost:{server.get_port()}",
+            compact=compact,
+            dictionary_compression=False,
+        )
+        for compact in (True, False)
+    ]
+    for client in clients:
+        await client.connect()
+        await client.send_camera()
+    while len(server.get_clients()) < len(clients):
+        await asyncio.sleep(0.01)
+    # Wait for the server to receive the initial camera messages.
+    await asyncio.sleep(0.5)
+    for step in range(steps):
+        session(server, step)
+        await asyncio.sleep(1.0 / 60.0)
+    await asyncio.sleep(0.5)
+    for client in clients:
+        await client.close()
+    server.stop()
+
+
+def _record_headers(steps: int) -> List[bytes]:
+    headers: Set[bytes] = set()
+    maybe_compress = CompressionPolicy.maybe_compress
+
+    def record(
+        self: CompressionPolicy,
+        data: Union[bytes, memoryview],
+        use_dictionary: bool = False,
+    ) -> memoryview:
+        if use_dictionary:
+            headers.add(bytes(data))
+        return maybe_compress(self, data, use_dictionary)
+
+    with mock.patch.object(CompressionPolicy, "maybe_compress", record):
+        for session in SESSIONS:
+            asyncio.run(_record_session(session, steps))
+    return sorted(headers)
+
+
+def _train(size: int, samples: Sequence[bytes]) -> zstandard.ZstdCompressionDict:
+    train_samples: List[ByteString] = list(samples)
+    return zstandard.train_dictionary(size, train_samples)
+
+
+def _compressed_size(
+    samples: Sequence[bytes], dictionary: Optional[zstandard.ZstdCompressionDict]
+) -> int:
+    policy = CompressionPolicy(dictionary=dictionary)
+    return sum(
+        len(policy.maybe_compress(sample, use_dictionary=True)) for sample in samples
+    )
+
+
+def main(
+    steps: int = 300,
+    sizes: Tuple[int, ...] = (8 * 1024, 16 * 1024, 32 * 1024),
+    size: int = 8 * 1024,
+    small_bytes: int = 1024,
+    seed: int = 0,
+) -> None:
+    """Train and write the header dictionary.
+
+    Args:
+        steps: Update steps per session.
+        sizes: Dictionary sizes to compare on held-out headers.
+        size: Dictionary size to write.
+        small_bytes: Headers up to this size are also reported separately.
+        seed: Seed for the train and held-out split.
+    """
+    start = time.perf_counter()
+    headers = _record_headers(steps)
+    print(f"Recorded {len(headers)} headers in {time.perf_counter() - start:.1f}s")
+
+    random.Random(seed).shuffle(headers)
+    held_out = headers[: len(headers) // 5]
+    train = headers[len(headers) // 5 :]
+    # Small windows are most of live traffic, and benefit the most.
+    small = [header for header in held_out if len(header) <= small_bytes]
+
+    def report(label: str, dictionary: Optional[zstandard.ZstdCompressionDict]):
+        print(
+            f"  {label}: {_compressed_size(held_out, dictionary)} bytes,"
+            f" {_compressed_size(small, dictionary)} for small headers"
+        )
+
+    print(
+        f"Held-out: {sum(map(len, held_out))} bytes,"
+        f" {sum(map(len, small))} for {len(small)} headers of <={small_bytes} bytes"
+    )
+    report("no dictionary", None)
+    for candidate in sorted(set(sizes) | {size}):
+        report(
+            f"{candidate // 1024} KiB dictionary",
+            _train(candidate, train),
+        )
+
+    dictionary = _train(size, headers)
+    _window_encoding.HEADER_DICTIONARY_PATH.write_bytes(dictionary.as_bytes())
+    print(f"Wrote {_window_encoding.HEADER_DICTIONARY_PATH}")
+
+
+if __name__ == "__main__":
+    tyro.cli(main)